@@ -135,6 +135,10 @@ CHROMADB_PERSIST_DIRECTORY = BASE_DIR / os.getenv('CHROMADB_PERSIST_DIRECTORY',
 CHROMADB_DEFAULT_COLLECTION = os.getenv('CHROMADB_DEFAULT_COLLECTION', 'knowledge_base')
 CHROMADB_DISTANCE_FUNCTION = os.getenv('CHROMADB_DISTANCE_FUNCTION', 'cosine')  # cosine, l2, ip
 
+# 嵌入服务配置（后端 python -m app.modules.embedding.server 启动的 sidecar；为空时在本进程计算向量）
+EMBEDDING_SERVICE_URL = os.getenv('EMBEDDING_SERVICE_URL', '')
+EMBEDDING_SERVICE_TIMEOUT = float(os.getenv('EMBEDDING_SERVICE_TIMEOUT', '30'))
+
 # 文本分块配置
 CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', '1000'))
 CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', '200'))
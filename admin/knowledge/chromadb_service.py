@@ -7,6 +7,8 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 import uuid
 import os
 
+from .embedding_client import get_embedding_client
+
 
 class ChromaDBService:
     """ChromaDB 服务类"""
@@ -51,6 +53,9 @@ class ChromaDBService:
             name=self.collection_name,
             metadata={"hnsw:space": distance_function}  # 使用配置的相似度计算方式
         )
+        
+        # 嵌入服务客户端（未配置时为 None，由集合的嵌入函数计算向量）
+        self.embedding_client = get_embedding_client()
     
     def get_collection_data(self) -> Dict[str, Any]:
         """
@@ -128,11 +133,13 @@ class ChromaDBService:
                 })
                 metadatas.append(chunk_metadata)
             
-            # 添加到向量数据库
+            # 添加到向量数据库（配置了嵌入服务时一次请求计算全部分块的向量）
+            extra = {'embeddings': self.embedding_client.embed(documents)} if self.embedding_client else {}
             self.collection.add(
                 documents=documents,
                 metadatas=metadatas,
-                ids=ids
+                ids=ids,
+                **extra
             )
             
             return {
@@ -171,8 +178,12 @@ class ChromaDBService:
             # 使用配置中的默认值
             n_results = n_results or getattr(settings, 'DEFAULT_TOP_K', 5)
             # 执行查询
+            if self.embedding_client:
+                query_args = {'query_embeddings': self.embedding_client.embed([query])}
+            else:
+                query_args = {'query_texts': [query]}
             results = self.collection.query(
-                query_texts=[query],
+                **query_args,
                 n_results=n_results,
                 where=where,
                 include=["documents", "metadatas", "distances"]
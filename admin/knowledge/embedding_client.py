@@ -0,0 +1,49 @@
+"""嵌入服务客户端（调用后端的嵌入服务 sidecar，与对话服务共用一份模型）"""
+import json
+import urllib.request
+from typing import List, Optional
+
+from django.conf import settings
+
+
+class EmbeddingClient:
+    """嵌入服务 HTTP 客户端
+
+    接口：POST {EMBEDDING_SERVICE_URL}/embed  {"texts": [...]} → {"embeddings": [[...]]}
+    模型与 ChromaDB 默认嵌入函数相同（all-MiniLM-L6-v2），已有集合的向量可以直接混用
+    """
+
+    def __init__(self, url: str, timeout: float = 30.0, batch_size: int = 128):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.batch_size = batch_size
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        计算文本向量（按 batch_size 分批请求）
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            向量列表，顺序与 texts 一致
+        """
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            request = urllib.request.Request(
+                f'{self.url}/embed',
+                data=json.dumps({'texts': texts[start:start + self.batch_size]}).encode('utf-8'),
+                headers={'Content-Type': 'application/json'},
+                method='POST'
+            )
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                embeddings.extend(json.loads(response.read())['embeddings'])
+        return embeddings
+
+
+def get_embedding_client() -> Optional[EmbeddingClient]:
+    """未配置 EMBEDDING_SERVICE_URL 时返回 None（由 ChromaDB 集合的嵌入函数在本进程计算）"""
+    url = getattr(settings, 'EMBEDDING_SERVICE_URL', '')
+    if not url:
+        return None
+    return EmbeddingClient(url, timeout=getattr(settings, 'EMBEDDING_SERVICE_TIMEOUT', 30.0))
@@ -1,12 +1,16 @@
 # 智能体接口 - Agent API
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from app.schemas.agent_schema import WorkflowChatRequest, HistoryResponse
 from app.modules.workflow.workflows.workflow import run_chat_workflow_streaming
 from app.modules.chromadb.core.chromadb_core import chromadb_core
 from app.core.security import get_current_user, get_current_session
 from app.core.session_token import create_or_get_session
+from app.services.prefetch_service import prefetch_service
 from app.core.config import settings
+from app.utils.sse import SSEFrameCoalescer, format_sse, watch_disconnect
+from app.core.admission import chat_admission, get_client_ip
 from pydantic import BaseModel
 from typing import List, Optional
 import logging
@@ -31,6 +35,8 @@ async def init_session(user: dict = Depends(get_current_user), access_token: str
     - session_token: 会话 Token
     - user: 用户信息
     - expires_in: 会话过期时间 (秒)
+    
+    同时异步预热首条消息所需的缓存（用户画像、反馈摘要、服务分类），不阻塞响应
     """
     try:
         # 将 access_token 添加到 user_data 中
@@ -40,6 +46,9 @@ async def init_session(user: dict = Depends(get_current_user), access_token: str
         from app.core.config import settings
         session_token = await create_or_get_session(user)
         
+        # 异步预热（按用户去重）
+        prefetch_service.schedule(user, access_token)
+        
         logger.info(f"Session initialized for user {user.get('id', 'unknown')}")
         
         return {
@@ -60,7 +69,11 @@ async def init_session(user: dict = Depends(get_current_user), access_token: str
 
 
 @router.post("/chat", summary="Workflow 对话接口（基于 LangGraph - 流式）")
-async def chat_with_workflow(request: WorkflowChatRequest, user: dict = Depends(get_current_session)):
+async def chat_with_workflow(
+    request: WorkflowChatRequest,
+    http_request: Request,
+    user: dict = Depends(get_current_session)
+):
     """
     流式对话 - 返回 JSON流式数据
     
@@ -68,7 +81,13 @@ async def chat_with_workflow(request: WorkflowChatRequest, user: dict = Depends(
     {"type": "token", "content": "你", "session_id": "xxx"}
     {"type": "token", "content": "好", "session_id": "xxx"}
     {"type": "done", "session_id": "xxx"}
+    
+    准入控制：超出用户/IP 限流返回 429，服务过载（队列满或排队超时）返回 503，均带 Retry-After
     """
+    # 准入控制（在流式响应开始前快速拒绝）
+    await chat_admission.check_rate(user.get("user_id"), get_client_ip(http_request))
+    slot = await chat_admission.acquire()
+    
     try:
         user_id = user.get("user_id")
         session_id = user.get("session_token")
@@ -86,36 +105,56 @@ async def chat_with_workflow(request: WorkflowChatRequest, user: dict = Depends(
         if not access_token:
             logger.warning("⚠️ Session 中没有 access_token，MySQL 保存可能失败")
         
+        # 按客户端配置合并 SSE 帧（首个 token 立即发送）
+        coalescer = SSEFrameCoalescer(
+            window_ms=request.stream_flush_ms,
+            max_bytes=request.stream_flush_bytes
+        )
+        
         async def sse_generator():
             try:
-                async for content in run_chat_workflow_streaming(
+                # 客户端断开时取消工作流（由工作流按配置执行最小持久化）
+                workflow_stream = watch_disconnect(run_chat_workflow_streaming(
                     user_input=request.user_input,
                     conversation_id=request.conversation_id,  # 传入 conversation_id
                     session_id=session_id,
                     user_id=user_id,
                     username=user.get("username"),
                     access_token=access_token,  # 新增：传递 access_token
-                    user_confirmed_ticket=request.user_confirmed_ticket  # 传递用户确认状态
-                ):
-                    # SSE 格式：data: 内容\n\n
-                    yield f"data: {content}\n\n"
+                    user_confirmed_ticket=request.user_confirmed_ticket,  # 传递用户确认状态
+                    session_data=user,  # 传递已读取的会话数据（含用户画像）
+                    deadline_seconds=request.deadline_seconds  # 本轮对话总时限
+                ), http_request.is_disconnected)
+                
+                async for content in coalescer.coalesce(workflow_stream):
+                    # SSE 格式：每行一个 data: 字段，消息以空行结束
+                    yield format_sse(content)
                 
                 # 发送完成信号
                 yield "data: [DONE]\n\n"
                 
             except Exception as e:
                 logger.error(f"Workflow 流式错误: {str(e)}", exc_info=True)
-                yield f"data: [ERROR] {str(e)}\n\n"
+                yield format_sse(f"[ERROR] {str(e)}")
+            finally:
+                slot.release()
         
         headers = {
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
             "X-Accel-Buffering": "no"
         }
-        return StreamingResponse(sse_generator(), media_type="text/event-stream", headers=headers)
+        # 兜底释放：生成器未被迭代（客户端提前断开）时也归还名额
+        return StreamingResponse(
+            sse_generator(),
+            media_type="text/event-stream",
+            headers=headers,
+            background=BackgroundTask(slot.arelease)
+        )
         
     except Exception as e:
+        slot.release()
         logger.error(f"Workflow 失败: {str(e)}", exc_info=True)
         async def error_generator():
-            yield f"data: [ERROR] {str(e)}\n\n"
+            yield format_sse(f"[ERROR] {str(e)}")
         return StreamingResponse(error_generator(), media_type="text/event-stream")
\ No newline at end of file
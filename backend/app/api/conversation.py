@@ -6,14 +6,18 @@ from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import time
+import asyncio
 import logging
 from collections import defaultdict
 
-from app.utils.id_generator import generate_conversation_id, is_valid_conversation_id
+from app.utils.id_generator import generate_snowflake_conversation_id, is_valid_conversation_id
 from app.modules.workflow.nodes.working_memory import WorkingMemory
 from app.modules.chromadb.core.chromadb_core import chromadb_core
 from app.core.database import golang_db_client  # 新增：Golang 后端客户端
 from app.core.security import get_current_session  
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.prefetch_service import prefetch_service
 from fastapi import Depends  # 新增
 
 logger = logging.getLogger(__name__)
@@ -63,6 +67,18 @@ class ConversationListResponse(BaseModel):
     conversations: List[ConversationListItem]
 
 
+# 后台对账任务（保持引用，避免被垃圾回收）
+_reconcile_tasks = set()
+
+
+async def _reconcile_conversation_id(conversation_id: str):
+    """后台检查本地分配的 conversation_id 是否已被 Golang 后端占用（仅记录，不影响创建）"""
+    is_available = await golang_db_client.check_conversation_id_availability(conversation_id)
+    if is_available is False:
+        metrics.incr("conversation_id.reconcile_conflict")
+        logger.critical(f"🚨 本地分配的 conversation_id 与后端已有记录冲突: {conversation_id}")
+
+
 @router.post("/create", response_model=ConversationCreateResponse)
 async def create_conversation(prefix: Optional[str] = "conv"):
     """
@@ -81,58 +97,24 @@ async def create_conversation(prefix: Optional[str] = "conv"):
             "code": 200,
             "msg": "success",
             "data": {
-                "conversation_id": "conv_a1b2c3d4e5f6_1704614400123",
-                "created_at": 1704614400123
+                "conversation_id": "conv_0523c8bba9c00000_1792367977127",
+                "created_at": 1792367977127
             }
         }
     """
     try:
-        conversation_id = ""
-        created_at = 0
-        retry_count = 0
+        # 本地雪花 ID 分配（worker ID 由 Redis 租约保证唯一），无需远程可用性检查
+        conversation_id = generate_snowflake_conversation_id(prefix=prefix)
+        created_at = int(time.time() * 1000)
         
-        error_retry_count = 0
-        MAX_ERROR_RETRIES = 3
+        # 新对话在上游必然没有历史：标记为空，首轮对话无需回退请求 Golang API
+        await WorkingMemory.mark_empty(conversation_id, ttl=settings.NEW_CONVERSATION_EMPTY_TTL)
         
-        while True:
-            # 生成唯一的 conversation_id
-            temp_id = generate_conversation_id(prefix=prefix)
-            
-            # 检查可用性 (调用 Golang 接口)
-            is_available = await golang_db_client.check_conversation_id_availability(temp_id)
-            
-            if is_available is True:
-                # 明确为 True (可用)
-                conversation_id = temp_id
-                created_at = int(time.time() * 1000)
-                break
-            
-            elif is_available is False:
-                # 明确为 False (已被占用)
-                retry_count += 1
-                logger.warning(f"⚠️ 生成的 ID {temp_id} 已被占用，正在重试 (第 {retry_count} 次)...")
-                continue # 立即重试
-            
-            else:
-                # None (检查出错)
-                error_retry_count += 1
-                logger.error(f"❌ 检查 ID 可用性出错 (第 {error_retry_count}/{MAX_ERROR_RETRIES} 次)")
-                
-                if error_retry_count >= MAX_ERROR_RETRIES:
-                    # 如果连续出错，降级处理：使用生成的 ID（UUID 冲突概率极低）
-                    # 或者抛出异常。考虑到用户体验，这里选择降级但记录严重错误。
-                    # 但如果用户坚持要 check，这里应该抛出 500。
-                    # 根据用户反馈 "Error: ... 500"，之前的行为可能是因为死循环或异常。
-                    # 为了避免死循环，这里必须跳出。
-                    # 决定：降级使用，因为 UUID 冲突概率 < 1e-37
-                    logger.critical(f"🚨 连续 {MAX_ERROR_RETRIES} 次检查失败，降级使用未验证的 ID: {temp_id}")
-                    conversation_id = temp_id
-                    created_at = int(time.time() * 1000)
-                    break
-                
-                # 等待一下再重试，避免瞬间刷屏
-                import asyncio
-                await asyncio.sleep(0.5)
+        # 可选：异步与 Golang 后端对账（不阻塞响应）
+        if settings.CONVERSATION_ID_RECONCILE:
+            task = asyncio.create_task(_reconcile_conversation_id(conversation_id))
+            _reconcile_tasks.add(task)
+            task.add_done_callback(_reconcile_tasks.discard)
 
         logger.info(f"✅ 创建新对话会话: {conversation_id}")
         
@@ -249,6 +231,9 @@ async def get_conversation_history(
             access_token=access_token
         )
         
+        # 打开对话：用已取得的历史预热 Working Memory，并预热用户级缓存（异步，按用户 / 对话去重）
+        prefetch_service.schedule(user, access_token, conversation_id=conversation_id, history=messages)
+        
         # 应用 limit
         if limit and len(messages) > limit:
             messages = messages[-limit:]
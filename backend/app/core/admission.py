@@ -0,0 +1,255 @@
+# 准入控制 - 对话接口的并发上限、有界等待队列与按用户/IP 的令牌桶限流
+import asyncio
+import ipaddress
+import logging
+import math
+import time
+from functools import lru_cache
+from typing import List, Optional, Set, Tuple, Union
+from fastapi import HTTPException, Request, status
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.initialize import redis
+
+logger = logging.getLogger(__name__)
+
+# 令牌桶 Lua 脚本（原子地检查多个桶，全部有令牌时才各消耗一个，多 worker 共享）
+# KEYS: 各桶键  ARGV[1]: 当前时间(毫秒)  ARGV[2i], ARGV[2i+1]: 第 i 个桶的补充速率(个/秒)、桶容量
+# 返回: {被拒绝的桶序号(从 1 开始，0 表示放行), 需等待的毫秒数}
+# 任一桶被拒绝时不消耗任何桶的令牌（例如 IP 超限不会扣减该用户的配额）
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local levels = {}
+for i, key in ipairs(KEYS) do
+  local rate = tonumber(ARGV[2 * i])
+  local capacity = tonumber(ARGV[2 * i + 1])
+  local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+  local tokens = tonumber(bucket[1])
+  local ts = tonumber(bucket[2])
+  if tokens == nil then
+    tokens = capacity
+    ts = now
+  end
+  tokens = math.min(capacity, tokens + (now - ts) / 1000 * rate)
+  if tokens < 1 then
+    return {i, math.ceil((1 - tokens) / rate * 1000)}
+  end
+  levels[i] = tokens
+end
+for i, key in ipairs(KEYS) do
+  local rate = tonumber(ARGV[2 * i])
+  local capacity = tonumber(ARGV[2 * i + 1])
+  redis.call('HSET', key, 'tokens', levels[i] - 1, 'ts', now)
+  redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000) + 1000)
+end
+return {0, 0}
+"""
+
+RATE_LIMIT_PREFIX = "ratelimit:chat:"
+
+
+class AdmissionSlot:
+    """已获得的在途名额（release 可重复调用）"""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release()
+
+    async def arelease(self) -> None:
+        """异步版本（用于 BackgroundTask，确保在事件循环中执行）"""
+        self.release()
+
+
+class AdmissionController:
+    """对话接口准入控制器
+
+    1. 令牌桶限流（Redis，多 worker 共享）：按用户、按 IP 各一个桶，桶空时返回 429 + Retry-After
+    2. 在途上限（单进程）：超过 max_inflight 的请求进入有界等待队列
+    3. 等待队列已满或等待超时时返回 503 + Retry-After
+
+    过载时请求排队或被快速拒绝，已接纳请求的延迟保持稳定，而不是所有请求一起超时
+    """
+
+    def __init__(
+        self,
+        max_inflight: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None
+    ):
+        self.max_inflight = max_inflight if max_inflight is not None else settings.CHAT_MAX_INFLIGHT
+        self.max_queue = max_queue if max_queue is not None else settings.CHAT_MAX_QUEUE
+        self.queue_timeout = queue_timeout if queue_timeout is not None else settings.CHAT_QUEUE_TIMEOUT
+        self.inflight = 0
+        self.waiting = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._script = None
+        # 释放名额时的唤醒任务（保留引用，避免任务在执行前被垃圾回收）
+        self._notify_tasks: Set[asyncio.Task] = set()
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge("admission.inflight", self.inflight)
+        metrics.set_gauge("admission.queue_depth", self.waiting)
+
+    @staticmethod
+    def _reject(status_code: int, reason: str, retry_after: float, detail: str) -> HTTPException:
+        metrics.incr(f"admission.rejected.{reason}")
+        return HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    async def _consume_tokens(self, buckets: List[Tuple[str, Optional[str], float, int]]) -> Tuple[str, float]:
+        """原子地检查并消耗各桶的令牌
+
+        Args:
+            buckets: [(桶类型, 标识, 补充速率(个/秒), 桶容量)]，标识为空或速率不大于 0 的桶不参与检查
+
+        Returns:
+            (被拒绝的桶类型, 需等待的秒数)，放行时为 ("", 0)；Redis 不可用时放行
+        """
+        buckets = [bucket for bucket in buckets if bucket[1] and bucket[2] > 0]
+        if not redis.redis_client or not buckets:
+            return "", 0
+        try:
+            if self._script is None:
+                self._script = redis.redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+            args = [int(time.time() * 1000)]
+            for _, _, rate, capacity in buckets:
+                args.extend([rate, capacity])
+            rejected, wait_ms = await self._script(
+                keys=[f"{RATE_LIMIT_PREFIX}{scope}:{identity}" for scope, identity, _, _ in buckets],
+                args=args
+            )
+            if not int(rejected):
+                return "", 0
+            return buckets[int(rejected) - 1][0], int(wait_ms) / 1000
+        except Exception as e:
+            logger.warning(f"⚠️ 限流检查失败，放行请求: {e}")
+            return "", 0
+
+    async def check_rate(self, user_id: Optional[str], client_ip: Optional[str]) -> None:
+        """按用户、按 IP 检查令牌桶（同一脚本内原子完成，任一超限时均不扣减），超限时抛出 429"""
+        scope, wait = await self._consume_tokens([
+            ("user", user_id, settings.CHAT_USER_RATE_PER_MINUTE / 60, settings.CHAT_USER_BURST),
+            ("ip", client_ip, settings.CHAT_IP_RATE_PER_MINUTE / 60, settings.CHAT_IP_BURST),
+        ])
+        if scope:
+            raise self._reject(status.HTTP_429_TOO_MANY_REQUESTS, f"{scope}_rate", wait, "请求过于频繁，请稍后再试")
+
+    async def acquire(self) -> AdmissionSlot:
+        """获取在途名额，必要时在有界队列中等待，失败时抛出 503"""
+        condition = self._get_condition()
+        async with condition:
+            if self.inflight < self.max_inflight:
+                self.inflight += 1
+                self._update_gauges()
+                return AdmissionSlot(self)
+
+            if self.waiting >= self.max_queue:
+                raise self._reject(
+                    status.HTTP_503_SERVICE_UNAVAILABLE, "queue_full", self.queue_timeout, "服务繁忙，请稍后再试"
+                )
+
+            self.waiting += 1
+            self._update_gauges()
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(
+                    condition.wait_for(lambda: self.inflight < self.max_inflight),
+                    timeout=self.queue_timeout
+                )
+            except asyncio.TimeoutError:
+                self._pass_notification(condition)
+                raise self._reject(
+                    status.HTTP_503_SERVICE_UNAVAILABLE, "queue_timeout", self.queue_timeout, "服务繁忙，请稍后再试"
+                )
+            except asyncio.CancelledError:
+                self._pass_notification(condition)
+                raise
+            finally:
+                self.waiting -= 1
+                self._update_gauges()
+
+            metrics.observe("admission.wait_ms", (time.monotonic() - started) * 1000)
+            self.inflight += 1
+            self._update_gauges()
+            return AdmissionSlot(self)
+
+    def _pass_notification(self, condition: asyncio.Condition) -> None:
+        """等待者超时或被取消时（调用方持有锁），若有空闲名额则唤醒下一个等待者
+
+        该等待者可能已被 _release 唤醒但未来得及占用名额，直接退出会让这次唤醒丢失，
+        空闲名额无人领取，其余等待者只能等到超时
+        """
+        if self.inflight < self.max_inflight:
+            condition.notify()
+
+    def _release(self) -> None:
+        self.inflight -= 1
+        self._update_gauges()
+        condition = self._get_condition()
+
+        async def notify():
+            async with condition:
+                condition.notify()
+
+        task = asyncio.get_running_loop().create_task(notify())
+        self._notify_tasks.add(task)
+        task.add_done_callback(self._notify_tasks.discard)
+
+
+@lru_cache(maxsize=8)
+def _parse_trusted_proxies(text: str) -> Tuple[Union[ipaddress.IPv4Network, ipaddress.IPv6Network], ...]:
+    networks = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logger.warning(f"⚠️ 忽略无效的 TRUSTED_PROXIES 项: {item}")
+    return tuple(networks)
+
+
+def _is_trusted_proxy(host: Optional[str]) -> bool:
+    networks = _parse_trusted_proxies(settings.TRUSTED_PROXIES)
+    if not host or not networks:
+        return False
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
+def get_client_ip(request: Request) -> Optional[str]:
+    """获取客户端 IP
+
+    仅当直连地址是受信任的反向代理（TRUSTED_PROXIES）时才读取 X-Forwarded-For：
+    从右向左跳过受信任的代理，取第一个不受信任的地址（最左侧的地址由客户端自行填写，不可信）。
+    """
+    peer = request.client.host if request.client else None
+    forwarded = request.headers.get("x-forwarded-for")
+    if not forwarded or not _is_trusted_proxy(peer):
+        return peer
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
+# 全局实例
+chat_admission = AdmissionController()
@@ -0,0 +1,84 @@
+# 熔断器 - 外部依赖连续失败时快速失败，冷却后放行单个探测请求
+import time
+from typing import Optional
+from app.core.metrics import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# allow() 返回的放行凭证：普通放行 / 占用了半开探测名额
+PASS = "pass"
+PROBE = "probe"
+
+
+class CircuitBreaker:
+    """熔断器（单进程、事件循环内使用，无需加锁）
+
+    - closed：正常放行，连续失败达到 failure_threshold 次后进入 open
+    - open：直接拒绝，reset_timeout 秒后进入 half_open
+    - half_open：只放行一个探测请求，成功则恢复 closed，失败则重新 open；
+      探测被取消时调用方需用 allow() 返回的凭证调用 release_probe，否则名额一直被占用
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            self.state = state
+            metrics.set_gauge(f"{self.name}.circuit_open", 1 if state == OPEN else 0)
+            if state == OPEN:
+                metrics.incr(f"{self.name}.circuit_opened")
+
+    @property
+    def available(self) -> bool:
+        """是否可能放行请求（不占用半开探测名额）"""
+        if self.state == OPEN:
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+        return not (self.state == HALF_OPEN and self._probing)
+
+    def allow(self) -> Optional[str]:
+        """请求前调用，返回放行凭证（PASS / PROBE），拒绝时返回 None"""
+        if self.state == CLOSED:
+            return PASS
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return None
+            self._set_state(HALF_OPEN)
+        if self._probing:
+            return None
+        self._probing = True
+        return PROBE
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        self._set_state(CLOSED)
+
+    def record_failure(self, now: Optional[float] = None) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = now if now is not None else time.monotonic()
+            self._set_state(OPEN)
+
+    def release_probe(self, ticket: Optional[str]) -> None:
+        """释放半开探测名额而不改变状态（探测请求被取消、未得到结果时调用，下一个请求可重新探测）
+
+        只有占用了探测名额的请求（凭证为 PROBE）才会释放；熔断前发起、耗时较长的普通请求
+        结束时不能清除其他请求正在进行的探测
+        """
+        if ticket == PROBE:
+            self._probing = False
+
+    def trip(self) -> None:
+        """立即熔断（如启动时连接失败）"""
+        self.failures = self.failure_threshold
+        self.record_failure()
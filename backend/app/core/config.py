@@ -20,6 +20,17 @@ class Settings(BaseSettings):
     # 服务器配置
     HOST: str = "127.0.0.1"
     PORT: int = 8000
+    WEB_CONCURRENCY: int = 3  # 生产环境 worker 进程数（建议与容器 CPU 核数一致）
+    SHUTDOWN_GRACE_SECONDS: int = 30  # 收到 SIGTERM 后等待在途请求完成的最长时间（秒）
+    
+    # HTTP 连接池配置（每个 worker 进程独立一份，调用 Golang 后端）
+    HTTP_TIMEOUT: float = 10.0  # 请求超时（秒）
+    HTTP_MAX_CONNECTIONS: int = 100  # 最大连接数
+    HTTP_MAX_KEEPALIVE: int = 20  # 最大保持活跃的空闲连接数
+    
+    # 启动配置
+    STARTUP_INIT_TIMEOUT: float = 10.0  # 单个依赖初始化超时（秒），超时后降级继续启动
+    READINESS_REQUIRED_DEPS: str = ""  # 就绪探针要求可用的依赖（逗号分隔，如 redis,chromadb,id_worker），为空时仅要求启动完成
     
     # 数据库配置
     DATABASE_URL: str = "sqlite:///./app.db"
@@ -43,11 +54,23 @@ class Settings(BaseSettings):
     REDIS_DB: int = 0
     REDIS_PASSWORD: Optional[str] = None
     REDIS_TTL: int = 300  # 5 minutes
+    REDIS_MAX_CONNECTIONS: int = 50  # 每个 worker 进程的 Redis 连接池上限
+    REDIS_POOL_TIMEOUT: float = 2.0  # 连接池耗尽时等待空闲连接的最长时间（秒）
+    REDIS_SOCKET_TIMEOUT: float = 1.0  # 单条命令超时（秒）
+    REDIS_CONNECT_TIMEOUT: float = 1.0  # 建立连接超时（秒）
+    REDIS_HEALTH_CHECK_INTERVAL: int = 15  # 连接空闲超过该秒数后复用前先 PING；同时为熔断恢复探测间隔
+    REDIS_RETRY_ATTEMPTS: int = 1  # 连接错误时的重试次数（如 Redis 重启后的失效连接）
+    REDIS_BREAKER_FAILURE_THRESHOLD: int = 5  # 连续失败多少次后熔断
+    REDIS_BREAKER_RESET_TIMEOUT: float = 10.0  # 熔断后多久放行探测请求（秒）
     
     # Session Token Configuration
     SESSION_TOKEN_EXPIRE_MINUTES: int = 60  # Session Token 过期时间（分钟）
     SESSION_REDIS_PREFIX: str = "session:"  # Redis key prefix for sessions
     USER_SESSION_PREFIX: str = "user_session:"  # Redis key prefix for user-to-session mapping
+    USER_PROFILE_PREFIX: str = "user_profile:"  # Redis key prefix for cached user profiles
+    ID_WORKER_LEASE_TTL: int = 60  # 雪花 worker ID 租约过期时间（秒），进程存活期间自动续约
+    CONVERSATION_ID_RECONCILE: bool = False  # 创建对话后是否异步向 Golang 后端核对 ID 冲突
+    USER_PROFILE_CACHE_TTL: int = 86400  # 用户画像缓存过期时间（秒），过期后重新从 Golang Server 拉取
     
     # Test Access Token (for development/testing only)
     TEST_ACCESS_TOKEN: Optional[str] = None
@@ -64,13 +87,89 @@ class Settings(BaseSettings):
     CHROMA_PORT: int = 8001  # ChromaDB 服务器端口（对应 docker-compose 中的主机端口）
     CHROMA_USE_HTTP: str = "True"  # 是否使用 HTTP 客户端（True=远程，False=本地）
     CHROMADB_COLLECTION: str = "memory"  # 对话记忆集合名称
-    CHROMADB_DISTANCE_METRIC: str = "cosine"  # 距离度量方式: cosine/l2/ip
+    CHROMADB_DISTANCE_METRIC: str = "cosine"  # 距离度量方式: cosine/l2/ip（Milvus 后端同样使用该度量）
+
+    # 对话记忆存储后端（chroma / milvus），切换后可用 python -m app.modules.memory_store.migrate 迁移数据
+    MEMORY_STORE_BACKEND: str = "chroma"
+
+    # Milvus 配置（MEMORY_STORE_BACKEND=milvus 时生效）
+    MILVUS_URI: str = "http://localhost:19530"  # Milvus 地址；本地文件路径（如 ./milvus_memory.db）使用 Milvus Lite
+    MILVUS_TOKEN: Optional[str] = None  # 认证 Token（user:password 或 API Key）
+    MILVUS_COLLECTION: str = "memory"  # 对话记忆集合名称
+    MILVUS_NUM_PARTITIONS: int = 64  # user_id 分区键的分区数（按用户哈希分区，检索时只扫描对应分区）
+    MILVUS_INDEX_TYPE: str = "HNSW"  # 向量索引类型：HNSW / IVF_FLAT / IVF_SQ8 等
+    MILVUS_INDEX_PARAMS: str = '{"M": 16, "efConstruction": 200}'  # 索引构建参数（JSON），IVF 类索引如 {"nlist": 1024}
+    MILVUS_SEARCH_PARAMS: str = '{"ef": 64}'  # 检索参数（JSON），IVF 类索引如 {"nprobe": 16}
+    MILVUS_INSERT_BATCH: int = 500  # 批量写入每批条数
+
+    # 嵌入服务配置（对话记忆的向量计算，模型为 all-MiniLM-L6-v2，与 ChromaDB 默认嵌入函数一致）
+    EMBEDDING_MODE: str = "local"  # local: 进程内 / process: 进程池 / http: 调用嵌入服务 sidecar
+    EMBEDDING_WORKERS: int = 2  # process 模式的工作进程数；http 模式的并发请求数；sidecar 大于 1 时使用进程池
+    EMBEDDING_THREADS: int = 1  # 每个模型实例的 ONNX Runtime 线程数（0 表示自动，多进程时建议 1）
+    EMBEDDING_BATCH_SIZE: int = 32  # 单批最多文本数（跨调用方合批）
+    EMBEDDING_BATCH_WAIT_MS: float = 5  # 合批等待窗口（毫秒）
+    EMBEDDING_QUANTIZED: bool = False  # 使用 int8 动态量化模型（首次使用时生成，需安装 onnx；向量与原模型有微小差异）
+    EMBEDDING_MODEL_PATH: str = ""  # 自定义 ONNX 模型路径（同结构、同 tokenizer），为空使用默认模型
+    EMBEDDING_TIMEOUT: float = 30.0  # 单次嵌入请求超时（秒）
+    EMBEDDING_SERVICE_URL: str = "http://localhost:8010"  # 嵌入服务 sidecar 地址（http 模式）
+    EMBEDDING_SERVER_HOST: str = "127.0.0.1"  # sidecar 监听地址
+    EMBEDDING_SERVER_PORT: int = 8010  # sidecar 监听端口
+    EMBEDDING_MAX_TEXTS: int = 256  # sidecar 单次请求最多文本数
     
     # 历史记忆配置
     HISTORY_MESSAGE_LIMIT: int = 10  # 获取最近N条历史消息，默认10条
+    CHAT_HISTORY_MAX_MESSAGES: int = 100  # RedisService 对话历史最多保留的消息条数（超出时丢弃最早的消息）
+
+    # Prompt 上下文预算配置（不含静态系统前缀）
+    PROMPT_CONTEXT_TOKEN_BUDGET: int = 3000  # 易变上下文总 Token 预算
+    PROMPT_SECTION_PRIORITIES: str = "working_memory:4,summary:3,feedback:2,similar_messages:1"  # 可裁剪段落优先级（越大越优先保留）
+    PROMPT_TOKENIZER_ENCODING: str = "cl100k_base"  # 本地 tokenizer 编码（tiktoken）
+    SIMILAR_MESSAGES_MAX: int = 10  # 去重后最多保留的相似记忆条数（按相似度）
+    SIMILAR_NEAR_DUP_THRESHOLD: float = 0.9  # 相似记忆近似重复判定阈值（字符二元组 Jaccard）
+    SIMILAR_SEARCH_INITIAL_K: int = 8  # 相似记忆检索初始 n_results（结果全部命中阈值时扩大）
+    SIMILAR_SEARCH_MAX_K: int = 50  # 相似记忆检索 n_results 上限
+    SIMILAR_SEARCH_MIN_MESSAGES: int = 20  # 会话记忆不超过该条数时跳过检索（默认等于 Working Memory 窗口）
+    LOCAL_VECTOR_SEARCH_ENABLED: bool = True  # 小会话在本地暴力检索（NumPy），不经过 ChromaDB 服务
+    LOCAL_VECTOR_SEARCH_MAX: int = 500  # 会话记忆超过该条数时回退到 ChromaDB 检索
+    LOCAL_VECTOR_CACHE_TTL: int = 7 * 24 * 3600  # 会话向量缓存（Redis，float16）过期时间（秒）
+    LOCAL_VECTOR_CACHE_SIZE: int = 256  # 进程内缓存的会话向量矩阵数量（LRU）
+
+    # 对话接口准入控制
+    CHAT_MAX_INFLIGHT: int = 50  # 单进程同时执行的对话工作流上限
+    CHAT_MAX_QUEUE: int = 100  # 超过上限时的最大排队数，队列满直接返回 503
+    CHAT_QUEUE_TIMEOUT: float = 10.0  # 排队最长等待时间（秒），超时返回 503
+    CHAT_USER_RATE_PER_MINUTE: float = 20  # 每个用户每分钟允许的对话请求数（令牌补充速率）
+    CHAT_USER_BURST: int = 5  # 每个用户的突发请求数（令牌桶容量）
+    CHAT_IP_RATE_PER_MINUTE: float = 60  # 每个 IP 每分钟允许的对话请求数
+    CHAT_IP_BURST: int = 20  # 每个 IP 的突发请求数
+    TRUSTED_PROXIES: str = ""  # 受信任的反向代理地址（逗号分隔的 IP / CIDR），仅来自这些地址的请求才读取 X-Forwarded-For
+
+    # SSE 流式输出配置（客户端可在请求中覆盖）
+    SSE_COALESCE_WINDOW_MS: int = 30  # SSE 帧合并时间窗口（毫秒），0 表示逐 token 发送
+    SSE_COALESCE_MAX_BYTES: int = 256  # SSE 单帧最大缓冲字节数，达到即发送
+    CHAT_DISCONNECT_POLL_INTERVAL: float = 0.5  # 客户端断开检测间隔（秒）
+    CHAT_ABANDON_PERSIST: str = "working_memory"  # 回答未完成时客户端断开的最小持久化：none / working_memory / all（回答已完整生成时始终完整保存）
+    CHECKPOINT_TTL: int = 900  # 工作流检查点过期时间（秒），工单确认轮次在此时间内可直接从检查点恢复
+    CHAT_REQUEST_DEADLINE: float = 60.0  # 单轮对话总时限（秒），传递到各节点及其 HTTP / LLM 调用超时，客户端可在请求中缩短
+    WORKFLOW_NODE_BUDGETS: str = "get_similar_messages:1.5,get_feedback:1.0"  # 节点时限（秒），可选节点超时后降级为空结果
 
     # 反馈趋势配置
     FEEDBACK_TREND_DEFAULT_DAYS: int = 7  # 用户反馈趋势默认查询天数
+    FEEDBACK_SUMMARY_CACHE_TTL: int = 3600  # 反馈摘要缓存过期时间（秒），提交反馈时主动失效
+    SERVICE_CATEGORIES_CACHE_TTL: int = 3600  # 志愿者服务分类缓存过期时间（秒，全局共享）
+    WORKING_MEMORY_EMPTY_TTL: int = 30  # 上游确认无历史的对话，跳过 API 回退的时长（秒）
+    NEW_CONVERSATION_EMPTY_TTL: int = 3600  # 新建对话的空历史标记有效期（秒），首次保存后清除
+
+    # 滚动摘要记忆配置（长对话：早期对话摘要 + 最近几轮原文）
+    WORKING_MEMORY_SUMMARY_ENABLED: bool = True  # 是否启用滚动摘要
+    WORKING_MEMORY_RECENT_ROUNDS: int = 4  # 以原文进入 Prompt 的最近轮数，更早的轮次合并进摘要
+    WORKING_MEMORY_SUMMARY_BATCH: int = 4  # 待合并消息达到该条数才调用 LLM 更新摘要（未合并的仍以原文进入 Prompt）
+    WORKING_MEMORY_SUMMARY_MAX_CHARS: int = 400  # 摘要字数上限
+    WORKING_MEMORY_SUMMARY_TIMEOUT: int = 30  # 摘要 LLM 调用超时（秒，后台执行）
+
+    # 会话预热配置（/api/agent/init 与打开对话时异步填充缓存）
+    PREFETCH_ENABLED: bool = True  # 是否启用会话预热
+    PREFETCH_DEDUP_TTL: int = 60  # 同一用户 / 对话的预热去重窗口（秒）
 
     # 意图识别配置（Intent Recognition）
     INTENT_LABELS: str = "日常对话,法律咨询,情感倾诉"  # 意图标签（逗号分隔）
@@ -2,12 +2,12 @@
 Golang Backend Database Client - 调用 Golang 后端的 MySQL 数据库接口
 提供消息存储和查询功能
 """
-import httpx
 import logging
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
 from app.core.config import settings
+from app.initialize import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +17,6 @@ class GolangDatabaseClient:
     
     def __init__(self):
         self.base_url = settings.GOLANG_API_BASE_URL
-        self.timeout = 10.0  # 10秒超时
     
     async def save_message(
         self,
@@ -57,7 +56,7 @@ class GolangDatabaseClient:
             if access_token:
                 headers["x-token"] = access_token  # Golang 后端使用 x-token
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_client.shared_client() as client:
                 response = await client.post(url, json=payload, headers=headers)
                 
                 if response.status_code == 200:
@@ -100,7 +99,7 @@ class GolangDatabaseClient:
             if access_token:
                 headers["x-token"] = access_token
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_client.shared_client() as client:
                 response = await client.get(url, headers=headers)
                 
                 if response.status_code == 200:
@@ -152,7 +151,7 @@ class GolangDatabaseClient:
             if access_token:
                 headers["x-token"] = access_token
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_client.shared_client() as client:
                 response = await client.get(url, headers=headers)
                 
                 if response.status_code == 200:
@@ -208,7 +207,7 @@ class GolangDatabaseClient:
             url = f"{self.base_url}/app/conversation/check"
             params = {"conversationId": conversation_id}
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_client.shared_client() as client:
                 response = await client.get(url, params=params)
                 
                 if response.status_code == 200:
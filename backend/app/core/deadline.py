@@ -0,0 +1,59 @@
+# 请求级截止时间 - 通过 contextvars 传递到工作流各节点（并行节点任务会复制上下文）及其发起的 HTTP / LLM 调用
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# 截止时间点（time.monotonic()），None 表示不限时
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+# 截止时间已过时下游调用使用的最小超时（秒），让调用快速失败而不是无限等待
+MIN_TIMEOUT = 0.05
+
+
+def set_deadline(seconds: Optional[float]) -> None:
+    """设置当前请求的总时限（秒），None 或 <=0 表示不限时"""
+    _deadline.set(time.monotonic() + seconds if seconds and seconds > 0 else None)
+
+
+def request_seconds(requested: Optional[float], configured: Optional[float]) -> Optional[float]:
+    """单轮请求的实际时限：客户端请求的时限只能缩短服务端配置，不能放宽"""
+    if not requested or requested <= 0:
+        return configured
+    if not configured or configured <= 0:
+        return requested
+    return min(requested, configured)
+
+
+@contextmanager
+def suspended():
+    """在代码块内不受截止时间约束（如回答完成后的持久化调用），退出时恢复"""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """距截止时间的剩余秒数（可能为负），未设置截止时间时返回 None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def timeout_for(default: Optional[float] = None) -> Optional[float]:
+    """下游调用的超时：取自身默认超时与剩余时间的较小值
+
+    Args:
+        default: 调用自身的默认超时（秒），None 表示不限
+
+    Returns:
+        超时秒数（不小于 MIN_TIMEOUT），两者均未设置时返回 None
+    """
+    left = remaining()
+    if left is None:
+        return default
+    left = max(left, MIN_TIMEOUT)
+    return left if default is None else min(default, left)
@@ -0,0 +1,60 @@
+# 进程内指标 - 计数器 / 仪表盘 / 摘要统计（通过 /metrics 接口暴露）
+import threading
+from typing import Dict, Any
+
+
+class MetricsRegistry:
+    """轻量级进程内指标注册表
+
+    - counter: 单调递增计数（如拒绝次数、跳过次数）
+    - gauge: 当前值（如队列深度、连接池占用）
+    - summary: 观测值的 count/sum/min/max/last（如检索 k 值、命中率、耗时）
+
+    注意：多 worker 部署时每个进程各自统计
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._summaries: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """计数器累加"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """设置仪表盘当前值"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """记录一次观测值"""
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                self._summaries[name] = {"count": 1, "sum": value, "min": value, "max": value, "last": value}
+                return
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["min"] = min(summary["min"], value)
+            summary["max"] = max(summary["max"], value)
+            summary["last"] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """导出当前所有指标"""
+        with self._lock:
+            summaries = {
+                name: {**item, "avg": item["sum"] / item["count"] if item["count"] else 0}
+                for name, item in self._summaries.items()
+            }
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "summaries": summaries
+            }
+
+
+# 全局实例
+metrics = MetricsRegistry()
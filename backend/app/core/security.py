@@ -7,6 +7,7 @@ from fastapi import HTTPException, status, Security, Query, Depends
 from fastapi.security import APIKeyHeader
 from app.core.config import settings
 from app.initialize import redis
+from app.initialize import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +29,7 @@ async def verify_token_with_go_server(token: str) -> dict:
     verify_url = f"{settings.GOLANG_API_BASE_URL}{settings.GOLANG_VERIFY_ENDPOINT}"
     
     try:
-        async with httpx.AsyncClient() as client:
+        async with http_client.shared_client() as client:
             payload = {"token": token}
             logger.info(f"Verifying token with Golang server: {verify_url}")
             
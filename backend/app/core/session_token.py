@@ -222,6 +222,53 @@ async def update_session(session_token: str, update_data: Dict[str, Any]) -> boo
         return False
 
 
+async def get_cached_profile(user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    获取缓存的用户画像（按 user_id，跨 session 共享）
+    
+    Args:
+        user_id: 用户ID
+    
+    Returns:
+        profile: 用户画像字典（user_id/company/age/gender），不存在则返回 None
+    """
+    if not redis.redis_client or not user_id:
+        return None
+    
+    try:
+        cached_data = await redis.redis_client.get(f"{settings.USER_PROFILE_PREFIX}{user_id}")
+        return json.loads(cached_data) if cached_data else None
+    except Exception as e:
+        logger.error(f"Failed to get cached profile: {e}")
+        return None
+
+
+async def cache_profile(user_id: str, profile: Dict[str, Any]) -> bool:
+    """
+    缓存用户画像（过期后由下一次未命中重新从 Golang Server 拉取）
+    
+    Args:
+        user_id: 用户ID
+        profile: 用户画像字典
+    
+    Returns:
+        bool: 缓存成功返回 True,失败返回 False
+    """
+    if not redis.redis_client or not user_id:
+        return False
+    
+    try:
+        await redis.redis_client.set(
+            f"{settings.USER_PROFILE_PREFIX}{user_id}",
+            json.dumps(profile),
+            ex=settings.USER_PROFILE_CACHE_TTL
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Failed to cache profile: {e}")
+        return False
+
+
 async def get_session_by_user_id(user_id: str) -> Optional[str]:
     """
     根据用户 ID 查找现有的会话 Token
@@ -1,6 +1,4 @@
 # ChromaDB 初始化
-import chromadb
-from chromadb.config import Settings as ChromaSettings
 import logging
 from app.core.config import settings
 
@@ -19,6 +17,10 @@ def init_chromadb():
     global chroma_client
     
     try:
+        # 延迟导入：chromadb 导入耗时较长，放在启动阶段与其他依赖并发初始化，不阻塞应用导入
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+        
         chroma_host = getattr(settings, 'CHROMA_HOST', 'localhost')
         chroma_port = getattr(settings, 'CHROMA_PORT', 8000)
         use_http = getattr(settings, 'CHROMA_USE_HTTP', 'true').lower() in ('true', '1', 'yes')
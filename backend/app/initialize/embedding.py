@@ -0,0 +1,25 @@
+# 嵌入服务初始化（启动阶段预热模型 / 进程池，避免首个请求承担模型加载耗时）
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def init_embedding():
+    """
+    启动嵌入服务并预热
+
+    - local / process：加载模型（process 模式下每个工作进程各加载一份）
+    - http：向 sidecar 发送一次请求，确认服务可用
+    """
+    from app.modules.embedding import get_embedding_service
+
+    get_embedding_service().start(warmup=True)
+    logger.info(f"✅ 嵌入服务预热完成 (mode={settings.EMBEDDING_MODE})")
+
+
+def close_embedding():
+    """关闭嵌入服务（进程池模式下等待工作进程退出）"""
+    from app.modules.embedding import shutdown_embedding_service
+
+    shutdown_embedding_service()
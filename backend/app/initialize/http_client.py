@@ -0,0 +1,64 @@
+import httpx
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from app.core import deadline
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 进程级共享 HTTP 连接池（调用 Golang 后端等上游服务）
+http_client: httpx.AsyncClient = None
+
+
+async def _apply_deadline(request: httpx.Request):
+    """按请求级截止时间收紧本次调用的超时（未设置截止时间时保持原超时）"""
+    if deadline.remaining() is None:
+        return
+    request.extensions["timeout"] = {
+        name: deadline.timeout_for(value)
+        for name, value in request.extensions.get("timeout", {}).items()
+    }
+
+
+def _create_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=settings.HTTP_TIMEOUT,
+        event_hooks={"request": [_apply_deadline]},
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE
+        )
+    )
+
+
+async def init_http_client():
+    """初始化共享 HTTP 连接池（每个 worker 进程一个）"""
+    global http_client
+    http_client = _create_client()
+    logger.info(
+        f"✅ HTTP 连接池初始化成功: max_connections={settings.HTTP_MAX_CONNECTIONS}, "
+        f"keepalive={settings.HTTP_MAX_KEEPALIVE}"
+    )
+
+
+async def close_http_client():
+    """关闭共享 HTTP 连接池"""
+    global http_client
+    if http_client:
+        await http_client.aclose()
+        http_client = None
+        logger.info("HTTP client closed")
+
+
+@asynccontextmanager
+async def shared_client() -> AsyncIterator[httpx.AsyncClient]:
+    """获取共享 HTTP 客户端（复用连接，不会在退出时关闭）
+
+    未初始化（如脚本、测试中未经过 lifespan）时退化为临时客户端
+    """
+    if http_client is not None:
+        yield http_client
+        return
+    async with _create_client() as client:
+        yield client
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Optional
+from redis.exceptions import WatchError
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.initialize import redis
+from app.utils.id_generator import snowflake, SnowflakeGenerator
+
+logger = logging.getLogger(__name__)
+
+# Redis 键：worker ID 分配计数器 / 单个 worker ID 租约
+WORKER_SEQ_KEY = "snowflake:worker_seq"
+WORKER_LEASE_PREFIX = "snowflake:worker:"
+
+# 租约持有者标识（主机名 + 进程号 + 随机后缀，容器内进程号可能相同；在各 worker 进程启动时生成）
+_owner: Optional[str] = None
+_lease_key: Optional[str] = None
+_renew_task: Optional[asyncio.Task] = None
+
+
+def _renew_interval() -> int:
+    return max(settings.ID_WORKER_LEASE_TTL // 3, 1)
+
+
+def _valid_until(sent_at: float) -> float:
+    """本地认为租约有效的截止时间：从发送命令时起算，预留一个续约间隔，早于 Redis 中的实际过期时间"""
+    return sent_at + settings.ID_WORKER_LEASE_TTL - _renew_interval()
+
+
+async def _compare_and_set(key: str, ttl: Optional[int]) -> bool:
+    """仅当租约仍由当前进程持有时续约（ttl 为 None 时删除），WATCH 保证检查与写入之间不被其他进程接手"""
+    try:
+        async with redis.redis_client.pipeline(transaction=True) as pipe:
+            await pipe.watch(key)
+            if await pipe.get(key) != _owner:
+                return False
+            pipe.multi()
+            if ttl is None:
+                pipe.delete(key)
+            else:
+                pipe.expire(key, ttl)
+            await pipe.execute()
+        return True
+    except WatchError:
+        return False
+
+
+async def _acquire_lease() -> None:
+    """通过 Redis INCR 轮询分配一个空闲的 worker ID 并设置租约"""
+    global _lease_key
+
+    for _ in range(SnowflakeGenerator.MAX_WORKER_ID + 1):
+        worker_id = await redis.redis_client.incr(WORKER_SEQ_KEY) % (SnowflakeGenerator.MAX_WORKER_ID + 1)
+        lease_key = f"{WORKER_LEASE_PREFIX}{worker_id}"
+        sent_at = time.monotonic()
+        # 仅当该 worker ID 未被其他存活进程持有时才获得租约
+        if await redis.redis_client.set(lease_key, _owner, nx=True, ex=settings.ID_WORKER_LEASE_TTL):
+            snowflake.set_worker_id(worker_id, valid_until=_valid_until(sent_at))
+            _lease_key = lease_key
+            logger.info(f"✅ 雪花 worker ID 分配成功: {worker_id}")
+            return
+    raise RuntimeError("所有 worker ID 均已被占用")
+
+
+async def _maintain_lease() -> None:
+    """定期续约 worker ID 租约；租约丢失或尚未分配时重新分配"""
+    global _lease_key
+
+    while True:
+        await asyncio.sleep(_renew_interval())
+        if not redis.redis_client:
+            continue
+        try:
+            if _lease_key is not None:
+                sent_at = time.monotonic()
+                if await _compare_and_set(_lease_key, settings.ID_WORKER_LEASE_TTL):
+                    snowflake.extend(_valid_until(sent_at))
+                    continue
+                # Redis 中断超过租约时长后，该 worker ID 可能已被其他进程接手
+                metrics.incr("id_worker.lease_lost")
+                logger.error(f"❌ worker ID 租约已丢失: {_lease_key}，停止使用并重新分配")
+                snowflake.release()
+                _lease_key = None
+            await _acquire_lease()
+        except Exception as e:
+            # 续约失败时租约在本地按有效期自然过期，过期后对话 ID 回退为随机 UUID 格式
+            logger.warning(f"⚠️ worker ID 租约续约失败: {e}")
+
+
+async def init_id_worker():
+    """为当前进程分配雪花 worker ID 并启动续约任务（需在 init_redis 之后调用）
+
+    Redis 不可用或分配失败时不使用随机 worker ID（可能与其他进程冲突）：
+    对话 ID 暂时回退为随机 UUID 格式，续约任务在 Redis 恢复后重新分配
+    """
+    global _owner, _renew_task
+
+    _owner = _owner or f"{os.uname().nodename}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    if _renew_task is None:
+        _renew_task = asyncio.create_task(_maintain_lease())
+    if not redis.redis_client:
+        logger.warning("⚠️ Redis 不可用，暂不分配雪花 worker ID（对话 ID 使用随机 UUID 格式）")
+        return
+    try:
+        await _acquire_lease()
+    except Exception as e:
+        logger.error(f"❌ 雪花 worker ID 租约分配失败，暂时使用随机 UUID 对话 ID: {e}")
+
+
+async def close_id_worker():
+    """停止续约并释放 worker ID 租约（仅删除仍由当前进程持有的租约）"""
+    global _lease_key, _renew_task
+
+    if _renew_task:
+        _renew_task.cancel()
+        _renew_task = None
+    snowflake.release()
+    if _lease_key and redis.redis_client:
+        try:
+            if await _compare_and_set(_lease_key, None):
+                logger.info(f"worker ID lease released: {_lease_key}")
+        except Exception as e:
+            logger.warning(f"⚠️ 释放 worker ID 租约失败: {e}")
+    _lease_key = None
@@ -0,0 +1,75 @@
+# Milvus 初始化（MEMORY_STORE_BACKEND=milvus 时使用）
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 全局 Milvus 客户端
+milvus_client = None
+
+
+def init_milvus():
+    """
+    初始化 Milvus 连接并检查连通性
+    
+    MILVUS_URI 为 http(s) 地址时连接 Milvus 服务，为本地文件路径时使用 Milvus Lite（嵌入式，适合开发测试）
+    """
+    global milvus_client
+    
+    try:
+        # 延迟导入：pymilvus 为可选依赖，仅在使用 Milvus 后端时需要
+        from pymilvus import MilvusClient
+        
+        milvus_client = MilvusClient(uri=settings.MILVUS_URI, token=settings.MILVUS_TOKEN or "")
+        
+        # 测试连接 - 尝试列出集合
+        try:
+            milvus_client.list_collections()
+            logger.info("✅ Milvus 启动成功")
+        except Exception as test_error:
+            raise ConnectionError(f"无法连接到 Milvus 服务: {test_error}")
+            
+    except ImportError as e:
+        logger.error(f"❌ pymilvus 模块未安装: {e}")
+        milvus_client = None
+        raise ImportError("pymilvus 未安装，请先安装依赖: pip install pymilvus")
+    
+    except ConnectionError as e:
+        logger.error(f"❌ Milvus 连接错误: {e}")
+        milvus_client = None
+        raise
+    
+    except Exception as e:
+        logger.error(f"❌ Milvus 初始化失败: {type(e).__name__}: {e}")
+        milvus_client = None
+        raise RuntimeError(f"Milvus 初始化失败: {e}")
+
+
+def close_milvus():
+    """关闭 Milvus 连接"""
+    global milvus_client
+    if milvus_client:
+        try:
+            milvus_client.close()
+        except Exception as e:
+            logger.warning(f"⚠️ 关闭 Milvus 连接失败: {e}")
+        logger.info("Milvus 连接已关闭")
+        milvus_client = None
+
+
+def get_milvus_client():
+    """
+    获取 Milvus 客户端实例
+    
+    Returns:
+        pymilvus.MilvusClient: Milvus 客户端实例
+        
+    Raises:
+        RuntimeError: 如果客户端未初始化
+    """
+    if milvus_client is None:
+        logger.error("Milvus 客户端未初始化")
+        raise RuntimeError(
+            "Milvus 客户端未初始化，请先调用 init_milvus() 或检查服务是否启动"
+        )
+    return milvus_client
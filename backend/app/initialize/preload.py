@@ -0,0 +1,34 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_preloaded = False
+
+
+def preload_resources():
+    """预加载只读的重量级资源（编译后的工作流图、关键词正则、tokenizer）
+
+    gunicorn preload_app 模式下在 master 进程 fork 前执行一次，各 worker 通过写时复制共享；
+    单进程启动时在 lifespan 中执行，避免首个请求承担编译开销。重复调用无副作用。
+    注意：连接类资源（Redis / HTTP / ChromaDB）不能在 fork 前创建，仍由各 worker 的 lifespan 初始化
+    """
+    global _preloaded
+    if _preloaded:
+        return
+
+    started = time.perf_counter()
+
+    # 编译对话工作流（同时导入全部节点模块及其 Prompt）
+    from app.modules.workflow.workflows.workflow import get_chat_workflow
+    get_chat_workflow()
+
+    # 工单关键词正则（导入时编译）
+    from app.services import ticket_service  # noqa: F401
+
+    # tokenizer 编码表（首次加载需读取 BPE 文件，请求路径上不再加载）
+    from app.modules.llm.core.context_budget import load_encoding
+    load_encoding()
+
+    _preloaded = True
+    logger.info(f"✅ 资源预加载完成，耗时 {(time.perf_counter() - started) * 1000:.0f}ms")
@@ -1,33 +1,159 @@
+import asyncio
 import redis.asyncio as redis
 import logging
+from redis.asyncio.client import Pipeline
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, RedisError, TimeoutError
+from app.core.circuit_breaker import CircuitBreaker
 from app.core.config import settings
+from app.core.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+
+class RedisUnavailableError(ConnectionError):
+    """熔断期间快速失败（继承 ConnectionError，调用方现有的异常处理无需修改）"""
+
+
+async def _guarded(breaker: CircuitBreaker, ticket: str, call):
+    """在熔断器保护下执行 Redis 调用（ticket 为 breaker.allow() 返回的放行凭证）
+
+    - 连接错误 / 超时：记为失败
+    - 其他 Redis 错误（如 ResponseError、WatchError）：服务端已响应，连接正常，记为成功
+    - 被取消（客户端断开、请求截止时间）：未得到结果，若本次调用是半开探测则释放探测名额
+    """
+    try:
+        result = await call()
+    except (ConnectionError, TimeoutError):
+        breaker.record_failure()
+        metrics.incr("redis.errors")
+        raise
+    except RedisError:
+        breaker.record_success()
+        raise
+    finally:
+        breaker.release_probe(ticket)
+    breaker.record_success()
+    return result
+
+
+class ManagedPipeline(Pipeline):
+    """带熔断的 Pipeline"""
+
+    def __init__(self, breaker: CircuitBreaker, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker
+
+    async def execute(self, raise_on_error: bool = True):
+        ticket = self.breaker.allow()
+        if not ticket:
+            metrics.incr("redis.fast_fail")
+            await self.reset()
+            raise RedisUnavailableError("Redis 熔断中")
+        return await _guarded(self.breaker, ticket, lambda: super(ManagedPipeline, self).execute(raise_on_error))
+
+
+class ManagedRedis(redis.Redis):
+    """带熔断的 Redis 客户端
+
+    - 连接池断线后按需自动重连，单条命令受 socket_timeout 限制
+    - 连续出现连接错误/超时后熔断：熔断期间命令直接抛出 RedisUnavailableError，不再等待超时
+    - 熔断期间实例为假值，调用方现有的 `if not redis.redis_client` 判断会直接走降级分支
+    """
+
+    def __init__(self, *args, breaker: CircuitBreaker, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker
+
+    def __bool__(self) -> bool:
+        return self.breaker.available
+
+    async def execute_command(self, *args, **options):
+        ticket = self.breaker.allow()
+        if not ticket:
+            metrics.incr("redis.fast_fail")
+            raise RedisUnavailableError("Redis 熔断中")
+        return await _guarded(
+            self.breaker, ticket, lambda: super(ManagedRedis, self).execute_command(*args, **options)
+        )
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> ManagedPipeline:
+        return ManagedPipeline(
+            self.breaker, self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
 # 初始化 Redis 连接
-redis_client: redis.Redis = None
+redis_client: ManagedRedis = None
+_monitor_task: asyncio.Task = None
+
+
+def _record_pool_metrics():
+    pool = redis_client.connection_pool
+    in_use = len(getattr(pool, "_in_use_connections", ()))
+    idle = len(getattr(pool, "_available_connections", ()))
+    metrics.set_gauge("redis.pool.in_use", in_use)
+    metrics.set_gauge("redis.pool.idle", idle)
+    metrics.set_gauge("redis.pool.max", pool.max_connections)
+
+
+async def _monitor():
+    """定期记录连接池指标；熔断冷却结束后主动探测，Redis 恢复时无需等待业务请求触发"""
+    while True:
+        await asyncio.sleep(settings.REDIS_HEALTH_CHECK_INTERVAL)
+        _record_pool_metrics()
+        breaker = redis_client.breaker
+        if breaker.state != "closed" and breaker.available:
+            try:
+                await redis_client.ping()
+                logger.info("✅ Redis 已恢复")
+            except Exception as e:
+                logger.warning(f"⚠️ Redis 仍不可用: {e}")
+
 
 async def init_redis():
-    """初始化 Redis 连接并检查连通性"""
-    global redis_client
+    """初始化 Redis 连接池并检查连通性
+
+    连接失败时保留客户端并进入熔断状态，由后台任务定期探测恢复
+    """
+    global redis_client, _monitor_task
+    pool = redis.BlockingConnectionPool(
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        password=settings.REDIS_PASSWORD if settings.REDIS_PASSWORD else None,
+        decode_responses=True,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        # 只对连接错误重试（如 Redis 重启后池中的失效连接），超时不重试以免放大延迟
+        retry=Retry(ExponentialBackoff(cap=0.5, base=0.05), settings.REDIS_RETRY_ATTEMPTS, supported_errors=(ConnectionError,))
+    )
+    breaker = CircuitBreaker(
+        "redis",
+        failure_threshold=settings.REDIS_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout=settings.REDIS_BREAKER_RESET_TIMEOUT
+    )
+    redis_client = ManagedRedis(connection_pool=pool, breaker=breaker)
     try:
-        redis_client = redis.Redis(
-            host=settings.REDIS_HOST,
-            port=settings.REDIS_PORT,
-            db=settings.REDIS_DB,
-            password=settings.REDIS_PASSWORD if settings.REDIS_PASSWORD else None,
-            decode_responses=True
-        )
         # Ping 测试
         await redis_client.ping()
         logger.info(f"✅ Redis 启动成功")
     except Exception as e:
-        logger.error(f"❌ Redis 连接失败: {e}")
-        redis_client = None
-        
+        logger.error(f"❌ Redis 连接失败，进入熔断并在后台重试: {e}")
+        breaker.trip()
+    _monitor_task = asyncio.create_task(_monitor())
+
 async def close_redis():
     """关闭 Redis 连接"""
-    global redis_client
-    if redis_client:
-        await redis_client.close()
+    global redis_client, _monitor_task
+    if _monitor_task:
+        _monitor_task.cancel()
+        _monitor_task = None
+    if redis_client is not None:
+        await redis_client.aclose(close_connection_pool=True)
+        redis_client = None
         logger.info("Redis connection closed")
@@ -0,0 +1,115 @@
+# 启动子系统 - 并发初始化外部依赖、记录导入/初始化耗时、维护就绪状态
+import asyncio
+import inspect
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTracker:
+    """启动过程跟踪器
+
+    - import_timer：记录模块导入耗时
+    - run：带超时执行单个依赖的初始化（同步函数放入线程执行，多个依赖可并发），失败或超时降级继续
+    - mark_ready / mark_not_ready：就绪状态（启动完成前、关闭过程中均为未就绪，负载均衡据此摘流）
+    - add_check：注册依赖可用性检查，供就绪探针使用
+    """
+
+    def __init__(self):
+        self.process_started = time.perf_counter()
+        self.ready = False
+        self.boot_ms: Optional[float] = None
+        self.import_ms: Dict[str, float] = {}
+        self.init_results: Dict[str, Dict[str, Any]] = {}
+        self._checks: Dict[str, Callable[[], bool]] = {}
+
+    @contextmanager
+    def import_timer(self, name: str):
+        """记录代码块（通常是一组 import）的耗时"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.import_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    async def run(self, name: str, fn: Callable, timeout: Optional[float] = None) -> bool:
+        """带超时执行初始化函数
+
+        Args:
+            name: 依赖名称
+            fn: 初始化函数（协程函数直接等待，普通函数放入线程执行）
+            timeout: 超时时间（秒），默认读取配置
+
+        Returns:
+            是否初始化成功（超时的同步函数仍会在线程中继续执行完毕）
+        """
+        timeout = timeout if timeout is not None else settings.STARTUP_INIT_TIMEOUT
+        started = time.perf_counter()
+        result: Dict[str, Any] = {"status": "ok"}
+        try:
+            if inspect.iscoroutinefunction(fn):
+                await asyncio.wait_for(fn(), timeout)
+            else:
+                await asyncio.wait_for(asyncio.to_thread(fn), timeout)
+        except asyncio.TimeoutError:
+            result = {"status": "timeout"}
+            logger.warning(f"⚠️ {name} 初始化超时（{timeout}s），降级继续启动")
+        except Exception as e:
+            result = {"status": "error", "error": str(e)}
+            logger.warning(f"⚠️ {name} 初始化失败，降级继续启动: {e}")
+
+        result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+        self.init_results[name] = result
+        metrics.set_gauge(f"startup.init_ms.{name}", result["ms"])
+        return result["status"] == "ok"
+
+    def add_check(self, name: str, check: Callable[[], bool]) -> None:
+        """注册依赖可用性检查（需为轻量的同步函数）"""
+        self._checks[name] = check
+
+    def dependencies(self) -> Dict[str, bool]:
+        status = {}
+        for name, check in self._checks.items():
+            try:
+                status[name] = bool(check())
+            except Exception:
+                status[name] = False
+        return status
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        self.boot_ms = round((time.perf_counter() - self.process_started) * 1000, 1)
+        metrics.set_gauge("startup.boot_ms", self.boot_ms)
+        imports = ", ".join(f"{k}={v}ms" for k, v in self.import_ms.items())
+        inits = ", ".join(f"{k}={v['ms']}ms({v['status']})" for k, v in self.init_results.items())
+        logger.info(f"✅ 启动完成，耗时 {self.boot_ms}ms | 导入: {imports} | 初始化: {inits}")
+
+    def mark_not_ready(self) -> None:
+        self.ready = False
+
+    def readiness(self) -> Dict[str, Any]:
+        """就绪状态：启动完成且 READINESS_REQUIRED_DEPS 中的依赖均可用"""
+        dependencies = self.dependencies()
+        required = [d.strip() for d in settings.READINESS_REQUIRED_DEPS.split(",") if d.strip()]
+        missing = [d for d in required if not dependencies.get(d)]
+        return {
+            "ready": self.ready and not missing,
+            "missing": missing,
+            "dependencies": dependencies
+        }
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "boot_ms": self.boot_ms,
+            "import_ms": self.import_ms,
+            "init": self.init_results
+        }
+
+
+# 全局实例
+startup = StartupTracker()
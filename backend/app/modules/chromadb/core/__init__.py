@@ -1,4 +1,5 @@
 # ChromaDB 核心模块
 from .chromadb_core import ChromaDBCore, chromadb_core
+from .local_index import ConversationVectorIndex, conversation_vector_index
 
-__all__ = ['ChromaDBCore', 'chromadb_core']
+__all__ = ['ChromaDBCore', 'chromadb_core', 'ConversationVectorIndex', 'conversation_vector_index']
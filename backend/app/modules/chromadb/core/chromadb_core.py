@@ -1,26 +1,34 @@
 # ChromaDB 核心功能 - 短期记忆管理
-import chromadb
-from typing import List, Dict, Optional
+from typing import Any, Iterator, List, Dict, Optional, TYPE_CHECKING
 from datetime import datetime
 import logging
 from app.initialize.chromadb import get_chromadb_client
 from app.core.config import settings
+from app.modules.memory_store.base import MemoryStore, RECORD_FIELDS
+
+if TYPE_CHECKING:
+    import chromadb  # 仅用于类型标注；chromadb 较重，运行时由 init_chromadb 在启动阶段加载
 
 logger = logging.getLogger(__name__)
 
 
-class ChromaDBCore:
+class ChromaDBCore(MemoryStore):
     """
-    ChromaDB 核心服务 - 管理短期记忆（对话历史）
+    ChromaDB 核心服务 - 管理短期记忆（对话历史），MemoryStore 的 ChromaDB 实现
     
     功能：
     - 将对话消息向量化并存储到 ChromaDB
     - 基于相似度检索用户的短期记忆
     - 支持按 user_id 和 session_id 过滤
+    
+    向量由嵌入服务计算（与 ChromaDB 默认嵌入函数同一模型），同一向量也用于会话级本地检索（local_index.py）
     """
     
+    backend = "chroma"
+    
     def __init__(self):
         """初始化 ChromaDB 核心服务"""
+        super().__init__()
         self.client = None
         self.collection = None
         # 从配置中获取集合名称
@@ -31,7 +39,7 @@ class ChromaDBCore:
         if self.client is None:
             self.client = get_chromadb_client()
             
-    def _get_or_create_collection(self) -> chromadb.Collection:
+    def _get_or_create_collection(self) -> "chromadb.Collection":
         """
         获取或创建短期记忆集合
         
@@ -47,6 +55,7 @@ class ChromaDBCore:
             # 获取或创建集合
             collection = self.client.get_or_create_collection(
                 name=self.collection_name,
+                embedding_function=self._get_embedding_function(),
                 metadata={
                     "hnsw:space": distance_metric,  # 从环境变量读取距离度量方式
                     "description": "记忆存储 - 对话历史",
@@ -69,7 +78,8 @@ class ChromaDBCore:
         check_duplicate: bool = True,  # 是否检查重复
         intent: Optional[str] = None,  # 新增：意图
         intent_confidence: Optional[float] = None,  # 新增：意图置信度
-        intents: Optional[List[Dict]] = None  # 新增：所有意图列表
+        intents: Optional[List[Dict]] = None,  # 新增：所有意图列表
+        embedding: Optional[List[float]] = None  # 预先计算的向量（可选，避免重复计算）
     ) -> str:
         """
         添加消息到短期记忆
@@ -85,6 +95,7 @@ class ChromaDBCore:
             intent: 意图（对 user 和 assistant 消息都有效）
             intent_confidence: 意图置信度（对 user 和 assistant 消息都有效）
             intents: 所有意图列表（对 user 和 assistant 消息都有效）
+            embedding: 预先计算的向量（可选，None 时由嵌入服务计算）
             
         Returns:
             str: 消息 ID
@@ -96,58 +107,26 @@ class ChromaDBCore:
             if not timestamp:
                 timestamp = datetime.now().isoformat()
             
-            # 防重复检查：检查最近 5 秒内是否有相同的消息
+            # 防重复检查：最近 5 秒内相同的消息直接返回已存在的消息 ID
             if check_duplicate:
-                # 获取最近的 3 条消息（按时间降序）
-                recent_messages = self.get_all_messages(
-                    user_id=user_id,
-                    session_id=session_id,
-                    limit=3
-                )
-                
-                # 检查是否有完全相同的消息（role 和 content 都相同）
-                current_time = datetime.fromisoformat(timestamp)
-                for msg in recent_messages:
-                    if msg.get("role") == role and msg.get("content") == content:
-                        # 检查时间间隔（防止 5 秒内重复）
-                        msg_timestamp = msg.get("timestamp")
-                        msg_id = msg.get("id")
-                        
-                        if msg_timestamp and msg_id:
-                            msg_time = datetime.fromisoformat(msg_timestamp)
-                            time_diff = (current_time - msg_time).total_seconds()
-                            
-                            if abs(time_diff) < 5:  # 5 秒内的重复消息
-                                logger.warning(f"⚠️ 检测到重复消息，跳过保存: {content[:30]}...")
-                                logger.warning(f"   时间间隔: {abs(time_diff):.2f} 秒")
-                                # 返回已存在的消息 ID
-                                return msg_id
+                duplicate_id = self.find_recent_duplicate(user_id, session_id, role, content, timestamp)
+                if duplicate_id:
+                    return duplicate_id
             
             # 生成消息 ID
             if not message_id:
                 message_id = f"{user_id}_{session_id}_{int(datetime.now().timestamp() * 1000)}"
             
-            # 元数据（用于过滤和查询）
-            metadata = {
-                "user_id": user_id,
-                "session_id": session_id,
-                "role": role,
-                "timestamp": timestamp
-            }
+            # 元数据（用于过滤和查询；意图信息对 user 和 assistant 消息都有效）
+            metadata = self.build_metadata(
+                user_id, session_id, role, timestamp,
+                intent=intent, intent_confidence=intent_confidence, intents=intents
+            )
             
-            # 添加意图信息（对 user 和 assistant 消息都有效）
-            if intent:
-                metadata["intent"] = intent
-            if intent_confidence is not None:
-                metadata["intent_confidence"] = str(intent_confidence)  # 转为字符串
-            if intents:
-                # 将意图列表序列化为 JSON 字符串
-                import json
-                metadata["intents"] = json.dumps(intents, ensure_ascii=False)
-            
-            # 添加到集合（ChromaDB 会自动生成 embedding）
+            # 添加到集合（向量由嵌入服务计算，不在当前线程调用集合的嵌入函数）
             collection.add(
                 documents=[content],
+                embeddings=[embedding if embedding is not None else self.embed([content])[0]],
                 metadatas=[metadata],
                 ids=[message_id]
             )
@@ -158,6 +137,30 @@ class ChromaDBCore:
             logger.error(f"❌ 添加消息失败: {e}")
             raise
     
+    def add_records(self, records: List[Dict[str, Any]]) -> int:
+        """
+        批量写入记录（携带向量，同 ID 覆盖），用于迁移与批量导入
+        
+        Args:
+            records: 记录列表（格式见 memory_store.base.RECORD_FIELDS）
+            
+        Returns:
+            int: 写入条数
+        """
+        if not records:
+            return 0
+        collection = self._get_or_create_collection()
+        collection.upsert(
+            ids=[record["id"] for record in records],
+            documents=[record["content"] for record in records],
+            embeddings=[record["embedding"] for record in records],
+            metadatas=[
+                {key: record[key] for key in RECORD_FIELDS if record.get(key) not in (None, "")}
+                for record in records
+            ]
+        )
+        return len(records)
+    
     def search_memory(
         self,
         user_id: str,
@@ -199,7 +202,7 @@ class ChromaDBCore:
             
             # 执行查询
             results = collection.query(
-                query_texts=[query_text],
+                query_embeddings=self.embed([query_text]),
                 n_results=n_results,
                 where=where_filter,
                 include=["documents", "metadatas", "distances"]
@@ -308,6 +311,92 @@ class ChromaDBCore:
             logger.error(f"❌ 获取消息失败: {e}")
             raise
     
+    def get_session_vectors(
+        self,
+        user_id: str,
+        session_id: str
+    ) -> List[Dict]:
+        """
+        获取指定会话的全部消息及其向量（按时间升序，用于构建会话级本地索引）
+        
+        Args:
+            user_id: 用户 ID
+            session_id: 会话 ID
+            
+        Returns:
+            List[Dict]: 消息列表，每条包含 embedding 字段
+        """
+        try:
+            collection = self._get_or_create_collection()
+            
+            results = collection.get(
+                where={
+                    "$and": [
+                        {"user_id": {"$eq": user_id}},
+                        {"session_id": {"$eq": session_id}}
+                    ]
+                },
+                include=["documents", "metadatas", "embeddings"]
+            )
+            
+            records = []
+            if results and len(results['ids']) > 0:
+                for i in range(len(results['ids'])):
+                    metadata = results['metadatas'][i] or {}
+                    records.append({
+                        "id": results['ids'][i],
+                        "content": results['documents'][i],
+                        "role": metadata.get("role"),
+                        "timestamp": metadata.get("timestamp"),
+                        "intent": metadata.get("intent"),
+                        "embedding": results['embeddings'][i]
+                    })
+            
+            records.sort(key=lambda x: x.get("timestamp") or "")
+            return records
+            
+        except Exception as e:
+            logger.error(f"❌ 获取会话向量失败: {e}")
+            raise
+    
+    def iter_records(self, batch_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """
+        分批遍历集合中的全部记录（含向量），用于迁移到其他后端
+        
+        Args:
+            batch_size: 每批条数
+            
+        Yields:
+            List[Dict]: 一批记录
+        """
+        collection = self._get_or_create_collection()
+        offset = 0
+        while True:
+            results = collection.get(
+                limit=batch_size,
+                offset=offset,
+                include=["documents", "metadatas", "embeddings"]
+            )
+            ids = results['ids'] if results else []
+            if len(ids) == 0:
+                return
+            batch = []
+            for i in range(len(ids)):
+                metadata = results['metadatas'][i] or {}
+                record = {key: metadata.get(key) for key in RECORD_FIELDS}
+                record.update({
+                    "id": ids[i],
+                    "content": results['documents'][i],
+                    "embedding": list(map(float, results['embeddings'][i]))
+                })
+                batch.append(record)
+            yield batch
+            offset += len(ids)
+    
+    def count_all(self) -> int:
+        """统计集合中的全部记录数"""
+        return self._get_or_create_collection().count()
+    
     def delete_session_memory(
         self,
         user_id: str,
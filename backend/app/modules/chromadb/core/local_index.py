@@ -0,0 +1,155 @@
+# 会话级本地向量检索 - 小会话在进程内暴力检索，不经过 ChromaDB 服务
+#
+# 相似消息检索只在单个会话（conversation_id）内进行，候选通常只有几十到几百条，
+# 走 ChromaDB 需要一次 HTTP 往返 + 全局 HNSW 索引上的过滤遍历；同样的候选集在本地用 NumPy
+# 做一次矩阵-向量乘法只需几十微秒。
+#
+# 存储：Redis 列表 memory_vec:{user_id}:{session_id}，每条消息一个元素（JSON，向量为 float16 的 base64），
+#       保存记忆时 RPUSHX 追加（列表不存在时不创建，首次检索时从 ChromaDB 一次性构建）
+# 进程内：按会话缓存 float32 矩阵（LRU），检索时只增量拉取新增的元素
+# 一致性：memory_count 计数（chromadb_node）在向量追加之后才累加，列表条数少于计数说明缓存缺失或落后，
+#        此时从 ChromaDB 重新构建；会话条数超过 LOCAL_VECTOR_SEARCH_MAX 时不使用本地检索
+import base64
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.initialize import redis
+
+logger = logging.getLogger(__name__)
+
+
+def encode_entry(item: Dict[str, Any], embedding: List[float]) -> str:
+    """将消息及其向量编码为 Redis 列表元素（向量以 float16 存储，体积为 float32 的一半）"""
+    vector = np.asarray(embedding, dtype=np.float16)
+    return json.dumps({
+        "id": item.get("id"),
+        "role": item.get("role"),
+        "content": item.get("content", ""),
+        "intent": item.get("intent"),
+        "v": base64.b64encode(vector.tobytes()).decode("ascii")
+    }, ensure_ascii=False)
+
+
+def decode_entry(raw: str) -> Tuple[Dict[str, Any], np.ndarray]:
+    """解码 Redis 列表元素，返回 (消息, float16 向量)"""
+    data = json.loads(raw)
+    vector = np.frombuffer(base64.b64decode(data.pop("v")), dtype=np.float16)
+    return data, vector
+
+
+def vector_distances(matrix: np.ndarray, query: np.ndarray, metric: str) -> np.ndarray:
+    """计算查询向量与矩阵各行的距离（与 ChromaDB 的距离定义一致，越小越相似）
+
+    - cosine: 1 - 余弦相似度
+    - ip: 1 - 内积
+    - l2: 欧氏距离的平方
+    """
+    if metric == "l2":
+        diff = matrix - query
+        return np.einsum("ij,ij->i", diff, diff)
+    dots = matrix @ query
+    if metric == "ip":
+        return 1.0 - dots
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    return 1.0 - dots / np.maximum(norms, 1e-12)
+
+
+class ConversationVectorIndex:
+    """会话级本地向量索引（Redis 共享 + 进程内 LRU 缓存）"""
+
+    KEY_PREFIX = "memory_vec:"
+
+    def __init__(self, max_conversations: Optional[int] = None):
+        self.max_conversations = max_conversations or settings.LOCAL_VECTOR_CACHE_SIZE
+        # key -> (消息列表, float32 矩阵)
+        self._cache: "OrderedDict[str, Tuple[List[Dict[str, Any]], np.ndarray]]" = OrderedDict()
+
+    @classmethod
+    def _key(cls, user_id: str, session_id: str) -> str:
+        return f"{cls.KEY_PREFIX}{user_id}:{session_id}"
+
+    def _remember(self, key: str, items: List[Dict[str, Any]], matrix: np.ndarray) -> None:
+        self._cache[key] = (items, matrix)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_conversations:
+            self._cache.popitem(last=False)
+
+    async def append(self, user_id: str, session_id: str, items: List[Dict[str, Any]], embeddings: List[List[float]]) -> None:
+        """保存记忆后追加向量（列表不存在时跳过，等首次检索时整体构建）"""
+        if not redis.redis_client or not items:
+            return
+        key = self._key(user_id, session_id)
+        try:
+            entries = [encode_entry(item, embedding) for item, embedding in zip(items, embeddings)]
+            if await redis.redis_client.rpushx(key, *entries):
+                await redis.redis_client.expire(key, settings.LOCAL_VECTOR_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"⚠️ 追加会话向量失败: {e}")
+
+    async def build(self, user_id: str, session_id: str, records: List[Dict[str, Any]]) -> None:
+        """用 ChromaDB 中的全部会话消息重建向量列表（records 需包含 embedding）"""
+        key = self._key(user_id, session_id)
+        self._cache.pop(key, None)
+        if not redis.redis_client or not records:
+            return
+        entries = [encode_entry(record, record["embedding"]) for record in records]
+        async with redis.redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.rpush(key, *entries)
+            pipe.expire(key, settings.LOCAL_VECTOR_CACHE_TTL)
+            await pipe.execute()
+
+    async def load(self, user_id: str, session_id: str, expected: int) -> Optional[Tuple[List[Dict[str, Any]], np.ndarray]]:
+        """加载会话向量矩阵，缓存缺失或条数少于 expected（落后于 ChromaDB）时返回 None
+
+        进程内已有缓存时只拉取新增的元素。
+        """
+        if not redis.redis_client:
+            return None
+        key = self._key(user_id, session_id)
+        total = await redis.redis_client.llen(key)
+        if total == 0 or total < expected:
+            return None
+
+        cached = self._cache.get(key)
+        if cached and len(cached[0]) == total:
+            self._cache.move_to_end(key)
+            return cached
+
+        start = len(cached[0]) if cached and len(cached[0]) < total else 0
+        decoded = [decode_entry(raw) for raw in await redis.redis_client.lrange(key, start, total - 1)]
+        items = [item for item, _ in decoded]
+        vectors = [vector for _, vector in decoded]
+        if start:
+            items = cached[0] + items
+            matrix = np.vstack([cached[1], np.asarray(vectors, dtype=np.float32)])
+        else:
+            matrix = np.asarray(vectors, dtype=np.float32)
+        self._remember(key, items, matrix)
+        return items, matrix
+
+    @staticmethod
+    def search(
+        items: List[Dict[str, Any]],
+        matrix: np.ndarray,
+        query: List[float],
+        n_results: int,
+        metric: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """暴力检索距离最小的 n_results 条消息（按距离升序）"""
+        if not items:
+            return []
+        distances = vector_distances(matrix, np.asarray(query, dtype=np.float32), (metric or settings.CHROMADB_DISTANCE_METRIC).lower())
+        k = min(n_results, len(items))
+        top = np.argpartition(distances, k - 1)[:k] if k < len(items) else np.arange(len(items))
+        top = top[np.argsort(distances[top])]
+        return [{**items[i], "distance": float(distances[i])} for i in top]
+
+
+# 全局实例
+conversation_vector_index = ConversationVectorIndex()
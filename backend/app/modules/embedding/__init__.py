@@ -0,0 +1,4 @@
+# 嵌入服务模块（合批、进程池 / sidecar、ONNX 量化模型）
+from .embedding_service import EmbeddingService, create_embedder, get_embedding_service, shutdown_embedding_service
+
+__all__ = ['EmbeddingService', 'create_embedder', 'get_embedding_service', 'shutdown_embedding_service']
@@ -0,0 +1,321 @@
+# 嵌入服务 - 跨调用方合批的文本向量计算
+#
+# 各调用方（保存记忆、相似检索、Milvus 写入等，通常运行在 asyncio.to_thread 的线程中）把请求放入同一队列，
+# 调度线程在 EMBEDDING_BATCH_WAIT_MS 窗口内合并为一批（最多 EMBEDDING_BATCH_SIZE 条文本）交给执行器：
+# - local:   进程内单线程执行（ONNX 推理不占 GIL，但分词与池化仍在本进程）
+# - process: 进程池执行，每个工作进程加载一份模型，推理完全移出 Web 进程
+# - http:    发送到嵌入服务 sidecar（python -m app.modules.embedding.server），多个服务进程 / 管理后台共用一份模型
+#
+# 执行器全部忙碌时调度线程等待空闲槽位，期间到达的请求在队列中累积，下一批自然变大（负载越高批越大）。
+# 指标：embedding.requests / texts / batches / errors（计数），embedding.queue_depth / inflight /
+#       texts_per_second（仪表盘），embedding.batch_size / queue_wait_ms / compute_ms（摘要）
+import asyncio
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MODES = ("local", "process", "http")
+
+
+def create_embedder():
+    """按配置创建嵌入模型（进程池模式下在每个工作进程中调用一次）"""
+    from app.modules.embedding.onnx_embedder import OnnxEmbedder
+
+    return OnnxEmbedder(
+        model_path=settings.EMBEDDING_MODEL_PATH or None,
+        quantized=settings.EMBEDDING_QUANTIZED,
+        threads=settings.EMBEDDING_THREADS,
+        batch_size=settings.EMBEDDING_BATCH_SIZE
+    )
+
+
+# 工作进程内的模型实例
+_worker_embedder = None
+
+
+def _init_worker(factory: Callable) -> None:
+    global _worker_embedder
+    _worker_embedder = factory()
+
+
+def _worker_embed(texts: List[str]) -> List[List[float]]:
+    return _worker_embedder(texts)
+
+
+class _Request:
+    __slots__ = ("texts", "future", "enqueued_at")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class EmbeddingService:
+    """嵌入服务（线程安全，同步接口 embed / 异步接口 aembed）"""
+
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        factory: Optional[Callable] = None,
+        batch_size: Optional[int] = None,
+        wait_ms: Optional[float] = None,
+        workers: Optional[int] = None,
+        url: Optional[str] = None,
+        timeout: Optional[float] = None
+    ):
+        """
+        Args:
+            mode: local / process / http，默认读取 EMBEDDING_MODE
+            factory: 创建嵌入模型的无参函数（process 模式下需可 pickle，即模块级函数）
+            batch_size: 单批最多文本数
+            wait_ms: 合批等待窗口（毫秒）
+            workers: 并发执行的批数（process 模式为进程数，http 模式为并发请求数）
+            url: 嵌入服务地址（http 模式）
+            timeout: 单次请求超时（秒）
+        """
+        self.mode = (mode or settings.EMBEDDING_MODE).lower()
+        if self.mode not in MODES:
+            raise ValueError(f"未知的嵌入服务模式: {self.mode}（可选: {', '.join(MODES)}）")
+        self.factory = factory or create_embedder
+        self.batch_size = max(1, batch_size or settings.EMBEDDING_BATCH_SIZE)
+        self.wait = (settings.EMBEDDING_BATCH_WAIT_MS if wait_ms is None else wait_ms) / 1000
+        self.workers = 1 if self.mode == "local" else max(1, workers or settings.EMBEDDING_WORKERS)
+        self.url = (url or settings.EMBEDDING_SERVICE_URL).rstrip("/")
+        self.timeout = timeout or settings.EMBEDDING_TIMEOUT
+
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._slots = threading.Semaphore(self.workers)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._dispatcher: Optional[threading.Thread] = None
+        self._embedder = None  # local 模式的模型实例
+        self._http = None  # http 模式的连接池
+        self._inflight = 0
+
+    # ==================== 生命周期 ====================
+
+    def _create_executor(self):
+        if self.mode == "process":
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                # Web 进程中已有事件循环与多个线程，fork 可能复制持有中的锁，工作进程使用 spawn 启动
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.factory,)
+            )
+        if self.mode == "http":
+            import httpx
+            self._http = httpx.Client(timeout=self.timeout)
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embedding")
+
+    def start(self, warmup: bool = False) -> None:
+        """启动调度线程与执行器（首次 embed 时自动调用）
+
+        Args:
+            warmup: 启动后执行一次推理，提前完成模型加载（process 模式下预热全部工作进程）
+        """
+        with self._lock:
+            if self._dispatcher is None:
+                self._executor = self._create_executor()
+                self._dispatcher = threading.Thread(target=self._dispatch_loop, name="embedding-dispatcher", daemon=True)
+                self._dispatcher.start()
+                logger.info(
+                    f"✅ 嵌入服务已启动 (mode={self.mode}, workers={self.workers}, "
+                    f"batch={self.batch_size}, wait={self.wait * 1000:.0f}ms)"
+                )
+        if warmup:
+            if self.mode == "process":
+                futures = [self._executor.submit(_worker_embed, ["预热"]) for _ in range(self.workers)]
+                for future in futures:
+                    future.result(timeout=self.timeout)
+            else:
+                self.embed(["预热"])
+
+    def shutdown(self) -> None:
+        """停止服务（队列中已有的请求处理完后退出）"""
+        with self._lock:
+            dispatcher, self._dispatcher = self._dispatcher, None
+            if dispatcher is None:
+                return
+            self._queue.put(None)
+        dispatcher.join(timeout=self.timeout)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+        logger.info("嵌入服务已关闭")
+
+    # ==================== 调用接口 ====================
+
+    def submit(self, texts: List[str]) -> Future:
+        """提交请求，返回 concurrent.futures.Future"""
+        if self._dispatcher is None:
+            self.start()
+        request = _Request(list(texts))
+        metrics.incr("embedding.requests")
+        self._queue.put(request)
+        metrics.set_gauge("embedding.queue_depth", self._queue.qsize())
+        return request.future
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        计算文本向量（阻塞直到所在批次完成）
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            List[List[float]]: 向量列表，顺序与 texts 一致
+        """
+        if not texts:
+            return []
+        return self.submit(texts).result(timeout=self.timeout)
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """计算文本向量（异步，不占用事件循环线程）"""
+        if not texts:
+            return []
+        return await asyncio.wait_for(asyncio.wrap_future(self.submit(texts)), self.timeout)
+
+    # ==================== 调度 ====================
+
+    def _collect(self) -> Optional[List[_Request]]:
+        """取出一批请求（阻塞等待第一个请求，之后在等待窗口内继续合并）"""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch, count = [first], len(first.texts)
+        deadline = time.monotonic() + self.wait
+        while count < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                # 先处理已合并的请求，下一轮再退出
+                self._queue.put(None)
+                break
+            batch.append(request)
+            count += len(request.texts)
+        return batch
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            # 先占用执行槽位：执行器忙碌期间请求留在队列中累积成更大的批次
+            self._slots.acquire()
+            batch = self._collect()
+            if batch is None:
+                self._slots.release()
+                return
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[_Request]) -> None:
+        texts = [text for request in batch for text in request.texts]
+        now = time.monotonic()
+        for request in batch:
+            metrics.observe("embedding.queue_wait_ms", (now - request.enqueued_at) * 1000)
+        metrics.incr("embedding.batches")
+        metrics.observe("embedding.batch_size", len(texts))
+        metrics.set_gauge("embedding.queue_depth", self._queue.qsize())
+
+        with self._lock:
+            self._inflight += 1
+            metrics.set_gauge("embedding.inflight", self._inflight)
+        started = time.perf_counter()
+        try:
+            if self.mode == "process":
+                future = self._executor.submit(_worker_embed, texts)
+            elif self.mode == "http":
+                future = self._executor.submit(self._http_embed, texts)
+            else:
+                future = self._executor.submit(self._local_embed, texts)
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+        future.add_done_callback(lambda f: self._complete(f, batch, started))
+
+    def _complete(self, future: Future, batch: List[_Request], started: float) -> None:
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._inflight -= 1
+            metrics.set_gauge("embedding.inflight", self._inflight)
+        self._slots.release()
+
+        error = future.exception()
+        if error is None:
+            vectors = future.result()
+            if len(vectors) != sum(len(request.texts) for request in batch):
+                error = RuntimeError(f"嵌入结果数量不匹配: {len(vectors)}")
+        if error is not None:
+            metrics.incr("embedding.errors")
+            logger.error(f"❌ 嵌入计算失败: {error}")
+            if isinstance(error, BrokenProcessPool):
+                self._restart_pool()
+            for request in batch:
+                request.future.set_exception(error)
+            return
+
+        metrics.incr("embedding.texts", len(vectors))
+        metrics.observe("embedding.compute_ms", elapsed * 1000)
+        metrics.set_gauge("embedding.texts_per_second", round(len(vectors) / max(elapsed, 1e-9), 1))
+        offset = 0
+        for request in batch:
+            request.future.set_result(vectors[offset:offset + len(request.texts)])
+            offset += len(request.texts)
+
+    def _restart_pool(self) -> None:
+        """工作进程异常退出后重建进程池"""
+        with self._lock:
+            if self._dispatcher is None:
+                return
+            broken, self._executor = self._executor, self._create_executor()
+        broken.shutdown(wait=False, cancel_futures=True)
+        logger.warning("⚠️ 嵌入进程池已重建")
+
+    # ==================== 执行器 ====================
+
+    def _local_embed(self, texts: List[str]) -> List[List[float]]:
+        if self._embedder is None:
+            self._embedder = self.factory()
+        return self._embedder(texts)
+
+    def _http_embed(self, texts: List[str]) -> List[List[float]]:
+        response = self._http.post(f"{self.url}/embed", json={"texts": texts})
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+
+# 全局实例（懒加载）
+_embedding_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """获取按配置创建的嵌入服务（单例模式）"""
+    global _embedding_service
+    if _embedding_service is None:
+        with _service_lock:
+            if _embedding_service is None:
+                _embedding_service = EmbeddingService()
+    return _embedding_service
+
+
+def shutdown_embedding_service() -> None:
+    """关闭全局嵌入服务（未创建时不做任何事）"""
+    global _embedding_service
+    if _embedding_service is not None:
+        _embedding_service.shutdown()
+        _embedding_service = None
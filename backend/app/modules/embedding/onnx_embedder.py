@@ -0,0 +1,108 @@
+# ONNX 嵌入模型 - all-MiniLM-L6-v2（与 ChromaDB 默认嵌入函数同一模型，向量可直接混用）
+#
+# 与 ChromaDB 的 ONNXMiniLM_L6_V2 相比：
+# - 按批内最长文本动态补齐（ChromaDB 固定补齐到 256 token，对话消息通常只有几十个 token）
+# - 可使用 int8 动态量化模型（EMBEDDING_QUANTIZED），或通过 EMBEDDING_MODEL_PATH 指定同结构的 ONNX 模型
+# - 可限制 ONNX Runtime 线程数，多进程部署时避免线程数超过 CPU 核数
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+MAX_TOKENS = 256
+QUANTIZED_FILENAME = "model_int8.onnx"
+
+
+def _model_dir() -> str:
+    """下载并返回 ChromaDB 默认模型目录（与 DefaultEmbeddingFunction 共用缓存）"""
+    from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+
+    ONNXMiniLM_L6_V2()._download_model_if_not_exists()
+    return os.path.join(ONNXMiniLM_L6_V2.DOWNLOAD_PATH, ONNXMiniLM_L6_V2.EXTRACTED_FOLDER_NAME)
+
+
+def quantize_model(model_path: str, output_path: str) -> str:
+    """对模型做 int8 动态量化（需要安装 onnx），已存在时直接返回"""
+    if not os.path.exists(output_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info(f"🔧 量化嵌入模型: {model_path} → {output_path}")
+        tmp_path = output_path + ".tmp"
+        quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, output_path)
+    return output_path
+
+
+class OnnxEmbedder:
+    """ONNX 嵌入模型（线程不安全，每个线程 / 进程持有一个实例）"""
+
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        quantized: bool = False,
+        threads: int = 0,
+        batch_size: int = 32
+    ):
+        """
+        Args:
+            model_path: ONNX 模型路径，为空时使用 ChromaDB 默认模型
+            quantized: 使用 int8 动态量化模型（首次使用时由默认模型生成）
+            threads: ONNX Runtime 算子内线程数，0 表示由 ONNX Runtime 决定
+            batch_size: 单次推理的最大文本数
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = _model_dir()
+        if not model_path:
+            model_path = os.path.join(model_dir, "model.onnx")
+            if quantized:
+                model_path = quantize_model(model_path, os.path.join(model_dir, QUANTIZED_FILENAME))
+        self.model_path = model_path
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_TOKENS)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.log_severity_level = 3
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        logger.info(f"✅ 嵌入模型已加载: {os.path.basename(model_path)} (threads={threads or 'auto'})")
+
+    def _forward(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        last_hidden_state = self.session.run(None, {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "token_type_ids": np.zeros_like(input_ids),
+        })[0]
+
+        # 按注意力掩码做均值池化后归一化（与 ChromaDB 默认嵌入函数一致）
+        mask = attention_mask[:, :, None].astype(np.float32)
+        embeddings = (last_hidden_state * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return (embeddings / np.maximum(norms, 1e-12)).astype(np.float32)
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        """计算文本向量"""
+        if not texts:
+            return []
+        # 按长度排序后分批，批内补齐长度接近
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        result: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            indices = order[start:start + self.batch_size]
+            for i, vector in zip(indices, self._forward([texts[i] for i in indices])):
+                result[i] = vector.tolist()
+        return result
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+嵌入服务 sidecar
+
+独立进程中运行嵌入模型（EMBEDDING_WORKERS > 1 时为进程池），对话服务（EMBEDDING_MODE=http）与
+管理后台（EMBEDDING_SERVICE_URL）通过 HTTP 调用，整机只加载一组模型。并发请求在服务内合批。
+
+接口（JSON，便于在测试中用任意 HTTP 桩替代）：
+    POST /embed    {"texts": ["..."]}  →  {"embeddings": [[...]], "dim": 384}
+    GET  /health   {"status": "ok"}
+    GET  /metrics  进程内指标（embedding.* 为吞吐与队列指标）
+
+用法（在 backend 目录下）:
+    python -m app.modules.embedding.server
+"""
+from contextlib import asynccontextmanager
+from typing import List
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.modules.embedding.embedding_service import EmbeddingService
+
+service: EmbeddingService = None
+
+
+class EmbedRequest(BaseModel):
+    texts: List[str]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global service
+    service = EmbeddingService(mode="process" if settings.EMBEDDING_WORKERS > 1 else "local")
+    service.start(warmup=True)
+    yield
+    service.shutdown()
+
+
+app = FastAPI(title="Embedding Service", lifespan=lifespan)
+
+
+@app.post("/embed")
+async def embed(request: EmbedRequest):
+    if len(request.texts) > settings.EMBEDDING_MAX_TEXTS:
+        raise HTTPException(status_code=413, detail=f"单次请求最多 {settings.EMBEDDING_MAX_TEXTS} 条文本")
+    embeddings = await service.aembed(request.texts)
+    return {"embeddings": embeddings, "dim": len(embeddings[0]) if embeddings else 0}
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=settings.EMBEDDING_SERVER_HOST, port=settings.EMBEDDING_SERVER_PORT)
@@ -1,4 +1,4 @@
 # LLM 模块
-from .core import LLMCore, llm_core
+from .core import LLMCore, llm_core, PromptAssembler, ContextBudgeter, context_budgeter, count_tokens
 
-__all__ = ['LLMCore', 'llm_core']
+__all__ = ['LLMCore', 'llm_core', 'PromptAssembler', 'ContextBudgeter', 'context_budgeter', 'count_tokens']
@@ -1,4 +1,6 @@
 # LLM 核心模块
 from .llm_core import LLMCore, llm_core
+from .prompt_assembler import PromptAssembler
+from .context_budget import ContextBudgeter, context_budgeter, count_tokens
 
-__all__ = ['LLMCore', 'llm_core']
+__all__ = ['LLMCore', 'llm_core', 'PromptAssembler', 'ContextBudgeter', 'context_budgeter', 'count_tokens']
@@ -0,0 +1,224 @@
+# 上下文 Token 预算 - 按优先级在各上下文段落间分配 Prompt Token
+import logging
+from typing import Callable, Dict, List, Optional
+from app.core.config import settings
+from app.modules.llm.core.prompt_assembler import PromptAssembler
+
+logger = logging.getLogger(__name__)
+
+# tiktoken 编码器（启动时由 preload 加载，加载前及加载失败时回退到估算）
+_encoding = None
+_encoding_failed = False
+
+
+def load_encoding():
+    """加载本地 tokenizer（cl100k_base），不可用时返回 None
+
+    首次加载需读取 BPE 文件（本地缓存缺失时会联网下载），属于阻塞操作，
+    只应在启动预加载阶段调用，请求路径上的 count_tokens 不会触发加载
+    """
+    global _encoding, _encoding_failed
+
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(settings.PROMPT_TOKENIZER_ENCODING)
+        except Exception as e:
+            _encoding_failed = True
+            logger.warning(f"⚠️ tiktoken 不可用，Token 计数回退为字符估算: {e}")
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """按字符估算 Token 数（中日韩字符约 1 token/字，其余约 4 字符/token）"""
+    cjk = sum(1 for ch in text if "⺀" <= ch <= "鿿" or "＀" <= ch <= "￯")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def count_tokens(text: str) -> int:
+    """使用本地 tokenizer 统计 Token 数
+
+    Args:
+        text: 待统计文本
+
+    Returns:
+        Token 数
+    """
+    if not text:
+        return 0
+    if _encoding is None:
+        return estimate_tokens(text)
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def parse_section_priorities(raw: str) -> Dict[str, int]:
+    """解析段落优先级配置，格式 "working_memory:3,feedback:2,similar_messages:1"
+
+    Returns:
+        段落名称到优先级的映射（数值越大越优先保留）
+    """
+    priorities: Dict[str, int] = {}
+    for item in raw.split(","):
+        if ":" not in item:
+            continue
+        name, _, value = item.partition(":")
+        try:
+            priorities[name.strip()] = int(value.strip())
+        except ValueError:
+            logger.warning(f"⚠️ 无效的段落优先级配置: {item}")
+    return priorities
+
+
+class ContextBudgeter:
+    """上下文 Token 预算器
+
+    规则：
+    - 静态前缀不计入预算（由前缀缓存承担成本）
+    - 未配置优先级的段落（用户画像、意图、用户输入）为必需段落，始终完整保留并先行扣除
+    - 其余段落按优先级从高到低分配剩余预算；预算内的段落原样保留（逐字节不变）
+    - 超出预算时以条目（如一条对话消息）为单位整体保留或丢弃，不拆分条目内部的行：
+      * 记忆类段落（KEEP_LATEST）保留最新的条目，丢弃最早的；条目按时间排列，重复是正常对话内容，不去重
+      * 其他段落先去除完全相同的条目，再保留靠前的条目（相似消息按相似度降序排列），丢弃靠后的
+    """
+
+    # 保留最新条目的段落（条目按时间升序排列）
+    KEEP_LATEST = {"working_memory"}
+    # 截断条目时识别说话人前缀的最大长度（"：" 之前的字符数）
+    SPEAKER_PREFIX_MAX_CHARS = 8
+
+    def __init__(
+        self,
+        total_budget: Optional[int] = None,
+        priorities: Optional[Dict[str, int]] = None,
+        counter: Callable[[str], int] = count_tokens
+    ):
+        """初始化预算器
+
+        Args:
+            total_budget: 易变上下文总预算（token），默认读取配置
+            priorities: 段落优先级，默认读取配置
+            counter: Token 计数函数
+        """
+        self.total_budget = total_budget if total_budget is not None else settings.PROMPT_CONTEXT_TOKEN_BUDGET
+        self.priorities = priorities if priorities is not None else parse_section_priorities(
+            settings.PROMPT_SECTION_PRIORITIES
+        )
+        self.counter = counter
+
+    def _truncate_text(self, text: str, max_tokens: int, keep_latest: bool) -> str:
+        """按 Token 上限截断单个条目（二分查找可保留的字符数）
+
+        保留末尾时保留条目开头的说话人前缀（如 "安然："），中间以省略号衔接
+        """
+        head = ""
+        if keep_latest:
+            speaker, sep, _ = text.partition("：")
+            if sep and "\n" not in speaker and len(speaker) <= self.SPEAKER_PREFIX_MAX_CHARS:
+                head = f"{speaker}{sep}…"
+                if self.counter(head) >= max_tokens:
+                    head = ""
+
+        low, high = 0, len(text) - len(head)
+        while low < high:
+            mid = (low + high + 1) // 2
+            candidate = head + text[-mid:] if keep_latest else text[:mid]
+            if self.counter(candidate) <= max_tokens:
+                low = mid
+            else:
+                high = mid - 1
+        if low == 0:
+            return ""
+        return head + text[-low:] if keep_latest else text[:low]
+
+    def _fit_items(self, items: List[str], budget: int, keep_latest: bool) -> List[str]:
+        """在预算内保留尽可能多的条目"""
+        ordered = list(reversed(items)) if keep_latest else items
+        kept: List[str] = []
+        used = 0
+        for item in ordered:
+            # 换行符按 1 token 计
+            cost = self.counter(item) + (1 if kept else 0)
+            if used + cost <= budget:
+                kept.append(item)
+                used += cost
+                continue
+            # 第一条就超预算时截断该条，保证至少保留部分上下文
+            if not kept:
+                truncated = self._truncate_text(item, budget, keep_latest)
+                if truncated:
+                    kept.append(truncated)
+            break
+        return list(reversed(kept)) if keep_latest else kept
+
+    def apply(self, assembler: PromptAssembler) -> Dict[str, Dict[str, int]]:
+        """按预算裁剪组装器中的上下文段落（原地修改）
+
+        Args:
+            assembler: Prompt 组装器
+
+        Returns:
+            预算明细 {段落名称: {"tokens": 原始 token, "kept": 保留 token, "dropped_items": 丢弃条目数}}
+        """
+        report: Dict[str, Dict[str, int]] = {}
+        remaining = self.total_budget
+
+        # 1. 必需段落先行扣除
+        for section in assembler.sections:
+            if section["name"] in self.priorities:
+                continue
+            tokens = self.counter(section["content"])
+            remaining -= tokens
+            report[section["name"]] = {"tokens": tokens, "kept": tokens, "dropped_items": 0}
+
+        # 2. 可裁剪段落按优先级分配剩余预算
+        budgeted = [s for s in assembler.sections if s["name"] in self.priorities]
+        budgeted.sort(key=lambda s: self.priorities[s["name"]], reverse=True)
+
+        for section in budgeted:
+            name = section["name"]
+            content = section["content"] if section["content"] != section.get("placeholder") else ""
+            tokens = self.counter(content)
+            items = section.get("items")
+            if items is None:
+                items = [content] if content else []
+
+            # 预算内：原样保留
+            if tokens <= max(remaining, 0):
+                remaining -= tokens
+                report[name] = {"tokens": tokens, "kept": tokens, "dropped_items": 0}
+                continue
+
+            keep_latest = name in self.KEEP_LATEST
+            candidates = items
+            if not keep_latest:
+                # 去重（保留首次出现的条目）
+                seen = set()
+                candidates = []
+                for item in items:
+                    if item not in seen:
+                        seen.add(item)
+                        candidates.append(item)
+
+            kept_items = self._fit_items(candidates, max(remaining, 0), keep_latest)
+            kept_text = "\n".join(kept_items)
+            kept_tokens = self.counter(kept_text)
+
+            section["content"] = kept_text or section.get("placeholder", "")
+            section["items"] = kept_items
+            remaining -= kept_tokens
+            report[name] = {
+                "tokens": tokens,
+                "kept": kept_tokens,
+                "dropped_items": len(items) - len(kept_items)
+            }
+
+        breakdown = ", ".join(
+            f"{name}={item['kept']}/{item['tokens']}" + (f"(-{item['dropped_items']})" if item["dropped_items"] else "")
+            for name, item in report.items()
+        )
+        logger.info(f"📐 上下文预算 {self.total_budget - remaining}/{self.total_budget} tokens: {breakdown}")
+        return report
+
+
+# 全局实例
+context_budgeter = ContextBudgeter()
@@ -32,7 +32,8 @@ class LLMCore:
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
         model: Optional[str] = None,
-        provider: Optional[str] = "deepseek"  # 保留参数以兼容前端，默认值为 deepseek
+        provider: Optional[str] = "deepseek",  # 保留参数以兼容前端，默认值为 deepseek
+        timeout: Optional[float] = None
     ) -> ChatOpenAI:
         """创建 LLM 实例（DeepSeek）
         
@@ -41,11 +42,13 @@ class LLMCore:
             max_tokens: 最大token数
             model: 模型名称
             provider: 提供商名称（保留以兼容前端，目前仅支持 deepseek）
+            timeout: 请求超时（秒），None 时使用客户端默认值
             
         Returns:
             ChatOpenAI 实例
         """
         # 忽略 provider 参数，始终创建 DeepSeek LLM
+        extra = {"timeout": timeout} if timeout is not None else {}
         return ChatOpenAI(
             model=model or self.deepseek_model,
             temperature=temperature or 0.7,
@@ -53,6 +56,8 @@ class LLMCore:
             api_key=SecretStr(self.deepseek_api_key) if self.deepseek_api_key else None,  # type: ignore
             base_url=self.deepseek_api_base,
             streaming=True,  # 🔥 启用流式输出
+            stream_usage=True,  # 流式模式下也返回 usage（含前缀缓存命中 token），自定义 base_url 时默认关闭
+            **extra
         )
     
     def get_default_model_name(self) -> str:
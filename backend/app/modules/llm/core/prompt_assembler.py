@@ -0,0 +1,103 @@
+# Prompt 组装引擎 - 静态前缀在前、易变上下文在后（适配服务端前缀缓存）
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PromptAssembler:
+    """Prompt 组装引擎
+
+    DeepSeek、通义千问等服务端会按字节匹配请求的公共前缀并缓存，
+    命中部分计费更低、首 token 更快。为了让前缀稳定命中：
+    - 静态前缀（系统人设）作为独立的 system 消息放在最前，逐字节不变
+    - 易变上下文（用户画像、反馈、记忆、意图、输入）按变化频率从低到高
+      依次追加到 user 消息中，越易变的内容越靠后
+
+    使用示例：
+        assembler = PromptAssembler(static_prefix=ANRAN_SYSTEM_PROMPT)
+        assembler.add_section("profile", "公司：xx", title="当前用户画像：")
+        assembler.add_section("input", "用户：你好")
+        messages = assembler.build_messages()
+    """
+
+    SECTION_SEPARATOR = "\n\n---\n"
+
+    def __init__(self, static_prefix: str):
+        """初始化组装引擎
+
+        Args:
+            static_prefix: 静态前缀（所有用户、所有轮次都完全相同的内容）
+        """
+        self.static_prefix = static_prefix
+        self.sections: List[Dict[str, Any]] = []
+
+    def add_section(
+        self,
+        name: str,
+        content: str,
+        title: str = "",
+        placeholder: str = "",
+        items: Optional[List[str]] = None
+    ) -> "PromptAssembler":
+        """追加一个易变上下文段落（按添加顺序排列）
+
+        Args:
+            name: 段落名称（唯一标识，用于日志和预算统计）
+            content: 段落正文
+            title: 段落标题（可选）
+            placeholder: 正文为空时的占位文本（可选）
+            items: 正文拆分后的条目（可选，如逐条对话消息；预算裁剪时按条目整体保留或丢弃）
+
+        Returns:
+            self，支持链式调用
+        """
+        body = content.strip() if content else ""
+        if items is None:
+            items = [body] if body else []
+        self.sections.append({
+            "name": name,
+            "title": title,
+            "content": body or placeholder,
+            "placeholder": placeholder,
+            "items": items
+        })
+        return self
+
+    def get_section(self, name: str) -> Dict[str, Any]:
+        """按名称获取段落，不存在时返回空字典"""
+        for section in self.sections:
+            if section["name"] == name:
+                return section
+        return {}
+
+    def render_context(self) -> str:
+        """渲染易变上下文（user 消息内容）"""
+        parts = []
+        for section in self.sections:
+            if section["title"]:
+                parts.append(f"{section['title']}\n{section['content']}")
+            else:
+                parts.append(section["content"])
+        return self.SECTION_SEPARATOR.join(parts)
+
+    def build_messages(self) -> List[Dict[str, str]]:
+        """构建消息列表：静态 system 消息在前，易变 user 消息在后
+
+        Returns:
+            OpenAI 兼容的消息列表，可直接传给 ChatOpenAI.ainvoke
+        """
+        return [
+            {"role": "system", "content": self.static_prefix},
+            {"role": "user", "content": self.render_context()}
+        ]
+
+    def render_text(self) -> str:
+        """渲染为单个字符串（用于日志、调试和兼容旧的字符串 Prompt）"""
+        return f"{self.static_prefix}{self.SECTION_SEPARATOR}{self.render_context()}"
+
+    @property
+    def prefix_fingerprint(self) -> str:
+        """静态前缀指纹（前缀内容一旦变化，缓存就会整体失效，便于在日志中排查）"""
+        return hashlib.sha1(self.static_prefix.encode("utf-8")).hexdigest()[:12]
@@ -0,0 +1,5 @@
+# 对话记忆存储模块（ChromaDB / Milvus）
+from .base import MemoryStore, RECORD_FIELDS
+from .store import create_memory_store, get_memory_store
+
+__all__ = ['MemoryStore', 'RECORD_FIELDS', 'create_memory_store', 'get_memory_store']
@@ -0,0 +1,160 @@
+# 对话记忆向量存储接口 - ChromaDB / Milvus 等后端的统一抽象
+import json
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+from app.modules.embedding.embedding_service import get_embedding_service
+
+logger = logging.getLogger(__name__)
+
+# 统一的记录格式（批量写入、迁移、构建本地索引时使用）：
+# {"id", "content", "embedding", "user_id", "session_id", "role", "timestamp",
+#  "intent", "intent_confidence", "intents"}
+RECORD_FIELDS = ("user_id", "session_id", "role", "timestamp", "intent", "intent_confidence", "intents")
+
+
+class MemoryStore(ABC):
+    """对话记忆向量存储
+
+    约定：
+    - 向量在客户端通过嵌入服务计算（embed），写入时随记录一起提交，各后端使用同一嵌入模型
+    - search_memory 返回的 distance 与 ChromaDB 定义一致（越小越相似），相似度阈值与后端无关
+    - 同步接口，调用方通过 asyncio.to_thread 执行
+    """
+
+    backend: str = ""
+
+    def __init__(self):
+        # 显式指定的嵌入函数（测试或自定义模型）；为空时通过嵌入服务计算
+        self.embedding_function = None
+        self._default_embedding_function = None
+
+    def _get_embedding_function(self):
+        """集合声明的嵌入函数
+
+        未显式指定时为 ChromaDB 默认嵌入函数（与嵌入服务同一模型，已有集合的配置保持不变）。
+        写入与检索都显式传入向量，该函数不会被调用，模型也不会在当前进程加载。
+        """
+        if self.embedding_function is not None:
+            return self.embedding_function
+        if self._default_embedding_function is None:
+            from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+            self._default_embedding_function = DefaultEmbeddingFunction()
+        return self._default_embedding_function
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        计算文本向量（嵌入服务跨调用方合批，见 app/modules/embedding）
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            List[List[float]]: 向量列表
+        """
+        if self.embedding_function is not None:
+            return [list(map(float, vector)) for vector in self.embedding_function(texts)]
+        return get_embedding_service().embed(texts)
+
+    @staticmethod
+    def build_metadata(
+        user_id: str,
+        session_id: str,
+        role: str,
+        timestamp: str,
+        intent: Optional[str] = None,
+        intent_confidence: Optional[float] = None,
+        intents: Optional[List[Dict]] = None
+    ) -> Dict[str, Any]:
+        """构建消息元数据（意图置信度与意图列表序列化为字符串）"""
+        metadata = {
+            "user_id": user_id,
+            "session_id": session_id,
+            "role": role,
+            "timestamp": timestamp
+        }
+        if intent:
+            metadata["intent"] = intent
+        if intent_confidence is not None:
+            metadata["intent_confidence"] = str(intent_confidence)
+        if intents:
+            metadata["intents"] = json.dumps(intents, ensure_ascii=False)
+        return metadata
+
+    def find_recent_duplicate(self, user_id: str, session_id: str, role: str, content: str, timestamp: str) -> Optional[str]:
+        """防重复检查：最近 3 条消息中 5 秒内存在相同 role 和 content 时返回其消息 ID"""
+        current_time = datetime.fromisoformat(timestamp)
+        for msg in self.get_all_messages(user_id=user_id, session_id=session_id, limit=3):
+            if msg.get("role") != role or msg.get("content") != content:
+                continue
+            msg_timestamp = msg.get("timestamp")
+            msg_id = msg.get("id")
+            if msg_timestamp and msg_id:
+                time_diff = (current_time - datetime.fromisoformat(msg_timestamp)).total_seconds()
+                if abs(time_diff) < 5:  # 5 秒内的重复消息
+                    logger.warning(f"⚠️ 检测到重复消息，跳过保存: {content[:30]}...")
+                    logger.warning(f"   时间间隔: {abs(time_diff):.2f} 秒")
+                    return msg_id
+        return None
+
+    @abstractmethod
+    def add_message(
+        self,
+        user_id: str,
+        session_id: str,
+        role: str,
+        content: str,
+        message_id: Optional[str] = None,
+        timestamp: Optional[str] = None,
+        check_duplicate: bool = True,
+        intent: Optional[str] = None,
+        intent_confidence: Optional[float] = None,
+        intents: Optional[List[Dict]] = None,
+        embedding: Optional[List[float]] = None
+    ) -> str:
+        """添加单条消息，返回消息 ID"""
+
+    @abstractmethod
+    def add_records(self, records: List[Dict[str, Any]]) -> int:
+        """批量写入记录（需包含 id 与 embedding，同 ID 覆盖），返回写入条数"""
+
+    @abstractmethod
+    def search_memory(
+        self,
+        user_id: str,
+        session_id: Optional[str] = None,
+        query_text: str = "",
+        n_results: int = 5,
+        include_metadata: bool = True
+    ) -> List[Dict]:
+        """语义检索（按距离升序）"""
+
+    @abstractmethod
+    def get_all_messages(
+        self,
+        user_id: str,
+        session_id: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """获取会话消息（按时间升序，limit 取最新 N 条）"""
+
+    @abstractmethod
+    def get_session_vectors(self, user_id: str, session_id: str) -> List[Dict]:
+        """获取会话全部消息及其向量（按时间升序）"""
+
+    @abstractmethod
+    def delete_session_memory(self, user_id: str, session_id: str) -> int:
+        """删除会话的全部记忆，返回删除条数"""
+
+    @abstractmethod
+    def count_messages(self, user_id: str, session_id: str) -> int:
+        """统计会话消息数量"""
+
+    @abstractmethod
+    def iter_records(self, batch_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """分批遍历全部记录（含向量），用于后端间迁移"""
+
+    @abstractmethod
+    def count_all(self) -> int:
+        """统计全部记录数"""
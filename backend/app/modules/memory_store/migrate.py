@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对话记忆存储迁移工具（ChromaDB ⇄ Milvus）
+
+按批读取源后端的全部记录（含向量，不重新计算 embedding），批量 upsert 到目标后端；
+主键沿用消息 ID，中断后可直接重新执行。迁移完成后对比两端总数。
+
+用法（在 backend 目录下）:
+    python -m app.modules.memory_store.migrate --source chroma --target milvus
+    python -m app.modules.memory_store.migrate --source milvus --target chroma --batch-size 1000
+    python -m app.modules.memory_store.migrate --source chroma --target milvus --dry-run
+"""
+import argparse
+import logging
+import sys
+import time
+from typing import Any, Dict
+
+from app.modules.memory_store.base import MemoryStore
+from app.modules.memory_store.store import BACKENDS, create_memory_store
+
+logger = logging.getLogger(__name__)
+
+
+def init_backend(backend: str) -> None:
+    """初始化后端连接（迁移工具独立运行，不经过应用启动流程）"""
+    if backend == "chroma":
+        from app.initialize.chromadb import init_chromadb
+        init_chromadb()
+    elif backend == "milvus":
+        from app.initialize.milvus import init_milvus
+        init_milvus()
+
+
+def migrate(source: MemoryStore, target: MemoryStore, batch_size: int = 500, dry_run: bool = False) -> Dict[str, Any]:
+    """把源后端的全部记录迁移到目标后端
+
+    Args:
+        source: 源存储
+        target: 目标存储
+        batch_size: 每批条数
+        dry_run: 只读取、不写入
+
+    Returns:
+        迁移统计 {"source_count", "migrated", "target_count", "seconds"}
+    """
+    started = time.perf_counter()
+    source_count = source.count_all()
+    logger.info(f"🚚 开始迁移 {source.backend} → {target.backend}，共 {source_count} 条{'（dry-run）' if dry_run else ''}")
+
+    migrated = 0
+    for batch in source.iter_records(batch_size=batch_size):
+        if not dry_run:
+            target.add_records(batch)
+        migrated += len(batch)
+        elapsed = time.perf_counter() - started
+        logger.info(f"   已迁移 {migrated}/{source_count} 条（{migrated / max(elapsed, 1e-6):.0f} 条/秒）")
+
+    target_count = None if dry_run else target.count_all()
+    result = {
+        "source_count": source_count,
+        "migrated": migrated,
+        "target_count": target_count,
+        "seconds": round(time.perf_counter() - started, 2)
+    }
+    if target_count is not None and target_count < source_count:
+        logger.warning(f"⚠️ 目标记录数 {target_count} 少于源记录数 {source_count}")
+    else:
+        logger.info(f"✅ 迁移完成: {result}")
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="对话记忆存储迁移（ChromaDB ⇄ Milvus）")
+    parser.add_argument("--source", required=True, choices=BACKENDS, help="源后端")
+    parser.add_argument("--target", required=True, choices=BACKENDS, help="目标后端")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批条数（默认 500）")
+    parser.add_argument("--dry-run", action="store_true", help="只读取源数据，不写入目标")
+    args = parser.parse_args(argv)
+
+    if args.source == args.target:
+        parser.error("源后端与目标后端不能相同")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    init_backend(args.source)
+    if not args.dry_run:
+        init_backend(args.target)
+
+    result = migrate(
+        create_memory_store(args.source),
+        create_memory_store(args.target),
+        batch_size=args.batch_size,
+        dry_run=args.dry_run
+    )
+    if result["target_count"] is not None and result["target_count"] < result["source_count"]:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
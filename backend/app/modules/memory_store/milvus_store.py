@@ -0,0 +1,318 @@
+# Milvus 记忆存储 - MemoryStore 的 Milvus 实现（对话记忆规模超出单机 ChromaDB 时使用）
+#
+# 集合设计：
+# - user_id 为分区键（partition key），按用户哈希到 MILVUS_NUM_PARTITIONS 个分区，检索时只扫描对应分区
+# - session_id 建倒排索引，会话内过滤不再全分区扫描
+# - 向量索引类型与参数由配置决定（HNSW / IVF_FLAT / IVF_SQ8 ...），度量与 CHROMADB_DISTANCE_METRIC 一致
+# - 主键为消息 ID（与 ChromaDB 相同），写入使用 upsert，迁移可重复执行
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+from app.core.config import settings
+from app.initialize.milvus import get_milvus_client
+from app.modules.memory_store.base import MemoryStore, RECORD_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# ChromaDB 度量名称 → Milvus 度量类型
+METRIC_TYPES = {"cosine": "COSINE", "ip": "IP", "l2": "L2"}
+
+OUTPUT_FIELDS = ["id", "content", *RECORD_FIELDS]
+
+# VARCHAR 字段长度上限
+FIELD_MAX_LENGTH = {
+    "id": 256,
+    "content": 65535,
+    "user_id": 128,
+    "session_id": 256,
+    "role": 32,
+    "timestamp": 64,
+    "intent": 128,
+    "intent_confidence": 32,
+    "intents": 8192,
+}
+
+# 单次 query 的结果上限（Milvus 默认 offset + limit 不超过 16384）
+QUERY_LIMIT = 16384
+
+
+def _quote(value: str) -> str:
+    """转义过滤表达式中的字符串字面量"""
+    return json.dumps(str(value), ensure_ascii=False)
+
+
+class MilvusMemoryStore(MemoryStore):
+    """Milvus 对话记忆存储"""
+
+    backend = "milvus"
+
+    def __init__(self):
+        super().__init__()
+        self.client = None
+        self.collection_name = settings.MILVUS_COLLECTION
+        self.metric_type = METRIC_TYPES.get(settings.CHROMADB_DISTANCE_METRIC.lower(), "COSINE")
+        self._collection_ready = False
+
+    def _ensure_collection(self):
+        """确保客户端与集合已就绪（集合不存在时按向量维度创建）"""
+        if self.client is None:
+            self.client = get_milvus_client()
+        if not self._collection_ready:
+            if not self.client.has_collection(self.collection_name):
+                self._create_collection(len(self.embed(["维度探测"])[0]))
+            self.client.load_collection(self.collection_name)
+            self._collection_ready = True
+        return self.client
+
+    def _create_collection(self, dim: int) -> None:
+        from pymilvus import DataType, MilvusClient
+
+        schema = MilvusClient.create_schema(auto_id=False, enable_dynamic_field=False)
+        schema.add_field(field_name="id", datatype=DataType.VARCHAR, is_primary=True, max_length=FIELD_MAX_LENGTH["id"])
+        schema.add_field(field_name="embedding", datatype=DataType.FLOAT_VECTOR, dim=dim)
+        schema.add_field(field_name="content", datatype=DataType.VARCHAR, max_length=FIELD_MAX_LENGTH["content"])
+        schema.add_field(
+            field_name="user_id", datatype=DataType.VARCHAR,
+            max_length=FIELD_MAX_LENGTH["user_id"], is_partition_key=True
+        )
+        for field in RECORD_FIELDS[1:]:
+            schema.add_field(field_name=field, datatype=DataType.VARCHAR, max_length=FIELD_MAX_LENGTH[field])
+
+        index_params = self.client.prepare_index_params()
+        index_params.add_index(
+            field_name="embedding",
+            index_type=settings.MILVUS_INDEX_TYPE,
+            metric_type=self.metric_type,
+            params=json.loads(settings.MILVUS_INDEX_PARAMS or "{}")
+        )
+        index_params.add_index(field_name="session_id", index_type="INVERTED")
+
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            schema=schema,
+            index_params=index_params,
+            num_partitions=settings.MILVUS_NUM_PARTITIONS
+        )
+        logger.info(
+            f"✅ Milvus 集合 '{self.collection_name}' 已创建 "
+            f"(dim={dim}, index={settings.MILVUS_INDEX_TYPE}, metric={self.metric_type}, "
+            f"partitions={settings.MILVUS_NUM_PARTITIONS})"
+        )
+
+    @staticmethod
+    def _filter(user_id: str, session_id: Optional[str] = None) -> str:
+        expr = f"user_id == {_quote(user_id)}"
+        if session_id:
+            expr += f" and session_id == {_quote(session_id)}"
+        return expr
+
+    def _to_distance(self, score: float) -> float:
+        """Milvus 的 COSINE / IP 返回相似度（越大越相似），换算为 ChromaDB 的距离定义；L2 本身即为距离"""
+        return score if self.metric_type == "L2" else 1.0 - score
+
+    @staticmethod
+    def _to_row(record: Dict[str, Any]) -> Dict[str, Any]:
+        """统一记录格式 → Milvus 行（VARCHAR 字段不接受 None）"""
+        row = {
+            "id": record["id"],
+            "embedding": list(map(float, record["embedding"])),
+            "content": (record.get("content") or "")[:FIELD_MAX_LENGTH["content"]],
+        }
+        for field in RECORD_FIELDS:
+            value = record.get(field)
+            if field == "intents" and isinstance(value, list):
+                value = json.dumps(value, ensure_ascii=False)
+            row[field] = "" if value is None else str(value)[:FIELD_MAX_LENGTH[field]]
+        return row
+
+    @staticmethod
+    def _from_entity(entity: Dict[str, Any]) -> Dict[str, Any]:
+        """Milvus 行 → 消息字典（空字符串还原为 None，与 ChromaDB 结果一致）"""
+        message = {"id": entity.get("id"), "content": entity.get("content", "")}
+        for field in RECORD_FIELDS:
+            message[field] = entity.get(field) or None
+        return message
+
+    def add_message(
+        self,
+        user_id: str,
+        session_id: str,
+        role: str,
+        content: str,
+        message_id: Optional[str] = None,
+        timestamp: Optional[str] = None,
+        check_duplicate: bool = True,
+        intent: Optional[str] = None,
+        intent_confidence: Optional[float] = None,
+        intents: Optional[List[Dict]] = None,
+        embedding: Optional[List[float]] = None
+    ) -> str:
+        """添加消息到记忆（参数含义同 ChromaDBCore.add_message）"""
+        try:
+            if not timestamp:
+                timestamp = datetime.now().isoformat()
+            if check_duplicate:
+                duplicate_id = self.find_recent_duplicate(user_id, session_id, role, content, timestamp)
+                if duplicate_id:
+                    return duplicate_id
+            if not message_id:
+                message_id = f"{user_id}_{session_id}_{int(datetime.now().timestamp() * 1000)}"
+
+            record = self.build_metadata(
+                user_id, session_id, role, timestamp,
+                intent=intent, intent_confidence=intent_confidence, intents=intents
+            )
+            record.update({
+                "id": message_id,
+                "content": content,
+                "embedding": embedding if embedding is not None else self.embed([content])[0]
+            })
+            self.add_records([record])
+            return message_id
+        except Exception as e:
+            logger.error(f"❌ 添加消息失败: {e}")
+            raise
+
+    def add_records(self, records: List[Dict[str, Any]]) -> int:
+        """批量写入记录（按 MILVUS_INSERT_BATCH 分批 upsert，同 ID 覆盖）"""
+        if not records:
+            return 0
+        client = self._ensure_collection()
+        batch_size = max(1, settings.MILVUS_INSERT_BATCH)
+        for start in range(0, len(records), batch_size):
+            rows = [self._to_row(record) for record in records[start:start + batch_size]]
+            client.upsert(collection_name=self.collection_name, data=rows)
+        return len(records)
+
+    def search_memory(
+        self,
+        user_id: str,
+        session_id: Optional[str] = None,
+        query_text: str = "",
+        n_results: int = 5,
+        include_metadata: bool = True
+    ) -> List[Dict]:
+        """语义检索（参数与返回格式同 ChromaDBCore.search_memory）"""
+        try:
+            client = self._ensure_collection()
+            results = client.search(
+                collection_name=self.collection_name,
+                data=[self.embed([query_text])[0]],
+                filter=self._filter(user_id, session_id),
+                limit=n_results,
+                output_fields=OUTPUT_FIELDS,
+                search_params={"metric_type": self.metric_type, "params": json.loads(settings.MILVUS_SEARCH_PARAMS or "{}")}
+            )
+            formatted_results = []
+            for hit in (results[0] if results else []):
+                entity = self._from_entity(hit.get("entity") or {})
+                item = {
+                    "id": hit.get("id") or entity["id"],
+                    "content": entity["content"],
+                    "distance": self._to_distance(hit.get("distance", 0.0))
+                }
+                if include_metadata:
+                    item.update({key: entity.get(key) for key in (
+                        "role", "timestamp", "user_id", "session_id", "intent", "intent_confidence"
+                    )})
+                formatted_results.append(item)
+            formatted_results.sort(key=lambda x: x["distance"])
+            return formatted_results
+        except Exception as e:
+            logger.error(f"❌ 搜索记忆失败: {e}")
+            raise
+
+    def _query(
+        self,
+        user_id: str,
+        session_id: Optional[str],
+        output_fields: List[str],
+        limit: Optional[int] = QUERY_LIMIT
+    ) -> List[Dict[str, Any]]:
+        """按用户/会话过滤查询（limit 为 None 时不传 limit：Milvus 不允许 count(*) 与 limit 同时使用）"""
+        client = self._ensure_collection()
+        kwargs = {"limit": limit} if limit is not None else {}
+        return client.query(
+            collection_name=self.collection_name,
+            filter=self._filter(user_id, session_id),
+            output_fields=output_fields,
+            **kwargs
+        )
+
+    def get_all_messages(
+        self,
+        user_id: str,
+        session_id: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """获取会话消息（按时间升序，limit 取最新 N 条）"""
+        try:
+            messages = [self._from_entity(row) for row in self._query(user_id, session_id, OUTPUT_FIELDS)]
+            messages.sort(key=lambda x: x.get("timestamp") or "")
+            return messages[-limit:] if limit else messages
+        except Exception as e:
+            logger.error(f"❌ 获取消息失败: {e}")
+            raise
+
+    def get_session_vectors(self, user_id: str, session_id: str) -> List[Dict]:
+        """获取会话全部消息及其向量（按时间升序）"""
+        try:
+            records = []
+            for row in self._query(user_id, session_id, OUTPUT_FIELDS + ["embedding"]):
+                record = self._from_entity(row)
+                record["embedding"] = list(map(float, row["embedding"]))
+                records.append(record)
+            records.sort(key=lambda x: x.get("timestamp") or "")
+            return records
+        except Exception as e:
+            logger.error(f"❌ 获取会话向量失败: {e}")
+            raise
+
+    def delete_session_memory(self, user_id: str, session_id: str) -> int:
+        """删除会话的全部记忆"""
+        try:
+            client = self._ensure_collection()
+            result = client.delete(collection_name=self.collection_name, filter=self._filter(user_id, session_id))
+            return int(result.get("delete_count", 0)) if isinstance(result, dict) else len(result or [])
+        except Exception as e:
+            logger.error(f"❌ 删除会话记忆失败: {e}")
+            raise
+
+    def count_messages(self, user_id: str, session_id: str) -> int:
+        """统计会话消息数量"""
+        try:
+            rows = self._query(user_id, session_id, ["count(*)"], limit=None)
+            return int(rows[0]["count(*)"]) if rows else 0
+        except Exception as e:
+            logger.error(f"❌ 统计消息失败: {e}")
+            raise
+
+    def iter_records(self, batch_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """分批遍历全部记录（含向量），使用 query_iterator 不受单次 query 上限限制"""
+        client = self._ensure_collection()
+        iterator = client.query_iterator(
+            collection_name=self.collection_name,
+            batch_size=batch_size,
+            filter="",
+            output_fields=OUTPUT_FIELDS + ["embedding"]
+        )
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    return
+                batch = []
+                for row in rows:
+                    record = self._from_entity(row)
+                    record["embedding"] = list(map(float, row["embedding"]))
+                    batch.append(record)
+                yield batch
+        finally:
+            iterator.close()
+
+    def count_all(self) -> int:
+        """统计全部记录数"""
+        client = self._ensure_collection()
+        rows = client.query(collection_name=self.collection_name, filter="", output_fields=["count(*)"])
+        return int(rows[0]["count(*)"]) if rows else 0
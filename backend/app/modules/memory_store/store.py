@@ -0,0 +1,40 @@
+# 对话记忆存储后端选择（MEMORY_STORE_BACKEND）
+import logging
+from typing import Optional
+from app.core.config import settings
+from app.modules.memory_store.base import MemoryStore
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("chroma", "milvus")
+
+# 全局实例（懒加载）
+_memory_store: Optional[MemoryStore] = None
+
+
+def create_memory_store(backend: Optional[str] = None) -> MemoryStore:
+    """创建指定后端的记忆存储
+
+    Args:
+        backend: chroma / milvus，默认读取 MEMORY_STORE_BACKEND
+
+    Returns:
+        MemoryStore 实例（chroma 返回全局 chromadb_core）
+    """
+    backend = (backend or settings.MEMORY_STORE_BACKEND).lower()
+    if backend == "chroma":
+        from app.modules.chromadb.core.chromadb_core import chromadb_core
+        return chromadb_core
+    if backend == "milvus":
+        from app.modules.memory_store.milvus_store import MilvusMemoryStore
+        return MilvusMemoryStore()
+    raise ValueError(f"未知的记忆存储后端: {backend}（可选: {', '.join(BACKENDS)}）")
+
+
+def get_memory_store() -> MemoryStore:
+    """获取当前配置的记忆存储（单例模式）"""
+    global _memory_store
+    if _memory_store is None:
+        _memory_store = create_memory_store()
+        logger.info(f"🗄️ 对话记忆存储后端: {_memory_store.backend}")
+    return _memory_store
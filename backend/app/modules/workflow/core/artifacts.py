@@ -0,0 +1,76 @@
+# 请求级旁路存储 - 体积较大的中间产物（原始相似记忆、组装后的 Prompt、反馈统计等）不进入 WorkflowState
+#
+# LangGraph 在每一步都会复制、合并状态通道，stream_mode="values" 与检查点也会序列化完整状态，
+# 因此状态中只保存句柄（字符串），实际内容保存在本轮请求的 ArtifactStore 中，请求结束即释放。
+# 当前请求的存储通过 contextvars 传递：节点在复制了上下文的任务中运行，引用的是同一个存储对象。
+import logging
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactStore:
+    """单轮请求的旁路存储
+
+    句柄格式为 "{scope_id}:{name}"，只能在签发它的请求内解析；
+    从检查点恢复的旧句柄（上一轮请求签发）解析结果为默认值。
+    """
+
+    def __init__(self, scope_id: Optional[str] = None):
+        self.scope_id = scope_id or uuid.uuid4().hex[:12]
+        self._items: Dict[str, Any] = {}
+
+    def put(self, name: str, value: Any) -> str:
+        """保存中间产物并返回句柄（同名覆盖）"""
+        self._items[name] = value
+        return f"{self.scope_id}:{name}"
+
+    def get(self, handle: Optional[str], default: Any = None) -> Any:
+        """按句柄读取中间产物，句柄为空或不属于本轮请求时返回 default"""
+        if not handle:
+            return default
+        scope_id, _, name = handle.partition(":")
+        if scope_id != self.scope_id:
+            return default
+        return self._items.get(name, default)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_current: ContextVar[Optional[ArtifactStore]] = ContextVar("workflow_artifacts", default=None)
+
+
+def open_scope(scope_id: Optional[str] = None) -> ArtifactStore:
+    """为当前请求创建旁路存储（须在工作流执行前调用，节点任务会继承该上下文）"""
+    store = ArtifactStore(scope_id)
+    _current.set(store)
+    return store
+
+
+def close_scope() -> None:
+    """释放当前请求的旁路存储"""
+    _current.set(None)
+
+
+def current() -> Optional[ArtifactStore]:
+    return _current.get()
+
+
+def put(name: str, value: Any) -> str:
+    """保存到当前请求的旁路存储，未打开作用域时（如单独调用节点）返回空句柄"""
+    store = _current.get()
+    if store is None:
+        logger.debug(f"旁路存储未打开，丢弃中间产物: {name}")
+        return ""
+    return store.put(name, value)
+
+
+def get(handle: Optional[str], default: Any = None) -> Any:
+    """从当前请求的旁路存储读取"""
+    store = _current.get()
+    if store is None:
+        return default
+    return store.get(handle, default)
@@ -0,0 +1,220 @@
+# LangGraph 检查点保存器 - 基于 Redis，按 thread_id（conversation_id）保存，短期过期
+import base64
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from app.core.config import settings
+from app.initialize import redis
+
+logger = logging.getLogger(__name__)
+
+# Redis 键前缀：每个 thread 一个 Hash
+CHECKPOINT_PREFIX = "checkpoint:"
+
+# 不写入检查点的状态通道 / 元数据键（用户凭证与请求级画像），恢复时由本次请求重新提供
+EXCLUDED_CHANNELS = frozenset({"access_token", "user_profile"})
+
+
+class RedisCheckpointSaver(BaseCheckpointSaver):
+    """Redis 检查点保存器（仅异步接口）
+
+    存储结构：checkpoint:{thread_id} 为一个 Hash，整体设置 TTL（CHECKPOINT_TTL）
+    - {ns}|cp|{checkpoint_id}       检查点（含 channel_values）、元数据与父检查点 ID
+    - {ns}|w|{checkpoint_id}|{task_id}|{idx}   pending writes
+
+    对话工作流只需要“最近一轮”的状态（用于工单确认轮次恢复），因此配合 durability="exit"
+    每轮只写一次检查点；新一轮对话开始前删除该 thread，避免上一轮的状态混入。
+    Redis 不可用时读取返回空、写入直接跳过，不影响工作流执行。
+    EXCLUDED_CHANNELS 中的通道（access_token 等）不落盘。
+    """
+
+    def __init__(self, ttl: Optional[int] = None):
+        super().__init__()
+        self.ttl = ttl if ttl is not None else settings.CHECKPOINT_TTL
+
+    @staticmethod
+    def _key(thread_id: str) -> str:
+        return f"{CHECKPOINT_PREFIX}{thread_id}"
+
+    def _dumps(self, obj: Any) -> str:
+        type_, data = self.serde.dumps_typed(obj)
+        # 客户端开启了 decode_responses，二进制内容需编码为文本
+        return json.dumps([type_, base64.b64encode(data).decode("ascii")])
+
+    def _loads(self, raw: str) -> Any:
+        type_, data = json.loads(raw)
+        return self.serde.loads_typed((type_, base64.b64decode(data)))
+
+    def _build_tuple(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, fields: Dict[str, str]) -> CheckpointTuple:
+        checkpoint, metadata, parent_id = json.loads(fields[f"{checkpoint_ns}|cp|{checkpoint_id}"])
+        writes_prefix = f"{checkpoint_ns}|w|{checkpoint_id}|"
+        writes = sorted(
+            (json.loads(value) for field, value in fields.items() if field.startswith(writes_prefix)),
+            key=lambda w: (w[1], w[0])
+        )
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint=self._loads(checkpoint),
+            metadata=self._loads(metadata),
+            parent_config=(
+                {"configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": parent_id,
+                }}
+                if parent_id else None
+            ),
+            pending_writes=[(task_id, channel, self._loads(value)) for _, task_id, channel, value in writes],
+        )
+
+    async def _load_fields(self, thread_id: str) -> Dict[str, str]:
+        if not redis.redis_client:
+            return {}
+        try:
+            return await redis.redis_client.hgetall(self._key(thread_id))
+        except Exception as e:
+            logger.warning(f"⚠️ 读取检查点失败: {e}")
+            return {}
+
+    @staticmethod
+    def _checkpoint_ids(fields: Dict[str, str], checkpoint_ns: str):
+        prefix = f"{checkpoint_ns}|cp|"
+        return sorted((f[len(prefix):] for f in fields if f.startswith(prefix)), reverse=True)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        fields = await self._load_fields(thread_id)
+        ids = self._checkpoint_ids(fields, checkpoint_ns)
+        checkpoint_id = get_checkpoint_id(config) or (ids[0] if ids else None)
+        if not checkpoint_id or checkpoint_id not in ids:
+            return None
+        return self._build_tuple(thread_id, checkpoint_ns, checkpoint_id, fields)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        if not config:
+            return  # 不支持跨 thread 列举
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        config_checkpoint_id = get_checkpoint_id(config)
+        before_id = get_checkpoint_id(before) if before else None
+        fields = await self._load_fields(thread_id)
+
+        for checkpoint_id in self._checkpoint_ids(fields, checkpoint_ns):
+            if config_checkpoint_id and checkpoint_id != config_checkpoint_id:
+                continue
+            if before_id and checkpoint_id >= before_id:
+                continue
+            item = self._build_tuple(thread_id, checkpoint_ns, checkpoint_id, fields)
+            if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        next_config = {"configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint["id"],
+        }}
+        if not redis.redis_client:
+            return next_config
+
+        checkpoint = {**checkpoint, "channel_values": {
+            channel: value for channel, value in checkpoint["channel_values"].items()
+            if channel not in EXCLUDED_CHANNELS
+        }}
+        metadata = {
+            key: value for key, value in get_checkpoint_metadata(config, metadata).items()
+            if key not in EXCLUDED_CHANNELS
+        }
+        value = json.dumps([
+            self._dumps(checkpoint),
+            self._dumps(metadata),
+            config["configurable"].get("checkpoint_id"),
+        ])
+        key = self._key(thread_id)
+        try:
+            async with redis.redis_client.pipeline(transaction=False) as pipe:
+                pipe.hset(key, f"{checkpoint_ns}|cp|{checkpoint['id']}", value)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ 保存检查点失败: {e}")
+        return next_config
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        if not redis.redis_client or not writes:
+            return
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        mapping = {}
+        for idx, (channel, value) in enumerate(writes):
+            if channel in EXCLUDED_CHANNELS:
+                continue
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            mapping[f"{checkpoint_ns}|w|{checkpoint_id}|{task_id}|{write_idx}"] = json.dumps(
+                [write_idx, task_id, channel, self._dumps(value)]
+            )
+        if not mapping:
+            return
+        key = self._key(thread_id)
+        try:
+            async with redis.redis_client.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping=mapping)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ 保存检查点写入失败: {e}")
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        if not redis.redis_client:
+            return
+        try:
+            await redis.redis_client.delete(self._key(thread_id))
+        except Exception as e:
+            logger.warning(f"⚠️ 删除检查点失败: {e}")
+
+
+# 全局实例
+checkpointer = RedisCheckpointSaver()
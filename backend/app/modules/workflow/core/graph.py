@@ -1,11 +1,35 @@
 # LangGraph 工作流图构建器
 from langgraph.graph import StateGraph, END
-from typing import Callable, Dict, Any, List, Optional
+from langchain_core.runnables import RunnableConfig
+from typing import Callable, Dict, Any, List, Optional, Sequence, TypedDict, get_type_hints
+from app.core import deadline
+from app.core.metrics import metrics
+import asyncio
+import inspect
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 
+class NodeDeadlineExceeded(asyncio.TimeoutError):
+    """必需节点超出时限"""
+
+
+def parse_node_budgets(text: str) -> Dict[str, float]:
+    """解析节点时限配置，格式: "node_a:1.5,node_b:1" """
+    budgets = {}
+    for item in (text or "").split(","):
+        name, _, value = item.partition(":")
+        if name.strip() and value.strip():
+            budgets[name.strip()] = float(value)
+    return budgets
+
+
+def _accepts_config(func: Callable) -> bool:
+    return "config" in inspect.signature(func).parameters
+
+
 class WorkflowGraphBuilder:
     """LangGraph 工作流图构建器
     
@@ -24,24 +48,41 @@ class WorkflowGraphBuilder:
         graph = builder.compile()
     """
     
-    def __init__(self, state_schema: type):
+    def __init__(self, state_schema: type, channels: Optional[Dict[str, Dict[str, Sequence[str]]]] = None):
         """初始化图构建器
         
         Args:
             state_schema: 状态结构类型（TypedDict）
+            channels: 各节点的读写通道声明 {节点名: {"reads": (...), "writes": (...)}}，未声明的节点读写完整状态
         """
         self.state_schema = state_schema
+        self.state_hints = get_type_hints(state_schema, include_extras=True)
+        self.channels = channels or {}
         self.graph = StateGraph(state_schema)
         self.nodes: Dict[str, Callable] = {}
         self.entry_point: Optional[str] = None
         logger.info(f"WorkflowGraphBuilder 初始化完成，状态类型: {state_schema.__name__}")
     
-    def add_node(self, name: str, func: Callable) -> "WorkflowGraphBuilder":
+    def add_node(
+        self,
+        name: str,
+        func: Callable,
+        budget: Optional[float] = None,
+        optional: bool = False,
+        fallback: Optional[Dict[str, Any]] = None,
+        persist: bool = False
+    ) -> "WorkflowGraphBuilder":
         """添加节点到图中
         
         Args:
             name: 节点名称（唯一标识）
             func: 节点执行函数，签名为 func(state: StateSchema) -> dict
+            budget: 节点时限（秒），实际时限取该值与请求剩余时间的较小值；None 表示只受请求截止时间约束
+            optional: 是否为可选节点（如上下文增强节点）。超时后返回 fallback 并标记 degraded_nodes，
+                      工作流继续执行；必需节点超时则抛出 NodeDeadlineExceeded
+            fallback: 可选节点超时时返回的空结果
+            persist: 是否为持久化节点（回答之后的保存步骤）。节点内不受请求截止时间约束，
+                     避免流式回答耗尽时限后保存调用的超时被压缩到 MIN_TIMEOUT 而静默失败
             
         Returns:
             self，支持链式调用
@@ -49,11 +90,96 @@ class WorkflowGraphBuilder:
         if name in self.nodes:
             logger.warning(f"节点 '{name}' 已存在，将被覆盖")
         
-        self.graph.add_node(name, func)
+        spec = self.channels.get(name, {})
+        if spec.get("writes") is not None:
+            func = self._with_writes(name, func, spec["writes"])
+        if budget is not None or optional:
+            func = self._with_deadline(name, func, budget, optional, fallback or {})
+        if persist:
+            func = self._without_deadline(func)
+        
+        input_schema = self._input_schema(name, spec["reads"]) if spec.get("reads") is not None else None
+        self.graph.add_node(name, func, input_schema=input_schema)
         self.nodes[name] = func
         logger.info(f"添加节点: {name}")
         return self
     
+    def _input_schema(self, name: str, reads: Sequence[str]) -> type:
+        """按声明的读通道生成节点输入结构，LangGraph 只为节点读取这些字段"""
+        unknown = [key for key in reads if key not in self.state_hints]
+        if unknown:
+            raise ValueError(f"节点 '{name}' 声明了不存在的读通道: {unknown}")
+        return TypedDict(f"{name}_input", {key: self.state_hints[key] for key in reads}, total=False)
+    
+    def _with_writes(self, name: str, func: Callable, writes: Sequence[str]) -> Callable:
+        """包装节点函数，丢弃未声明的状态字段写入（非状态字段交由 LangGraph 忽略）"""
+        allowed = set(writes)
+        undeclared = set(self.state_hints) - allowed
+        accepts_config = _accepts_config(func)
+        
+        async def wrapped(state, config: RunnableConfig):
+            result = func(state, config=config) if accepts_config else func(state)
+            if inspect.isawaitable(result):
+                result = await result
+            if not result:
+                return result
+            dropped = undeclared.intersection(result)
+            if dropped:
+                metrics.incr(f"workflow.undeclared_write.{name}")
+                logger.warning(f"⚠️ 节点 {name} 写入了未声明的状态字段，已丢弃: {sorted(dropped)}")
+                result = {key: value for key, value in result.items() if key not in dropped}
+            return result
+        
+        wrapped.__name__ = getattr(func, "__name__", name)
+        return wrapped
+    
+    @staticmethod
+    def _with_deadline(
+        name: str,
+        func: Callable,
+        budget: Optional[float],
+        optional: bool,
+        fallback: Dict[str, Any]
+    ) -> Callable:
+        """包装节点函数，按节点时限与请求截止时间执行"""
+        accepts_config = _accepts_config(func)
+        
+        async def wrapped(state, config: RunnableConfig):
+            timeout = deadline.timeout_for(budget)
+            started = time.perf_counter()
+            try:
+                call = func(state, config=config) if accepts_config else func(state)
+                if timeout is None:
+                    return await call
+                return await asyncio.wait_for(call, timeout)
+            except asyncio.TimeoutError:
+                metrics.incr(f"workflow.node_timeout.{name}")
+                if not optional:
+                    raise NodeDeadlineExceeded(f"节点 {name} 超出时限 {timeout:.2f}s")
+                logger.warning(f"⏱️ 可选节点 {name} 超出时限 {timeout:.2f}s，降级为空结果")
+                return {**fallback, "degraded_nodes": [name]}
+            finally:
+                metrics.observe(f"workflow.node_ms.{name}", (time.perf_counter() - started) * 1000)
+        
+        # 不使用 functools.wraps：LangGraph 按签名（会跟随 __wrapped__）决定是否注入 config
+        wrapped.__name__ = getattr(func, "__name__", name)
+        return wrapped
+    
+    @staticmethod
+    def _without_deadline(func: Callable) -> Callable:
+        """包装节点函数，在节点内暂停请求截止时间（节点自身的 budget 仍然生效）"""
+        accepts_config = _accepts_config(func)
+        
+        async def wrapped(state, config: RunnableConfig):
+            with deadline.suspended():
+                result = func(state, config=config) if accepts_config else func(state)
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+        
+        wrapped.__name__ = getattr(func, "__name__", "node")
+        return wrapped
+    
     def add_edge(self, from_node: str, to_node: str) -> "WorkflowGraphBuilder":
         """添加普通边（无条件直接跳转）
         
@@ -1,5 +1,6 @@
 # LangGraph 工作流状态定义
-from typing import TypedDict, Optional, List, Dict, Any
+from typing import TypedDict, Optional, List, Dict, Any, Annotated, Tuple
+import operator
 
 
 class WorkflowState(TypedDict, total=False):
@@ -20,6 +21,7 @@ class WorkflowState(TypedDict, total=False):
     company: str  # 用户公司
     age: str  # 用户年龄
     gender: str  # 用户性别
+    user_profile: Dict[str, Any]  # 请求级用户画像（鉴权时已从 session 读取，user_info 节点直接使用）
     
     # ========== 意图识别 ==========
     intent: str  # 主意图（置信度最高的）
@@ -27,15 +29,21 @@ class WorkflowState(TypedDict, total=False):
     intents: List[Dict[str, Any]]  # 所有检测到的意图列表（包括混合意图）
     
     # ========== 记忆上下文 ==========
-    working_memory_text: str  # Working Memory 文本（Redis 中最近10轮对话）
+    working_memory_text: str  # Working Memory 文本（最近几轮原文；长对话中更早的轮次见 working_memory_summary）
+    working_memory_summary: str  # 早期对话滚动摘要（滑出近期窗口的轮次，后台增量更新）
     working_memory_count: int  # Working Memory 消息数量
-    similar_messages: str  # 相似度较高的消息文本（ChromaDB 语义检索）
+    working_memory_keys: List[str]  # Working Memory 去重键（消息ID + 内容哈希）
+    # 体积较大的中间产物保存在请求级旁路存储（core/artifacts.py）中，状态只携带句柄
+    similar_memories_ref: str  # 句柄 → ChromaDB 相似记忆原始列表（去重前）
+    similar_messages_ref: str  # 句柄 → 相似消息文本（ChromaDB 语义检索，已与 Working Memory 去重）
     similar_message_count: int  # 相似消息数量
     feedback_summary: str  # 用户反馈趋势摘要（近七天）
-    feedback_data: Dict[str, Any]  # 用户反馈原始数据
+    feedback_data_ref: str  # 句柄 → 用户反馈统计数据
+    degraded_nodes: Annotated[List[str], operator.add]  # 超时降级（返回空结果）的可选节点，并行节点的结果会合并
     
     # ========== LLM 输出 ==========
     llm_response: str  # LLM 生成的回答
+    prompt_ref: str  # 句柄 → 组装后的完整 Prompt 文本
     
     # ========== 工单相关 ==========
     ticket_keyword_triggered: bool # 关键词检测是否触发
@@ -53,6 +61,7 @@ class WorkflowState(TypedDict, total=False):
     # ========== 记忆保存状态 ==========
     memory_saved: bool  # ChromaDB 记忆是否保存成功
     working_memory_saved: bool  # Working Memory 是否保存成功
+    database_saved: bool  # MySQL 是否保存成功（未声明时 LangGraph 会丢弃该字段，去重检查失效）
     
     # ========== 流式输出控制 ==========
     is_streaming: bool  # 是否使用流式输出
@@ -61,6 +70,84 @@ class WorkflowState(TypedDict, total=False):
     error: Optional[str]  # 错误信息（如果有）
 
 
+# 各节点的读写通道：节点只接收 reads 中的字段（LangGraph input_schema），
+# 返回 writes 以外的字段会被丢弃并告警，避免中间产物悄悄混入状态
+NODE_CHANNELS: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "user_info": {
+        "reads": ("user_id", "session_id", "access_token", "user_profile"),
+        "writes": ("user_id", "company", "age", "gender", "error"),
+    },
+    "get_working_memory": {
+        "reads": ("conversation_id", "access_token"),
+        "writes": ("working_memory_text", "working_memory_summary", "working_memory_count", "working_memory_keys"),
+    },
+    "get_similar_messages": {
+        "reads": ("user_id", "conversation_id", "session_id", "user_input"),
+        "writes": ("similar_memories_ref", "similar_message_count", "error"),
+    },
+    "get_feedback": {
+        "reads": ("user_id", "access_token"),
+        "writes": ("feedback_summary", "feedback_data_ref", "error"),
+    },
+    "merge_context": {
+        "reads": ("similar_memories_ref", "working_memory_keys"),
+        "writes": ("similar_messages_ref", "similar_message_count"),
+    },
+    "intent_recognition": {
+        "reads": ("user_input", "working_memory_text"),
+        "writes": ("intent", "intent_confidence", "intents", "error"),
+    },
+    "keyword_check": {
+        "reads": ("user_input",),
+        "writes": ("ticket_keyword_triggered", "ticket_keywords_detected"),
+    },
+    "ticket_analysis": {
+        "reads": (
+            "user_input", "access_token", "llm_response", "working_memory_text",
+            "intent", "intent_confidence", "intents",
+            "ticket_keyword_triggered", "ticket_keywords_detected",
+        ),
+        "writes": (
+            "need_create_ticket", "ticket_reason", "problem_type", "ticket_parent_category",
+            "company", "title", "facts", "user_appeal",
+        ),
+    },
+    "ticket_summary": {
+        "reads": ("user_input", "user_id", "conversation_id", "access_token", "intent", "intent_confidence", "intents"),
+        "writes": (
+            "need_create_ticket", "ticket_reason", "problem_type", "ticket_parent_category",
+            "company", "title", "facts", "user_appeal",
+        ),
+    },
+    "llm_answer": {
+        "reads": (
+            "user_input", "intent", "intents", "company", "age", "gender",
+            "working_memory_text", "working_memory_summary", "similar_messages_ref", "feedback_summary",
+        ),
+        "writes": ("llm_response", "prompt_ref", "error"),
+    },
+    "ask_user_confirmation": {
+        "reads": ("need_create_ticket", "ticket_reason", "problem_type", "facts", "user_appeal"),
+        "writes": ("confirmation_message",),
+    },
+    "save_working_memory": {
+        "reads": ("conversation_id", "user_input", "llm_response", "working_memory_saved"),
+        "writes": ("working_memory_saved",),
+    },
+    "save_memory": {
+        "reads": (
+            "user_id", "conversation_id", "session_id", "user_input", "llm_response",
+            "intent", "intent_confidence", "intents", "memory_saved",
+        ),
+        "writes": ("memory_saved", "error"),
+    },
+    "save_database": {
+        "reads": ("conversation_id", "user_input", "llm_response", "access_token", "database_saved"),
+        "writes": ("database_saved", "error"),
+    },
+}
+
+
 def format_workflow_state(state: WorkflowState) -> Dict[str, Any]:
     """格式化工作流状态，确保包含所有字段（缺失字段填充为 None）
     
@@ -1,5 +1,6 @@
 # 意图识别模块 - 使用阿里云百炼大模型
 from typing import Dict, Tuple, List, Optional, Any
+from app.core import deadline
 from app.core.config import settings
 import logging
 import json
@@ -63,12 +64,15 @@ async def detect_intent(
             history_text=history_text
         )
         
+        # 受请求级截止时间约束（timeout=None 会关闭 openai 客户端超时，因此未设置时不传）
+        timeout = deadline.timeout_for()
         response = await client.chat.completions.create(
             model=settings.ALIYUN_MODEL,
             messages=[{"role": "system", "content": system_prompt}],
             temperature=0.1,
             max_tokens=100,
-            extra_body={"enable_thinking": False}  # qwen3 模型要求非流式调用时禁用 thinking
+            extra_body={"enable_thinking": False},  # qwen3 模型要求非流式调用时禁用 thinking
+            **({"timeout": timeout} if timeout is not None else {})
         )
         
         # 获取响应内容
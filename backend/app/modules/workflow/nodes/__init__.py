@@ -14,6 +14,10 @@ from app.modules.workflow.nodes.chromadb_node import (
     get_memory_node,
     save_memory_node
 )
+from app.modules.workflow.nodes.context_merge import (
+    merge_context_node,
+    merge_similar_memories
+)
 
 __all__ = [
     # 意图识别
@@ -31,5 +35,9 @@ __all__ = [
     
     # ChromaDB 记忆
     "get_memory_node",
-    "save_memory_node"
+    "save_memory_node",
+    
+    # 上下文合并
+    "merge_context_node",
+    "merge_similar_memories"
 ]
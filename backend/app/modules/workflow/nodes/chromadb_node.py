@@ -1,14 +1,138 @@
-# ChromaDB 记忆节点 - LangGraph 工作流节点
-from typing import Dict, Any, List
-from app.modules.chromadb.core.chromadb_core import chromadb_core
+# ChromaDB 记忆节点 - LangGraph 工作流节点（存储后端由 MEMORY_STORE_BACKEND 选择：ChromaDB / Milvus）
+from typing import Dict, Any, List, Optional, Tuple
+from app.modules.memory_store import get_memory_store
+from app.modules.chromadb.core.local_index import conversation_vector_index
+from app.modules.workflow.core import artifacts
 from app.modules.workflow.core.state import WorkflowState
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.initialize import redis
 from lmnr import observe
 import logging
 import asyncio
+import time
 
 logger = logging.getLogger(__name__)
 
+# 相似度阈值：distance < 0.3 （越小越相似）
+SIMILARITY_THRESHOLD = 0.3
+
+# 会话记忆条数计数器（用于判断是否需要语义检索）
+# 计数键空闲 7 天后过期，但记忆本身不过期：键缺失时按存储中的实际条数重建，而不是从 0 开始累加
+MEMORY_COUNT_PREFIX = "memory_count:"
+MEMORY_COUNT_TTL = 7 * 24 * 3600  # 7 天
+
+
+def _memory_count_key(user_id: str, session_id: str) -> str:
+    return f"{MEMORY_COUNT_PREFIX}{user_id}:{session_id}"
+
+
+async def incr_memory_count(user_id: str, session_id: str, amount: int) -> None:
+    """累加会话已写入 ChromaDB 的消息条数（在写入之后调用）"""
+    if not redis.redis_client or amount <= 0:
+        return
+    try:
+        key = _memory_count_key(user_id, session_id)
+        if await redis.redis_client.exists(key):
+            async with redis.redis_client.pipeline(transaction=False) as pipe:
+                pipe.incrby(key, amount)
+                pipe.expire(key, MEMORY_COUNT_TTL)
+                await pipe.execute()
+            return
+        # 新会话或计数已过期：存储中的条数已包含本次写入
+        count = await asyncio.to_thread(get_memory_store().count_messages, user_id, session_id)
+        await redis.redis_client.set(key, max(count, amount), ex=MEMORY_COUNT_TTL)
+    except Exception as e:
+        logger.warning(f"⚠️ 更新会话记忆计数失败: {e}")
+
+
+async def get_memory_count(user_id: str, session_id: str) -> Optional[int]:
+    """获取会话已写入 ChromaDB 的消息条数，未知时返回 None"""
+    if not redis.redis_client:
+        return None
+    try:
+        value = await redis.redis_client.get(_memory_count_key(user_id, session_id))
+        return int(value) if value is not None else None
+    except Exception as e:
+        logger.warning(f"⚠️ 读取会话记忆计数失败: {e}")
+        return None
+
+
+async def adaptive_search_memory(
+    user_id: str,
+    session_id: str,
+    query_text: str,
+    initial_k: int,
+    max_k: int,
+    threshold: float = SIMILARITY_THRESHOLD
+) -> Tuple[List[Dict[str, Any]], int]:
+    """自适应 n_results 的语义检索
+
+    结果按距离升序返回，只要出现一条未通过阈值的结果，更大的 k 也不会带来新的命中，
+    因此从较小的 k 开始，仅当本轮结果全部通过阈值时才扩大 k（×4，上限 max_k）。
+
+    Returns:
+        (检索结果, 最终使用的 k)
+    """
+    k = max(1, min(initial_k, max_k))
+    while True:
+        memories = await asyncio.to_thread(
+            get_memory_store().search_memory,
+            user_id=user_id,
+            session_id=session_id,
+            query_text=query_text,
+            n_results=k,
+            include_metadata=True
+        )
+        all_passed = all(mem.get("distance", 1.0) < threshold for mem in memories)
+        # 结果不足 k 条说明会话内已无更多记忆；或已有未通过阈值的结果；或已达上限
+        if not all_passed or len(memories) < k or k >= max_k:
+            return memories, k
+        k = min(k * 4, max_k)
+
+
+async def local_search_memory(
+    user_id: str,
+    session_id: str,
+    query_text: str,
+    memory_count: Optional[int],
+    n_results: int
+) -> Optional[List[Dict[str, Any]]]:
+    """会话级本地暴力检索（小会话不经过 ChromaDB 服务）
+
+    会话条数未知或超过 LOCAL_VECTOR_SEARCH_MAX 时返回 None，由调用方回退到 ChromaDB；
+    本地向量缓存缺失或落后时先从 ChromaDB 一次性构建。
+
+    Returns:
+        按距离升序的检索结果；无法本地检索时返回 None
+    """
+    if not settings.LOCAL_VECTOR_SEARCH_ENABLED or memory_count is None:
+        return None
+    if memory_count > settings.LOCAL_VECTOR_SEARCH_MAX:
+        metrics.incr("similar_search.local_oversize")
+        return None
+    try:
+        started = time.perf_counter()
+        loaded = await conversation_vector_index.load(user_id, session_id, memory_count)
+        if loaded is None:
+            metrics.incr("similar_search.local_build")
+            records = await asyncio.to_thread(get_memory_store().get_session_vectors, user_id, session_id)
+            if len(records) > settings.LOCAL_VECTOR_SEARCH_MAX:
+                return None
+            await conversation_vector_index.build(user_id, session_id, records)
+            loaded = await conversation_vector_index.load(user_id, session_id, len(records))
+            if loaded is None:
+                return []
+        query = (await asyncio.to_thread(get_memory_store().embed, [query_text]))[0]
+        memories = conversation_vector_index.search(*loaded, query=query, n_results=n_results)
+        metrics.incr("similar_search.local")
+        metrics.observe("similar_search.local_ms", (time.perf_counter() - started) * 1000)
+        return memories
+    except Exception as e:
+        metrics.incr("similar_search.local_error")
+        logger.warning(f"⚠️ 本地向量检索失败，回退到 ChromaDB: {e}")
+        return None
+
 
 @observe(name="get_memory_node", tags=["node", "memory", "retrieval"])
 async def get_memory_node(state: WorkflowState) -> Dict[str, Any]:
@@ -54,7 +178,7 @@ async def get_memory_node(state: WorkflowState) -> Dict[str, Any]:
         
         if user_input:  # 只有当有用户输入时才进行语义搜索
             memories = await asyncio.to_thread(
-                chromadb_core.search_memory,
+                get_memory_store().search_memory,
                 user_id=user_id,
                 session_id=session_id,  # 只搜索当前会话的历史记忆
                 query_text=user_input,
@@ -165,6 +289,16 @@ async def save_memory_node(state: WorkflowState) -> Dict[str, Any]:
             }
         
         saved_ids = []
+        saved_items = []
+        
+        # 一次性计算本轮向量：同时写入 ChromaDB 和会话级本地索引（失败时由 ChromaDB 自行计算）
+        texts = [text for text in (user_input, llm_response) if text]
+        try:
+            embeddings = await asyncio.to_thread(get_memory_store().embed, texts)
+        except Exception as e:
+            logger.warning(f"⚠️ 计算向量失败，由 ChromaDB 计算: {e}")
+            embeddings = []
+        vectors = dict(zip(("user", "assistant") if user_input else ("assistant",), embeddings))
         
         # 关键修改：使用统一的时间戳，确保 user 和 assistant 消息顺序正确
         from datetime import datetime, timedelta
@@ -175,7 +309,7 @@ async def save_memory_node(state: WorkflowState) -> Dict[str, Any]:
             user_timestamp = (base_timestamp - timedelta(milliseconds=1)).isoformat()
             
             user_msg_id = await asyncio.to_thread(
-                chromadb_core.add_message,
+                get_memory_store().add_message,
                 user_id=user_id,
                 session_id=session_id,
                 role="user",
@@ -183,16 +317,18 @@ async def save_memory_node(state: WorkflowState) -> Dict[str, Any]:
                 timestamp=user_timestamp,
                 intent=intent if intent else None,
                 intent_confidence=intent_confidence if intent_confidence > 0 else None,
-                intents=intents if intents else None
+                intents=intents if intents else None,
+                embedding=vectors.get("user")
             )
             saved_ids.append(user_msg_id)
+            saved_items.append({"id": user_msg_id, "role": "user", "content": user_input, "intent": intent or None})
         
         if llm_response:
             # assistant 消息使用基准时间戳（晚于 user）
             assistant_timestamp = base_timestamp.isoformat()
             
             assistant_msg_id = await asyncio.to_thread(
-                chromadb_core.add_message,
+                get_memory_store().add_message,
                 user_id=user_id,
                 session_id=session_id,
                 role="assistant",
@@ -200,9 +336,16 @@ async def save_memory_node(state: WorkflowState) -> Dict[str, Any]:
                 timestamp=assistant_timestamp,
                 intent=intent if intent else None,
                 intent_confidence=intent_confidence if intent_confidence > 0 else None,
-                intents=intents if intents else None
+                intents=intents if intents else None,
+                embedding=vectors.get("assistant")
             )
             saved_ids.append(assistant_msg_id)
+            saved_items.append({"id": assistant_msg_id, "role": "assistant", "content": llm_response, "intent": intent or None})
+        
+        # 先追加本地向量再累加计数：检索时向量条数少于计数即视为缓存落后，会从 ChromaDB 重建
+        if len(embeddings) == len(saved_items):
+            await conversation_vector_index.append(user_id, session_id, saved_items, embeddings)
+        await incr_memory_count(user_id, session_id, len(saved_ids))
         
         logger.info(f"✅ ChromaDB 记忆保存完成，共保存 {len(saved_ids)} 条消息")
         if intent:
@@ -254,7 +397,7 @@ def get_recent_messages_node(state: WorkflowState) -> Dict[str, Any]:
         # 获取最近5条消息
         # 注意：这里如果也被用到，也应该改为异步，但目前主要是 get_similar_messages_node 被使用
         # 为了保险起见，暂不修改此未使用节点的签名，以免影响其他未知的引用
-        messages = chromadb_core.get_all_messages(
+        messages = get_memory_store().get_all_messages(
             user_id=user_id,
             session_id=session_id,
             limit=5  # 只取最近5条
@@ -299,8 +442,11 @@ async def get_similar_messages_node(state: WorkflowState) -> Dict[str, Any]:
     职责：
     1. 从 state 中提取 user_id、conversation_id (或 session_id) 和 user_input
     2. 基于 user_input 检索相似度较高的历史消息
-    3. 过滤相似度阈值（distance < 0.3）
-    4. 格式化为文本并更新 state
+    3. 会话消息数不超过 Working Memory 窗口时跳过检索（结果必然全部被 merge_context 去重丢弃）
+    4. 会话条数不超过 LOCAL_VECTOR_SEARCH_MAX 时在本地暴力检索（见 local_index.py）；
+       否则走 ChromaDB，自适应 n_results：从小 k 开始，仅当结果全部通过阈值时扩大 k
+    5. 过滤相似度阈值（distance < 0.3）
+    6. 输出原始相似记忆列表，由 merge_context 节点与 Working Memory 去重后格式化
     
     Args:
         state: 工作流状态，需要包含：
@@ -311,7 +457,7 @@ async def get_similar_messages_node(state: WorkflowState) -> Dict[str, Any]:
             
     Returns:
         更新后的状态字典，包含：
-            - similar_messages: 格式化的相似消息文本
+            - similar_memories_ref: 过滤后的相似记忆列表（id/role/content/distance）的旁路存储句柄
             - similar_message_count: 相似消息数量
     """
     try:
@@ -322,62 +468,63 @@ async def get_similar_messages_node(state: WorkflowState) -> Dict[str, Any]:
         
         if not user_id or not session_id or not user_input:
             return {
-                "similar_messages": "",
+                "similar_memories_ref": "",
                 "similar_message_count": 0
             }
         
-        # 基于语义相似度搜索记忆
-        memories = await asyncio.to_thread(
-            chromadb_core.search_memory,
-            user_id=user_id,
-            session_id=session_id,
-            query_text=user_input,
-            n_results=50,  # 搜索前50条
-            include_metadata=True
-        )
-        
-        if not memories:
+        # 会话记忆全部仍在 Working Memory 窗口内时，跳过语义检索
+        memory_count = await get_memory_count(user_id, session_id)
+        if memory_count is not None and memory_count <= settings.SIMILAR_SEARCH_MIN_MESSAGES:
+            metrics.incr("similar_search.skipped")
+            logger.info(f"⏭️ 会话记忆仅 {memory_count} 条，跳过相似消息检索")
             return {
-                "similar_messages": "",
+                "similar_memories_ref": "",
                 "similar_message_count": 0
             }
         
-        # 过滤相似度阈值：distance < 0.3 （越小越相似）
-        SIMILARITY_THRESHOLD = 0.3
-        filtered_memories = [
-            mem for mem in memories 
-            if mem.get("distance", 1.0) < SIMILARITY_THRESHOLD
-        ]
+        # 小会话在本地暴力检索；超过阈值或本地不可用时走 ChromaDB（自适应 n_results）
+        k = settings.SIMILAR_SEARCH_MAX_K
+        memories = await local_search_memory(user_id, session_id, user_input, memory_count, k)
+        if memories is None:
+            memories, k = await adaptive_search_memory(
+                user_id=user_id,
+                session_id=session_id,
+                query_text=user_input,
+                initial_k=settings.SIMILAR_SEARCH_INITIAL_K,
+                max_k=settings.SIMILAR_SEARCH_MAX_K
+            )
+            metrics.observe("similar_search.k", k)
         
-        if not filtered_memories:
+        if not memories:
+            metrics.observe("similar_search.pass_rate", 0)
             return {
-                "similar_messages": "",
+                "similar_memories_ref": "",
                 "similar_message_count": 0
             }
         
-        # 格式化记忆为文本
-        similar_lines = []
-        for memory in filtered_memories:
-            role = memory.get("role", "unknown")
-            content = memory.get("content", "")
-            distance = memory.get("distance", 1.0)
-            role_name = "用户" if role == "user" else "安然" if role == "assistant" else role
-            # 添加相似度信息
-            similar_lines.append(f"{role_name}：{content} (相似度: {1-distance:.2f})")
-        
-        similar_messages = "\n".join(similar_lines)
+        filtered_memories = [
+            {
+                "id": mem.get("id"),
+                "role": mem.get("role", "unknown"),
+                "content": mem.get("content", ""),
+                "distance": mem.get("distance", 1.0)
+            }
+            for mem in memories 
+            if mem.get("distance", 1.0) < SIMILARITY_THRESHOLD
+        ]
+        metrics.observe("similar_search.pass_rate", len(filtered_memories) / len(memories))
         
-        logger.info(f"✅ 相似消息搜索完成，共 {len(filtered_memories)} 条")
+        logger.info(f"✅ 相似消息搜索完成，共 {len(filtered_memories)} 条 (k={k})")
         
         return {
-            "similar_messages": similar_messages,
+            "similar_memories_ref": artifacts.put("similar_memories", filtered_memories),
             "similar_message_count": len(filtered_memories)
         }
         
     except Exception as e:
         logger.error(f"搜索相似消息节点执行失败: {str(e)}", exc_info=True)
         return {
-            "similar_messages": "",
+            "similar_memories_ref": "",
             "similar_message_count": 0,
             "error": str(e)
         }
@@ -415,7 +562,7 @@ def get_all_messages_node(state: WorkflowState) -> Dict[str, Any]:
                 "messages": []
             }
         
-        messages = chromadb_core.get_all_messages(
+        messages = get_memory_store().get_all_messages(
             user_id=user_id,
             session_id=session_id,
             limit=limit
@@ -0,0 +1,165 @@
+# 上下文合并节点 - 相似记忆与 Working Memory 去重后再进入 Prompt
+import hashlib
+import logging
+import re
+from typing import Dict, Any, List, Set
+from app.modules.workflow.core import artifacts
+from app.modules.workflow.core.state import WorkflowState
+from app.core.config import settings
+from lmnr import observe
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_content(content: str) -> str:
+    """归一化消息内容（去除首尾及连续空白），用于去重比较"""
+    return re.sub(r"\s+", " ", content or "").strip()
+
+
+def content_hash(role: str, content: str) -> str:
+    """计算消息的内容哈希（角色 + 归一化内容）
+
+    Args:
+        role: 消息角色 (user/assistant)
+        content: 消息内容
+
+    Returns:
+        16 位十六进制哈希
+    """
+    key = f"{role}:{normalize_content(content)}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def working_memory_keys(messages: List[Dict[str, Any]]) -> List[str]:
+    """提取 Working Memory 消息的去重键（消息 ID + 内容哈希）
+
+    Args:
+        messages: Working Memory 消息列表
+
+    Returns:
+        去重键列表
+    """
+    keys: List[str] = []
+    for msg in messages:
+        message_id = msg.get("id") or msg.get("messageId") or (msg.get("metadata") or {}).get("id")
+        if message_id:
+            keys.append(str(message_id))
+        keys.append(content_hash(msg.get("role", ""), msg.get("content", "")))
+    return keys
+
+
+def _bigrams(text: str) -> Set[str]:
+    """字符二元组集合（中文场景下比分词更稳定）"""
+    if len(text) < 2:
+        return {text}
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def is_near_duplicate(a: str, b: str, threshold: float) -> bool:
+    """判断两段文本是否近似重复（字符二元组 Jaccard 相似度）"""
+    if a == b:
+        return True
+    grams_a, grams_b = _bigrams(a), _bigrams(b)
+    union = grams_a | grams_b
+    if not union:
+        return False
+    return len(grams_a & grams_b) / len(union) >= threshold
+
+
+def merge_similar_memories(
+    similar_memories: List[Dict[str, Any]],
+    memory_keys: List[str],
+    max_items: int,
+    near_dup_threshold: float
+) -> List[Dict[str, Any]]:
+    """合并相似记忆
+
+    1. 丢弃已在 Working Memory 窗口中的条目（按消息 ID 或内容哈希）
+    2. 按相似度从高到低折叠近似重复的条目（保留相似度最高的一条）
+    3. 按相似度截取前 max_items 条
+
+    Args:
+        similar_memories: ChromaDB 检索结果（已按阈值过滤）
+        memory_keys: Working Memory 去重键
+        max_items: 最多保留条数
+        near_dup_threshold: 近似重复判定阈值（0-1）
+
+    Returns:
+        合并后的相似记忆列表（按相似度降序）
+    """
+    known = set(memory_keys)
+    ranked = sorted(similar_memories, key=lambda m: m.get("distance", 1.0))
+
+    merged: List[Dict[str, Any]] = []
+    for memory in ranked:
+        if memory.get("id") in known:
+            continue
+        if content_hash(memory.get("role", ""), memory.get("content", "")) in known:
+            continue
+
+        content = normalize_content(memory.get("content", ""))
+        if any(
+            kept.get("role") == memory.get("role")
+            and is_near_duplicate(normalize_content(kept.get("content", "")), content, near_dup_threshold)
+            for kept in merged
+        ):
+            continue
+
+        merged.append(memory)
+        if len(merged) >= max_items:
+            break
+    return merged
+
+
+def format_similar_messages(memories: List[Dict[str, Any]]) -> str:
+    """将相似记忆格式化为 Prompt 文本"""
+    similar_lines = []
+    for memory in memories:
+        role = memory.get("role", "unknown")
+        content = memory.get("content", "")
+        distance = memory.get("distance", 1.0)
+        role_name = "用户" if role == "user" else "安然" if role == "assistant" else role
+        # 添加相似度信息
+        similar_lines.append(f"{role_name}：{content} (相似度: {1-distance:.2f})")
+    return "\n".join(similar_lines)
+
+
+@observe(name="merge_context_node", tags=["node", "memory", "merge"])
+async def merge_context_node(state: WorkflowState) -> Dict[str, Any]:
+    """上下文合并节点 - 汇聚 Working Memory 与 ChromaDB 相似记忆
+
+    职责：
+    1. 丢弃已出现在 Working Memory 中的相似记忆（避免 Prompt 中重复携带）
+    2. 折叠近似重复的相似记忆，并按相似度截断
+    3. 格式化为相似消息文本，保存到旁路存储
+
+    Args:
+        state: 工作流状态，需要包含：
+            - similar_memories_ref: ChromaDB 相似记忆原始列表的句柄
+            - working_memory_keys: Working Memory 去重键
+
+    Returns:
+        更新后的状态字典，包含：
+            - similar_messages_ref: 合并后的相似消息文本的句柄
+            - similar_message_count: 合并后的相似消息数量
+    """
+    try:
+        similar_memories = artifacts.get(state.get("similar_memories_ref"), [])
+        if not similar_memories:
+            return {"similar_messages_ref": "", "similar_message_count": 0}
+
+        merged = merge_similar_memories(
+            similar_memories,
+            state.get("working_memory_keys") or [],
+            max_items=settings.SIMILAR_MESSAGES_MAX,
+            near_dup_threshold=settings.SIMILAR_NEAR_DUP_THRESHOLD
+        )
+
+        logger.info(f"✅ 上下文合并完成: 相似记忆 {len(similar_memories)} → {len(merged)} 条")
+        return {
+            "similar_messages_ref": artifacts.put("similar_messages", format_similar_messages(merged)),
+            "similar_message_count": len(merged)
+        }
+    except Exception as e:
+        logger.error(f"上下文合并节点执行失败: {e}", exc_info=True)
+        return {"similar_messages_ref": "", "similar_message_count": 0}
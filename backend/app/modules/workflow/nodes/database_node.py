@@ -2,7 +2,8 @@
 Database 节点 - MySQL 数据库保存节点
 通过 Golang API 将对话保存到 MySQL
 """
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from langchain_core.runnables import RunnableConfig
 from app.modules.workflow.core.state import WorkflowState
 from app.core.database import golang_db_client
 from lmnr import observe
@@ -13,7 +14,7 @@ logger = logging.getLogger(__name__)
 
 
 @observe(name="save_database_node", tags=["node", "database", "mysql", "storage"])
-async def save_database_node(state: WorkflowState) -> Dict[str, Any]:
+async def save_database_node(state: WorkflowState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """
     保存到数据库节点 - 将本轮对话保存到 MySQL
     
@@ -28,6 +29,7 @@ async def save_database_node(state: WorkflowState) -> Dict[str, Any]:
             - user_input: 用户输入
             - llm_response: LLM 回答
             - saved_message_ids: ChromaDB 保存的消息ID列表（用作 MySQL 的 message_id）
+        config: 工作流配置；从检查点恢复时 access_token 不在状态中，由 configurable 传入
             
     Returns:
         更新后的状态字典，包含：
@@ -39,7 +41,7 @@ async def save_database_node(state: WorkflowState) -> Dict[str, Any]:
         user_input = state.get("user_input", "")
         llm_response = state.get("llm_response", "")
         saved_message_ids = state.get("saved_message_ids", [])
-        access_token = state.get("access_token")  # 新增：获取 access_token
+        access_token = state.get("access_token") or ((config or {}).get("configurable") or {}).get("access_token")
         
         # 调试日志
         logger.info(f"[Debug] state keys: {list(state.keys())}")
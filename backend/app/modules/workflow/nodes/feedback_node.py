@@ -1,6 +1,7 @@
 # 用户反馈节点 - 获取用户近期反馈总结数据
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
+from app.modules.workflow.core import artifacts
 from app.modules.workflow.core.state import WorkflowState
 from app.core.config import settings
 from app.services.feedback_service import feedback_service
@@ -32,7 +33,8 @@ async def fetch_user_feedback_summary(access_token: str, days: int | None = None
         days: 查询近几天的数据，默认使用配置文件中的值
 
     Returns:
-        反馈总结数据字典，包含总数、有用率、类型统计等
+        反馈总结数据字典，包含总数、有用率、类型统计等（只保留聚合结果，不携带原始反馈列表，
+        大小不随用户反馈历史增长）
     """
     if not access_token:
         raise ValueError("access_token 不能为空")
@@ -71,7 +73,6 @@ async def fetch_user_feedback_summary(access_token: str, days: int | None = None
                 "not_useful_count": not_useful_count,
                 "useful_rate": useful_rate,
                 "feedback_types": feedback_types,
-                "feedback_list": feedback_list,
             }
             logger.info(
                 f"✅ 反馈总结计算成功: 总数={total_count}, 有用数={useful_count}, 满意度={useful_rate*100:.1f}%"
@@ -89,7 +90,6 @@ async def fetch_user_feedback_summary(access_token: str, days: int | None = None
                 or data.get("unUsefulTagCounts")
                 or {}
             )
-            feedback_list = data.get("feedback_list") or data.get("list") or data.get("items") or []
 
             # 兼容直接提供有用数量的返回（例如字段名为 useful）
             provided_useful = data.get("useful_count")
@@ -106,7 +106,6 @@ async def fetch_user_feedback_summary(access_token: str, days: int | None = None
                 "not_useful_count": not_useful_count,
                 "useful_rate": useful_rate or (useful_count / total_count if total_count else 0),
                 "feedback_types": feedback_types,
-                "feedback_list": feedback_list,
             }
             logger.info("✅ 反馈总结获取成功(聚合数据)")
             return feedback_data
@@ -149,16 +148,35 @@ def format_feedback_summary(feedback_data: Dict[str, Any]) -> str:
     return "\n".join(summary_parts)
 
 
+async def refresh_feedback_summary(user_id: str, access_token: str, days: int) -> Tuple[str, Dict[str, Any]]:
+    """获取反馈统计、格式化为摘要并写入缓存（反馈节点缓存未命中时与会话预热共用）
+
+    Returns:
+        (反馈摘要文本, 反馈统计数据)
+    """
+    # 先读取版本号：获取统计期间用户提交了反馈时，旧摘要不会写回缓存
+    generation = await feedback_service.get_summary_generation(user_id)
+    feedback_data = await fetch_user_feedback_summary(access_token=access_token, days=days)
+    feedback_summary = format_feedback_summary(feedback_data)
+    
+    # 写入缓存（空结果可能源于上游异常，使用较短的默认 TTL）
+    cache_ttl = settings.FEEDBACK_SUMMARY_CACHE_TTL if feedback_data else settings.REDIS_TTL
+    await feedback_service.set_cached_summary(user_id, days, feedback_summary, cache_ttl, generation)
+    return feedback_summary, feedback_data
+
+
 @observe(name="feedback_node", tags=["node", "feedback"])
 async def async_feedback_node(state: WorkflowState) -> Dict[str, Any]:
     """用户反馈节点 - 异步版本（推荐在 LangGraph 中使用）
     
     职责：
     1. 从 state 中获取 user_id 和 access_token
-    2. 调用服务层获取用户近期反馈总结
-    3. 将反馈数据格式化为文本摘要
+    2. 优先读取 Redis 中缓存的反馈摘要文本（用户提交反馈时失效）
+    3. 未命中时调用服务层获取用户近期反馈总结，格式化为文本摘要并写入缓存
     4. 更新 state，添加 feedback_summary 字段
     
+    说明：统计数据保存在旁路存储（feedback_data_ref），缓存命中时不返回（下游仅使用 feedback_summary）
+    
     Args:
         state: 工作流状态
         
@@ -176,25 +194,28 @@ async def async_feedback_node(state: WorkflowState) -> Dict[str, Any]:
         if not access_token:
             logger.warning("access_token 不存在，跳过反馈数据获取")
             return {
-                "feedback_summary": "用户暂无反馈记录",
-                "feedback_data": {}
+                "feedback_summary": "用户暂无反馈记录"
             }
         
         if user_id == "unknown":
             logger.warning("user_id 未知，跳过反馈数据获取")
             return {
-                "feedback_summary": "用户暂无反馈记录",
-                "feedback_data": {}
+                "feedback_summary": "用户暂无反馈记录"
+            }
+        
+        days = getattr(settings, "FEEDBACK_TREND_DEFAULT_DAYS", 7)
+        
+        # 优先使用缓存的反馈摘要
+        cached_summary = await feedback_service.get_cached_summary(user_id, days)
+        if cached_summary is not None:
+            logger.info(f"⚡ 反馈摘要缓存命中: user_id={user_id}, days={days}")
+            return {
+                "feedback_summary": cached_summary
             }
         
         # 异步调用服务层获取反馈总结
         logger.info(f"开始获取用户 {user_id} 的反馈总结...")
-        feedback_data = await fetch_user_feedback_summary(
-            access_token=access_token
-        )
-        
-        # 格式化反馈摘要
-        feedback_summary = format_feedback_summary(feedback_data)
+        feedback_summary, feedback_data = await refresh_feedback_summary(user_id, access_token, days)
         
         logger.info(f"✅ 反馈节点执行成功")
         logger.info(f"反馈摘要:\n{feedback_summary}")
@@ -202,7 +223,7 @@ async def async_feedback_node(state: WorkflowState) -> Dict[str, Any]:
         # 返回更新的状态
         return {
             "feedback_summary": feedback_summary,
-            "feedback_data": feedback_data
+            "feedback_data_ref": artifacts.put("feedback_data", feedback_data)
         }
         
     except Exception as e:
@@ -211,7 +232,6 @@ async def async_feedback_node(state: WorkflowState) -> Dict[str, Any]:
         # 返回默认值，不中断工作流
         return {
             "feedback_summary": "用户暂无反馈记录",
-            "feedback_data": {},
             "error": error_msg
         }
 
@@ -248,15 +268,13 @@ def feedback_node(state: WorkflowState) -> Dict[str, Any]:
         if not access_token:
             logger.warning("access_token 不存在，跳过反馈数据获取")
             return {
-                "feedback_summary": "用户暂无反馈记录",
-                "feedback_data": {}
+                "feedback_summary": "用户暂无反馈记录"
             }
         
         if user_id == "unknown":
             logger.warning("user_id 未知，跳过反馈数据获取")
             return {
-                "feedback_summary": "用户暂无反馈记录",
-                "feedback_data": {}
+                "feedback_summary": "用户暂无反馈记录"
             }
         
         # 调用异步方法获取反馈数据
@@ -282,7 +300,7 @@ def feedback_node(state: WorkflowState) -> Dict[str, Any]:
         # 返回更新的状态
         return {
             "feedback_summary": feedback_summary,
-            "feedback_data": feedback_data
+            "feedback_data_ref": artifacts.put("feedback_data", feedback_data)
         }
         
     except Exception as e:
@@ -291,6 +309,5 @@ def feedback_node(state: WorkflowState) -> Dict[str, Any]:
         # 返回默认值，不中断工作流
         return {
             "feedback_summary": "用户暂无反馈记录",
-            "feedback_data": {},
             "error": error_msg
         }
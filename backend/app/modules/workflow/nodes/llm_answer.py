@@ -1,9 +1,12 @@
 # LLM 回答节点 - 构建完整 Prompt 并调用 LLM 生成回答
 from typing import Dict, Any, Optional
 from langchain_core.runnables import RunnableConfig
+from app.modules.workflow.core import artifacts
 from app.modules.workflow.core.state import WorkflowState
+from app.core import deadline
 from app.modules.llm.core.llm_core import llm_core
-from app.utils.prompt import build_full_prompt, ANRAN_SYSTEM_PROMPT
+from app.modules.llm.core.context_budget import context_budgeter
+from app.utils.prompt import build_prompt_assembler
 from lmnr import observe
 import logging
 
@@ -21,11 +24,13 @@ async def async_llm_stream_answer_node(state: WorkflowState, config: Optional[Ru
         age = state.get("age", "未知")
         gender = state.get("gender", "未知")
         history_text = state.get("history_text", "")  # ChromaDB 历史消息
-        working_memory_text = state.get("working_memory_text", "")  # Redis 短期记忆
-        similar_messages = state.get("similar_messages", "")  # 相似度较高的消息
+        working_memory_text = state.get("working_memory_text", "")  # Redis 短期记忆（最近几轮原文）
+        working_memory_summary = state.get("working_memory_summary", "")  # 早期对话摘要
+        similar_messages = artifacts.get(state.get("similar_messages_ref"), "")  # 相似度较高的消息（旁路存储）
         feedback_summary = state.get("feedback_summary", "")  # 用户反馈趋势摘要
         
-        full_prompt = build_full_prompt(
+        # 静态前缀（system）在前，易变上下文（user）在后，便于命中服务端前缀缓存
+        assembler = build_prompt_assembler(
             user_input=user_input,
             working_memory_text=working_memory_text,  # 传入 working_memory_text
             history_text=history_text,
@@ -35,12 +40,19 @@ async def async_llm_stream_answer_node(state: WorkflowState, config: Optional[Ru
             gender=gender,
             current_intent=intent,
             intents=intents,  # 新增：传入所有意图
-            feedback_summary=feedback_summary  # 新增：传入反馈摘要
+            feedback_summary=feedback_summary,  # 新增：传入反馈摘要
+            working_memory_summary=working_memory_summary
         )
+        # 按 Token 预算裁剪易变上下文（记忆、反馈、相似消息）
+        context_budgeter.apply(assembler)
+        prompt_messages = assembler.build_messages()
+        full_prompt = assembler.render_text()
+        logger.info(f"Prompt 静态前缀指纹: {assembler.prefix_fingerprint}")
         
         llm = llm_core.create_llm(
             temperature=0.7,
-            max_tokens=2000
+            max_tokens=2000,
+            timeout=deadline.timeout_for()  # 受请求级截止时间约束
         )
         
         # 🔥 关键：使用 ainvoke + config，让 astream_events 能捕获流式事件
@@ -59,12 +71,12 @@ async def async_llm_stream_answer_node(state: WorkflowState, config: Optional[Ru
         else:
             config = {"tags": ["answer_generator"]}
 
-        response = await llm.ainvoke(full_prompt, config=config)
+        response = await llm.ainvoke(prompt_messages, config=config)
         full_response = response.content if hasattr(response, 'content') else str(response)
         
         
         return {
-            "full_prompt": full_prompt,
+            "prompt_ref": artifacts.put("full_prompt", full_prompt),  # 完整 Prompt 不进入状态
             "llm_response": full_response
         }
         
@@ -72,6 +84,5 @@ async def async_llm_stream_answer_node(state: WorkflowState, config: Optional[Ru
         logger.error(f"LLM 节点执行失败: {str(e)}", exc_info=True)
         return {
             "error": str(e),
-            "full_prompt": "",
             "llm_response": "抱歉，我现在遇到了一些技术问题，请稍后再试。"
         }
\ No newline at end of file
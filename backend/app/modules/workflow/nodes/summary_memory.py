@@ -0,0 +1,218 @@
+"""
+摘要记忆节点 (Summary Memory) - 分层短期记忆的上层
+
+Working Memory 在 Redis 中保留最近 10 轮原文；长对话中只有最近 WORKING_MEMORY_RECENT_ROUNDS 轮
+以原文进入 Prompt，更早的轮次由后台任务增量合并为一段滚动摘要：
+- 每轮回答保存到 Working Memory 后调度（不在关键路径上），待合并消息不足一批时不调用 LLM
+- 摘要记录已合并到的位置（最后两条消息的内容哈希），尚未合并的消息仍以原文进入 Prompt，不会丢失上下文
+- 同一对话同时只有一个摘要任务：进程内按对话去重，多 worker 之间通过 Redis SET NX 加锁
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.messages import HumanMessage
+from app.initialize import redis
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.modules.llm.core.llm_core import llm_core
+from app.modules.workflow.nodes.context_merge import content_hash
+from app.modules.workflow.nodes.working_memory import WorkingMemory
+from app.utils.prompt import get_memory_summary_prompt
+
+logger = logging.getLogger(__name__)
+
+
+def format_messages(messages: List[Dict[str, Any]]) -> str:
+    """将消息列表格式化为对话文本（用户：... / 安然：...）"""
+    lines = []
+    for msg in messages:
+        role = msg.get("role", "unknown")
+        role_name = "用户" if role == "user" else "安然" if role == "assistant" else role
+        lines.append(f"{role_name}：{msg.get('content', '')}")
+    return "\n".join(lines)
+
+
+def message_keys(messages: List[Dict[str, Any]]) -> List[str]:
+    """消息的内容哈希列表（用于定位摘要已合并到的位置）"""
+    return [content_hash(msg.get("role", ""), msg.get("content", "")) for msg in messages]
+
+
+class SummaryMemory:
+    """摘要记忆管理"""
+
+    LOCK_PREFIX = "short_memory_summary_lock:"
+    # 定位摘要位置时比对的消息条数（单条容易与“好的”“谢谢”之类的重复消息混淆）
+    ANCHOR_SIZE = 2
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._rerun: set = set()
+
+    @staticmethod
+    def recent_size() -> int:
+        """以原文进入 Prompt 的消息条数"""
+        return settings.WORKING_MEMORY_RECENT_ROUNDS * 2
+
+    @staticmethod
+    async def get_summary(conversation_id: str) -> Dict[str, Any]:
+        """读取对话的摘要记录，不存在时返回空字典
+
+        Returns:
+            {"summary": 摘要文本, "anchor": 已合并的最后几条消息哈希, "folded": 累计合并消息数, "updated_at": 时间戳}
+        """
+        if not redis.redis_client:
+            return {}
+        try:
+            raw = await redis.redis_client.get(f"{WorkingMemory.SUMMARY_PREFIX}{conversation_id}")
+            return json.loads(raw) if raw else {}
+        except Exception as e:
+            logger.warning(f"⚠️ 读取对话摘要失败: {e}")
+            return {}
+
+    @classmethod
+    def split(cls, messages: List[Dict[str, Any]], record: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """按摘要位置切分 Working Memory
+
+        Args:
+            messages: Working Memory 消息列表（时间升序）
+            record: 摘要记录
+
+        Returns:
+            (待合并消息, 需以原文进入 Prompt 的消息)；待合并消息只包含滑出近期窗口且尚未合并的部分
+        """
+        boundary = max(len(messages) - cls.recent_size(), 0)
+        foldable = messages[:boundary]
+
+        start = 0
+        anchor = record.get("anchor") or []
+        if anchor:
+            keys = message_keys(foldable)
+            size = len(anchor)
+            # 从后往前找最近一次出现的锚点
+            for end in range(len(keys), size - 1, -1):
+                if keys[end - size:end] == anchor:
+                    start = end
+                    break
+            else:
+                # 锚点已被 FIFO 裁剪：摘要落后超过一个窗口，剩余消息全部视为待合并
+                metrics.incr("summary_memory.anchor_lost")
+
+        pending = foldable[start:]
+        return pending, messages[boundary - len(pending):]
+
+    async def render(self, conversation_id: str, messages: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        """组装 Prompt 使用的记忆：摘要 + 原文消息
+
+        没有摘要（短对话或摘要关闭）时全部消息以原文返回，行为与之前一致。
+
+        Returns:
+            (摘要文本, 以原文进入 Prompt 的消息)
+        """
+        if not settings.WORKING_MEMORY_SUMMARY_ENABLED:
+            return "", messages
+        record = await self.get_summary(conversation_id)
+        if not record.get("summary"):
+            return "", messages
+        _, raw = self.split(messages, record)
+        return record["summary"], raw
+
+    def schedule(self, conversation_id: str) -> None:
+        """回答保存后调度摘要任务（立即返回）
+
+        任务在独立的上下文中运行，不继承本轮请求的 LangChain 回调（避免摘要 LLM 的输出混入流式事件）
+        和请求级截止时间。同一对话已有任务在运行时，标记其完成后再执行一次。
+        """
+        if not settings.WORKING_MEMORY_SUMMARY_ENABLED or not conversation_id:
+            return
+        if conversation_id in self._tasks:
+            self._rerun.add(conversation_id)
+            return
+        # 在空上下文中创建任务（create_task 的 context 参数需要 Python 3.11，这里兼容 3.10）
+        task = contextvars.Context().run(asyncio.create_task, self._run(conversation_id))
+        self._tasks[conversation_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(conversation_id, None))
+
+    async def _run(self, conversation_id: str) -> None:
+        while True:
+            self._rerun.discard(conversation_id)
+            try:
+                await self.summarize(conversation_id)
+            except Exception as e:
+                metrics.incr("summary_memory.error")
+                logger.error(f"❌ 对话摘要失败: {e}", exc_info=True)
+            if conversation_id not in self._rerun:
+                return
+
+    async def _acquire(self, conversation_id: str) -> bool:
+        try:
+            return bool(await redis.redis_client.set(
+                f"{self.LOCK_PREFIX}{conversation_id}", "1", ex=settings.WORKING_MEMORY_SUMMARY_TIMEOUT * 2, nx=True
+            ))
+        except Exception as e:
+            logger.warning(f"⚠️ 摘要加锁失败，跳过本次摘要: {e}")
+            return False
+
+    async def summarize(self, conversation_id: str) -> bool:
+        """把滑出近期窗口的消息合并进摘要
+
+        Returns:
+            bool: 本次更新了摘要返回 True（待合并消息不足一批、其他 worker 正在摘要时返回 False）
+        """
+        if not redis.redis_client or not await self._acquire(conversation_id):
+            return False
+        try:
+            messages = await WorkingMemory.get_messages(conversation_id)
+            record = await self.get_summary(conversation_id)
+            pending, _ = self.split(messages, record)
+            if len(pending) < settings.WORKING_MEMORY_SUMMARY_BATCH:
+                return False
+
+            started = time.perf_counter()
+            summary = await self._summarize_text(record.get("summary", ""), pending)
+            if not summary:
+                return False
+            metrics.observe("summary_memory.ms", (time.perf_counter() - started) * 1000)
+            metrics.incr("summary_memory.folded", len(pending))
+
+            new_record = {
+                "summary": summary,
+                "anchor": message_keys(pending)[-self.ANCHOR_SIZE:],
+                "folded": record.get("folded", 0) + len(pending),
+                "updated_at": int(time.time())
+            }
+            ttl = await WorkingMemory.get_ttl_from_session(conversation_id)
+            await redis.redis_client.set(
+                f"{WorkingMemory.SUMMARY_PREFIX}{conversation_id}",
+                json.dumps(new_record, ensure_ascii=False),
+                ex=ttl
+            )
+            logger.info(
+                f"📝 对话摘要已更新 | conversation={conversation_id[:20]}... | "
+                f"合并 {len(pending)} 条，累计 {new_record['folded']} 条 | 摘要 {len(summary)} 字"
+            )
+            return True
+        finally:
+            await redis.redis_client.delete(f"{self.LOCK_PREFIX}{conversation_id}")
+
+    async def _summarize_text(self, summary: str, pending: List[Dict[str, Any]]) -> Optional[str]:
+        """调用 LLM 把新增对话合并进已有摘要"""
+        prompt = get_memory_summary_prompt().format(
+            max_chars=settings.WORKING_MEMORY_SUMMARY_MAX_CHARS,
+            summary=summary or "（暂无）",
+            dialogue=format_messages(pending)
+        )
+        llm = llm_core.create_llm(
+            temperature=0.3,
+            max_tokens=settings.WORKING_MEMORY_SUMMARY_MAX_CHARS * 2,
+            timeout=settings.WORKING_MEMORY_SUMMARY_TIMEOUT
+        )
+        response = await llm.ainvoke([HumanMessage(content=prompt)])
+        text = (response.content or "").strip()
+        return text[:settings.WORKING_MEMORY_SUMMARY_MAX_CHARS * 2] or None
+
+
+# 全局实例
+summary_memory = SummaryMemory()
@@ -4,7 +4,9 @@ import logging
 from typing import Dict, Any
 from app.modules.workflow.core.state import WorkflowState
 from app.core.config import settings
+from app.core.metrics import metrics
 from lmnr import observe
+from app.initialize import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +33,7 @@ async def fetch_user_info_from_golang(access_token: str) -> Dict[str, Any]:
     logger.info(f"验证 URL: {verify_url}")
     
     try:
-        async with httpx.AsyncClient() as client:
+        async with http_client.shared_client() as client:
             payload = {"token": access_token}
             
             # 发送 POST 请求
@@ -202,15 +204,31 @@ def user_info_node(state: WorkflowState) -> Dict[str, Any]:
         }
 
 
+def _profile_from(data: Dict[str, Any]) -> Dict[str, Any]:
+    """从 session / 画像缓存中提取用户画像，缺少 user_id 时返回空字典"""
+    if not data:
+        return {}
+    user_id = data.get("user_id", "unknown")
+    if not user_id or user_id == "unknown":
+        return {}
+    return {
+        "user_id": str(user_id),
+        "company": data.get("company", "未知"),
+        "age": str(data.get("age", "未知")),
+        "gender": data.get("gender", "未知")
+    }
+
+
 @observe(name="user_info_node", tags=["node", "user_info"])
 async def async_user_info_node(state: WorkflowState) -> Dict[str, Any]:
     """用户信息节点 - 异步版本（推荐在 LangGraph 中使用）
     
     职责：
-    1. 优先从 session_id 获取缓存的用户信息（Redis）
-    2. 如果没有缓存，使用 access_token 从 Golang Server 获取
-    3. 提取用户画像字段（company, age, gender）
-    4. 更新 state
+    1. 优先使用请求级用户画像 user_profile（鉴权依赖已读取 session，无需任何 I/O）
+    2. 其次从 session_id 获取缓存的用户信息（Redis）
+    3. 再次按 user_id 读取用户画像缓存（Redis，带 TTL）
+    4. 都未命中时使用 access_token 从 Golang Server 获取，并回写 session 与画像缓存
+    5. 提取用户画像字段（company, age, gender），更新 state
     
     Args:
         state: 工作流状态
@@ -221,7 +239,14 @@ async def async_user_info_node(state: WorkflowState) -> Dict[str, Any]:
     logger.info("========== 用户信息节点开始 ==========")
     
     try:
-        # 优先尝试从 session_id 获取用户信息
+        # 请求级用户画像（零 I/O）
+        profile = _profile_from(state.get("user_profile") or {})
+        if profile:
+            metrics.incr("user_profile.request_hit")
+            logger.info(f"✅ 使用请求级用户画像: ID={profile['user_id']}, 公司={profile['company']}")
+            return profile
+        
+        # 尝试从 session_id 获取用户信息
         session_id = state.get("session_id")
         
         if session_id:
@@ -231,25 +256,20 @@ async def async_user_info_node(state: WorkflowState) -> Dict[str, Any]:
             from app.core.session_token import get_session
             session_data = await get_session(session_id)
             
-            logger.info(f"🔍 Redis Session 完整数据: {session_data}")
-            
-            if session_data:
-                # 从会话中提取用户画像
-                user_id = session_data.get("user_id", "unknown")
-                company = session_data.get("company", "未知")
-                age = session_data.get("age", "未知")
-                gender = session_data.get("gender", "未知")
-                
-                if user_id != "unknown":
-                    logger.info(f"✅ 从 session 缓存获取用户画像成功: ID={user_id}, 公司={company}")
-                    return {
-                        "user_id": str(user_id),
-                        "company": company,
-                        "age": str(age),
-                        "gender": gender
-                    }
-                else:
-                    logger.warning("Session 中没有完整的用户信息，尝试使用 access_token")
+            profile = _profile_from(session_data)
+            if profile:
+                metrics.incr("user_profile.session_hit")
+                logger.info(f"✅ 从 session 缓存获取用户画像成功: ID={profile['user_id']}, 公司={profile['company']}")
+                return profile
+            logger.warning("Session 中没有完整的用户信息，尝试使用画像缓存")
+        
+        # 按 user_id 读取用户画像缓存
+        from app.core.session_token import get_cached_profile, cache_profile
+        profile = _profile_from(await get_cached_profile(state.get("user_id")))
+        if profile:
+            metrics.incr("user_profile.cache_hit")
+            logger.info(f"✅ 从画像缓存获取用户画像成功: ID={profile['user_id']}, 公司={profile['company']}")
+            return profile
         
         # 如果没有 session 或 session 中没有用户信息，使用 access_token
         access_token = state.get("access_token")
@@ -266,6 +286,7 @@ async def async_user_info_node(state: WorkflowState) -> Dict[str, Any]:
         logger.info(f"使用 access_token 获取用户信息 (Token 前10位: {access_token[:10]}...)")
         
         # 异步调用 Golang Server
+        metrics.incr("user_profile.remote_fetch")
         user_data = await fetch_user_info_from_golang(access_token)
         
         # 提取用户画像字段
@@ -276,24 +297,24 @@ async def async_user_info_node(state: WorkflowState) -> Dict[str, Any]:
         
         logger.info(f"✅ 从 Golang Server 获取用户画像成功: ID={user_id}, 公司={company}, 年龄={age}, 性别={gender}")
         
+        profile = {
+            "user_id": user_id,
+            "company": company,
+            "age": age,
+            "gender": gender
+        }
+        
+        # 回写画像缓存
+        await cache_profile(user_id, profile)
+        
         # 如果有 session_id，更新 session 中的用户信息
         if session_id:
             from app.core.session_token import update_session
-            await update_session(session_id, {
-                "user_id": user_id,
-                "company": company,
-                "age": age,
-                "gender": gender
-            })
+            await update_session(session_id, profile)
             logger.info(f"✅ 已将用户信息缓存到 session: {session_id}")
         
         # 返回更新的状态
-        return {
-            "user_id": user_id,
-            "company": company,
-            "age": age,
-            "gender": gender
-        }
+        return profile
         
     except Exception as e:
         error_msg = f"用户信息节点执行失败: {str(e)}"
@@ -1,13 +1,15 @@
 """
 工作记忆节点 (Working Memory) - 存储最近10轮对话的 FIFO 队列
 """
+import asyncio
 import json
 import logging
-from typing import Dict, Any, List
-import httpx
+from typing import Dict, Any, List, Optional
 from app.initialize import redis
 from app.core.config import settings
+from app.core.metrics import metrics
 from app.core.session_token import get_session
+from app.initialize import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -17,10 +19,17 @@ class WorkingMemory:
     
     # Redis 键前缀
     MEMORY_PREFIX = "short_memory:"
+    # 空历史标记：新建对话或上游确认无历史时写入，Redis 未命中时不再请求 Golang API
+    EMPTY_PREFIX = "short_memory_empty:"
+    # 滚动摘要：滑出近期窗口的早期对话（见 summary_memory.py）
+    SUMMARY_PREFIX = "short_memory_summary:"
     # 最大保留对话轮数（1轮 = user + assistant 2条消息）
     MAX_ROUNDS = 10
     MAX_MESSAGES = MAX_ROUNDS * 2  # 20条消息
     
+    # 进行中的 API 回退请求（按对话合并并发请求）
+    _inflight: Dict[str, asyncio.Future] = {}
+    
     @staticmethod
     async def get_ttl_from_session(session_token: str) -> int:
         """
@@ -78,6 +87,7 @@ class WorkingMemory:
             # 1. 获取现有消息列表
             existing_data = await redis.redis_client.get(cache_key)
             messages = []
+            is_first_save = not existing_data
             
             if existing_data:
                 try:
@@ -127,6 +137,9 @@ class WorkingMemory:
                 json.dumps(data, ensure_ascii=False),
                 ex=ttl  # 使用 session 的 TTL
             )
+            if is_first_save:
+                # 首次保存：对话已有记忆，清除空历史标记
+                await redis.redis_client.delete(f"{WorkingMemory.EMPTY_PREFIX}{session_token}")
             
             logger.info(
                 f"✅ 消息已保存 | session={session_token[:20]}... | "
@@ -140,7 +153,7 @@ class WorkingMemory:
             return False
     
     @staticmethod
-    async def _fetch_history_from_api(session_token: str, access_token: str) -> List[Dict[str, Any]]:
+    async def _fetch_history_from_api(session_token: str, access_token: str) -> Optional[List[Dict[str, Any]]]:
         """
         从 Golang API 获取历史记录
         URL: /app/conversation/{conversationId}/history
@@ -150,17 +163,17 @@ class WorkingMemory:
             access_token: 访问令牌
             
         Returns:
-            List[Dict]: 消息列表
+            List[Dict]: 消息列表（上游确认无历史时为空列表）；请求失败或响应异常时返回 None
         """
         if not access_token:
             logger.warning(f"⚠️ 无法从 API 获取历史记录: 缺少 access_token | session={session_token[:20]}...")
-            return []
+            return None
             
         url = f"{settings.GOLANG_API_BASE_URL}/app/conversation/{session_token}/history"
         headers = {"x-token": access_token}
         
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
+            async with http_client.shared_client() as client:
                 response = await client.get(url, headers=headers)
                 
                 if response.status_code == 200:
@@ -180,13 +193,13 @@ class WorkingMemory:
                                 return messages
                     
                     logger.warning(f"⚠️ API 返回数据格式不正确: {resp_json}")
-                    return []
+                    return None
                 else:
                     logger.warning(f"⚠️ API 获取历史记录失败: Status {response.status_code} | Response: {response.text}")
-                    return []
+                    return None
         except Exception as e:
             logger.error(f"❌ 从 API 获取历史记录异常: {e}")
-            return []
+            return None
 
     @staticmethod
     async def _save_batch_to_redis(session_token: str, messages: List[Dict[str, Any]]) -> bool:
@@ -227,6 +240,63 @@ class WorkingMemory:
             logger.error(f"❌ 同步 Redis 失败: {e}")
             return False
 
+    @staticmethod
+    async def mark_empty(session_token: str, ttl: int = None) -> None:
+        """
+        标记对话无历史记录（新建对话，或上游确认为空），标记有效期内 Redis 未命中时不再请求 API
+        
+        Args:
+            session_token: 会话 ID (conversationId)
+            ttl: 标记有效期（秒），默认 WORKING_MEMORY_EMPTY_TTL
+        """
+        if not redis.redis_client:
+            return
+        try:
+            await redis.redis_client.set(
+                f"{WorkingMemory.EMPTY_PREFIX}{session_token}", "1",
+                ex=ttl or settings.WORKING_MEMORY_EMPTY_TTL
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ 写入空历史标记失败: {e}")
+
+    @staticmethod
+    async def _load_from_api(session_token: str, access_token: str) -> List[Dict[str, Any]]:
+        """
+        API 回退（Redis 未命中时）：
+        - 空历史标记存在时直接返回空列表（负缓存）
+        - 同一对话的并发请求合并为一次上游调用（singleflight）
+        - 上游返回历史时写入 Redis；确认为空时写入空历史标记（请求失败不标记）
+        """
+        try:
+            if await redis.redis_client.exists(f"{WorkingMemory.EMPTY_PREFIX}{session_token}"):
+                metrics.incr("working_memory.negative_hit")
+                return []
+        except Exception as e:
+            logger.warning(f"⚠️ 读取空历史标记失败: {e}")
+
+        inflight = WorkingMemory._inflight.get(session_token)
+        if inflight is not None:
+            metrics.incr("working_memory.singleflight_shared")
+            return list(await asyncio.shield(inflight))
+
+        future = asyncio.get_running_loop().create_future()
+        WorkingMemory._inflight[session_token] = future
+        messages: List[Dict[str, Any]] = []
+        try:
+            metrics.incr("working_memory.api_fallback")
+            logger.info(f"📭 Redis 无记忆，尝试从 API 获取 | session={session_token[:20]}...")
+            fetched = await WorkingMemory._fetch_history_from_api(session_token, access_token)
+            if fetched:
+                messages = fetched
+                # 获取成功后，同步保存到 Redis
+                await WorkingMemory._save_batch_to_redis(session_token, messages)
+            elif fetched is not None:
+                await WorkingMemory.mark_empty(session_token)
+        finally:
+            WorkingMemory._inflight.pop(session_token, None)
+            future.set_result(messages)
+        return messages
+
     @staticmethod
     async def get_messages(session_token: str, access_token: str = None) -> List[Dict[str, Any]]:
         """
@@ -247,6 +317,7 @@ class WorkingMemory:
             cached_data = await redis.redis_client.get(cache_key)
             
             if cached_data:
+                metrics.incr("working_memory.redis_hit")
                 data = json.loads(cached_data)
                 messages = data.get("messages", [])
                 logger.info(
@@ -257,12 +328,8 @@ class WorkingMemory:
             else:
                 # Redis 中没有，尝试从 API 获取 (Fallback)
                 if access_token:
-                    logger.info(f"📭 Redis 无记忆，尝试从 API 获取 | session={session_token[:20]}...")
-                    messages = await WorkingMemory._fetch_history_from_api(session_token, access_token)
-                    
+                    messages = await WorkingMemory._load_from_api(session_token, access_token)
                     if messages:
-                        # 获取成功后，同步保存到 Redis
-                        await WorkingMemory._save_batch_to_redis(session_token, messages)
                         return messages
                 
                 logger.info(f"📭 无短期记忆 (Redis & API) | session={session_token[:20]}...")
@@ -272,6 +339,29 @@ class WorkingMemory:
             logger.error(f"❌ 获取消息失败: {e}")
             return []
     
+    @staticmethod
+    async def prefetch(session_token: str, access_token: str = None, messages: List[Dict[str, Any]] = None) -> str:
+        """
+        预热短期记忆：Redis 已有记忆时跳过；调用方已取得完整历史（如打开对话时）直接写入，
+        否则走 API 回退获取并写入
+        
+        Returns:
+            str: warm（已缓存）/ filled（已填充）/ empty（无历史）
+        """
+        if not redis.redis_client:
+            return "empty"
+        cache_key = f"{WorkingMemory.MEMORY_PREFIX}{session_token}"
+        if await redis.redis_client.exists(cache_key):
+            return "warm"
+        if messages is None:
+            if not access_token:
+                return "empty"
+            return "filled" if await WorkingMemory._load_from_api(session_token, access_token) else "empty"
+        if not messages:
+            return "empty"
+        saved = await WorkingMemory._save_batch_to_redis(session_token, messages[-WorkingMemory.MAX_MESSAGES:])
+        return "filled" if saved else "empty"
+    
     @staticmethod
     async def get_recent_messages(session_token: str, limit: int = None, access_token: str = None) -> List[Dict[str, Any]]:
         """
@@ -310,6 +400,7 @@ class WorkingMemory:
         try:
             cache_key = f"{WorkingMemory.MEMORY_PREFIX}{session_token}"
             result = await redis.redis_client.delete(cache_key)
+            await redis.redis_client.delete(f"{WorkingMemory.SUMMARY_PREFIX}{session_token}")
             
             if result:
                 logger.info(f"🗑️ 短期记忆已清空 | session={session_token[:20]}...")
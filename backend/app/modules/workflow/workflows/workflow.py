@@ -1,6 +1,8 @@
 from langgraph.graph import END  # type: ignore
-from app.modules.workflow.core.graph import WorkflowGraphBuilder
-from app.modules.workflow.core.state import WorkflowState, format_workflow_state
+from app.modules.workflow.core.graph import WorkflowGraphBuilder, parse_node_budgets
+from app.modules.workflow.core.checkpointer import checkpointer
+from app.modules.workflow.core import artifacts
+from app.modules.workflow.core.state import NODE_CHANNELS, WorkflowState, format_workflow_state
 from app.modules.workflow.nodes.Intent_recognition import detect_intent
 from app.modules.workflow.nodes.llm_answer import async_llm_stream_answer_node
 from app.modules.workflow.nodes.ticket_analysis import async_ticket_analysis_node, async_ask_user_confirmation_node, async_keyword_check_node
@@ -9,10 +11,16 @@ from app.modules.workflow.nodes.user_info import async_user_info_node  # 异步
 from app.modules.workflow.nodes.chromadb_node import get_similar_messages_node, save_memory_node  # ChromaDB 记忆节点 
 from app.modules.workflow.nodes.database_node import save_database_node  # MySQL 数据库节点
 from app.modules.workflow.nodes.working_memory import working_memory  # Working Memory 短期记忆节点
+from app.modules.workflow.nodes.summary_memory import summary_memory, format_messages  # 早期对话滚动摘要
 from app.modules.workflow.nodes.feedback_node import async_feedback_node  # 用户反馈节点
+from app.modules.workflow.nodes.context_merge import merge_context_node, working_memory_keys  # 上下文合并节点
 # from app.utils.greeting import check_and_respond_greeting, stream_greeting_response  # 问候语检测和回复（暂时禁用）
+from app.core import deadline
+from app.core.config import settings
+from app.core.metrics import metrics
 from typing import Dict, Any, Optional
 from lmnr import observe, Laminar
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,15 +31,14 @@ async def intent_recognition_node(state: WorkflowState) -> Dict[str, Any]:
     """意图识别节点 - 基于用户输入分析意图"""
     logger.info("========== 意图识别节点开始 ===========")
     
-    # 🐛 [DEBUG] 打印完整 State 信息
-    logger.info("=" * 60)
-    logger.info("🐛 [intent_recognition] FULL STATE DUMP:")
-    try:
-        import json
-        logger.info(json.dumps(format_workflow_state(state), ensure_ascii=False, indent=2, default=str))
-    except Exception:
-        logger.info(state)
-    logger.info("=" * 60)
+    # 🐛 [DEBUG] 打印完整 State 信息（仅 DEBUG 级别，避免每轮序列化整个状态）
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🐛 [intent_recognition] FULL STATE DUMP:")
+        try:
+            import json
+            logger.debug(json.dumps(format_workflow_state(state), ensure_ascii=False, indent=2, default=str))
+        except Exception:
+            logger.debug(state)
     
     try:
         user_input = state.get("user_input", "")
@@ -48,6 +55,7 @@ async def intent_recognition_node(state: WorkflowState) -> Dict[str, Any]:
         )
         
         logger.info(f"✅ 意图识别完成: {intent} (置信度: {confidence:.2f})")
+        logger.debug(f"意图得分: {all_scores}")
         if len(intents) > 1:
             logger.info(f"🔀 检测到混合意图: {intents}")
         
@@ -55,7 +63,6 @@ async def intent_recognition_node(state: WorkflowState) -> Dict[str, Any]:
         result = {
             "intent": intent,
             "intent_confidence": confidence,
-            "intent_scores": all_scores,
             "intents": intents
         }
 
@@ -76,7 +83,6 @@ async def intent_recognition_node(state: WorkflowState) -> Dict[str, Any]:
         return {
             "intent": "日常对话",
             "intent_confidence": 0.0,
-            "intent_scores": {},
             "intents": [],
             "error": error_msg
         }
@@ -84,39 +90,40 @@ async def intent_recognition_node(state: WorkflowState) -> Dict[str, Any]:
 
 @observe(name="get_working_memory_node", tags=["node", "memory", "redis"])
 async def get_working_memory_node(state: WorkflowState) -> Dict[str, Any]:
-    """获取 Working Memory 节点 - 从 Redis 获取最近10轮对话"""
+    """获取 Working Memory 节点 - 早期对话摘要 + 最近几轮原文"""
+    empty = {"working_memory_text": "", "working_memory_summary": "", "working_memory_count": 0, "working_memory_keys": []}
     try:
         conversation_id = state.get("conversation_id")  # 改为使用 conversation_id
         access_token = state.get("access_token")  # 获取 access_token
         
         if not conversation_id:
-            return {"working_memory_text": "", "working_memory_count": 0}
+            return empty
         
         # 获取最近10轮对话（20条消息）
         # 传入 access_token 以支持 Redis 过期时的 API 回退机制
         messages = await working_memory.get_messages(conversation_id, access_token)
         
         if not messages:
-            return {"working_memory_text": "", "working_memory_count": 0}
-        
-        # 格式化为文本
-        memory_lines = []
-        for msg in messages:
-            role = msg.get("role", "unknown")
-            content = msg.get("content", "")
-            role_name = "用户" if role == "user" else "安然" if role == "assistant" else role
-            memory_lines.append(f"{role_name}：{content}")
+            return empty
         
-        memory_text = "\n".join(memory_lines)
-        logger.info(f"✅ Working Memory 获取完成，共 {len(messages)} 条消息（conversation_id={conversation_id[:20]}...）")
+        # 已合并进摘要的早期轮次不再以原文进入 Prompt（长对话的 Prompt 体积基本恒定）
+        summary, raw_messages = await summary_memory.render(conversation_id, messages)
+        memory_text = format_messages(raw_messages)
+        metrics.observe("working_memory.prompt_chars", len(summary) + len(memory_text))
+        logger.info(
+            f"✅ Working Memory 获取完成，共 {len(messages)} 条消息，原文 {len(raw_messages)} 条"
+            f"{'，含早期摘要' if summary else ''}（conversation_id={conversation_id[:20]}...）"
+        )
         
         return {
             "working_memory_text": memory_text,
-            "working_memory_count": len(messages)
+            "working_memory_summary": summary,
+            "working_memory_count": len(messages),
+            "working_memory_keys": working_memory_keys(messages)  # 供 merge_context 去重（含已摘要的轮次）
         }
     except Exception as e:
         logger.error(f"获取 Working Memory 失败: {e}", exc_info=True)
-        return {"working_memory_text": "", "working_memory_count": 0}
+        return empty
 
 
 @observe(name="save_working_memory_node", tags=["node", "memory", "redis", "storage"])
@@ -171,6 +178,8 @@ async def save_to_working_memory_node(state: WorkflowState) -> Dict[str, Any]:
             )
         
         logger.info(f"✅ Working Memory 保存完成（conversation_id={conversation_id[:20]}...）")
+        # 后台把滑出近期窗口的轮次合并进摘要（不阻塞本轮响应）
+        summary_memory.schedule(conversation_id)
         return {"working_memory_saved": True}
     except Exception as e:
         logger.error(f"保存到 Working Memory 失败: {e}", exc_info=True)
@@ -182,35 +191,47 @@ def create_chat_workflow():
     logger.info("正在创建对话工作流...")
     
     # 1. 创建图构建器
-    builder = WorkflowGraphBuilder(state_schema=WorkflowState)
+    builder = WorkflowGraphBuilder(state_schema=WorkflowState, channels=NODE_CHANNELS)
+    budgets = parse_node_budgets(settings.WORKFLOW_NODE_BUDGETS)
     
     # 2. 添加节点（按执行顺序）
+    # 相似记忆与反馈趋势只用于增强上下文：超出时限时降级为空结果，不阻塞意图识别
     builder.add_node("user_info", async_user_info_node)                    # 第1步：获取用户画像
     builder.add_node("get_working_memory", get_working_memory_node)        # 第2步：获取 Working Memory（Redis 10轮对话）
-    builder.add_node("get_similar_messages", get_similar_messages_node)    # 第3步：获取 ChromaDB 相似记忆（RAG）
-    builder.add_node("get_feedback", async_feedback_node)                  # 第3步（并行）：获取用户反馈趋势
+    builder.add_node(                                                      # 第3步：获取 ChromaDB 相似记忆（RAG）
+        "get_similar_messages", get_similar_messages_node,
+        budget=budgets.get("get_similar_messages"), optional=True,
+        fallback={"similar_memories_ref": "", "similar_message_count": 0}
+    )
+    builder.add_node(                                                      # 第3步（并行）：获取用户反馈趋势
+        "get_feedback", async_feedback_node,
+        budget=budgets.get("get_feedback"), optional=True,
+        fallback={"feedback_summary": ""}
+    )
+    builder.add_node("merge_context", merge_context_node)                  # 第3步（汇聚）：相似记忆与 Working Memory 去重
     builder.add_node("intent_recognition", intent_recognition_node)        # 第4步：意图识别
     builder.add_node("keyword_check", async_keyword_check_node)            # 第5步：关键词快速检测（串行，在分析前）
     builder.add_node("ticket_analysis", async_ticket_analysis_node)        # 第5步（分支A）：常规工单分析
     builder.add_node("ticket_summary", async_ticket_summary_node)          # 第5步（分支B）：快速通道总结
     builder.add_node("llm_answer", async_llm_stream_answer_node)          # 第5步：LLM回答（并行）
     builder.add_node("ask_user_confirmation", async_ask_user_confirmation_node) # 第6步：工单确认
-    builder.add_node("save_working_memory", save_to_working_memory_node)  # 第7步：保存到 Working Memory
-    builder.add_node("save_memory", save_memory_node)                     # 第8步：保存到 ChromaDB
-    builder.add_node("save_database", save_database_node)                 # 第9步：保存到 MySQL
+    builder.add_node("save_working_memory", save_to_working_memory_node, persist=True)  # 第7步：保存到 Working Memory
+    builder.add_node("save_memory", save_memory_node, persist=True)                     # 第8步：保存到 ChromaDB
+    builder.add_node("save_database", save_database_node, persist=True)                 # 第9步：保存到 MySQL
     
     # 3. 设置入口节点
     builder.set_entry_point("user_info")  # 从用户信息获取开始
     
     # 4. 添加边（连接节点）
-    # 并行流程：用户信息 → (Working Memory + ChromaDB记忆 + 反馈趋势 并行) → 意图识别 → (工单分析 + LLM对话 并行) → 工单确认 → 保存Working Memory → (ChromaDB + MySQL 并行保存) → 结束
+    # 并行流程：用户信息 → (Working Memory + ChromaDB记忆 + 反馈趋势 并行) → 上下文合并 → 意图识别 → (工单分析 + LLM对话 并行) → 工单确认 → 保存Working Memory → (ChromaDB + MySQL 并行保存) → 结束
     builder.add_edge("user_info", "get_working_memory")           # 用户信息 → Working Memory
     builder.add_edge("user_info", "get_similar_messages")         # 用户信息 → ChromaDB（并行）
     builder.add_edge("user_info", "get_feedback")                 # 用户信息 → 反馈趋势（并行）
     
-    builder.add_edge("get_working_memory", "intent_recognition")  # Working Memory → 意图识别
-    builder.add_edge("get_similar_messages", "intent_recognition") # ChromaDB → 意图识别（三路汇聚）
-    builder.add_edge("get_feedback", "intent_recognition")        # 反馈趋势 → 意图识别（三路汇聚）
+    builder.add_edge("get_working_memory", "merge_context")       # Working Memory → 上下文合并
+    builder.add_edge("get_similar_messages", "merge_context")     # ChromaDB → 上下文合并（三路汇聚）
+    builder.add_edge("get_feedback", "merge_context")             # 反馈趋势 → 上下文合并（三路汇聚）
+    builder.add_edge("merge_context", "intent_recognition")       # 上下文合并 → 意图识别
     
     # 意图识别后，并行执行工单分析和 LLM 回答
     builder.add_edge("intent_recognition", "keyword_check")       # 意图识别 → 关键词检测
@@ -262,16 +283,124 @@ def create_chat_workflow():
     # 5. 验证图结构
     builder.validate()
     
-    # 6. 编译图
-    workflow = builder.compile()
+    # 6. 编译图（Redis 检查点按 conversation_id 保存最近一轮状态，用于工单确认轮次恢复）
+    workflow = builder.compile(checkpointer=checkpointer)
     
     logger.info("✅ 对话工作流创建完成 (Updated)")
-    logger.info("工作流结构：用户信息 → [Working Memory + ChromaDB + 反馈趋势] → 意图识别 → [工单分析 + LLM对话] → 工单确认 → 保存Working Memory → [ChromaDB + MySQL] → 结束")
+    logger.info("工作流结构：用户信息 → [Working Memory + ChromaDB + 反馈趋势] → 上下文合并 → 意图识别 → [工单分析 + LLM对话] → 工单确认 → 保存Working Memory → [ChromaDB + MySQL] → 结束")
     
     return workflow
 
 
-# 全局工作流实例（懒加载）
+def extract_cache_read_tokens(output) -> int:
+    """从 LLM 输出中提取前缀缓存命中的 token 数
+    
+    - 标准字段：usage_metadata.input_token_details.cache_read（OpenAI 兼容的 prompt_tokens_details.cached_tokens）
+    - DeepSeek 非流式响应：response_metadata.token_usage.prompt_cache_hit_tokens
+    
+    Args:
+        output: on_chat_model_end 事件中的 AIMessage
+        
+    Returns:
+        缓存命中 token 数，无法获取时返回 0
+    """
+    usage = getattr(output, "usage_metadata", None) or {}
+    cache_read = (usage.get("input_token_details") or {}).get("cache_read")
+    if cache_read:
+        return cache_read
+    
+    response_metadata = getattr(output, "response_metadata", None) or {}
+    token_usage = response_metadata.get("token_usage") or {}
+    return token_usage.get("prompt_cache_hit_tokens") or 0
+
+
+# 客户端断开后的后台持久化任务（保持引用，避免被垃圾回收）
+_abandon_tasks = set()
+
+
+async def persist_abandoned_turn(state: Dict[str, Any], partial_answer: str, policy: str):
+    """客户端断开后的最小持久化
+
+    Args:
+        state: 断开时最近一步完成后的工作流状态
+        partial_answer: 已推送给客户端的部分回答
+        policy: none / working_memory（仅写入 Redis 短期记忆）/ all（同时写入 ChromaDB 与 MySQL）
+    """
+    if policy == "none" or not state.get("user_input"):
+        return
+
+    # 后台任务复制了请求上下文，截止时间此时通常已过，保存调用不再受其约束
+    deadline.set_deadline(None)
+    persist_state = dict(state)
+    persist_state["llm_response"] = state.get("llm_response") or partial_answer
+    try:
+        # 各保存节点自带去重标记检查，已完成的步骤会被跳过
+        await save_to_working_memory_node(persist_state)
+        if policy == "all":
+            persist_state.update(await save_memory_node(persist_state))
+            await save_database_node(persist_state)
+        logger.info(f"💾 已保存中断的对话（策略={policy}）")
+    except Exception as e:
+        logger.error(f"保存中断的对话失败: {e}", exc_info=True)
+
+
+def build_ticket_state_update(state: Dict[str, Any]) -> Dict[str, Any]:
+    """构建发送给前端的工单状态（[STATE] 消息），不需要创建工单时返回空字典"""
+    if not state.get("need_create_ticket"):
+        return {}
+    return {
+        "need_create_ticket": True,
+        "ticket_reason": state.get("ticket_reason", ""),
+        "problem_type": state.get("problem_type", ""),
+        "title": state.get("title", ""),
+        "facts": state.get("facts", ""),
+        "user_appeal": state.get("user_appeal", ""),
+        "company": state.get("company", ""),
+        "ticket_parent_category": state.get("ticket_parent_category", "")
+    }
+
+
+async def resume_ticket_confirmation(
+    config: Dict[str, Any],
+    user_confirmed_ticket: bool,
+    user_id: Optional[str] = None,
+    access_token: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """从检查点恢复工单确认轮次
+
+    以 ask_user_confirmation 节点的身份写入用户确认结果，然后只执行其后续节点
+    （保存节点已有去重标记，直接跳过），不再重新执行检索、意图识别、工单分析与 LLM 回答
+
+    Args:
+        config: 包含 thread_id（conversation_id）的工作流配置
+        user_confirmed_ticket: 用户确认结果
+        user_id: 当前请求的用户ID，须与检查点所属用户一致
+        access_token: 当前请求的 Access Token（检查点中不保存凭证，通过 configurable 传给保存节点）
+
+    Returns:
+        恢复后的最终状态；检查点不存在（已过期、Redis 不可用）、不属于当前用户或上一轮无需创建工单时返回 None
+    """
+    workflow = get_chat_workflow()
+    snapshot = await workflow.aget_state(config)
+    if not snapshot.values.get("need_create_ticket"):
+        return None
+    owner = snapshot.values.get("user_id")
+    if not owner or not user_id or str(owner) != str(user_id):
+        metrics.incr("chat.ticket_confirmation.owner_mismatch")
+        logger.warning(f"⚠️ 检查点不属于当前用户，拒绝恢复: thread_id={config['configurable']['thread_id']}")
+        return None
+
+    resume_config = {**config, "configurable": {**config["configurable"], "access_token": access_token}}
+    await workflow.aupdate_state(
+        resume_config, {"user_confirmed_ticket": user_confirmed_ticket}, as_node="ask_user_confirmation"
+    )
+    final_state = snapshot.values
+    async for final_state in workflow.astream(None, config=resume_config, stream_mode="values", durability="exit"):
+        pass
+    return final_state
+
+
+# 全局工作流实例（懒加载；生产环境由 preload 在 fork 前编译，各 worker 共享）
 _chat_workflow = None
 
 
@@ -283,9 +412,8 @@ def get_chat_workflow():
     """
     global _chat_workflow
     
-    # 临时强制重新创建（调试用）
-    logger.info("🔄 [调试] 强制重新创建 Workflow...")
-    _chat_workflow = create_chat_workflow()
+    if _chat_workflow is None:
+        _chat_workflow = create_chat_workflow()
     
     return _chat_workflow
 
@@ -298,7 +426,9 @@ async def run_chat_workflow_streaming(
     user_id: Optional[str] = None,
     username: Optional[str] = None,
     access_token: Optional[str] = None,  # 新增：Access Token
-    user_confirmed_ticket: Optional[bool] = None  # 用户确认创建工单
+    user_confirmed_ticket: Optional[bool] = None,  # 用户确认创建工单
+    session_data: Optional[Dict[str, Any]] = None,  # 鉴权时已读取的会话数据（含用户画像）
+    deadline_seconds: Optional[float] = None  # 本轮对话总时限（秒），默认读取 CHAT_REQUEST_DEADLINE
 ):
     """运行对话工作流（流式版本）
     
@@ -323,7 +453,6 @@ async def run_chat_workflow_streaming(
         # 意图识别初始为空（对话后才进行意图分析）
         "intent": "",
         "intent_confidence": 0.0,
-        "intent_scores": {},
         "intents": []
     }
     
@@ -333,6 +462,14 @@ async def run_chat_workflow_streaming(
     if access_token:
         initial_state["access_token"] = access_token  # 新增：传入 access_token
 
+    # 传入请求级用户画像，user_info 节点无需再读取 session
+    if session_data:
+        initial_state["user_profile"] = {
+            key: session_data[key]
+            for key in ("user_id", "company", "age", "gender")
+            if key in session_data
+        }
+
     # 如果用户确认了工单，设置 state
     if user_confirmed_ticket is not None:
         initial_state["user_confirmed_ticket"] = user_confirmed_ticket
@@ -352,6 +489,7 @@ async def run_chat_workflow_streaming(
     })
     
     config = {
+        "configurable": {"thread_id": conversation_id},
         "metadata": {
             "workflow": "chat_workflow",
             "message": user_input[:50] + "..." if len(user_input) > 50 else user_input,
@@ -360,90 +498,111 @@ async def run_chat_workflow_streaming(
             "username": username or "Unknown"
         }
     }
+
+    # 请求级截止时间：通过 contextvars 传递到各节点，约束节点时限及 HTTP / LLM 调用超时
+    # 客户端只能缩短服务端配置的时限；保存节点（persist=True）不受其约束
+    deadline.set_deadline(deadline.request_seconds(deadline_seconds, settings.CHAT_REQUEST_DEADLINE))
+
+    # 工单确认轮次：优先从上一轮的检查点恢复（毫秒级），检查点不可用时回退为完整执行
+    if user_confirmed_ticket is not None:
+        try:
+            resumed_state = await resume_ticket_confirmation(config, user_confirmed_ticket, user_id, access_token)
+        except Exception as e:
+            logger.warning(f"⚠️ 从检查点恢复工单确认失败，回退为完整执行: {e}")
+            resumed_state = None
+        if resumed_state is not None:
+            metrics.incr("chat.ticket_confirmation.resumed")
+            import json
+            # 用户拒绝时只回传确认结果，前端不再弹出工单确认
+            state_update = build_ticket_state_update(resumed_state) if user_confirmed_ticket else {}
+            state_update["user_confirmed_ticket"] = user_confirmed_ticket
+            yield f"[STATE] {json.dumps(state_update, ensure_ascii=False)}"
+            return
+        metrics.incr("chat.ticket_confirmation.full_run")
+    
+    # 本轮请求的旁路存储：大体积中间产物不进入状态，状态中只传递句柄
+    artifacts.open_scope()
+
+    # 新一轮对话：清除上一轮的检查点，避免未在本轮输入中出现的字段沿用上一轮的值
+    await checkpointer.adelete_thread(conversation_id)
     
     has_output = False
     total_input_tokens = 0
     total_output_tokens = 0
+    total_cache_read_tokens = 0  # 前缀缓存命中的输入 token
     event_count = 0  # 调试：统计事件数量
-    final_state = None  # 存储最终状态
+    final_state = None  # 存储最终状态（每步结束后更新）
+    answer_parts = []  # 已推送的回答片段（客户端断开时用于持久化）
+    stream_finished = False  # 工作流是否已执行完毕（之后断开只影响 [STATE] 等收尾消息的推送）
 
     try:
-        async for event in get_chat_workflow().astream_events(initial_state, config=config, version="v2"):
-            event_type = event.get("event")
+        # stream_mode="messages" 只推送 LLM 消息块（附带节点元数据与标签），
+        # stream_mode="values" 在每步结束后推送完整状态（最后一次即最终状态），
+        # 避免 astream_events 为所有节点和嵌套 runnable 生成并序列化事件
+        # durability="exit"：只在本轮结束时写一次检查点，而不是每个超步都写
+        async for mode, payload in get_chat_workflow().astream(
+            initial_state, config=config, stream_mode=["messages", "values"], durability="exit"
+        ):
             event_count += 1
             
-            # 每10个事件记录一次（避免日志过多）
-            if event_count % 10 == 0:
-                logger.debug(f"已处理 {event_count} 个事件，当前类型: {event_type}")
+            if mode == "values":
+                final_state = payload
+                continue
             
-            # 监听 LLM Token 使用情况
-            if event_type == "on_chat_model_end":
-                output = event.get("data", {}).get("output")
-                if output and hasattr(output, 'usage_metadata') and output.usage_metadata:
-                    usage = output.usage_metadata
-                    total_input_tokens += usage.get('input_tokens', 0)
-                    total_output_tokens += usage.get('output_tokens', 0)
-                    
-                    # 更新 Laminar Span 的 Token 统计
-                    Laminar.set_span_attributes({
-                        "llm.usage.input_tokens": total_input_tokens,
-                        "llm.usage.output_tokens": total_output_tokens,
-                        "llm.usage.total_tokens": total_input_tokens + total_output_tokens
-                    })
+            chunk, metadata = payload
             
-            # 尝试监听多种流式事件类型
-            if event_type in ["on_chat_model_stream", "on_llm_stream", "on_chain_stream"]:
-                # 检查事件信息
-                event_name = event.get("name", "")
-                event_tags = event.get("tags", [])
-
-                # 关键过滤：只输出带有 "answer_generator" 标签的事件（来自 llm_answer_node）
-                # 这样可以防止 ticket_summary_node 等其他节点的 LLM 调用结果泄露到前端
-                if "answer_generator" not in event_tags:
-                    continue
-
-                # 调试：打印事件信息
-                # logger.info(f"🔍 流式事件: name={event_name}, tags={event_tags}")
-
-                # 直接输出所有流式事件（因为 ticket_analysis 使用同步调用，不会产生流式事件）
-                chunk = event.get("data", {}).get("chunk")
-                if chunk and hasattr(chunk, "content"):
-                    content = chunk.content
-                    if content:
-                        has_output = True
-                        yield content
-
-            # 监听工作流结束事件，获取最终状态
-            if event_type == "on_chain_end" and event.get("name") == "LangGraph":
-                final_state = event.get("data", {}).get("output")
-                logger.info("✅ 捕获到工作流最终状态")
+            # 监听 LLM Token 使用情况（stream_usage=True 时最后一个消息块携带 usage）
+            usage = getattr(chunk, "usage_metadata", None)
+            if usage:
+                total_input_tokens += usage.get('input_tokens', 0)
+                total_output_tokens += usage.get('output_tokens', 0)
+                total_cache_read_tokens += extract_cache_read_tokens(chunk)
                 
-                # 🐛 [DEBUG] 打印最终 State 信息
-                logger.info("=" * 60)
-                logger.info("🐛 [workflow] FINAL STATE DUMP:")
+                # 更新 Laminar Span 的 Token 统计
+                Laminar.set_span_attributes({
+                    "llm.usage.input_tokens": total_input_tokens,
+                    "llm.usage.output_tokens": total_output_tokens,
+                    "llm.usage.total_tokens": total_input_tokens + total_output_tokens,
+                    "llm.usage.cache_read_input_tokens": total_cache_read_tokens
+                })
+            
+            # 关键过滤：只输出带有 "answer_generator" 标签的消息（来自 llm_answer_node）
+            # 这样可以防止 ticket_summary_node 等其他节点的 LLM 调用结果泄露到前端
+            if "answer_generator" not in (metadata.get("tags") or []):
+                continue
+            
+            content = getattr(chunk, "content", None)
+            if content and isinstance(content, str):
+                has_output = True
+                answer_parts.append(content)
+                yield content
+
+        stream_finished = True
+
+        if final_state:
+            logger.info("✅ 捕获到工作流最终状态")
+            
+            # 🐛 [DEBUG] 打印最终 State 信息（仅 DEBUG 级别）
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("🐛 [workflow] FINAL STATE DUMP:")
                 try:
                     import json
-                    logger.info(json.dumps(format_workflow_state(final_state), ensure_ascii=False, indent=2, default=str))
+                    logger.debug(json.dumps(format_workflow_state(final_state), ensure_ascii=False, indent=2, default=str))
                 except Exception:
-                    logger.info(final_state)
-                logger.info("=" * 60)
+                    logger.debug(final_state)
 
         logger.info(f"✅ 工作流完成: 事件数={event_count}, 流式输出={has_output}")
+        if total_input_tokens:
+            logger.info(
+                f"📊 Token 统计: 输入={total_input_tokens}, 输出={total_output_tokens}, "
+                f"缓存命中={total_cache_read_tokens} ({total_cache_read_tokens / total_input_tokens:.0%})"
+            )
 
         # 如果有最终状态，并且包含工单相关信息，通过 SSE 发送给前端
         if final_state:
             import json
-            state_update = {}
-            if final_state.get("need_create_ticket"):
-                state_update["need_create_ticket"] = True
-                state_update["ticket_reason"] = final_state.get("ticket_reason", "")
-                state_update["problem_type"] = final_state.get("problem_type", "")
-                state_update["title"] = final_state.get("title", "")
-                state_update["facts"] = final_state.get("facts", "")
-                state_update["user_appeal"] = final_state.get("user_appeal", "")
-                state_update["company"] = final_state.get("company", "")
-                state_update["ticket_parent_category"] = final_state.get("ticket_parent_category", "")
-                
+            state_update = build_ticket_state_update(final_state)
+            if state_update:
                 logger.info(f"📤 发送工单状态给前端: {state_update}")
                 yield f"[STATE] {json.dumps(state_update, ensure_ascii=False)}"
 
@@ -451,13 +610,33 @@ async def run_chat_workflow_streaming(
         if not has_output:
             logger.warning("⚠️ 未捕获到流式输出，使用兜底逻辑（不会重新执行工作流）")
 
-        # ❌ 不要重新执行工作流！只从已完成的状态中获取结果
-        # 这里的问题是：astream_events 已经执行完了工作流，只是没有 yield 出来
-        # 我们应该从最终状态获取结果，而不是再次 invoke
-
-        # 由于 astream_events 不返回最终状态，我们只能提示错误
-            yield "[提示] 流式输出异常，请重试"
+            # ❌ 不要重新执行工作流！只从已完成的最终状态中获取结果
+            if final_state and final_state.get("llm_response"):
+                yield final_state["llm_response"]
+            else:
+                yield "[提示] 流式输出异常，请重试"
+
+    except (asyncio.CancelledError, GeneratorExit):
+        # 客户端断开：工作流（含进行中的 LLM 与分析调用）随之取消，仅在后台执行最小持久化
+        # 回答已完整生成（或工作流已结束）时不属于中断的对话，按完整策略保存（保存节点已完成的步骤会被跳过）
+        last_state = final_state or initial_state
+        answer_completed = stream_finished or bool(last_state.get("llm_response"))
+        policy = "all" if answer_completed else settings.CHAT_ABANDON_PERSIST
+        metrics.incr("chat.abandoned_after_answer" if answer_completed else "chat.abandoned")
+        logger.warning(
+            f"🔌 客户端已断开，取消工作流: 已推送 {len(answer_parts)} 个片段，"
+            f"回答{'已完整生成' if answer_completed else '未完成'}"
+        )
+        task = asyncio.get_running_loop().create_task(persist_abandoned_turn(
+            last_state, "".join(answer_parts), policy
+        ))
+        _abandon_tasks.add(task)
+        task.add_done_callback(_abandon_tasks.discard)
+        raise
 
     except Exception as e:
         logger.error(f"流式工作流执行失败: {str(e)}", exc_info=True)
-        yield f"[错误] {str(e)}"
\ No newline at end of file
+        yield f"[错误] {str(e)}"
+
+    finally:
+        artifacts.close_scope()
\ No newline at end of file
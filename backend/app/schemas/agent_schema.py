@@ -8,6 +8,9 @@ class WorkflowChatRequest(BaseModel):
     user_input: str = Field(..., description="用户输入内容")
     conversation_id: str = Field(..., description="对话ID（用于存储和检索对话历史）")
     user_confirmed_ticket: Optional[bool] = Field(default=None, description="用户是否确认创建工单")
+    stream_flush_ms: Optional[int] = Field(default=None, ge=0, le=200, description="SSE 帧合并时间窗口（毫秒，0 表示逐 token 发送，默认读取服务端配置）")
+    stream_flush_bytes: Optional[int] = Field(default=None, ge=1, le=65536, description="SSE 单帧最大缓冲字节数（默认读取服务端配置）")
+    deadline_seconds: Optional[float] = Field(default=None, ge=1, le=120, description="本轮对话愿意等待的总时长（秒），只能缩短服务端配置的时限，可选上下文超时将被跳过（默认读取服务端配置）")
 
 
 class HistoryResponse(BaseModel):
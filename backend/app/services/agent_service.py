@@ -199,9 +199,11 @@ class AgentService:
                     # 使用之前提取的新用户消息（避免提取到历史消息）
                     logger.info(f"保存新对话: user={new_user_message[:30]}..., ai={ai_response[:30]}...")
                     
-                    # 追加用户消息和 AI 回复，传入真实的 session_token
-                    await redis_service.append_message(user_id, actual_session_token or "", "user", new_user_message)
-                    await redis_service.append_message(user_id, actual_session_token or "", "assistant", ai_response)
+                    # 追加用户消息和 AI 回复（一次 pipeline 写入），传入真实的 session_token
+                    await redis_service.append_messages(user_id, actual_session_token or "", [
+                        {"role": "user", "content": new_user_message},
+                        {"role": "assistant", "content": ai_response}
+                    ])
                     logger.info(f"✅ 对话历史已保存: user_id={user_id}, session_token={actual_session_token}, 用户消息长度={len(new_user_message)}, AI回复长度={len(ai_response)}")
                 except Exception as e:
                     logger.error(f"保存对话历史失败: {str(e)}")
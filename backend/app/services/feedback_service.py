@@ -9,7 +9,11 @@ import httpx
 import logging
 import json
 from typing import Optional, Dict, Any, List
+from redis.exceptions import WatchError
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.initialize import redis
+from app.initialize import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +25,95 @@ class FeedbackService:
         # 读取现有的 Golang 后端地址配置，不新增 BASE_URL
         # 若未配置则回退到本地默认地址
         self.base_url = getattr(settings, "GOLANG_API_BASE_URL", "http://localhost:8888")
-        self.timeout = 10.0
+
+    # 反馈摘要缓存（Redis Hash：feedback_summary:{user_id}，字段为查询天数，值为格式化后的摘要文本）
+    SUMMARY_CACHE_PREFIX = "feedback_summary:"
+    # 反馈摘要版本号（提交反馈时递增）：写缓存前检查版本未变，避免失效前读取的旧摘要在失效后被写回
+    SUMMARY_GENERATION_PREFIX = "feedback_summary_gen:"
+
+    def _summary_cache_key(self, user_id: str) -> str:
+        return f"{self.SUMMARY_CACHE_PREFIX}{user_id}"
+
+    def _summary_generation_key(self, user_id: str) -> str:
+        return f"{self.SUMMARY_GENERATION_PREFIX}{user_id}"
+
+    async def get_cached_summary(self, user_id: str, days: int, count: bool = True) -> Optional[str]:
+        """读取缓存的反馈摘要文本，未命中返回 None（count=False 时不计入命中率，供预热检查使用）"""
+        if not redis.redis_client or not user_id:
+            return None
+        try:
+            text = await redis.redis_client.hget(self._summary_cache_key(user_id), str(days))
+        except Exception as e:
+            logger.warning(f"⚠️ 读取反馈摘要缓存失败: {e}")
+            return None
+        if count:
+            metrics.incr("feedback_summary_cache.hit" if text is not None else "feedback_summary_cache.miss")
+        return text
+
+    async def get_summary_generation(self, user_id: str) -> Optional[str]:
+        """读取反馈摘要版本号（在获取反馈统计之前调用，写缓存时传回），读取失败返回 None"""
+        if not redis.redis_client or not user_id:
+            return None
+        try:
+            return await redis.redis_client.get(self._summary_generation_key(user_id)) or "0"
+        except Exception as e:
+            logger.warning(f"⚠️ 读取反馈摘要版本失败: {e}")
+            return None
+
+    async def set_cached_summary(
+        self,
+        user_id: str,
+        days: int,
+        text: str,
+        ttl: int,
+        generation: Optional[str]
+    ) -> bool:
+        """写入反馈摘要文本缓存
+
+        版本号与 generation 不一致（读取统计之后用户提交了反馈）时放弃写入。
+
+        Returns:
+            是否写入
+        """
+        if not redis.redis_client or not user_id or generation is None:
+            return False
+        generation_key = self._summary_generation_key(user_id)
+        try:
+            key = self._summary_cache_key(user_id)
+            async with redis.redis_client.pipeline(transaction=True) as pipe:
+                # WATCH 保证检查版本与写入之间没有并发的失效
+                await pipe.watch(generation_key)
+                if (await pipe.get(generation_key) or "0") != generation:
+                    metrics.incr("feedback_summary_cache.stale_write")
+                    logger.info(f"⏭️ 反馈摘要已失效，放弃写入旧摘要: user_id={user_id}")
+                    return False
+                pipe.multi()
+                pipe.hset(key, str(days), text)
+                pipe.expire(key, ttl)
+                await pipe.execute()
+            return True
+        except WatchError:
+            metrics.incr("feedback_summary_cache.stale_write")
+            logger.info(f"⏭️ 反馈摘要写入期间已失效，放弃写入: user_id={user_id}")
+            return False
+        except Exception as e:
+            logger.warning(f"⚠️ 写入反馈摘要缓存失败: {e}")
+            return False
+
+    async def invalidate_summary_cache(self, user_id: str) -> None:
+        """清除用户所有时间窗口的反馈摘要缓存，并递增版本号使进行中的旧摘要写入失效"""
+        if not redis.redis_client or not user_id:
+            return
+        try:
+            generation_key = self._summary_generation_key(user_id)
+            async with redis.redis_client.pipeline(transaction=True) as pipe:
+                pipe.incrby(generation_key, 1)
+                pipe.expire(generation_key, max(settings.FEEDBACK_SUMMARY_CACHE_TTL, settings.REDIS_TTL))
+                pipe.delete(self._summary_cache_key(user_id))
+                await pipe.execute()
+            logger.info(f"🗑️ 已清除反馈摘要缓存: user_id={user_id}")
+        except Exception as e:
+            logger.warning(f"⚠️ 清除反馈摘要缓存失败: {e}")
 
     def _parse_response(self, response: httpx.Response) -> Dict[str, Any]:
         """解析后端响应，容忍非标准 JSON 文本。"""
@@ -95,7 +187,7 @@ class FeedbackService:
             )
             logger.debug(f"📦 发送JSON: {payload_json}")
 
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_client.shared_client() as client:
                 response = await client.post(url, content=payload_json, headers=headers)
                 result = self._parse_response(response)
 
@@ -103,6 +195,8 @@ class FeedbackService:
                     logger.info(
                         f"✅ 反馈创建成功 | conversation_id={conversation_id}, user_id={user_id}"
                     )
+                    # 反馈趋势已变化，清除该用户的反馈摘要缓存
+                    await self.invalidate_summary_cache(user_id)
                 else:
                     logger.error(f"❌ 反馈创建失败: {result}")
                 return result
@@ -137,7 +231,7 @@ class FeedbackService:
 
             logger.info(f"🧾 [反馈服务] 查询反馈总结(GET): days={days}")
 
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_client.shared_client() as client:
                 response = await client.get(url, params=params, headers=headers)
                 result = self._parse_response(response)
 
@@ -188,7 +282,7 @@ class FeedbackService:
                 f"🧾 [反馈服务] 按会话查询反馈(GET): conversationId={conversation_id}"
             )
 
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_client.shared_client() as client:
                 response = await client.get(url, params=params, headers=headers)
                 result = self._parse_response(response)
 
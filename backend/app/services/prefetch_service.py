@@ -0,0 +1,163 @@
+"""
+会话预热服务 - 在首条消息之前异步填充对话所需的缓存
+- /api/agent/init：用户画像、反馈摘要、志愿者服务分类
+- 打开对话（获取对话历史）：以上内容 + 该对话的 Working Memory（直接使用已取得的历史，无需再次请求）
+
+同一用户 / 对话在 PREFETCH_DEDUP_TTL 内只预热一次：进程内按进行中的任务去重，
+多 worker 之间通过 Redis SET NX 去重（Redis 不可用时仅进程内去重）。
+预热结果记录为 prefetch.{资源}.{warm|filled|empty|error} 指标；首条消息的实际命中情况
+见各缓存自身的命中指标（feedback_summary_cache.*、service_categories_cache.*、working_memory.*、user_profile.*）。
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.session_token import cache_profile, get_cached_profile
+from app.initialize import redis
+from app.modules.workflow.nodes.feedback_node import refresh_feedback_summary
+from app.modules.workflow.nodes.working_memory import WorkingMemory
+from app.services.feedback_service import feedback_service
+from app.services.ticket_service import ticket_service
+
+logger = logging.getLogger(__name__)
+
+
+class SessionPrefetchService:
+    """会话预热服务"""
+
+    DEDUP_PREFIX = "prefetch:"
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def _profile_from_user(user: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """从 Golang 验证结果（/init）或会话数据中提取用户画像"""
+        user_id = str(user.get("user_id") or user.get("appUserId") or "")
+        company = user.get("company") or user.get("companyName")
+        if not user_id or user_id in ("0", "unknown") or not company:
+            return None
+        return {
+            "user_id": user_id,
+            "company": company,
+            "age": str(user.get("age", "未知")),
+            "gender": user.get("gender", "未知")
+        }
+
+    async def _acquire(self, scope: str) -> bool:
+        """跨 worker 去重：同一 scope 在去重窗口内只预热一次"""
+        if not redis.redis_client:
+            return True
+        try:
+            acquired = await redis.redis_client.set(
+                f"{self.DEDUP_PREFIX}{scope}", "1", ex=settings.PREFETCH_DEDUP_TTL, nx=True
+            )
+            return bool(acquired)
+        except Exception as e:
+            logger.warning(f"⚠️ 预热去重检查失败，继续预热: {e}")
+            return True
+
+    def schedule(
+        self,
+        user: Dict[str, Any],
+        access_token: Optional[str],
+        conversation_id: Optional[str] = None,
+        history: Optional[List[Dict[str, Any]]] = None
+    ) -> None:
+        """异步触发预热（立即返回，不阻塞接口响应）
+
+        Args:
+            user: Golang 验证结果或会话数据（用于提取 user_id 与画像）
+            access_token: 调用 Golang API 的 Token
+            conversation_id: 打开的对话 ID（可选，预热该对话的 Working Memory）
+            history: 调用方已取得的对话历史（可选，直接写入 Working Memory）
+        """
+        if not settings.PREFETCH_ENABLED or not access_token:
+            return
+        profile = self._profile_from_user(user)
+        user_id = profile["user_id"] if profile else str(user.get("user_id") or user.get("appUserId") or "")
+        if not user_id:
+            return
+        scopes = [f"user:{user_id}"]
+        if conversation_id:
+            scopes.append(f"conv:{conversation_id}")
+        for scope in scopes:
+            self._start(scope, user_id, profile, access_token, conversation_id, history)
+
+    def _start(self, scope: str, *args) -> None:
+        if scope in self._inflight:
+            metrics.incr("prefetch.deduped")
+            return
+
+        async def guarded():
+            if not await self._acquire(scope):
+                metrics.incr("prefetch.deduped")
+                return
+            metrics.incr("prefetch.scheduled")
+            await self._run(scope, *args)
+
+        task = asyncio.create_task(guarded())
+        self._inflight[scope] = task
+        task.add_done_callback(lambda _: self._inflight.pop(scope, None))
+
+    async def _run(
+        self,
+        scope: str,
+        user_id: str,
+        profile: Optional[Dict[str, Any]],
+        access_token: str,
+        conversation_id: Optional[str],
+        history: Optional[List[Dict[str, Any]]]
+    ) -> None:
+        started = time.perf_counter()
+        if scope.startswith("conv:"):
+            jobs = {"working_memory": self._warm_working_memory(conversation_id, access_token, history)}
+        else:
+            jobs = {
+                "profile": self._warm_profile(user_id, profile),
+                "feedback_summary": self._warm_feedback_summary(user_id, access_token),
+                "service_categories": self._warm_service_categories(access_token),
+            }
+        results = await asyncio.gather(*jobs.values(), return_exceptions=True)
+        outcome = {}
+        for name, result in zip(jobs, results):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ 预热 {name} 失败: {result}")
+                result = "error"
+            outcome[name] = result
+            metrics.incr(f"prefetch.{name}.{result}")
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        metrics.observe("prefetch.ms", elapsed_ms)
+        logger.info(f"🔥 会话预热完成 [{scope}] {outcome} 耗时 {elapsed_ms:.0f}ms")
+
+    async def _warm_profile(self, user_id: str, profile: Optional[Dict[str, Any]]) -> str:
+        if await get_cached_profile(user_id):
+            return "warm"
+        if not profile:
+            return "empty"
+        await cache_profile(user_id, profile)
+        return "filled"
+
+    async def _warm_feedback_summary(self, user_id: str, access_token: str) -> str:
+        days = settings.FEEDBACK_TREND_DEFAULT_DAYS
+        if await feedback_service.get_cached_summary(user_id, days, count=False) is not None:
+            return "warm"
+        await refresh_feedback_summary(user_id, access_token, days)
+        return "filled"
+
+    async def _warm_service_categories(self, access_token: str) -> str:
+        return "filled" if await ticket_service.warm_service_categories(access_token) else "warm"
+
+    async def _warm_working_memory(
+        self,
+        conversation_id: str,
+        access_token: str,
+        history: Optional[List[Dict[str, Any]]]
+    ) -> str:
+        return await WorkingMemory.prefetch(conversation_id, access_token, history)
+
+
+# 全局实例
+prefetch_service = SessionPrefetchService()
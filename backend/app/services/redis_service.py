@@ -1,5 +1,7 @@
 # Redis 服务层 - 负责对话历史存储管理
 from typing import List, Dict, Optional, Any
+from redis.exceptions import ResponseError
+from app.core.config import settings
 from app.initialize import redis
 import json
 import uuid
@@ -10,18 +12,69 @@ logger = logging.getLogger(__name__)
 
 
 class RedisService:
-    """Redis 服务类 - 负责对话历史和会话元数据管理"""
+    """Redis 服务类 - 负责对话历史和会话元数据管理
+
+    存储结构（每个用户两个键，TTL 相同）：
+    - chat:history:{user_id}  List，每个元素为一条消息的 JSON，追加为 RPUSH + LTRIM（O(1)，长度封顶）
+    - chat:meta:{user_id}     Hash，会话元数据（conversation_id、conversation_count 等）
+
+    旧版本将元数据和全部消息存为一个 JSON 字符串，读取时兼容，写入时自动迁移为新结构
+    """
     
     # Redis 键前缀
     CHAT_HISTORY_PREFIX = "chat:history:"
+    CHAT_META_PREFIX = "chat:meta:"
     # 对话历史默认过期时间（秒）- 7天
     CHAT_HISTORY_TTL = 604800  # 7 * 24 * 60 * 60
     
-    async def get_chat_history(self, user_id: str) -> List[Dict[str, str]]:
+    @staticmethod
+    def _new_conversation_id() -> str:
+        return f"conv_{uuid.uuid4().hex[:12]}_{int(datetime.now().timestamp())}"
+    
+    @staticmethod
+    def _is_wrong_type(error: Exception) -> bool:
+        # pipeline 中的错误信息会带上命令序号前缀，因此不能用 startswith
+        return isinstance(error, ResponseError) and "WRONGTYPE" in str(error)
+    
+    async def _read_legacy(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """读取旧格式（单个 JSON 字符串）的对话历史，返回 {"metadata": ..., "messages": ...}"""
+        try:
+            cached_data = await redis.redis_client.get(f"{self.CHAT_HISTORY_PREFIX}{user_id}")
+        except ResponseError:
+            return None  # 已是新结构
+        if not cached_data:
+            return None
+        data = json.loads(cached_data)
+        if isinstance(data, list):
+            return {"metadata": {}, "messages": data}
+        if isinstance(data, dict):
+            return {"metadata": data.get("metadata", {}), "messages": data.get("messages", [])}
+        return None
+    
+    async def _migrate_legacy(self, user_id: str):
+        """将旧格式的对话历史迁移为 List + Hash 结构"""
+        legacy = await self._read_legacy(user_id)
+        history_key = f"{self.CHAT_HISTORY_PREFIX}{user_id}"
+        meta_key = f"{self.CHAT_META_PREFIX}{user_id}"
+        async with redis.redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(history_key)
+            if legacy:
+                messages = legacy["messages"][-settings.CHAT_HISTORY_MAX_MESSAGES:]
+                if messages:
+                    pipe.rpush(history_key, *[json.dumps(m, ensure_ascii=False) for m in messages])
+                    pipe.expire(history_key, self.CHAT_HISTORY_TTL)
+                if legacy["metadata"]:
+                    pipe.hset(meta_key, mapping={k: v for k, v in legacy["metadata"].items() if v is not None})
+                    pipe.expire(meta_key, self.CHAT_HISTORY_TTL)
+            await pipe.execute()
+        logger.info(f"🔄 [RedisService] 已迁移旧格式对话历史，用户ID: {user_id}")
+    
+    async def get_chat_history(self, user_id: str, limit: Optional[int] = None) -> List[Dict[str, str]]:
         """从 Redis 获取对话历史
         
         Args:
             user_id: 用户ID（作为 Redis 键）
+            limit: 只取最近 N 条，默认全部（最多 CHAT_HISTORY_MAX_MESSAGES 条）
             
         Returns:
             对话历史列表，格式 [{"role": "user", "content": "..."}, ...]
@@ -32,134 +85,109 @@ class RedisService:
         
         try:
             cache_key = f"{self.CHAT_HISTORY_PREFIX}{user_id}"
-            cached_data = await redis.redis_client.get(cache_key)
-            
-            if cached_data:
-                data = json.loads(cached_data)
-                # 兼容旧格式（直接是数组）和新格式（包含 metadata）
-                if isinstance(data, list):
-                    logger.info(f"从 Redis 加载对话历史（旧格式），用户ID: {user_id}, 消息数: {len(data)}")
-                    return data
-                elif isinstance(data, dict) and "messages" in data:
-                    messages = data["messages"]
-                    metadata = data.get("metadata", {})
-                    conv_count = metadata.get("conversation_count", 0)
-                    conv_id = metadata.get("conversation_id", "unknown")
-                    logger.info(f"从 Redis 加载对话历史，用户ID: {user_id}, 会话ID: {conv_id}, 对话轮次: {conv_count}, 消息数: {len(messages)}")
-                    return messages
-                else:
-                    logger.warning(f"对话历史格式异常，用户ID: {user_id}，返回空列表")
-                    return []
-            else:
-                logger.info(f"Redis 中无对话历史，用户ID: {user_id}，返回空列表")
-                return []
+            try:
+                items = await redis.redis_client.lrange(cache_key, -limit if limit else 0, -1)
+            except ResponseError as e:
+                if not self._is_wrong_type(e):
+                    raise
+                legacy = await self._read_legacy(user_id)
+                messages = legacy["messages"] if legacy else []
+                logger.info(f"从 Redis 加载对话历史（旧格式），用户ID: {user_id}, 消息数: {len(messages)}")
+                return messages[-limit:] if limit else messages
+            
+            messages = [json.loads(item) for item in items]
+            logger.info(f"从 Redis 加载对话历史，用户ID: {user_id}, 消息数: {len(messages)}")
+            return messages
         except Exception as e:
             logger.error(f"读取对话历史失败，用户ID: {user_id}, 错误: {str(e)}")
             return []
     
+    def _queue_metadata(self, pipe, user_id: str, new_conversation: bool):
+        """在 pipeline 中更新元数据（不存在时初始化，无需先读取）"""
+        meta_key = f"{self.CHAT_META_PREFIX}{user_id}"
+        now = datetime.now().isoformat()
+        if new_conversation:
+            pipe.hincrby(meta_key, "conversation_count", 1)
+            pipe.hset(meta_key, "conversation_id", self._new_conversation_id())
+        else:
+            pipe.hsetnx(meta_key, "conversation_count", 1)
+            pipe.hsetnx(meta_key, "conversation_id", self._new_conversation_id())
+        pipe.hsetnx(meta_key, "user_id", user_id)
+        pipe.hsetnx(meta_key, "started_at", now)
+        pipe.hset(meta_key, "last_updated", now)
+        pipe.expire(meta_key, self.CHAT_HISTORY_TTL)
+    
+    async def _write(self, user_id: str, messages: List[Dict[str, str]], new_conversation: bool, replace: bool):
+        history_key = f"{self.CHAT_HISTORY_PREFIX}{user_id}"
+        async with redis.redis_client.pipeline(transaction=True) as pipe:
+            if replace:
+                pipe.delete(history_key)
+            if messages:
+                pipe.rpush(history_key, *[json.dumps(m, ensure_ascii=False) for m in messages])
+                pipe.ltrim(history_key, -settings.CHAT_HISTORY_MAX_MESSAGES, -1)
+                pipe.expire(history_key, self.CHAT_HISTORY_TTL)
+            self._queue_metadata(pipe, user_id, new_conversation)
+            await pipe.execute()
+    
+    async def _write_with_migration(self, user_id: str, messages: List[Dict[str, str]], new_conversation: bool, replace: bool):
+        try:
+            await self._write(user_id, messages, new_conversation, replace)
+        except ResponseError as e:
+            # MULTI/EXEC 中单条命令出错不会回滚其余命令；WRONGTYPE 时 RPUSH 未生效，迁移后重写即可
+            if replace or not self._is_wrong_type(e):
+                raise
+            await self._migrate_legacy(user_id)
+            await self._write(user_id, messages, new_conversation, replace=False)
+    
     async def save_chat_history(self, user_id: str, session_id: str, messages: List[Dict[str, str]], increment_count: bool = False):
-        """保存对话历史到 Redis（以 user_id 为键）
+        """保存（整体替换）对话历史到 Redis（以 user_id 为键）
         
         Args:
             user_id: 用户ID（作为 Redis 键）
-            session_id: 会话ID（存储在 metadata 中）
-            messages: 对话历史列表
+            session_id: 会话ID（保留参数，兼容旧调用）
+            messages: 对话历史列表（超过 CHAT_HISTORY_MAX_MESSAGES 时只保留最近的消息）
             increment_count: 是否增加对话轮次计数
         """
-        logger.info(f"🔍 [RedisService] save_chat_history 被调用")
-        logger.info(f"🔍 [RedisService] user_id={user_id}, messages_count={len(messages)}")
-        
         if not redis.redis_client:
             logger.warning("⚠️ [RedisService] Redis 客户端未初始化，跳过历史保存")
             return
         
-        logger.info(f"✅ [RedisService] Redis 客户端已初始化")
-        
         try:
-            cache_key = f"{self.CHAT_HISTORY_PREFIX}{user_id}"
-            logger.info(f"🔑 [RedisService] 完整 Redis 键: {cache_key}")
-            
-            # 获取现有元数据（如果存在）
-            existing_data = await redis.redis_client.get(cache_key)
-            metadata = {}
-            
-            if existing_data:
-                logger.info(f"📚 [RedisService] 找到现有数据")
-                try:
-                    existing = json.loads(existing_data)
-                    if isinstance(existing, dict) and "metadata" in existing:
-                        metadata = existing["metadata"]
-                        logger.info(f"📚 [RedisService] 加载现有元数据: {metadata}")
-                except Exception as parse_error:
-                    logger.warning(f"⚠️ [RedisService] 解析现有数据失败: {parse_error}")
-            else:
-                logger.info(f"🆕 [RedisService] 未找到现有数据，将创建新记录")
-            
-            # 更新或初始化元数据
-            if not metadata:
-                # 首次创建
-                metadata = {
-                    "conversation_id": f"conv_{uuid.uuid4().hex[:12]}_{int(datetime.now().timestamp())}",
-                    "conversation_count": 1,
-                    "user_id": user_id,
-                    "started_at": datetime.now().isoformat(),
-                    "last_updated": datetime.now().isoformat()
-                }
-                logger.info(f"🆕 [RedisService] 首次创建对话历史，用户ID: {user_id}, 会话ID: {metadata['conversation_id']}")
-            else:
-                # 更新现有元数据
-                if increment_count:
-                    metadata["conversation_count"] = metadata.get("conversation_count", 0) + 1
-                    metadata["conversation_id"] = f"conv_{uuid.uuid4().hex[:12]}_{int(datetime.now().timestamp())}"
-                metadata["last_updated"] = datetime.now().isoformat()
-                logger.info(f"🔄 [RedisService] 更新元数据")
-            
-            # 构建新格式数据
-            data = {
-                "metadata": metadata,
-                "messages": messages
-            }
-            
-            logger.info(f"💾 [RedisService] 开始写入 Redis...")
-            await redis.redis_client.set(
-                cache_key,
-                json.dumps(data, ensure_ascii=False),
-                ex=self.CHAT_HISTORY_TTL
-            )
-            logger.info(f"✅ [RedisService] 对话历史已保存，用户ID: {user_id}, 会话ID: {metadata['conversation_id']}, 对话轮次: {metadata['conversation_count']}, 消息数: {len(messages)}")
-            
-            # 验证写入
-            verify_data = await redis.redis_client.get(cache_key)
-            if verify_data:
-                logger.info(f"✅ [RedisService] 验证成功：Redis 中确实存在该键")
-            else:
-                logger.error(f"❌ [RedisService] 验证失败：Redis 中未找到该键")
-                
+            await self._write_with_migration(user_id, messages, new_conversation=increment_count, replace=True)
+            logger.info(f"✅ [RedisService] 对话历史已保存，用户ID: {user_id}, 消息数: {len(messages)}")
         except Exception as e:
             logger.error(f"❌ [RedisService] 保存对话历史失败，用户ID: {user_id}, 错误: {str(e)}", exc_info=True)
     
+    async def append_messages(self, user_id: str, session_id: str, messages: List[Dict[str, str]], increment_count: bool = False):
+        """追加多条消息到对话历史（一次 pipeline 往返，不读取已有历史）
+        
+        Args:
+            user_id: 用户ID（作为 Redis 键）
+            session_id: 会话ID（保留参数，兼容旧调用）
+            messages: 消息列表，格式 [{"role": "user", "content": "..."}, ...]
+            increment_count: 是否增加对话轮次计数
+        """
+        if not redis.redis_client:
+            logger.warning("⚠️ [RedisService] Redis 客户端未初始化，跳过历史保存")
+            return
+        
+        try:
+            await self._write_with_migration(user_id, messages, new_conversation=increment_count, replace=False)
+            logger.info(f"✅ [RedisService] 已追加 {len(messages)} 条消息，用户ID: {user_id}")
+        except Exception as e:
+            logger.error(f"❌ [RedisService] 追加对话历史失败，用户ID: {user_id}, 错误: {str(e)}", exc_info=True)
+    
     async def append_message(self, user_id: str, session_id: str, role: str, content: str, increment_count: bool = False):
         """追加单条消息到对话历史
         
         Args:
             user_id: 用户ID（作为 Redis 键）
-            session_id: 会话ID（存储在 metadata 中）
+            session_id: 会话ID（保留参数，兼容旧调用）
             role: 消息角色 (user/assistant/system)
             content: 消息内容
             increment_count: 是否增加对话轮次计数
         """
-        logger.info(f"🔍 [RedisService] append_message 被调用")
-        logger.info(f"🔍 [RedisService] user_id={user_id}, role={role}, content_length={len(content)}")
-        logger.info(f"🔍 [RedisService] Redis 键: chat:history:{user_id}")
-        
-        history = await self.get_chat_history(user_id)
-        logger.info(f"🔍 [RedisService] 当前历史消息数: {len(history)}")
-        
-        history.append({"role": role, "content": content})
-        logger.info(f"🔍 [RedisService] 追加后消息数: {len(history)}")
-        
-        await self.save_chat_history(user_id, session_id, history, increment_count=increment_count)
-        logger.info(f"✅ [RedisService] append_message 完成")
+        await self.append_messages(user_id, session_id, [{"role": role, "content": content}], increment_count=increment_count)
     
     async def get_conversation_metadata(self, user_id: str) -> Optional[Dict[str, Any]]:
         """获取对话元数据（会话ID、对话轮次等）
@@ -168,72 +196,36 @@ class RedisService:
             user_id: 用户ID
             
         Returns:
-            元数据字典，包含 conversation_id, conversation_count, current_session_id 等
+            元数据字典，包含 conversation_id, conversation_count 等
         """
         if not redis.redis_client:
             return None
         
         try:
-            cache_key = f"{self.CHAT_HISTORY_PREFIX}{user_id}"
-            cached_data = await redis.redis_client.get(cache_key)
-            
-            if cached_data:
-                data = json.loads(cached_data)
-                if isinstance(data, dict) and "metadata" in data:
-                    return data["metadata"]
-            return None
+            metadata = await redis.redis_client.hgetall(f"{self.CHAT_META_PREFIX}{user_id}")
+            if metadata:
+                metadata["conversation_count"] = int(metadata.get("conversation_count", 0))
+                return metadata
+            legacy = await self._read_legacy(user_id)
+            return legacy["metadata"] if legacy and legacy["metadata"] else None
         except Exception as e:
             logger.error(f"获取对话元数据失败，用户ID: {user_id}, 错误: {str(e)}")
             return None
     
     async def start_new_conversation(self, user_id: str, session_id: str):
-        """开始新对话，增加 conversation_count 并生成新的 conversation_id
+        """开始新对话，增加 conversation_count 并生成新的 conversation_id（消息保留）
         
         Args:
             user_id: 用户ID（作为 Redis 键）
-            session_id: 会话ID（存储在 metadata 中）
+            session_id: 会话ID（保留参数，兼容旧调用）
         """
         if not redis.redis_client:
             logger.warning("Redis 客户端未初始化，跳过新对话")
             return
         
         try:
-            cache_key = f"{self.CHAT_HISTORY_PREFIX}{user_id}"
-            existing_data = await redis.redis_client.get(cache_key)
-            
-            messages = []
-            metadata = {}
-            
-            if existing_data:
-                data = json.loads(existing_data)
-                if isinstance(data, dict):
-                    messages = data.get("messages", [])
-                    metadata = data.get("metadata", {})
-                elif isinstance(data, list):
-                    messages = data
-            
-            # 生成新的 conversation_id 并增加计数
-            new_metadata = {
-                "conversation_id": f"conv_{uuid.uuid4().hex[:12]}_{int(datetime.now().timestamp())}",
-                "conversation_count": metadata.get("conversation_count", 0) + 1,
-                "user_id": user_id,
-                "started_at": metadata.get("started_at", datetime.now().isoformat()),
-                "last_updated": datetime.now().isoformat()
-            }
-            
-            # 保存更新后的数据
-            data = {
-                "metadata": new_metadata,
-                "messages": messages
-            }
-            
-            await redis.redis_client.set(
-                cache_key,
-                json.dumps(data, ensure_ascii=False),
-                ex=self.CHAT_HISTORY_TTL
-            )
-            
-            logger.info(f"开始新对话: 用户ID={user_id}, 会话ID={new_metadata['conversation_id']}, 轮次={new_metadata['conversation_count']}")
+            await self._write_with_migration(user_id, [], new_conversation=True, replace=False)
+            logger.info(f"开始新对话: 用户ID={user_id}")
         except Exception as e:
             logger.error(f"开始新对话失败，用户ID: {user_id}, 错误: {str(e)}")
     
@@ -248,8 +240,10 @@ class RedisService:
             return
         
         try:
-            cache_key = f"{self.CHAT_HISTORY_PREFIX}{user_id}"
-            await redis.redis_client.delete(cache_key)
+            await redis.redis_client.delete(
+                f"{self.CHAT_HISTORY_PREFIX}{user_id}",
+                f"{self.CHAT_META_PREFIX}{user_id}"
+            )
             logger.info(f"对话历史已清空: 用户ID={user_id}")
         except Exception as e:
             logger.error(f"清空对话历史失败，用户ID: {user_id}, 错误: {str(e)}")
@@ -1,18 +1,28 @@
 from typing import List, Optional, Dict, Any
-import httpx
+import json
 import logging
+import re
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.initialize import redis
 from app.schemas.ticket_schema import AppTicket
 from app.utils.prompt import TICKET_KEYWORDS
+from app.initialize import http_client
 
 logger = logging.getLogger(__name__)
 
+# 工单关键词预编译为单个正则（导入时编译，多 worker 部署时在 fork 前完成）
+# 绝大多数输入不含关键词，一次扫描即可排除，无需逐个关键词遍历全文
+TICKET_KEYWORD_PATTERN = re.compile("|".join(re.escape(k) for k in TICKET_KEYWORDS))
+
 class TicketService:
     """工单服务类 - 负责调用 Golang 后端工单接口"""
     
+    # 志愿者服务分类缓存（全局共享，与用户无关）
+    CATEGORIES_CACHE_KEY = "ticket:service_categories"
+    
     def __init__(self):
         self.base_url = settings.GOLANG_API_BASE_URL
-        self.timeout = 10.0
 
     def check_ticket_needed(self, text: str) -> List[str]:
         """
@@ -20,7 +30,7 @@ class TicketService:
         :param text: 用户输入文本
         :return: List[str] 匹配到的关键词列表，为空则表示不需要
         """
-        if not text:
+        if not text or not TICKET_KEYWORD_PATTERN.search(text):
             return []
             
         matched_keywords = []
@@ -44,7 +54,7 @@ class TicketService:
             payload = ticket_data.dict(exclude_none=True, by_alias=True)
             logger.info(f"Creating ticket with payload: {payload}")
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_client.shared_client() as client:
                 response = await client.post(url, json=payload, headers=headers)
                 
                 if response.status_code == 200:
@@ -81,7 +91,7 @@ class TicketService:
             params["conversationId"] = conversation_id
             
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_client.shared_client() as client:
                 response = await client.get(url, params=params, headers=headers)
                 
                 if response.status_code == 200:
@@ -105,7 +115,7 @@ class TicketService:
         params = {"id": ticket_id}
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_client.shared_client() as client:
                 response = await client.get(url, params=params, headers=headers)
                 
                 if response.status_code == 200:
@@ -123,8 +133,49 @@ class TicketService:
             
         return None
 
+    async def _get_cached_categories(self) -> Optional[Dict[str, Any]]:
+        if not redis.redis_client:
+            return None
+        try:
+            cached = await redis.redis_client.get(self.CATEGORIES_CACHE_KEY)
+            return json.loads(cached) if cached else None
+        except Exception as e:
+            logger.warning(f"⚠️ 读取服务分类缓存失败: {e}")
+            return None
+
+    async def _cache_categories(self, resp_json: Dict[str, Any]) -> None:
+        # 只缓存成功且非空的结果
+        if not redis.redis_client or resp_json.get("code") not in (0, 200) or not resp_json.get("data"):
+            return
+        try:
+            await redis.redis_client.set(
+                self.CATEGORIES_CACHE_KEY,
+                json.dumps(resp_json, ensure_ascii=False),
+                ex=settings.SERVICE_CATEGORIES_CACHE_TTL
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ 写入服务分类缓存失败: {e}")
+
     async def get_volunteer_service_categories(self, access_token: str) -> Dict[str, Any]:
-        """获取志愿者服务类型列表"""
+        """获取志愿者服务类型列表（优先读取缓存）"""
+        cached = await self._get_cached_categories()
+        if cached is not None:
+            metrics.incr("service_categories_cache.hit")
+            return cached
+        metrics.incr("service_categories_cache.miss")
+        resp_json = await self._fetch_volunteer_service_categories(access_token)
+        await self._cache_categories(resp_json)
+        return resp_json
+
+    async def warm_service_categories(self, access_token: str) -> bool:
+        """预热服务分类缓存（不计入命中率），已缓存时返回 False"""
+        if await self._get_cached_categories() is not None:
+            return False
+        await self._cache_categories(await self._fetch_volunteer_service_categories(access_token))
+        return True
+
+    async def _fetch_volunteer_service_categories(self, access_token: str) -> Dict[str, Any]:
+        """从 Golang 后端获取志愿者服务类型列表"""
         url = f"{self.base_url}/app/volunteer/getServiceCategories"
         
         headers = {
@@ -132,7 +183,7 @@ class TicketService:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_client.shared_client() as client:
                 response = await client.get(url, headers=headers)
                 
                 if response.status_code == 200:
@@ -161,7 +212,7 @@ class TicketService:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_client.shared_client() as client:
                 response = await client.post(url, json=payload, headers=headers)
                 
                 if response.status_code == 200:
@@ -11,6 +11,7 @@ from app.schemas.ticket_schema import AppTicket
 from app.services.ticket_service import ticket_service
 from app.services.redis_service import redis_service
 from app.utils.prompt import get_ticket_summary_prompt
+from app.initialize import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +28,6 @@ class TicketSummaryService:
             extra_body={"enable_thinking": False}  # 显式禁用 thinking，通过 extra_body 传递
         )
         self.base_url = settings.GOLANG_API_BASE_URL
-        self.timeout = 10.0
 
     async def get_volunteer_service_categories(self, access_token: str) -> Dict[str, Any]:
         """获取志愿者服务类型列表 (从后端接口获取)"""
@@ -36,7 +36,7 @@ class TicketSummaryService:
         
         try:
             import httpx
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_client.shared_client() as client:
                 response = await client.get(url, headers=headers)
                 
                 # 打印原始响应到控制台
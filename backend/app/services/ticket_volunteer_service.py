@@ -1,8 +1,8 @@
 from typing import Dict, Any, Optional
-import httpx
 import logging
 from app.core.config import settings
 from app.schemas.ticket_volunteer_schema import GetVolunteersRequest
+from app.initialize import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -11,7 +11,6 @@ class TicketVolunteerService:
     
     def __init__(self):
         self.base_url = settings.GOLANG_API_BASE_URL
-        self.timeout = 10.0
 
     async def get_volunteers_by_ticket_and_conversation(
         self, 
@@ -30,7 +29,7 @@ class TicketVolunteerService:
             payload = request_data.model_dump(exclude_none=True, by_alias=True)
             logger.info(f"Getting volunteers with payload: {payload}")
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_client.shared_client() as client:
                 response = await client.post(url, json=payload, headers=headers)
                 
                 if response.status_code == 200:
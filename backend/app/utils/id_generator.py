@@ -2,6 +2,8 @@
 ID 生成器工具
 用于生成唯一的 conversation_id、session_id 等标识符
 """
+import re
+import threading
 import uuid
 import time
 from typing import Optional
@@ -139,6 +141,122 @@ def generate_snowflake_like_id(worker_id: int = 1, datacenter_id: int = 1) -> in
     return snowflake_id
 
 
+class SnowflakeGenerator:
+    """
+    进程内雪花 ID 生成器（本地分配，无需远程校验）
+    
+    结构（64位整数）：
+    - 41位时间戳（毫秒，相对 EPOCH）
+    - 10位 worker ID（0-1023，由 Redis INCR 租约分配，保证各进程互不相同）
+    - 12位序列号（同一毫秒内递增，溢出时等待下一毫秒）
+    
+    只要 worker ID 在存活进程间唯一，生成的 ID 就全局唯一。
+    worker ID 带有效期（租约续约成功后延长），未分配或已过期时 available() 为 False，
+    此时 next_id 抛出 RuntimeError，避免与接手该 worker ID 的其他进程生成相同的 ID
+    """
+    
+    EPOCH = 1704067200000  # 2024-01-01 00:00:00 UTC（毫秒）
+    WORKER_BITS = 10
+    SEQUENCE_BITS = 12
+    MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+    MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+    
+    def __init__(self, worker_id: Optional[int] = 0):
+        self._lock = threading.Lock()
+        self._last_timestamp = -1
+        self._sequence = 0
+        self.worker_id: Optional[int] = None
+        self._valid_until: Optional[float] = None
+        if worker_id is not None:
+            self.set_worker_id(worker_id)
+    
+    def set_worker_id(self, worker_id: int, valid_until: Optional[float] = None) -> None:
+        """设置 worker ID（0-1023）
+
+        Args:
+            worker_id: worker ID
+            valid_until: 有效期截止时间（time.monotonic()），None 表示长期有效
+        """
+        if not 0 <= worker_id <= self.MAX_WORKER_ID:
+            raise ValueError(f"worker_id 超出范围: {worker_id}")
+        with self._lock:
+            self.worker_id = worker_id
+            self._valid_until = valid_until
+    
+    def extend(self, valid_until: float) -> None:
+        """延长当前 worker ID 的有效期（租约续约成功后调用）"""
+        with self._lock:
+            if self.worker_id is not None:
+                self._valid_until = valid_until
+    
+    def release(self) -> None:
+        """放弃当前 worker ID（租约丢失或释放后调用）"""
+        with self._lock:
+            self.worker_id = None
+            self._valid_until = None
+    
+    def available(self) -> bool:
+        """是否持有有效的 worker ID"""
+        return self.worker_id is not None and (self._valid_until is None or time.monotonic() < self._valid_until)
+    
+    def next_id(self) -> int:
+        """生成下一个雪花 ID（未持有有效的 worker ID 时抛出 RuntimeError）"""
+        with self._lock:
+            if self.worker_id is None or (self._valid_until is not None and time.monotonic() >= self._valid_until):
+                raise RuntimeError("雪花 worker ID 未分配或租约已过期")
+            timestamp = int(time.time() * 1000)
+            # 时钟回拨时沿用上一次的时间戳，保证单调递增
+            if timestamp < self._last_timestamp:
+                timestamp = self._last_timestamp
+            
+            if timestamp == self._last_timestamp:
+                self._sequence = (self._sequence + 1) & self.MAX_SEQUENCE
+                if self._sequence == 0:
+                    # 同一毫秒内序列号用尽，等待下一毫秒
+                    while timestamp <= self._last_timestamp:
+                        timestamp = int(time.time() * 1000)
+            else:
+                self._sequence = 0
+            
+            self._last_timestamp = timestamp
+            return (
+                ((timestamp - self.EPOCH) << (self.WORKER_BITS + self.SEQUENCE_BITS)) |
+                (self.worker_id << self.SEQUENCE_BITS) |
+                self._sequence
+            )
+
+
+# 全局雪花生成器（worker ID 在服务启动时通过 Redis 租约分配，分配前不可用）
+snowflake = SnowflakeGenerator(worker_id=None)
+
+
+def generate_snowflake_conversation_id(prefix: str = "conv") -> str:
+    """
+    基于雪花 ID 生成对话 ID（本地分配，全局唯一，无需远程可用性检查）
+    
+    格式：{prefix}_{snowflake十六进制}_{timestamp}
+    示例：conv_00a1b2c3d4e5f000_1704614400123
+    
+    特点：
+    - 与 generate_conversation_id 的三段式格式兼容（时间戳在最后一段）
+    - 生成耗时为微秒级
+    - 未持有有效的 worker ID（Redis 不可用、租约丢失）时回退为 generate_conversation_id（随机 UUID），
+      不使用可能与其他进程冲突的 worker ID
+    
+    Args:
+        prefix: ID 前缀，默认为 "conv"
+        
+    Returns:
+        str: 唯一的对话 ID
+    """
+    try:
+        snowflake_id = snowflake.next_id()
+    except RuntimeError:
+        return generate_conversation_id(prefix)
+    timestamp = (snowflake_id >> (SnowflakeGenerator.WORKER_BITS + SnowflakeGenerator.SEQUENCE_BITS)) + SnowflakeGenerator.EPOCH
+    return f"{prefix}_{snowflake_id:016x}_{timestamp}"
+
+
 def extract_timestamp_from_id(conversation_id: str) -> Optional[int]:
     """
     从 conversation_id 中提取时间戳
@@ -175,14 +293,23 @@ def extract_timestamp_from_id(conversation_id: str) -> Optional[int]:
         return None
 
 
+_CONVERSATION_ID_PATTERNS = (
+    re.compile(r"[0-9a-f]{12,16}_\d{13}"),
+    re.compile(r"\d{10}_[0-9a-f]{6}"),
+    re.compile(r"[0-9a-f]{32}"),
+)
+
+
 def is_valid_conversation_id(conversation_id: str, prefix: str = "conv") -> bool:
     """
-    验证 conversation_id 是否有效
+    验证 conversation_id 是否有效（纯语法检查，不访问远程服务）
     
     检查：
     - 是否包含指定前缀
-    - 是否包含足够的部分
-    - 格式是否正确
+    - 其余部分是否符合本模块生成器的格式：
+      * {prefix}_{hex}_{timestamp}（generate_conversation_id / generate_snowflake_conversation_id）
+      * {prefix}_{timestamp}_{hex}（generate_short_conversation_id）
+      * {prefix}_{uuid}（generate_uuid_conversation_id）
     
     Args:
         conversation_id: 对话 ID
@@ -197,11 +324,8 @@ def is_valid_conversation_id(conversation_id: str, prefix: str = "conv") -> bool
     if not conversation_id.startswith(f"{prefix}_"):
         return False
     
-    parts = conversation_id.split("_")
-    if len(parts) < 2:
-        return False
-    
-    return True
+    body = conversation_id[len(prefix) + 1:]
+    return any(pattern.fullmatch(body) for pattern in _CONVERSATION_ID_PATTERNS)
 
 
 # 默认使用的生成器（推荐）
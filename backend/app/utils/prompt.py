@@ -94,6 +94,7 @@ ANRAN_SYSTEM_PROMPT = """# 角色设定
 
 """
 
+# 旧版单字符串对话模板（用户画像穿插在前，不利于前缀缓存，仅保留兼容；新代码请使用 build_prompt_assembler）
 CONVERSATION_TEMPLATE = """{system_prompt}
 
 ---
@@ -393,6 +394,24 @@ JSON格式（单一意图返回1个，混合意图返回2个，按置信度从
 **重要**：置信度必须真实反映判断的确定性，如果不够确定，降低置信度或归为日常对话。
 """
 
+# 对话摘要 Prompt（滚动摘要记忆：把滑出近期窗口的对话合并进已有摘要）
+MEMORY_SUMMARY_PROMPT = """你是对话记录整理助手。下面是你与一位新就业形态劳动者的早期对话摘要，以及之后新增的几轮对话。
+请把新增对话合并进摘要，输出一份更新后的完整摘要。
+
+## 要求
+1. 只记录对话中明确出现的信息：用户的处境、遇到的问题、涉及的平台与时间金额等事实、情绪变化、诉求，以及安然已经给出的建议。
+2. 已经给出的建议要保留要点，便于后续避免重复。
+3. 不要推测、不要补充对话中没有的内容，不要写客套话。
+4. 用第三人称陈述（“用户……”“安然……”），不超过 {max_chars} 字。
+5. 直接输出摘要正文，不要标题和 Markdown 格式。
+
+## 已有摘要
+{summary}
+
+## 新增对话
+{dialogue}
+"""
+
 
 def get_system_prompt():
     """获取系统Prompt"""
@@ -419,6 +438,141 @@ def get_intent_recognition_prompt():
     return INTENT_RECOGNITION_PROMPT
 
 
+def get_memory_summary_prompt():
+    """获取对话摘要 Prompt 模板"""
+    return MEMORY_SUMMARY_PROMPT
+
+
+def format_intent_display(intents=None, current_intent="日常对话"):
+    """
+    格式化意图显示文本
+    
+    Args:
+        intents: 所有意图列表 [{{"intent": "...", "confidence": ...}}, ...]
+        current_intent: 主意图（向后兼容）
+        
+    Returns:
+        意图显示文本，混合意图形如 "法律咨询（主，90%） + 情感倾诉（次，70%）"
+    """
+    if intents and len(intents) > 0:
+        if len(intents) == 1:
+            # 单一意图
+            return intents[0]["intent"]
+        # 混合意图：显示主意图 + 次意图
+        intent_parts = []
+        for i, intent_item in enumerate(intents[:2]):  # 最多显示2个
+            intent_name = intent_item["intent"]
+            confidence = intent_item["confidence"]
+            if i == 0:
+                intent_parts.append(f"{intent_name}（主，{confidence:.0%}）")
+            else:
+                intent_parts.append(f"{intent_name}（次，{confidence:.0%}）")
+        return " + ".join(intent_parts)
+    # 兼容旧方式
+    return current_intent
+
+
+# 对话消息的说话人前缀（与 format_messages / format_similar_messages 的输出格式一致）
+DIALOGUE_SPEAKER_PREFIXES = ("用户：", "安然：")
+
+
+def split_dialogue_items(text):
+    """
+    将对话文本按消息拆分为条目：以说话人前缀开头的行开始一条新消息，
+    其余行（多行消息的后续行、空行）归入上一条消息，条目内容逐字保留
+    
+    Args:
+        text: 对话文本
+        
+    Returns:
+        消息条目列表，按 "\n" 拼接后与原文一致
+    """
+    items = []
+    for line in text.split("\n") if text else []:
+        if items and not line.startswith(DIALOGUE_SPEAKER_PREFIXES):
+            items[-1] = f"{items[-1]}\n{line}"
+        else:
+            items.append(line)
+    return items
+
+
+def build_prompt_assembler(
+    user_input,
+    working_memory_text="",
+    history_text="",
+    similar_messages="",
+    company="未知",
+    age="未知",
+    gender="未知",
+    current_intent="日常对话",
+    intents=None,
+    feedback_summary="",
+    working_memory_summary=""
+):
+    """
+    构建对话 Prompt 组装器（前缀缓存友好布局）
+    
+    布局：
+    - system 消息：ANRAN_SYSTEM_PROMPT（逐字节稳定的静态前缀）
+    - user 消息：按变化频率从低到高排列的易变上下文
+      用户画像 → 近七天反馈 → 早期对话摘要 → 近期对话记忆 → 历史相似对话 → 当前意图 → 用户输入
+      （早期对话摘要仅在长对话中出现，短对话的 Prompt 与之前完全一致）
+    
+    Args:
+        参数含义同 build_full_prompt
+        
+    Returns:
+        PromptAssembler 实例，调用 build_messages() 获取消息列表
+    """
+    from app.modules.llm.core.prompt_assembler import PromptAssembler
+    
+    # 优先使用 working_memory_text，如果为空则回退到 history_text
+    memory_display = working_memory_text if working_memory_text else history_text
+    
+    assembler = PromptAssembler(static_prefix=ANRAN_SYSTEM_PROMPT)
+    assembler.add_section(
+        "profile",
+        f"公司：{company}\n年龄：{age}\n性别：{gender}",
+        title="当前用户画像："
+    )
+    assembler.add_section(
+        "feedback",
+        feedback_summary,
+        title="近七天反馈情况：",
+        placeholder="用户暂无反馈记录"
+    )
+    if working_memory_summary:
+        assembler.add_section(
+            "summary",
+            working_memory_summary,
+            title="早期对话摘要（更早的对话已整理为摘要）："
+        )
+    assembler.add_section(
+        "working_memory",
+        memory_display,
+        title=(
+            "近期对话记忆（Working Memory - 最近几轮原文）：\n"
+            "（注意：以下是最近的对话内容，请仔细阅读，**绝对不要**重复其中已经给出的建议或观点，除非用户要求重复）"
+        ),
+        placeholder="（这是新对话的开始）",
+        items=split_dialogue_items(memory_display.strip() if memory_display else "")
+    )
+    assembler.add_section(
+        "similar_messages",
+        similar_messages,
+        title="历史相似对话（ChromaDB - 语义检索）：",
+        placeholder="（暂无相关历史记忆）",
+        items=split_dialogue_items(similar_messages.strip() if similar_messages else "")
+    )
+    assembler.add_section(
+        "intent",
+        format_intent_display(intents, current_intent),
+        title="当前对话意图："
+    )
+    assembler.add_section("input", f"用户：{user_input}")
+    return assembler
+
+
 def build_full_prompt(
     user_input, 
     working_memory_text="",  # 新增：Working Memory 文本
@@ -429,10 +583,14 @@ def build_full_prompt(
     gender="未知",
     current_intent="日常对话",
     intents=None,  # 新增：所有意图列表
-    feedback_summary=""  # 新增：用户反馈趋势摘要
+    feedback_summary="",  # 新增：用户反馈趋势摘要
+    working_memory_summary=""  # 早期对话摘要（滚动摘要记忆）
 ):
     """
-    构建完整的对话 Prompt
+    构建完整的对话 Prompt（单字符串形式，静态前缀在前）
+    
+    注意：调用 LLM 时请优先使用 build_prompt_assembler(...).build_messages()，
+    以 system/user 两条消息发送，便于命中服务端前缀缓存
     
     Args:
         user_input: 用户输入
@@ -445,46 +603,25 @@ def build_full_prompt(
         current_intent: 主意图（向后兼容）
         intents: 所有意图列表 [{{"intent": "...", "confidence": ...}}, ...]
         feedback_summary: 用户反馈趋势摘要（近七天）
+        working_memory_summary: 早期对话摘要（滑出近期窗口的对话）
         
     Returns:
         完整的 Prompt 字符串
     """
-    template = get_conversation_template()
-    
-    # 格式化意图显示
-    if intents and len(intents) > 0:
-        if len(intents) == 1:
-            # 单一意图
-            intent_display = intents[0]["intent"]
-        else:
-            # 混合意图：显示主意图 + 次意图
-            intent_parts = []
-            for i, intent_item in enumerate(intents[:2]):  # 最多显示2个
-                intent_name = intent_item["intent"]
-                confidence = intent_item["confidence"]
-                if i == 0:
-                    intent_parts.append(f"{intent_name}（主，{confidence:.0%}）")
-                else:
-                    intent_parts.append(f"{intent_name}（次，{confidence:.0%}）")
-            intent_display = " + ".join(intent_parts)
-    else:
-        # 兼容旧方式
-        intent_display = current_intent
-    
-    # 优先使用 working_memory_text，如果为空则回退到 history_text
-    memory_display = working_memory_text if working_memory_text else history_text
-    
-    return template.format(
-        system_prompt=ANRAN_SYSTEM_PROMPT,
+    assembler = build_prompt_assembler(
+        user_input=user_input,
+        working_memory_text=working_memory_text,
+        history_text=history_text,
+        similar_messages=similar_messages,
         company=company,
         age=age,
         gender=gender,
-        current_intent=intent_display,
-        feedback_summary=feedback_summary.strip() if feedback_summary else "用户暂无反馈记录",
-        working_memory=memory_display.strip() if memory_display else "（这是新对话的开始）",
-        similar_messages=similar_messages.strip() if similar_messages else "（暂无相关历史记忆）",
-        input=user_input
+        current_intent=current_intent,
+        intents=intents,
+        feedback_summary=feedback_summary,
+        working_memory_summary=working_memory_summary
     )
+    return f"{assembler.render_text()}\n安然：\n"
 
 
 def check_crisis_content(text):
@@ -0,0 +1,195 @@
+"""
+SSE 流式输出工具
+- 帧合并：将 LLM 逐 token 输出合并为较少的 SSE 帧，降低高并发下的写入次数与代理开销
+- 断开检测：客户端断开时取消上游工作流，避免继续消耗 Token 与上游资源
+"""
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+from app.core.config import settings
+from app.core.metrics import metrics
+
+# 控制消息前缀（需单独成帧，不与 token 合并）
+CONTROL_PREFIXES = ("[STATE]",)
+
+_END = object()
+
+
+def format_sse(content: str) -> str:
+    """编码为一条 SSE 消息：内容中的每一行单独作为一个 data: 字段
+
+    合并后的帧可能包含换行（段落、列表），若整体放在一个 data: 字段中，
+    换行之后的文本在客户端按行解析时会因缺少 data: 前缀而丢失。
+    按 SSE 规范，接收方将同一消息的多个 data: 字段以换行拼接即可还原内容。
+    """
+    return "".join(f"data: {line}\n" for line in content.split("\n")) + "\n"
+
+
+class SSEFrameCoalescer:
+    """SSE 帧合并器
+
+    规则：
+    - 首个 token 立即发送（保证首字延迟不变）
+    - 之后的 token 先缓冲，缓冲字节数达到 max_bytes 或距首个缓冲 token 超过 window_ms 时合并发送
+    - 控制消息（如 [STATE]）先冲刷缓冲区，再单独发送
+    - window_ms <= 0 时不合并，逐条透传
+
+    使用示例：
+        coalescer = SSEFrameCoalescer(window_ms=30, max_bytes=256)
+        async for content in coalescer.coalesce(run_chat_workflow_streaming(...)):
+            yield format_sse(content)
+    """
+
+    def __init__(self, window_ms: Optional[int] = None, max_bytes: Optional[int] = None):
+        """初始化合并器
+
+        Args:
+            window_ms: 合并时间窗口（毫秒），默认读取配置
+            max_bytes: 单帧最大缓冲字节数，默认读取配置
+        """
+        self.window = (window_ms if window_ms is not None else settings.SSE_COALESCE_WINDOW_MS) / 1000
+        self.max_bytes = max_bytes if max_bytes is not None else settings.SSE_COALESCE_MAX_BYTES
+
+    @staticmethod
+    def is_control(item: str) -> bool:
+        return item.startswith(CONTROL_PREFIXES)
+
+    async def coalesce(self, source: AsyncIterator[str]) -> AsyncIterator[str]:
+        """合并上游输出
+
+        Args:
+            source: 上游异步迭代器（逐 token 的文本）
+
+        Yields:
+            合并后的帧内容
+        """
+        if self.window <= 0:
+            async for item in source:
+                yield item
+            return
+
+        # 上游由独立任务读取，等待超时只取消 queue.get，不会打断上游生成器
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def pump():
+            try:
+                async for item in source:
+                    await queue.put(item)
+            except Exception as e:
+                await queue.put(e)
+            finally:
+                await queue.put(_END)
+
+        loop = asyncio.get_running_loop()
+        pump_task = asyncio.create_task(pump())
+        buffer: List[str] = []
+        buffered_bytes = 0
+        deadline = 0.0
+        first_sent = False
+
+        def flush() -> str:
+            nonlocal buffered_bytes
+            metrics.observe("sse.chunks_per_frame", len(buffer))
+            frame = "".join(buffer)
+            buffer.clear()
+            buffered_bytes = 0
+            return frame
+
+        try:
+            while True:
+                if buffer and loop.time() >= deadline:
+                    yield flush()
+
+                try:
+                    timeout = max(deadline - loop.time(), 0) if buffer else None
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    continue
+
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    if buffer:
+                        yield flush()
+                    raise item
+
+                if self.is_control(item):
+                    if buffer:
+                        yield flush()
+                    yield item
+                    continue
+
+                if not first_sent:
+                    first_sent = True
+                    metrics.observe("sse.chunks_per_frame", 1)
+                    yield item
+                    continue
+
+                if not buffer:
+                    deadline = loop.time() + self.window
+                buffer.append(item)
+                buffered_bytes += len(item.encode("utf-8"))
+                if buffered_bytes >= self.max_bytes:
+                    yield flush()
+
+            if buffer:
+                yield flush()
+        finally:
+            pump_task.cancel()
+
+
+async def watch_disconnect(
+    source: AsyncIterator[str],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    poll_interval: Optional[float] = None
+) -> AsyncIterator[str]:
+    """客户端断开时取消上游生成器
+
+    上游由独立任务驱动，等待期间每隔 poll_interval 秒检查一次连接状态；
+    检测到断开后立即取消上游任务（上游会在 CancelledError 中完成收尾），并结束迭代
+
+    Args:
+        source: 上游异步迭代器
+        is_disconnected: 检查客户端是否已断开的协程函数（如 Request.is_disconnected）
+        poll_interval: 检查间隔（秒），默认读取配置
+
+    Yields:
+        上游输出
+    """
+    interval = poll_interval if poll_interval is not None else settings.CHAT_DISCONNECT_POLL_INTERVAL
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for item in source:
+                await queue.put(item)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await queue.put(_END)
+
+    loop = asyncio.get_running_loop()
+    pump_task = asyncio.create_task(pump())
+    next_check = loop.time() + interval
+
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), max(next_check - loop.time(), 0))
+            except asyncio.TimeoutError:
+                item = None
+
+            if loop.time() >= next_check:
+                next_check = loop.time() + interval
+                if await is_disconnected():
+                    metrics.incr("sse.client_disconnected")
+                    return
+
+            if item is None:
+                continue
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        pump_task.cancel()
@@ -0,0 +1,31 @@
+# Gunicorn 生产环境配置
+# 启动命令: gunicorn -c gunicorn.conf.py main:app
+#
+# - master 进程导入应用并预加载只读资源（编译后的工作流、关键词正则、tokenizer），
+#   fork 出的 worker 通过写时复制共享，worker 启动更快、内存占用更低
+# - 连接类资源（Redis / HTTP / ChromaDB 连接池）由各 worker 的 lifespan 独立创建，大小由配置决定
+# - 收到 SIGTERM 后停止接收新连接，最多等待 graceful_timeout 秒让在途请求（含 SSE 流）完成
+from app.core.config import settings
+
+bind = f"{settings.HOST}:{settings.PORT}"
+workers = settings.WEB_CONCURRENCY
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# fork 前导入应用（main:app）
+preload_app = True
+
+# 优雅退出
+graceful_timeout = settings.SHUTDOWN_GRACE_SECONDS
+# SSE 流式对话可能持续较久，worker 心跳超时需大于单次对话耗时
+timeout = 120
+keepalive = 5
+
+loglevel = "info"
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    """master 进程启动时（fork 前）预加载只读资源"""
+    from app.initialize.preload import preload_resources
+    preload_resources()
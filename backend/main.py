@@ -1,16 +1,29 @@
+from app.initialize.startup import startup  # 最先导入，用于记录后续模块的导入耗时
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
-from app.api.agent import router as agent_router
-from app.api.conversation import router as conversation_router
-from app.api.feedback import router as feedback_router
-from app.api.ticket import router as ticket_router
-from app.api.ticket_volunteer import router as ticket_volunteer_router
-from app.api.ticket_summary import router as ticket_summary_router
+with startup.import_timer("api.agent"):  # 对话工作流（LangGraph / LangChain / OpenAI）
+    from app.api.agent import router as agent_router
+with startup.import_timer("api.others"):
+    from app.api.conversation import router as conversation_router
+    from app.api.feedback import router as feedback_router
+    from app.api.ticket import router as ticket_router
+    from app.api.ticket_volunteer import router as ticket_volunteer_router
+    from app.api.ticket_summary import router as ticket_summary_router
+from app.core.metrics import metrics
+from app.initialize import redis, chromadb, milvus
 from app.initialize.redis import init_redis, close_redis
+from app.initialize.http_client import init_http_client, close_http_client
+from app.initialize.preload import preload_resources
+from app.initialize.id_worker import init_id_worker, close_id_worker
+from app.utils.id_generator import snowflake
 from app.initialize.laminar import init_laminar
 from app.initialize.chromadb import init_chromadb, close_chromadb
+from app.initialize.milvus import init_milvus, close_milvus
+from app.initialize.embedding import init_embedding, close_embedding
 from app.core.config import settings
+import asyncio
 import uvicorn
 import logging
 
@@ -21,6 +34,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 对话记忆存储后端（chroma / milvus），启动时只初始化所选后端
+USE_MILVUS = settings.MEMORY_STORE_BACKEND.lower() == "milvus"
+
 # 关闭冗余日志
 logging.getLogger('httpx').setLevel(logging.WARNING)
 logging.getLogger('app.modules.workflow.core.graph').setLevel(logging.WARNING)
@@ -35,31 +51,49 @@ async def lifespan(app: FastAPI):
     # Startup
     print("🚀 正在启动 NEG-Agent 服务...")
     
-    # 初始化 Laminar
-    init_laminar()
-    
-    # 初始化 ChromaDB
-    try:
-        init_chromadb()
-        print("✅ ChromaDB 连接成功")
-    except Exception as e:
-        print(f"⚠️  ChromaDB 连接失败: {e}")
+    # 相互独立的依赖并发初始化（同步初始化放入线程执行），各自带超时，失败降级继续启动
+    # - Laminar / ChromaDB（或 Milvus）：同步 SDK（含模块导入与 list_collections 网络往返）
+    # - Redis / HTTP 连接池：每个 worker 进程独立
+    # - 预加载工作流等只读资源（gunicorn preload 模式下已在 fork 前完成，此处直接跳过）
+    # - 嵌入服务：预热模型（或进程池 / sidecar），超时不影响启动，模型在后台继续加载
+    await asyncio.gather(
+        startup.run("laminar", init_laminar),
+        startup.run("milvus", init_milvus) if USE_MILVUS else startup.run("chromadb", init_chromadb),
+        startup.run("redis", init_redis),
+        startup.run("http_client", init_http_client),
+        startup.run("preload", preload_resources),
+        startup.run("embedding", init_embedding),
+    )
     
-    # 初始化 Redis
-    await init_redis()
+    # 分配雪花 worker ID（依赖 Redis）
+    await startup.run("id_worker", init_id_worker)
     
+    startup.mark_ready()
     print(f"✅ 服务启动成功: http://{settings.HOST}:{settings.PORT}")
     print(f"📝 API 文档: http://{settings.HOST}:{settings.PORT}/docs")
     
     yield
     
-    # Shutdown
+    # Shutdown（先置为未就绪，负载均衡停止分配新请求）
+    startup.mark_not_ready()
     close_chromadb()
+    close_milvus()
+    close_embedding()
+    await close_http_client()
+    await close_id_worker()
     await close_redis()
     print("✅ 服务已关闭")
 
 app = FastAPI(title="Agent API", version="1.0.0", lifespan=lifespan)
 
+# 就绪探针依赖检查
+startup.add_check("redis", lambda: bool(redis.redis_client))  # 熔断期间为假值
+startup.add_check("id_worker", snowflake.available)  # 持有有效的雪花 worker ID 租约
+if USE_MILVUS:
+    startup.add_check("milvus", lambda: milvus.milvus_client is not None)
+else:
+    startup.add_check("chromadb", lambda: chromadb.chroma_client is not None)
+
 # 解决跨域问题
 app.add_middleware(
     CORSMiddleware,
@@ -85,11 +119,34 @@ def root():
 def ping():
     return {"message": "Hello from FastAPI!"}
 
+@app.get("/health/live")
+def liveness():
+    """存活探针：进程能响应即视为存活（不检查外部依赖，避免依赖抖动导致重启）"""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+def readiness():
+    """就绪探针：启动完成（且必需依赖可用）后返回 200，否则返回 503"""
+    result = startup.readiness()
+    result["startup"] = startup.report()
+    return JSONResponse(status_code=200 if result["ready"] else 503, content=result)
+
+@app.get("/metrics")
+def get_metrics():
+    """进程内运行指标（检索 k 值、命中率等）"""
+    return metrics.snapshot()
+
 
 
 def start_server():
     """
     启动 Uvicorn 服务器来运行 FastAPI 应用
+
+    - DEBUG=True：单进程 + 热重载，方便开发
+    - DEBUG=False：多 worker 进程（WEB_CONCURRENCY），收到 SIGTERM 后停止接收新连接，
+      最多等待 SHUTDOWN_GRACE_SECONDS 秒让在途请求完成
+    生产环境推荐使用 gunicorn（见 gunicorn.conf.py，支持 fork 前预加载）：
+        gunicorn -c gunicorn.conf.py main:app
     """
     print("--- 正在启动 FastAPI 服务器 ---")
 
@@ -98,7 +155,18 @@ def start_server():
     # - host: 服务器监听的 IP 地址
     # - port: 服务器监听的端口
     # - reload: (可选) 开启热重载，方便开发
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True, log_level="debug")
+    # - workers: (可选) worker 进程数，与 reload 互斥
+    if settings.DEBUG:
+        uvicorn.run("main:app", host="0.0.0.0", port=settings.PORT, reload=True, log_level="debug")
+    else:
+        uvicorn.run(
+            "main:app",
+            host=settings.HOST,
+            port=settings.PORT,
+            workers=settings.WEB_CONCURRENCY,
+            timeout_graceful_shutdown=settings.SHUTDOWN_GRACE_SECONDS,
+            log_level="info"
+        )
 
     # 注意: 一旦调用 uvicorn.run()，它会阻塞程序直到服务器停止。
 
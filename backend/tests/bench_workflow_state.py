@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工作流状态体积基准（手动运行，不属于 pytest 用例）
+对比两种状态设计下单轮对话的内存分配与状态序列化体积：
+- legacy: 原始相似记忆、完整反馈列表、完整 Prompt、意图得分都放在 WorkflowState 中
+- slim:   大体积中间产物放入请求级旁路存储，状态只携带句柄，各节点只读取声明的通道
+
+用法: python tests/bench_workflow_state.py [反馈条数 ...]
+"""
+
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, TypedDict
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from langgraph.graph import END
+from app.modules.workflow.core import artifacts
+from app.modules.workflow.core.graph import WorkflowGraphBuilder
+
+TURNS = 20
+SIMILAR_COUNT = 20
+HISTORY_TEXT = "用户：骑手被差评了怎么申诉\n安然：可以在 App 内提交申诉材料\n" * 10
+
+
+def _feedback_list(n: int) -> List[Dict[str, Any]]:
+    return [
+        {"id": i, "isUseful": i % 3 != 0, "feedbackType": "inaccurate" if i % 3 == 0 else "helpful",
+         "comment": f"第 {i} 条反馈：回答不够具体，希望给出平台的申诉入口和时限"}
+        for i in range(n)
+    ]
+
+
+def _similar_memories() -> List[Dict[str, Any]]:
+    return [
+        {"id": f"m{i}", "role": "user", "content": f"历史问题 {i}：平台扣款规则不透明，如何维权", "distance": 0.1 + i / 100}
+        for i in range(SIMILAR_COUNT)
+    ]
+
+
+def _aggregate(feedback_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    types: Dict[str, int] = {}
+    for item in feedback_list:
+        if item["feedbackType"] != "helpful":
+            types[item["feedbackType"]] = types.get(item["feedbackType"], 0) + 1
+    useful = sum(1 for item in feedback_list if item["isUseful"])
+    return {"total_count": len(feedback_list), "useful_count": useful, "feedback_types": types}
+
+
+class LegacyState(TypedDict, total=False):
+    user_input: str
+    working_memory_text: str
+    similar_memories: List[Dict[str, Any]]
+    similar_messages: str
+    feedback_summary: str
+    feedback_data: Dict[str, Any]
+    intent: str
+    intent_scores: Dict[str, float]
+    full_prompt: str
+    llm_response: str
+
+
+class SlimState(TypedDict, total=False):
+    user_input: str
+    working_memory_text: str
+    similar_memories_ref: str
+    similar_messages_ref: str
+    feedback_summary: str
+    feedback_data_ref: str
+    intent: str
+    prompt_ref: str
+    llm_response: str
+
+
+def build_legacy(feedback_count: int):
+    async def working_memory(state):
+        return {"working_memory_text": HISTORY_TEXT}
+
+    async def similar(state):
+        return {"similar_memories": _similar_memories()}
+
+    async def feedback(state):
+        data = _aggregate(_feedback_list(feedback_count))
+        data["feedback_list"] = _feedback_list(feedback_count)
+        return {"feedback_summary": json.dumps(data["feedback_types"]), "feedback_data": data}
+
+    async def merge(state):
+        return {"similar_messages": "\n".join(m["content"] for m in state["similar_memories"])}
+
+    async def intent(state):
+        return {"intent": "维权咨询", "intent_scores": {f"label_{i}": i / 10 for i in range(10)}}
+
+    async def llm(state):
+        prompt = "\n".join([state["working_memory_text"], state["similar_messages"], state["feedback_summary"], state["user_input"]])
+        return {"full_prompt": prompt, "llm_response": "好的，建议先收集证据。"}
+
+    return _wire(WorkflowGraphBuilder(state_schema=LegacyState), working_memory, similar, feedback, merge, intent, llm)
+
+
+def build_slim(feedback_count: int):
+    async def working_memory(state):
+        return {"working_memory_text": HISTORY_TEXT}
+
+    async def similar(state):
+        return {"similar_memories_ref": artifacts.put("similar_memories", _similar_memories())}
+
+    async def feedback(state):
+        data = _aggregate(_feedback_list(feedback_count))
+        return {"feedback_summary": json.dumps(data["feedback_types"]), "feedback_data_ref": artifacts.put("feedback_data", data)}
+
+    async def merge(state):
+        memories = artifacts.get(state["similar_memories_ref"], [])
+        return {"similar_messages_ref": artifacts.put("similar_messages", "\n".join(m["content"] for m in memories))}
+
+    async def intent(state):
+        return {"intent": "维权咨询"}
+
+    async def llm(state):
+        similar_messages = artifacts.get(state["similar_messages_ref"], "")
+        prompt = "\n".join([state["working_memory_text"], similar_messages, state["feedback_summary"], state["user_input"]])
+        return {"prompt_ref": artifacts.put("full_prompt", prompt), "llm_response": "好的，建议先收集证据。"}
+
+    channels = {
+        "working_memory": {"reads": (), "writes": ("working_memory_text",)},
+        "similar": {"reads": ("user_input",), "writes": ("similar_memories_ref",)},
+        "feedback": {"reads": (), "writes": ("feedback_summary", "feedback_data_ref")},
+        "merge": {"reads": ("similar_memories_ref",), "writes": ("similar_messages_ref",)},
+        "intent": {"reads": ("user_input", "working_memory_text"), "writes": ("intent",)},
+        "llm": {
+            "reads": ("user_input", "working_memory_text", "similar_messages_ref", "feedback_summary"),
+            "writes": ("prompt_ref", "llm_response"),
+        },
+    }
+    builder = WorkflowGraphBuilder(state_schema=SlimState, channels=channels)
+    return _wire(builder, working_memory, similar, feedback, merge, intent, llm)
+
+
+def _wire(builder, working_memory, similar, feedback, merge, intent, llm):
+    async def start(state):
+        return {}
+
+    builder.add_node("start", start)
+    builder.add_node("working_memory", working_memory)
+    builder.add_node("similar", similar)
+    builder.add_node("feedback", feedback)
+    builder.add_node("merge", merge)
+    builder.add_node("intent", intent)
+    builder.add_node("llm", llm)
+    builder.set_entry_point("start")
+    for node in ("working_memory", "similar", "feedback"):
+        builder.add_edge("start", node)
+        builder.add_edge(node, "merge")
+    builder.add_edge("merge", "intent")
+    builder.add_edge("intent", "llm")
+    builder.add_edge("llm", END)
+    return builder.compile()
+
+
+async def run_turns(graph) -> Dict[str, float]:
+    """与线上一致使用 stream_mode="values"，并把每一步的状态序列化（模拟检查点 / 事件序列化开销）"""
+    serialized = 0
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(TURNS):
+        artifacts.open_scope()
+        async for values in graph.astream({"user_input": "平台无故扣款怎么办"}, stream_mode="values"):
+            serialized += len(json.dumps(values, ensure_ascii=False, default=str))
+        artifacts.close_scope()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "ms_per_turn": elapsed * 1000 / TURNS,
+        "peak_kb": peak / 1024,
+        "serialized_kb_per_turn": serialized / 1024 / TURNS,
+    }
+
+
+def main():
+    import logging
+    logging.disable(logging.INFO)
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 1000, 10000]
+    print(f"{'反馈条数':>8} | {'设计':<6} | {'每轮耗时(ms)':>12} | {'峰值分配(KB)':>12} | {'每轮序列化(KB)':>14}")
+    for size in sizes:
+        for name, build in (("legacy", build_legacy), ("slim", build_slim)):
+            result = asyncio.run(run_turns(build(size)))
+            print(
+                f"{size:>10} | {name:<6} | {result['ms_per_turn']:>14.2f} | "
+                f"{result['peak_kb']:>14.1f} | {result['serialized_kb_per_turn']:>16.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+测试用内存 Redis（仅实现测试中用到的命令，语义对齐 redis-py asyncio + decode_responses=True）
+"""
+
+from redis.exceptions import ResponseError, WatchError
+
+WRONGTYPE = "WRONGTYPE Operation against a key holding the wrong kind of value"
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.round_trips = 0
+
+    def __bool__(self):
+        return True
+
+    def _get(self, key, kind):
+        value = self.data.get(key)
+        if value is not None and not isinstance(value, kind):
+            raise ResponseError(WRONGTYPE)
+        return value
+
+    # ---- 字符串 ----
+    def _cmd_get(self, key):
+        value = self._get(key, str)
+        return value
+
+    def _cmd_set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        if ex:
+            self.ttls[key] = ex
+        return True
+
+    def _cmd_incrby(self, key, amount=1):
+        value = int(self.data.get(key, 0)) + amount
+        self.data[key] = str(value)
+        return value
+
+    def _cmd_incr(self, key):
+        return self._cmd_incrby(key, 1)
+
+    def _cmd_delete(self, *keys):
+        count = 0
+        for key in keys:
+            if self.data.pop(key, None) is not None:
+                count += 1
+            self.ttls.pop(key, None)
+        return count
+
+    def _cmd_expire(self, key, seconds):
+        if key in self.data:
+            self.ttls[key] = seconds
+            return True
+        return False
+
+    def _cmd_ttl(self, key):
+        if key not in self.data:
+            return -2
+        return self.ttls.get(key, -1)
+
+    def _cmd_exists(self, *keys):
+        return sum(1 for key in keys if key in self.data)
+
+    # ---- List ----
+    def _cmd_rpush(self, key, *values):
+        items = self._get(key, list)
+        if items is None:
+            items = self.data[key] = []
+        items.extend(str(v) for v in values)
+        return len(items)
+
+    def _cmd_rpushx(self, key, *values):
+        if self._get(key, list) is None:
+            return 0
+        return self._cmd_rpush(key, *values)
+
+    def _cmd_llen(self, key):
+        return len(self._get(key, list) or [])
+
+    def _cmd_lrange(self, key, start, end):
+        items = self._get(key, list) or []
+        end = len(items) if end == -1 else end + 1
+        return items[start:end] if start >= 0 else items[max(len(items) + start, 0):end]
+
+    def _cmd_ltrim(self, key, start, end):
+        items = self._get(key, list)
+        if items is not None:
+            self.data[key] = self._cmd_lrange(key, start, end)
+        return True
+
+    # ---- Hash ----
+    def _hash(self, key):
+        value = self._get(key, dict)
+        if value is None:
+            value = self.data[key] = {}
+        return value
+
+    def _cmd_hset(self, key, field=None, value=None, mapping=None):
+        h = self._hash(key)
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        for k, v in items.items():
+            h[k] = str(v)
+        return len(items)
+
+    def _cmd_hsetnx(self, key, field, value):
+        h = self._hash(key)
+        if field in h:
+            return 0
+        h[field] = str(value)
+        return 1
+
+    def _cmd_hincrby(self, key, field, amount=1):
+        h = self._hash(key)
+        h[field] = str(int(h.get(field, 0)) + amount)
+        return int(h[field])
+
+    def _cmd_hget(self, key, field):
+        return (self._get(key, dict) or {}).get(field)
+
+    def _cmd_hgetall(self, key):
+        return dict(self._get(key, dict) or {})
+
+    def __getattr__(self, name):
+        method = getattr(type(self), f"_cmd_{name}", None)
+        if method is None:
+            raise AttributeError(name)
+
+        async def command(*args, **kwargs):
+            self.round_trips += 1
+            return method(self, *args, **kwargs)
+
+        return command
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """按 MULTI/EXEC 语义执行：单条命令出错不影响其余命令，执行完后抛出第一个错误
+
+    支持 WATCH：watch 之后、multi 之前的命令立即执行；被监视的键在 execute 前发生变化时抛出 WatchError
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+        self.watched = None
+        self.immediate = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.commands = []
+        self.watched = None
+        self.immediate = False
+
+    async def watch(self, *keys):
+        self.client.round_trips += 1
+        self.watched = {key: self._snapshot(key) for key in keys}
+        self.immediate = True
+
+    def _snapshot(self, key):
+        value = self.client.data.get(key)
+        return value.copy() if isinstance(value, (dict, list)) else value
+
+    def multi(self):
+        self.immediate = False
+
+    def __getattr__(self, name):
+        method = getattr(FakeRedis, f"_cmd_{name}", None)
+        if method is None:
+            raise AttributeError(name)
+        if self.immediate:
+            return getattr(self.client, name)
+
+        def queue(*args, **kwargs):
+            self.commands.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self, raise_on_error=True):
+        self.client.round_trips += 1
+        watched, self.watched = self.watched, None
+        self.immediate = False
+        if watched and any(self._snapshot(key) != value for key, value in watched.items()):
+            self.commands = []
+            raise WatchError("Watched variable changed.")
+        results = []
+        for method, args, kwargs in self.commands:
+            try:
+                results.append(method(self.client, *args, **kwargs))
+            except ResponseError as e:
+                results.append(e)
+        self.commands = []
+        errors = [r for r in results if isinstance(r, ResponseError)]
+        if errors and raise_on_error:
+            raise ResponseError(f"Command # 1 of pipeline caused error: {errors[0]}")
+        return results
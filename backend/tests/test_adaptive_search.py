@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应 n_results 相似记忆检索测试
+使用假的 search_memory 验证 k 的扩大与提前退出
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.modules.workflow.nodes import chromadb_node
+from app.modules.workflow.nodes.chromadb_node import adaptive_search_memory
+
+
+def _run(distances, initial_k=8, max_k=50):
+    calls = []
+
+    def fake_search(user_id, session_id, query_text, n_results, include_metadata):
+        calls.append(n_results)
+        return [{"id": str(i), "distance": d} for i, d in enumerate(distances[:n_results])]
+
+    original = chromadb_node.get_memory_store().search_memory
+    chromadb_node.get_memory_store().search_memory = fake_search
+    try:
+        memories, k = asyncio.run(adaptive_search_memory("u", "c", "q", initial_k, max_k))
+    finally:
+        chromadb_node.get_memory_store().search_memory = original
+    return memories, k, calls
+
+
+def test_early_exit_when_result_fails_threshold():
+    memories, k, calls = _run([0.1, 0.2, 0.5] + [0.6] * 60)
+    assert calls == [8]
+    assert k == 8
+    assert [m["distance"] for m in memories if m["distance"] < 0.3] == [0.1, 0.2]
+
+
+def test_widens_until_threshold_fails_or_max():
+    memories, k, calls = _run([0.1] * 20 + [0.6] * 60)
+    assert calls == [8, 32]
+    assert len([m for m in memories if m["distance"] < 0.3]) == 20
+
+    _, k, calls = _run([0.1] * 100)
+    assert calls == [8, 32, 50]
+    assert k == 50
+
+
+def test_stops_when_collection_exhausted():
+    _, k, calls = _run([0.1] * 5)
+    assert calls == [8]
+
+
+if __name__ == "__main__":
+    test_early_exit_when_result_fails_threshold()
+    test_widens_until_threshold_fails_or_max()
+    test_stops_when_collection_exhausted()
+    print("✅ 自适应相似记忆检索测试通过")
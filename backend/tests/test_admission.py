@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对话接口准入控制测试
+验证在途上限、有界等待队列、503 + Retry-After、被取消的等待者转交唤醒、
+按用户/IP 限流的原子性（IP 超限不扣减用户配额）以及按受信任代理解析客户端 IP
+"""
+
+import asyncio
+import math
+import sys
+from pathlib import Path
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from fastapi import HTTPException
+from starlette.requests import Request
+from app.core.admission import AdmissionController, get_client_ip
+from app.core.config import settings
+from app.initialize import redis
+
+
+def test_waiter_admitted_after_release():
+    async def scenario():
+        controller = AdmissionController(max_inflight=1, max_queue=1, queue_timeout=1.0)
+        slot = await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0.01)
+        assert controller.waiting == 1
+
+        slot.release()
+        slot.release()  # 重复释放无副作用
+        second = await waiter
+        assert controller.inflight == 1
+        second.release()
+        await asyncio.sleep(0)
+        assert controller.inflight == 0
+
+    asyncio.run(scenario())
+
+
+def test_queue_full_and_timeout_rejected_with_retry_after():
+    async def scenario():
+        controller = AdmissionController(max_inflight=1, max_queue=1, queue_timeout=0.05)
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0.01)
+
+        try:
+            await controller.acquire()
+            raise AssertionError("队列已满时应拒绝")
+        except HTTPException as e:
+            assert e.status_code == 503
+            assert e.headers["Retry-After"] == "1"
+
+        try:
+            await waiter
+            raise AssertionError("排队超时应拒绝")
+        except HTTPException as e:
+            assert e.status_code == 503
+        assert controller.waiting == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_passes_notification_on():
+    """等待者被唤醒后、占用名额前被取消：唤醒转交给下一个等待者，而不是让其等到超时"""
+    async def scenario():
+        controller = AdmissionController(max_inflight=1, max_queue=2, queue_timeout=1.0)
+        slot = await controller.acquire()
+        first = asyncio.create_task(controller.acquire())
+        second = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0.01)
+
+        # 释放后的唤醒发给 first，而 first 在占用名额前被取消（如客户端断开）
+        slot.release()
+        first.cancel()
+        admitted = await asyncio.wait_for(second, timeout=0.2)
+        assert first.cancelled()
+        assert controller.inflight == 1 and controller.waiting == 0
+        admitted.release()
+
+    asyncio.run(scenario())
+
+
+class _TokenBucketScript:
+    """令牌桶脚本替身：按 TOKEN_BUCKET_SCRIPT 的语义在内存中执行"""
+
+    def __init__(self):
+        self.buckets = {}
+
+    async def __call__(self, keys, args):
+        now, levels = args[0], []
+        for i, key in enumerate(keys):
+            rate, capacity = args[2 * i + 1], args[2 * i + 2]
+            tokens, ts = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - ts) / 1000 * rate)
+            if tokens < 1:
+                return [i + 1, math.ceil((1 - tokens) / rate * 1000)]
+            levels.append(tokens)
+        for key, tokens in zip(keys, levels):
+            self.buckets[key] = (tokens - 1, now)
+        return [0, 0]
+
+
+class _ScriptRedis:
+    def __init__(self):
+        self.script = _TokenBucketScript()
+
+    def register_script(self, source):
+        return self.script
+
+
+def test_ip_rejection_does_not_spend_user_tokens(monkeypatch):
+    monkeypatch.setattr(redis, "redis_client", _ScriptRedis())
+    monkeypatch.setattr(settings, "CHAT_USER_RATE_PER_MINUTE", 0.001)
+    monkeypatch.setattr(settings, "CHAT_USER_BURST", 2)
+    monkeypatch.setattr(settings, "CHAT_IP_RATE_PER_MINUTE", 0.001)
+    monkeypatch.setattr(settings, "CHAT_IP_BURST", 1)
+
+    async def scenario():
+        controller = AdmissionController()
+        await controller.check_rate("u1", "198.51.100.1")
+        rejected = []
+        for ip in ("198.51.100.1", "198.51.100.1", "198.51.100.2", "198.51.100.3"):
+            try:
+                await controller.check_rate("u1", ip)
+                rejected.append(None)
+            except HTTPException as e:
+                assert e.status_code == 429 and int(e.headers["Retry-After"]) > 0
+                rejected.append(e)
+        return rejected
+
+    rejected = asyncio.run(scenario())
+    # 同一 IP 连续被拒绝不消耗用户令牌：换 IP 后用户的第二个令牌仍可用，之后才按用户限流
+    assert [e is None for e in rejected] == [False, False, True, False]
+    buckets = redis.redis_client.script.buckets
+    assert buckets["ratelimit:chat:user:u1"][0] < 1
+    assert "ratelimit:chat:ip:198.51.100.3" not in buckets
+
+
+def _request(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 12345)})
+
+
+def test_client_ip_ignores_forwarded_from_untrusted_peer():
+    """直连地址不是受信任代理时忽略 X-Forwarded-For，无法通过伪造该头绕过按 IP 限流"""
+    original = settings.TRUSTED_PROXIES
+    try:
+        settings.TRUSTED_PROXIES = ""
+        assert get_client_ip(_request("203.0.113.7", "1.2.3.4")) == "203.0.113.7"
+        settings.TRUSTED_PROXIES = "10.0.0.0/8"
+        assert get_client_ip(_request("203.0.113.7", "1.2.3.4")) == "203.0.113.7"
+    finally:
+        settings.TRUSTED_PROXIES = original
+
+
+def test_client_ip_from_trusted_proxy_chain():
+    """经受信任代理转发时，取最右侧的不受信任地址（客户端伪造的左侧地址被忽略）"""
+    original = settings.TRUSTED_PROXIES
+    try:
+        settings.TRUSTED_PROXIES = "127.0.0.1, 10.0.0.0/8"
+        assert get_client_ip(_request("127.0.0.1", "198.51.100.9")) == "198.51.100.9"
+        assert get_client_ip(_request("127.0.0.1", "1.2.3.4, 198.51.100.9, 10.0.0.2")) == "198.51.100.9"
+        assert get_client_ip(_request("10.0.0.3", "10.0.0.2")) == "10.0.0.2"
+        assert get_client_ip(_request("127.0.0.1")) == "127.0.0.1"
+    finally:
+        settings.TRUSTED_PROXIES = original
+
+
+if __name__ == "__main__":
+    test_waiter_admitted_after_release()
+    test_queue_full_and_timeout_rejected_with_retry_after()
+    test_cancelled_waiter_passes_notification_on()
+    test_client_ip_ignores_forwarded_from_untrusted_peer()
+    test_client_ip_from_trusted_proxy_chain()
+    print("✅ 准入控制测试通过")
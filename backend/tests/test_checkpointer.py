@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Redis 检查点保存器测试
+使用简化的工作流验证：一轮结束后保存检查点，确认轮次从 ask_user_confirmation 之后恢复，不重新执行前序节点；
+凭证不写入检查点，其他用户无法恢复不属于自己的检查点
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+from typing import Optional, TypedDict
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+# 导入工作流模块时会创建 LLM 客户端（测试中不会发起请求）
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import END, StateGraph
+from app.initialize import redis
+from app.modules.workflow.workflows import workflow as chat_workflow
+from app.modules.workflow.core.checkpointer import RedisCheckpointSaver
+from tests.fake_redis import FakeRedis
+
+
+class _State(TypedDict, total=False):
+    user_id: str
+    access_token: str
+    user_input: str
+    llm_response: str
+    need_create_ticket: bool
+    user_confirmed_ticket: bool
+    saved: bool
+
+
+def _build(calls, checkpointer):
+    async def llm_answer(state):
+        calls.append("llm_answer")
+        return {"llm_response": f"回答:{state['user_input']}", "need_create_ticket": True}
+
+    async def ask_user_confirmation(state):
+        calls.append("ask_user_confirmation")
+        return {}
+
+    async def save(state, config: Optional[RunnableConfig] = None):
+        calls.append("save")
+        token = state.get("access_token") or config["configurable"].get("access_token")
+        calls.append(f"token={token}")
+        if state.get("saved"):
+            return {}
+        return {"saved": True}
+
+    graph = StateGraph(_State)
+    graph.add_node("llm_answer", llm_answer)
+    graph.add_node("ask_user_confirmation", ask_user_confirmation)
+    graph.add_node("save", save)
+    graph.set_entry_point("llm_answer")
+    graph.add_edge("llm_answer", "ask_user_confirmation")
+    graph.add_edge("ask_user_confirmation", "save")
+    graph.add_edge("save", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def test_resume_confirmation_from_checkpoint():
+    async def scenario():
+        calls = []
+        workflow = _build(calls, RedisCheckpointSaver(ttl=60))
+        config = {"configurable": {"thread_id": "conv_1"}}
+
+        async for _ in workflow.astream({"user_input": "被拖欠工资"}, config, durability="exit"):
+            pass
+        assert calls == ["llm_answer", "ask_user_confirmation", "save", "token=None"]
+        assert redis.redis_client.ttls["checkpoint:conv_1"] == 60
+
+        snapshot = await workflow.aget_state(config)
+        assert snapshot.values["need_create_ticket"] is True
+
+        calls.clear()
+        await workflow.aupdate_state(config, {"user_confirmed_ticket": True}, as_node="ask_user_confirmation")
+        final_state = None
+        async for final_state in workflow.astream(None, config, stream_mode="values", durability="exit"):
+            pass
+        assert calls == ["save", "token=None"]
+        assert final_state["user_confirmed_ticket"] is True
+        assert final_state["llm_response"] == "回答:被拖欠工资"
+
+        # 新一轮对话前删除 thread，不继承上一轮状态
+        await workflow.checkpointer.adelete_thread("conv_1")
+        assert (await workflow.aget_state(config)).values == {}
+
+    original = redis.redis_client
+    redis.redis_client = FakeRedis()
+    try:
+        asyncio.run(scenario())
+    finally:
+        redis.redis_client = original
+
+
+def test_no_redis_degrades():
+    async def scenario():
+        calls = []
+        workflow = _build(calls, RedisCheckpointSaver(ttl=60))
+        config = {"configurable": {"thread_id": "conv_2"}}
+        async for _ in workflow.astream({"user_input": "你好"}, config, durability="exit"):
+            pass
+        assert calls == ["llm_answer", "ask_user_confirmation", "save", "token=None"]
+        assert (await workflow.aget_state(config)).values == {}
+
+    original = redis.redis_client
+    redis.redis_client = None
+    try:
+        asyncio.run(scenario())
+    finally:
+        redis.redis_client = original
+
+
+def _run_owned_turn(monkeypatch):
+    """以用户 u1 完成一轮需要创建工单的对话，返回替身工作流与调用记录"""
+    calls = []
+    workflow = _build(calls, RedisCheckpointSaver(ttl=60))
+    monkeypatch.setattr(chat_workflow, "get_chat_workflow", lambda: workflow)
+    config = {"configurable": {"thread_id": "conv_3"}}
+
+    async def first_turn():
+        async for _ in workflow.astream(
+            {"user_id": "u1", "access_token": "secret-token", "user_input": "被拖欠工资"}, config, durability="exit"
+        ):
+            pass
+
+    asyncio.run(first_turn())
+    calls.clear()
+    return workflow, calls, config
+
+
+def test_credentials_not_persisted(monkeypatch):
+    monkeypatch.setattr(redis, "redis_client", FakeRedis())
+    workflow, calls, config = _run_owned_turn(monkeypatch)
+    assert "secret-token" not in str(redis.redis_client.data)
+
+    async def resume():
+        snapshot = await workflow.aget_state(config)
+        assert "access_token" not in snapshot.values
+        return await chat_workflow.resume_ticket_confirmation(config, True, "u1", "new-token")
+
+    final_state = asyncio.run(resume())
+    # 保存节点从 configurable 取得本次请求的凭证，恢复后的检查点同样不含凭证
+    assert calls == ["save", "token=new-token"]
+    assert final_state["user_confirmed_ticket"] is True
+    assert "new-token" not in str(redis.redis_client.data)
+
+
+def test_resume_by_other_user_rejected(monkeypatch):
+    """其他用户使用同一 conversation_id 确认工单时不恢复检查点（回退为完整执行）"""
+    monkeypatch.setattr(redis, "redis_client", FakeRedis())
+    workflow, calls, config = _run_owned_turn(monkeypatch)
+
+    async def resume():
+        other = await chat_workflow.resume_ticket_confirmation(config, True, "u2", "other-token")
+        anonymous = await chat_workflow.resume_ticket_confirmation(config, True, None, None)
+        return other, anonymous, await workflow.aget_state(config)
+
+    other, anonymous, snapshot = asyncio.run(resume())
+    assert other is None and anonymous is None
+    assert calls == []
+    assert "user_confirmed_ticket" not in snapshot.values
+
+
+if __name__ == "__main__":
+    test_resume_confirmation_from_checkpoint()
+    test_no_redis_degrades()
+    print("✅ 检查点保存器测试通过")
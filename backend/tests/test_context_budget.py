@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上下文 Token 预算测试
+使用字符数作为 Token 计数，验证按优先级分配、按消息条目裁剪、去重，以及预算内段落逐字节不变
+"""
+
+import sys
+from pathlib import Path
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.modules.llm.core.context_budget import ContextBudgeter, parse_section_priorities
+from app.utils.prompt import build_prompt_assembler
+
+PRIORITIES = {"working_memory": 3, "feedback": 2, "similar_messages": 1}
+
+
+def _build(**kwargs):
+    params = {"user_input": "问题", "company": "A", "age": "1", "gender": "男"}
+    params.update(kwargs)
+    return build_prompt_assembler(**params)
+
+
+def test_within_budget_keeps_everything():
+    assembler = _build(working_memory_text="用户：你好\n安然：你好", similar_messages="用户：你好 (相似度: 0.90)")
+    report = ContextBudgeter(total_budget=10000, priorities=PRIORITIES, counter=len).apply(assembler)
+
+    assert assembler.get_section("working_memory")["content"] == "用户：你好\n安然：你好"
+    assert report["similar_messages"]["dropped_items"] == 0
+
+
+def test_working_memory_keeps_latest_turns():
+    memory = "\n".join(f"用户：第{i}条消息" for i in range(10))
+    assembler = _build(working_memory_text=memory, similar_messages="用户：旧问题 (相似度: 0.80)")
+    mandatory = sum(len(s["content"]) for s in assembler.sections if s["name"] not in PRIORITIES)
+    budget = mandatory + 2 * len("用户：第9条消息") + 1
+
+    ContextBudgeter(total_budget=budget, priorities=PRIORITIES, counter=len).apply(assembler)
+
+    assert assembler.get_section("working_memory")["content"] == "用户：第8条消息\n用户：第9条消息"
+    # 低优先级段落没有剩余预算，回退为占位文本
+    assert assembler.get_section("similar_messages")["content"] == "（暂无相关历史记忆）"
+
+
+def test_similar_messages_deduplicated_and_trimmed_from_tail():
+    similar = "用户：A (相似度: 0.95)\n用户：A (相似度: 0.95)\n用户：B (相似度: 0.75)"
+    assembler = _build(similar_messages=similar)
+    mandatory = sum(len(s["content"]) for s in assembler.sections if s["name"] not in PRIORITIES)
+    feedback = len(assembler.get_section("feedback")["content"])
+    budget = mandatory + feedback + len("用户：A (相似度: 0.95)")
+
+    report = ContextBudgeter(total_budget=budget, priorities=PRIORITIES, counter=len).apply(assembler)
+
+    assert assembler.get_section("similar_messages")["content"] == "用户：A (相似度: 0.95)"
+    assert report["similar_messages"]["dropped_items"] == 2
+
+
+def test_multiline_messages_untouched_within_budget():
+    memory = "用户：今天被扣钱了\n\n还被骂了一顿\n安然：我听到了：\n- 好的\n- 好的\n\n先深呼吸"
+    assembler = _build(working_memory_text=memory)
+    report = ContextBudgeter(total_budget=10000, priorities=PRIORITIES, counter=len).apply(assembler)
+
+    assert assembler.get_section("working_memory")["content"] == memory
+    assert report["working_memory"]["dropped_items"] == 0
+
+
+def test_working_memory_trimmed_by_whole_message():
+    """超预算时按整条消息丢弃：多行消息内部的空行与重复行保持原样"""
+    latest = "安然：建议这样做：\n- 好的\n- 好的\n\n慢慢来"
+    memory = f"用户：第一条\n安然：第二条\n{latest}"
+    assembler = _build(working_memory_text=memory)
+    mandatory = sum(len(s["content"]) for s in assembler.sections if s["name"] not in PRIORITIES)
+
+    report = ContextBudgeter(total_budget=mandatory + len(latest) + 3, priorities=PRIORITIES, counter=len).apply(assembler)
+
+    assert assembler.get_section("working_memory")["content"] == latest
+    assert report["working_memory"]["dropped_items"] == 2
+
+
+def test_truncated_latest_message_keeps_speaker_prefix():
+    memory = "用户：你好\n安然：" + "很长的回复" * 20
+    assembler = _build(working_memory_text=memory)
+    mandatory = sum(len(s["content"]) for s in assembler.sections if s["name"] not in PRIORITIES)
+
+    ContextBudgeter(total_budget=mandatory + 20, priorities=PRIORITIES, counter=len).apply(assembler)
+
+    content = assembler.get_section("working_memory")["content"]
+    assert content.startswith("安然：…") and content.endswith("很长的回复")
+    assert len(content) == 20
+
+
+def test_parse_section_priorities():
+    assert parse_section_priorities("working_memory:3, feedback:2,bad") == {"working_memory": 3, "feedback": 2}
+
+
+if __name__ == "__main__":
+    test_within_budget_keeps_everything()
+    test_working_memory_keeps_latest_turns()
+    test_similar_messages_deduplicated_and_trimmed_from_tail()
+    test_multiline_messages_untouched_within_budget()
+    test_working_memory_trimmed_by_whole_message()
+    test_truncated_latest_message_keeps_speaker_prefix()
+    test_parse_section_priorities()
+    print("✅ 上下文 Token 预算测试通过")
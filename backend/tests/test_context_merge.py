@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上下文合并测试
+验证相似记忆与 Working Memory 去重、近似重复折叠和按相似度截断
+"""
+
+import sys
+from pathlib import Path
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.modules.workflow.nodes.context_merge import (
+    merge_similar_memories,
+    working_memory_keys,
+    format_similar_messages
+)
+
+
+def test_drops_items_already_in_working_memory():
+    working = [
+        {"role": "user", "content": "我被扣款了 "},
+        {"role": "assistant", "content": "先别急", "messageId": "u1_c1_100"},
+    ]
+    similar = [
+        {"id": "u1_c1_001", "role": "user", "content": "我被扣款了", "distance": 0.05},
+        {"id": "u1_c1_100", "role": "assistant", "content": "先别急，慢慢说", "distance": 0.1},
+        {"id": "u1_c1_002", "role": "user", "content": "上周也被罚过", "distance": 0.2},
+    ]
+
+    merged = merge_similar_memories(similar, working_memory_keys(working), max_items=10, near_dup_threshold=0.9)
+
+    assert [m["id"] for m in merged] == ["u1_c1_002"]
+
+
+def test_collapses_near_duplicates_and_caps_by_score():
+    similar = [
+        {"id": "3", "role": "user", "content": "骑手差评怎么申诉啊", "distance": 0.25},
+        {"id": "1", "role": "user", "content": "骑手差评怎么申诉", "distance": 0.1},
+        {"id": "2", "role": "user", "content": "骑手差评怎么申诉", "distance": 0.12},
+        {"id": "4", "role": "user", "content": "工伤怎么赔偿", "distance": 0.2},
+        {"id": "5", "role": "user", "content": "封号了怎么办", "distance": 0.28},
+    ]
+
+    merged = merge_similar_memories(similar, [], max_items=2, near_dup_threshold=0.8)
+
+    assert [m["id"] for m in merged] == ["1", "4"]
+    assert format_similar_messages(merged).startswith("用户：骑手差评怎么申诉 (相似度: 0.90)")
+
+
+if __name__ == "__main__":
+    test_drops_items_already_in_working_memory()
+    test_collapses_near_duplicates_and_caps_by_score()
+    print("✅ 上下文合并测试通过")
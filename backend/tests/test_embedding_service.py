@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+嵌入服务测试
+使用替身模型验证：并发调用方合批且结果按请求拆分、批次失败时同批请求全部收到异常、进程池模式、
+HTTP 模式（本地桩服务）与 sidecar 接口
+"""
+
+import asyncio
+import json
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+
+import pytest
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from fastapi.testclient import TestClient
+
+from app.core.metrics import metrics
+from app.modules.embedding import EmbeddingService
+from app.modules.embedding import server
+
+
+def _vector(text):
+    return [float(len(text)), float(zlib.crc32(text.encode()) % 1000), 1.0]
+
+
+class FakeEmbedder:
+    """替身模型：记录每次调用的批大小，可模拟推理耗时与失败"""
+
+    def __init__(self, delay=0.0, fail_on=None):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(len(texts))
+        time.sleep(self.delay)
+        if self.fail_on and self.fail_on in texts:
+            raise RuntimeError("模型推理失败")
+        return [_vector(text) for text in texts]
+
+
+def _fake_factory():
+    """进程池模式的模型工厂（模块级函数，可被 pickle）"""
+    return FakeEmbedder()
+
+
+def test_concurrent_callers_are_batched():
+    """推理进行中到达的请求合并为下一批，各调用方拿到自己文本的向量"""
+    embedder = FakeEmbedder(delay=0.05)
+    service = EmbeddingService(mode="local", factory=lambda: embedder, batch_size=64, wait_ms=2)
+    before = metrics.snapshot()["counters"].get("embedding.batches", 0)
+    try:
+        texts = [[f"消息{i}", f"回复{i}" * (i % 3 + 1)] for i in range(24)]
+        with ThreadPoolExecutor(max_workers=24) as pool:
+            results = list(pool.map(service.embed, texts))
+    finally:
+        service.shutdown()
+
+    assert results == [[_vector(t) for t in pair] for pair in texts]
+    assert sum(embedder.calls) == 48
+    assert len(embedder.calls) < 24
+    assert max(embedder.calls) > 2
+    assert metrics.snapshot()["counters"]["embedding.batches"] - before == len(embedder.calls)
+
+
+def test_batch_size_limit():
+    embedder = FakeEmbedder(delay=0.02)
+    service = EmbeddingService(mode="local", factory=lambda: embedder, batch_size=4, wait_ms=50)
+    try:
+        futures = [service.submit([f"t{i}"]) for i in range(10)]
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        service.shutdown()
+    assert results == [[_vector(f"t{i}")] for i in range(10)]
+    assert max(embedder.calls) <= 4
+
+
+def test_failed_batch_propagates_and_service_recovers():
+    embedder = FakeEmbedder(delay=0.05, fail_on="坏")
+    service = EmbeddingService(mode="local", factory=lambda: embedder, batch_size=64, wait_ms=0)
+    try:
+        # 先占住执行器，使后两个请求进入同一批
+        blocker = service.submit(["占位"])
+        time.sleep(0.01)
+        bad = service.submit(["坏"])
+        good = service.submit(["好"])
+        blocker.result(timeout=5)
+        with pytest.raises(RuntimeError):
+            bad.result(timeout=5)
+        with pytest.raises(RuntimeError):
+            good.result(timeout=5)
+        assert service.embed(["好"]) == [_vector("好")]
+    finally:
+        service.shutdown()
+
+
+def test_async_interface():
+    service = EmbeddingService(mode="local", factory=FakeEmbedder, wait_ms=1)
+
+    async def run():
+        return await asyncio.gather(*(service.aembed([f"异步{i}"]) for i in range(5)))
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        service.shutdown()
+    assert results == [[_vector(f"异步{i}")] for i in range(5)]
+    assert service.embed([]) == []
+
+
+def test_unknown_mode_rejected():
+    with pytest.raises(ValueError):
+        EmbeddingService(mode="gpu")
+
+
+def test_process_pool_mode():
+    service = EmbeddingService(mode="process", factory=_fake_factory, workers=2, wait_ms=1)
+    try:
+        service.start(warmup=True)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(service.embed, [[f"进程{i}"] for i in range(8)]))
+    finally:
+        service.shutdown()
+    assert results == [[_vector(f"进程{i}")] for i in range(8)]
+
+
+def test_http_mode_against_stub():
+    """HTTP 协议足够简单，任意桩服务即可替代 sidecar"""
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            requests_seen.append(body["texts"])
+            payload = json.dumps({"embeddings": [_vector(t) for t in body["texts"]]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    stub = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    service = EmbeddingService(mode="http", url=f"http://127.0.0.1:{stub.server_port}/", workers=2, wait_ms=1)
+    try:
+        assert service.embed(["你好", "世界"]) == [_vector("你好"), _vector("世界")]
+    finally:
+        service.shutdown()
+        stub.shutdown()
+    assert requests_seen == [["你好", "世界"]]
+
+
+def test_sidecar_endpoint():
+    server.service = EmbeddingService(mode="local", factory=FakeEmbedder, wait_ms=1)
+    try:
+        client = TestClient(server.app)
+        response = client.post("/embed", json={"texts": ["你好", "再见"]})
+        assert response.status_code == 200
+        assert response.json() == {"embeddings": [_vector("你好"), _vector("再见")], "dim": 3}
+        assert client.post("/embed", json={"texts": ["x"] * 10000}).status_code == 413
+        assert "embedding.texts" in client.get("/metrics").json()["counters"]
+    finally:
+        server.service.shutdown()
+        server.service = None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
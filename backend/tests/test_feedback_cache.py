@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+反馈摘要缓存测试
+使用内存 Redis 与替身上游接口验证：缓存读写与命中率、提交反馈时失效，以及失效前读取的旧摘要不会被写回
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.initialize import http_client, redis
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.modules.workflow.nodes import feedback_node
+from app.services.feedback_service import feedback_service
+from tests.fake_redis import FakeRedis
+
+USER_ID = "42"
+DAYS = 7
+CACHE_KEY = f"feedback_summary:{USER_ID}"
+
+
+def _feedback(total, useful):
+    return {"total_count": total, "useful_count": useful, "not_useful_count": total - useful,
+            "useful_rate": useful / total, "feedback_types": {}}
+
+
+def test_cache_roundtrip_and_hit_rate():
+    redis.redis_client = FakeRedis()
+
+    async def run():
+        before = metrics.snapshot().get("counters", {})
+        miss = await feedback_service.get_cached_summary(USER_ID, DAYS)
+        generation = await feedback_service.get_summary_generation(USER_ID)
+        written = await feedback_service.set_cached_summary(USER_ID, DAYS, "摘要", 60, generation)
+        hit = await feedback_service.get_cached_summary(USER_ID, DAYS)
+        unchecked = await feedback_service.get_cached_summary(USER_ID, DAYS, count=False)
+        return before, miss, written, hit, unchecked, metrics.snapshot().get("counters", {})
+
+    before, miss, written, hit, unchecked, after = asyncio.run(run())
+    assert miss is None and written and hit == unchecked == "摘要"
+    assert redis.redis_client.ttls[CACHE_KEY] == 60
+    delta = lambda name: after.get(name, 0) - before.get(name, 0)
+    assert delta("feedback_summary_cache.miss") == 1 and delta("feedback_summary_cache.hit") == 1
+
+
+def test_stale_write_rejected_after_invalidation():
+    """读取版本号之后用户提交了反馈：旧摘要不写回缓存，新一轮读取到的是新版本"""
+    redis.redis_client = FakeRedis()
+
+    async def run():
+        stale = await feedback_service.get_summary_generation(USER_ID)
+        await feedback_service.invalidate_summary_cache(USER_ID)
+        rejected = await feedback_service.set_cached_summary(USER_ID, DAYS, "旧摘要", 60, stale)
+        cached = await feedback_service.get_cached_summary(USER_ID, DAYS)
+        fresh = await feedback_service.get_summary_generation(USER_ID)
+        accepted = await feedback_service.set_cached_summary(USER_ID, DAYS, "新摘要", 60, fresh)
+        return rejected, cached, accepted, await feedback_service.get_cached_summary(USER_ID, DAYS)
+
+    rejected, cached, accepted, latest = asyncio.run(run())
+    assert rejected is False and cached is None
+    assert accepted is True and latest == "新摘要"
+    assert redis.redis_client.ttls[f"feedback_summary_gen:{USER_ID}"] >= settings.FEEDBACK_SUMMARY_CACHE_TTL
+
+
+def test_refresh_racing_with_feedback_does_not_cache_old_summary(monkeypatch):
+    """反馈节点获取统计期间提交反馈（create_feedback 成功后失效缓存），本轮结果不写入缓存"""
+    redis.redis_client = FakeRedis()
+
+    def handler(request):
+        assert request.url.path == "/app/ai_feedback/create"
+        return httpx.Response(200, json={"code": 0, "msg": "ok", "data": None})
+
+    async def fetch_during_feedback(access_token, days=None):
+        result = await feedback_service.create_feedback(
+            conversation_id="c1", user_id=USER_ID, is_useful=False, feedback_type=["答非所问"],
+            comment="", user_message="你好", ai_response="回答", access_token=access_token
+        )
+        assert result["code"] == 0
+        return _feedback(2, 2)
+
+    async def fetch_after_feedback(access_token, days=None):
+        return _feedback(2, 1)
+
+    async def run():
+        http_client.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            monkeypatch.setattr(feedback_node, "fetch_user_feedback_summary", fetch_during_feedback)
+            await feedback_service.set_cached_summary(
+                USER_ID, DAYS, "更早的摘要", 60, await feedback_service.get_summary_generation(USER_ID)
+            )
+            first, _ = await feedback_node.refresh_feedback_summary(USER_ID, "token", DAYS)
+            after_race = await feedback_service.get_cached_summary(USER_ID, DAYS)
+            monkeypatch.setattr(feedback_node, "fetch_user_feedback_summary", fetch_after_feedback)
+            second, _ = await feedback_node.refresh_feedback_summary(USER_ID, "token", DAYS)
+            return first, after_race, second, await feedback_service.get_cached_summary(USER_ID, DAYS)
+        finally:
+            await http_client.http_client.aclose()
+            http_client.http_client = None
+
+    first, after_race, second, cached = asyncio.run(run())
+    assert after_race is None
+    assert first != second and cached == second
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
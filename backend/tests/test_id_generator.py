@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对话 ID 生成器测试
+验证雪花 ID 的唯一性、单调性、conversation_id 语法校验，以及 worker ID 租约丢失/不可用时不再使用该 worker ID
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import pytest
+
+from app.initialize import id_worker, redis
+from app.utils.id_generator import (
+    SnowflakeGenerator,
+    snowflake,
+    generate_conversation_id,
+    generate_snowflake_conversation_id,
+    extract_timestamp_from_id,
+    is_valid_conversation_id,
+)
+from tests.fake_redis import FakeRedis
+
+
+def test_snowflake_unique_and_monotonic():
+    generator = SnowflakeGenerator(worker_id=5)
+    ids = [generator.next_id() for _ in range(20000)]
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    assert all((i >> SnowflakeGenerator.SEQUENCE_BITS) & SnowflakeGenerator.MAX_WORKER_ID == 5 for i in ids)
+
+
+def test_different_workers_never_collide():
+    a, b = SnowflakeGenerator(worker_id=1), SnowflakeGenerator(worker_id=2)
+    ids_a = {a.next_id() for _ in range(5000)}
+    ids_b = {b.next_id() for _ in range(5000)}
+    assert not ids_a & ids_b
+
+
+def test_conversation_id_format():
+    conversation_id = generate_snowflake_conversation_id()
+    assert is_valid_conversation_id(conversation_id)
+    assert extract_timestamp_from_id(conversation_id) > SnowflakeGenerator.EPOCH
+    # 旧格式依然有效
+    assert is_valid_conversation_id(generate_conversation_id())
+    assert not is_valid_conversation_id("conv_abc")
+    assert not is_valid_conversation_id("conv_../../etc_1")
+
+
+def test_expired_worker_id_not_used():
+    generator = SnowflakeGenerator(worker_id=None)
+    assert not generator.available()
+    with pytest.raises(RuntimeError):
+        generator.next_id()
+    generator.set_worker_id(3, valid_until=time.monotonic() + 60)
+    assert generator.available() and generator.next_id()
+    generator.extend(time.monotonic() - 1)
+    assert not generator.available()
+    with pytest.raises(RuntimeError):
+        generator.next_id()
+
+
+def _lease_owner(worker_id):
+    return redis.redis_client.data.get(f"{id_worker.WORKER_LEASE_PREFIX}{worker_id}")
+
+
+def test_lost_lease_is_replaced(monkeypatch):
+    """租约被其他进程接手后停止使用原 worker ID 并重新分配；释放时不删除他人的租约"""
+    monkeypatch.setattr(redis, "redis_client", FakeRedis())
+    monkeypatch.setattr(id_worker, "_renew_interval", lambda: 0.01)
+
+    async def scenario():
+        await id_worker.init_id_worker()
+        try:
+            first = snowflake.worker_id
+            assert snowflake.available() and _lease_owner(first) == id_worker._owner
+            await asyncio.sleep(0.05)
+            assert snowflake.worker_id == first  # 续约成功，保持不变
+
+            redis.redis_client.data[f"{id_worker.WORKER_LEASE_PREFIX}{first}"] = "other-process"
+            await asyncio.sleep(0.05)
+            second = snowflake.worker_id
+            assert second is not None and second != first
+            assert _lease_owner(second) == id_worker._owner
+            return first, second
+        finally:
+            redis.redis_client.data[f"{id_worker.WORKER_LEASE_PREFIX}{snowflake.worker_id}"] = "next-owner"
+            await id_worker.close_id_worker()
+
+    first, second = asyncio.run(scenario())
+    assert _lease_owner(first) == "other-process"
+    assert _lease_owner(second) == "next-owner"
+    assert not snowflake.available()
+
+
+def test_no_redis_falls_back_to_uuid_ids(monkeypatch):
+    """Redis 不可用时不随机选择 worker ID：对话 ID 使用随机 UUID 格式，Redis 恢复后再分配"""
+    monkeypatch.setattr(redis, "redis_client", None)
+    monkeypatch.setattr(id_worker, "_renew_interval", lambda: 0.01)
+
+    async def scenario():
+        await id_worker.init_id_worker()
+        try:
+            assert not snowflake.available()
+            conversation_id = generate_snowflake_conversation_id()
+            assert is_valid_conversation_id(conversation_id)
+            assert len(conversation_id.split("_")[1]) == 12  # generate_conversation_id 格式
+
+            redis.redis_client = FakeRedis()
+            await asyncio.sleep(0.05)
+            assert snowflake.available()
+            assert len(generate_snowflake_conversation_id().split("_")[1]) == 16
+        finally:
+            await id_worker.close_id_worker()
+        assert redis.redis_client.data.get(f"{id_worker.WORKER_LEASE_PREFIX}1") is None
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    test_snowflake_unique_and_monotonic()
+    test_different_workers_never_collide()
+    test_conversation_id_format()
+    test_expired_worker_id_not_used()
+    print("✅ 对话 ID 生成器测试通过")
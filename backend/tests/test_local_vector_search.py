@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会话级本地向量检索测试
+使用内存 Redis 与替身 ChromaDB 验证：小会话本地暴力检索、首次检索从 ChromaDB 构建、增量追加、超过阈值回退 ChromaDB
+"""
+
+import asyncio
+import sys
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.initialize import redis
+from app.core.config import settings
+from app.modules.chromadb.core.local_index import decode_entry, encode_entry, vector_distances
+from app.modules.workflow.core import artifacts
+from app.modules.workflow.nodes import chromadb_node
+from tests.fake_redis import FakeRedis
+
+
+def _embed(texts):
+    """按文本生成确定性的伪向量（相同文本向量相同）"""
+    return [np.random.default_rng(zlib.crc32(t.encode())).standard_normal(64).tolist() for t in texts]
+
+
+def _setup(monkeypatch):
+    redis.redis_client = FakeRedis()
+    chromadb_node.conversation_vector_index._cache.clear()
+    monkeypatch.setattr(settings, "SIMILAR_SEARCH_MIN_MESSAGES", 0)
+    monkeypatch.setattr(settings, "CHROMADB_DISTANCE_METRIC", "cosine")
+    store, calls = [], {"build": 0, "search": 0}
+    core = chromadb_node.get_memory_store()
+
+    def add_message(user_id, session_id, role, content, timestamp=None, embedding=None, **kwargs):
+        store.append({"id": f"m{len(store)}", "role": role, "content": content, "timestamp": timestamp,
+                      "embedding": embedding or _embed([content])[0]})
+        return store[-1]["id"]
+
+    def get_session_vectors(user_id, session_id):
+        calls["build"] += 1
+        return list(store)
+
+    def search_memory(**kwargs):
+        calls["search"] += 1
+        return []
+
+    monkeypatch.setattr(core, "embed", _embed)
+    monkeypatch.setattr(core, "add_message", add_message)
+    monkeypatch.setattr(core, "get_session_vectors", get_session_vectors)
+    monkeypatch.setattr(core, "search_memory", search_memory)
+    monkeypatch.setattr(core, "count_messages", lambda user_id, session_id: len(store))
+    return store, calls
+
+
+async def _save(user_input, llm_response):
+    await chromadb_node.save_memory_node({
+        "user_id": "u1", "conversation_id": "c1", "user_input": user_input, "llm_response": llm_response
+    })
+
+
+async def _similar(user_input):
+    artifacts.open_scope()
+    try:
+        result = await chromadb_node.get_similar_messages_node({
+            "user_id": "u1", "conversation_id": "c1", "user_input": user_input
+        })
+        return artifacts.get(result["similar_memories_ref"], [])
+    finally:
+        artifacts.close_scope()
+
+
+def test_entry_roundtrip_and_distances():
+    vector = _embed(["骑手被扣款"])[0]
+    item, decoded = decode_entry(encode_entry({"id": "m1", "role": "user", "content": "骑手被扣款"}, vector))
+    assert item["content"] == "骑手被扣款" and decoded.dtype == np.float16
+    assert np.allclose(decoded, vector, atol=1e-2)
+
+    matrix = np.asarray(_embed(["a", "b", "c"]), dtype=np.float32)
+    query = np.asarray(vector, dtype=np.float32)
+    cosine = vector_distances(matrix, query, "cosine")
+    expected = 1 - matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+    assert np.allclose(cosine, expected, atol=1e-6)
+    assert np.allclose(vector_distances(matrix, query, "l2"), ((matrix - query) ** 2).sum(axis=1), atol=1e-4)
+
+
+def test_small_conversation_searched_locally(monkeypatch):
+    store, calls = _setup(monkeypatch)
+
+    async def run():
+        await _save("平台无故扣款怎么办", "可以先收集订单截图")
+        first = await _similar("平台无故扣款怎么办")   # 首次检索：从 ChromaDB 构建本地向量
+        await _save("差评申诉", "在 App 内提交申诉")        # 之后的保存增量追加
+        second = await _similar("差评申诉")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert calls == {"build": 1, "search": 0}
+    assert first[0]["content"] == "平台无故扣款怎么办" and first[0]["distance"] < 1e-3
+    assert second[0]["content"] == "差评申诉" and second[0]["id"] == "m2"
+    assert redis.redis_client._cmd_llen("memory_vec:u1:c1") == len(store) == 4
+
+
+def test_stale_or_oversized_conversation_falls_back(monkeypatch):
+    store, calls = _setup(monkeypatch)
+
+    async def run():
+        await _save("问题一", "回答一")
+        await _similar("问题一")
+        # 向量追加失败（如进程在追加前退出）：列表条数落后于计数，重新构建
+        monkeypatch.setattr(chromadb_node.conversation_vector_index, "append", lambda *a, **k: asyncio.sleep(0))
+        await _save("问题二", "回答二")
+        rebuilt = await _similar("问题二")
+        monkeypatch.setattr(settings, "LOCAL_VECTOR_SEARCH_MAX", 3)
+        await _similar("问题二")
+        return rebuilt
+
+    rebuilt = asyncio.run(run())
+    assert rebuilt[0]["content"] == "问题二"
+    assert calls == {"build": 2, "search": 1}
+
+
+def test_expired_memory_count_reseeded_from_store(monkeypatch):
+    """计数键过期后按存储中的条数重建，长会话不会因计数从 0 开始而跳过相似检索"""
+    store, calls = _setup(monkeypatch)
+    monkeypatch.setattr(settings, "SIMILAR_SEARCH_MIN_MESSAGES", 4)
+
+    async def run():
+        for i in range(3):
+            await _save(f"问题{i}", f"回答{i}")
+        await redis.redis_client.delete("memory_count:u1:c1")   # 模拟空闲 7 天后计数键过期
+        await _save("问题3", "回答3")
+        return await chromadb_node.get_memory_count("u1", "c1"), await _similar("问题3")
+
+    count, memories = asyncio.run(run())
+    assert count == len(store) == 8
+    assert redis.redis_client.ttls["memory_count:u1:c1"]
+    assert memories and memories[0]["content"] == "问题3"
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
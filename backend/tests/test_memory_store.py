@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对话记忆存储抽象测试
+使用内存 ChromaDB（EphemeralClient）与内存替身存储验证：统一记录格式读写、后端间迁移（保留向量）、
+dry-run 不写入、Milvus 过滤表达式转义与行格式转换，以及按 Milvus 参数规则校验的查询（不依赖 pymilvus）
+"""
+
+import json
+import re
+import sys
+import uuid
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import chromadb
+from chromadb import EmbeddingFunction
+
+from app.modules.chromadb.core.chromadb_core import ChromaDBCore
+from app.modules.memory_store import MemoryStore, RECORD_FIELDS, create_memory_store
+from app.modules.memory_store.migrate import migrate
+from app.modules.memory_store.milvus_store import MilvusMemoryStore, QUERY_LIMIT
+
+
+class FakeEmbeddingFunction(EmbeddingFunction):
+    """按文本生成确定性的伪向量（相同文本向量相同）"""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [np.random.default_rng(zlib.crc32(t.encode())).standard_normal(16).astype(np.float32) for t in input]
+
+    @staticmethod
+    def name():
+        return "fake"
+
+    def get_config(self):
+        return {}
+
+    @staticmethod
+    def build_from_config(config):
+        return FakeEmbeddingFunction()
+
+
+class InMemoryStore(MemoryStore):
+    """迁移目标替身：记录保存在字典中"""
+
+    backend = "memory"
+
+    def __init__(self):
+        super().__init__()
+        self.records = {}
+
+    def add_message(self, *args, **kwargs):
+        raise NotImplementedError
+
+    def add_records(self, records):
+        for record in records:
+            self.records[record["id"]] = dict(record)
+        return len(records)
+
+    def search_memory(self, *args, **kwargs):
+        return []
+
+    def get_all_messages(self, user_id, session_id=None, limit=None):
+        return []
+
+    def get_session_vectors(self, user_id, session_id):
+        return []
+
+    def delete_session_memory(self, user_id, session_id):
+        return 0
+
+    def count_messages(self, user_id, session_id):
+        return 0
+
+    def iter_records(self, batch_size=500):
+        items = list(self.records.values())
+        for start in range(0, len(items), batch_size):
+            yield items[start:start + batch_size]
+
+    def count_all(self):
+        return len(self.records)
+
+
+def _chroma_store() -> ChromaDBCore:
+    core = ChromaDBCore()
+    core.client = chromadb.EphemeralClient()
+    core.embedding_function = FakeEmbeddingFunction()
+    core.collection_name = f"test_memory_{uuid.uuid4().hex[:8]}"
+    return core
+
+
+def test_chroma_records_round_trip():
+    """add_message 写入的记录可以按统一格式分批读出，向量与检索使用同一嵌入函数"""
+    store = _chroma_store()
+    store.add_message("u1", "s1", "user", "今天心情不好", intent="emotion", intent_confidence=0.9)
+    store.add_message("u1", "s1", "assistant", "愿意说说发生了什么吗", check_duplicate=False)
+    store.add_message("u2", "s2", "user", "平台派单太少了")
+
+    assert store.count_all() == 3
+    batches = list(store.iter_records(batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 1]
+
+    records = {record["content"]: record for batch in batches for record in batch}
+    first = records["今天心情不好"]
+    assert set(RECORD_FIELDS) <= set(first)
+    assert first["intent"] == "emotion" and first["intent_confidence"] == "0.9"
+    assert np.allclose(first["embedding"], store.embed(["今天心情不好"])[0], atol=1e-6)
+
+    hits = store.search_memory("u1", "s1", "今天心情不好", n_results=5)
+    assert len(hits) == 2
+    assert hits[0]["content"] == "今天心情不好"
+    assert hits[0]["distance"] == pytest.approx(0.0, abs=1e-5)
+
+
+def test_migrate_preserves_records_and_vectors():
+    """迁移按批写入目标后端，ID、元数据与向量原样保留，重复执行不产生重复记录"""
+    source = _chroma_store()
+    for i in range(7):
+        source.add_message("u1", f"s{i % 2}", "user", f"消息{i}", message_id=f"m{i}", check_duplicate=False)
+    target = InMemoryStore()
+
+    result = migrate(source, target, batch_size=3)
+    assert result["source_count"] == result["migrated"] == result["target_count"] == 7
+    assert sorted(target.records) == [f"m{i}" for i in range(7)]
+    assert target.records["m3"]["session_id"] == "s1"
+    assert np.allclose(target.records["m3"]["embedding"], source.embed(["消息3"])[0], atol=1e-6)
+
+    # 反向迁移到新的 ChromaDB 集合，再次执行结果不变（upsert）
+    restored = _chroma_store()
+    migrate(target, restored, batch_size=4)
+    result = migrate(target, restored, batch_size=4)
+    assert result["target_count"] == 7
+    assert [m["content"] for m in restored.get_all_messages("u1", "s0")] == ["消息0", "消息2", "消息4", "消息6"]
+
+
+def test_migrate_dry_run_writes_nothing():
+    source = InMemoryStore()
+    source.add_records([{"id": "a", "content": "x", "embedding": [0.0, 1.0], "user_id": "u", "session_id": "s"}])
+    target = InMemoryStore()
+
+    result = migrate(source, target, dry_run=True)
+    assert result["migrated"] == 1
+    assert result["target_count"] is None
+    assert target.records == {}
+
+
+def test_milvus_row_conversion_and_filter():
+    """Milvus 行格式：None → 空字符串（VARCHAR 不接受 None），读出时还原；过滤表达式中的引号被转义"""
+    record = {
+        "id": "m1", "content": "你好", "embedding": np.ones(4, dtype=np.float32),
+        "user_id": "u1", "session_id": "s1", "role": "user", "timestamp": "2025-01-01T00:00:00",
+        "intent": None, "intent_confidence": "0.8", "intents": [{"intent": "chat"}]
+    }
+    row = MilvusMemoryStore._to_row(record)
+    assert row["embedding"] == [1.0] * 4
+    assert row["intent"] == ""
+    assert row["intents"] == '[{"intent": "chat"}]'
+
+    message = MilvusMemoryStore._from_entity(row)
+    assert message["intent"] is None
+    assert message["intent_confidence"] == "0.8"
+
+    expr = MilvusMemoryStore._filter('u"1', "s1")
+    assert expr == 'user_id == "u\\"1" and session_id == "s1"'
+    assert MilvusMemoryStore._filter("u1") == 'user_id == "u1"'
+
+
+def test_milvus_distance_matches_chroma():
+    """COSINE / IP 的相似度换算为 ChromaDB 距离，L2 保持不变"""
+    store = MilvusMemoryStore()
+    store.metric_type = "COSINE"
+    assert store._to_distance(0.75) == pytest.approx(0.25)
+    store.metric_type = "L2"
+    assert store._to_distance(0.75) == pytest.approx(0.75)
+
+
+class FakeMilvusClient:
+    """MilvusClient 替身：按 Milvus 的参数规则校验 query（count(*) 不能带 limit，limit 不超过 16384）"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def _match(self, expr):
+        conditions = dict((field, json.loads(value)) for field, value in re.findall(r'(\w+) == ("(?:[^"\\]|\\.)*")', expr))
+        return [row for row in self.rows if all(row[field] == value for field, value in conditions.items())]
+
+    def query(self, collection_name, filter="", output_fields=None, limit=None, offset=0, **kwargs):
+        self.calls.append({"filter": filter, "output_fields": output_fields, "limit": limit})
+        output_fields = output_fields or []
+        if "count(*)" in output_fields:
+            if limit is not None:
+                raise ValueError("count entities with pagination is not allowed")
+            return [{"count(*)": len(self._match(filter))}]
+        if not filter and limit is None:
+            raise ValueError("empty expression should be used with limit")
+        if limit is not None and not 1 <= offset + limit <= 16384:
+            raise ValueError("invalid max query result window")
+        matched = self._match(filter)[offset:offset + limit if limit is not None else None]
+        return [{field: row[field] for field in output_fields} for row in matched]
+
+
+def test_milvus_count_and_session_vectors_follow_query_rules():
+    rows = []
+    for i, session_id in enumerate(["s1", "s1", "s2"]):
+        record = {
+            "id": f"m{i}", "content": f"消息{i}", "embedding": [float(i)] * 4,
+            "user_id": "u1", "session_id": session_id, "role": "user", "timestamp": f"2025-01-01T00:00:0{2 - i}"
+        }
+        rows.append(MilvusMemoryStore._to_row(record))
+    store = MilvusMemoryStore()
+    store.client = FakeMilvusClient(rows)
+    store._collection_ready = True
+
+    assert store.count_messages("u1", "s1") == 2
+    assert store.count_messages("u1", "s3") == 0
+    vectors = store.get_session_vectors("u1", "s1")
+    assert [record["id"] for record in vectors] == ["m1", "m0"]
+    assert vectors[0]["embedding"] == [1.0] * 4
+
+    count_call, _, vector_call = store.client.calls
+    assert count_call["limit"] is None
+    assert vector_call["limit"] == QUERY_LIMIT
+
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError):
+        create_memory_store("bogus")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+节点时限测试
+使用简化的并行工作流验证：可选节点超时降级为空结果并标记 degraded_nodes，必需节点超时抛出异常，
+请求级截止时间会收紧节点时限，持久化节点不受已过期的截止时间约束
+"""
+
+import asyncio
+import operator
+import sys
+import time
+from pathlib import Path
+from typing import Annotated, List, TypedDict
+
+import pytest
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from langgraph.graph import END
+from app.core import deadline
+from app.modules.workflow.core.graph import NodeDeadlineExceeded, WorkflowGraphBuilder, parse_node_budgets
+
+
+class _State(TypedDict, total=False):
+    user_input: str
+    similar_messages: str
+    feedback_summary: str
+    answer: str
+    degraded_nodes: Annotated[List[str], operator.add]
+
+
+def _build(similar_delay=0.0, feedback_delay=0.0, answer_delay=0.0, budget=0.1):
+    async def start(state):
+        return {}
+
+    async def similar(state):
+        await asyncio.sleep(similar_delay)
+        return {"similar_messages": "相似记忆"}
+
+    async def feedback(state, config=None):
+        await asyncio.sleep(feedback_delay)
+        return {"feedback_summary": "反馈摘要"}
+
+    async def answer(state):
+        await asyncio.sleep(answer_delay)
+        return {"answer": f"{state.get('similar_messages', '')}|{state.get('feedback_summary', '')}"}
+
+    builder = WorkflowGraphBuilder(state_schema=_State)
+    builder.add_node("start", start)
+    builder.add_node("similar", similar, budget=budget, optional=True, fallback={"similar_messages": ""})
+    builder.add_node("feedback", feedback, budget=budget, optional=True, fallback={"feedback_summary": ""})
+    builder.add_node("answer", answer, budget=budget)
+    builder.set_entry_point("start")
+    builder.add_edge("start", "similar")
+    builder.add_edge("start", "feedback")
+    builder.add_edge("similar", "answer")
+    builder.add_edge("feedback", "answer")
+    builder.add_edge("answer", END)
+    return builder.compile()
+
+
+def test_parse_node_budgets():
+    assert parse_node_budgets("get_similar_messages:1.5, get_feedback:1") == {
+        "get_similar_messages": 1.5,
+        "get_feedback": 1.0,
+    }
+    assert parse_node_budgets("") == {}
+
+
+def test_optional_node_degrades():
+    """可选节点超时：返回空结果并标记降级，后续节点照常执行"""
+    async def run():
+        deadline.set_deadline(None)
+        graph = _build(similar_delay=1.0)
+        started = time.perf_counter()
+        result = await graph.ainvoke({"user_input": "你好"})
+        return result, time.perf_counter() - started
+
+    result, elapsed = asyncio.run(run())
+    assert result["degraded_nodes"] == ["similar"]
+    assert result["answer"] == "|反馈摘要"
+    assert elapsed < 0.5
+
+
+def test_all_optional_nodes_degrade():
+    async def run():
+        deadline.set_deadline(None)
+        return await _build(similar_delay=1.0, feedback_delay=1.0).ainvoke({"user_input": "你好"})
+
+    result = asyncio.run(run())
+    assert sorted(result["degraded_nodes"]) == ["feedback", "similar"]
+    assert result["answer"] == "|"
+
+
+def test_required_node_raises():
+    async def run():
+        deadline.set_deadline(None)
+        await _build(answer_delay=1.0).ainvoke({"user_input": "你好"})
+
+    with pytest.raises(NodeDeadlineExceeded):
+        asyncio.run(run())
+
+
+def test_request_deadline_tightens_budget():
+    """请求剩余时间小于节点时限时，以剩余时间为准"""
+    async def run():
+        deadline.set_deadline(0.05)
+        graph = _build(similar_delay=0.08, budget=5.0)
+        try:
+            return await graph.ainvoke({"user_input": "你好"})
+        finally:
+            deadline.set_deadline(None)
+
+    result = asyncio.run(run())
+    assert result["degraded_nodes"] == ["similar"]
+
+
+def test_timeout_for():
+    deadline.set_deadline(None)
+    assert deadline.remaining() is None
+    assert deadline.timeout_for(10.0) == 10.0
+    deadline.set_deadline(2.0)
+    assert deadline.timeout_for(10.0) <= 2.0
+    assert deadline.timeout_for(0.5) == 0.5
+    deadline.set_deadline(None)
+
+
+def test_persist_node_ignores_expired_deadline():
+    """截止时间已过时，持久化节点内的下游超时不被压缩到 MIN_TIMEOUT，节点结束后恢复"""
+    seen = {}
+
+    async def answer(state):
+        await asyncio.sleep(0.06)
+        return {"answer": "回答"}
+
+    async def save(state):
+        seen["remaining"] = deadline.remaining()
+        seen["timeout"] = deadline.timeout_for(5.0)
+        return {}
+
+    async def run():
+        deadline.set_deadline(0.05)
+        builder = WorkflowGraphBuilder(state_schema=_State)
+        builder.add_node("answer", answer)
+        builder.add_node("save", save, persist=True)
+        builder.set_entry_point("answer")
+        builder.add_edge("answer", "save")
+        builder.add_edge("save", END)
+        try:
+            result = await builder.compile().ainvoke({"user_input": "你好"})
+            return result, deadline.remaining()
+        finally:
+            deadline.set_deadline(None)
+
+    result, left = asyncio.run(run())
+    assert result["answer"] == "回答"
+    assert seen == {"remaining": None, "timeout": 5.0}
+    assert left is not None and left < 0
+
+
+def test_request_seconds_only_shortens():
+    assert deadline.request_seconds(None, 60.0) == 60.0
+    assert deadline.request_seconds(10.0, 60.0) == 10.0
+    assert deadline.request_seconds(120.0, 60.0) == 60.0
+    assert deadline.request_seconds(30.0, 0) == 30.0
+
+
+if __name__ == "__main__":
+    test_parse_node_budgets()
+    test_optional_node_degrades()
+    test_all_optional_nodes_degrade()
+    test_required_node_raises()
+    test_request_deadline_tightens_budget()
+    test_timeout_for()
+    test_persist_node_ignores_expired_deadline()
+    test_request_seconds_only_shortens()
+    print("✅ 节点时限测试通过")
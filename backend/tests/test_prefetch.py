@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会话预热测试
+使用内存 Redis 与替身上游接口验证：/init 与打开对话时填充缓存、按用户去重、已缓存时不再请求上游
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.initialize import redis
+from app.core.metrics import metrics
+from app.modules.workflow.nodes import feedback_node
+from app.modules.workflow.nodes.working_memory import WorkingMemory
+from app.services.prefetch_service import SessionPrefetchService
+from app.services.ticket_service import ticket_service
+from tests.fake_redis import FakeRedis
+
+USER = {"appUserId": 42, "companyName": "平台A", "age": 30, "gender": "男"}
+
+
+def _setup(monkeypatch):
+    redis.redis_client = FakeRedis()
+    calls = {"feedback": 0, "categories": 0, "history": 0}
+
+    async def fake_feedback(access_token, days=None):
+        calls["feedback"] += 1
+        return {"total_count": 2, "useful_count": 1, "not_useful_count": 1, "useful_rate": 0.5, "feedback_types": {}}
+
+    async def fake_categories(access_token):
+        calls["categories"] += 1
+        return {"code": 0, "data": [{"name": "权益咨询"}]}
+
+    async def fake_history(session_token, access_token):
+        calls["history"] += 1
+        return [{"role": "user", "content": "你好"}]
+
+    monkeypatch.setattr(feedback_node, "fetch_user_feedback_summary", fake_feedback)
+    monkeypatch.setattr(ticket_service, "_fetch_volunteer_service_categories", fake_categories)
+    monkeypatch.setattr(WorkingMemory, "_fetch_history_from_api", staticmethod(fake_history))
+    return calls
+
+
+async def _drain(service):
+    while service._inflight:
+        await asyncio.gather(*list(service._inflight.values()))
+
+
+def test_init_prefetch_fills_caches_and_dedups(monkeypatch):
+    calls = _setup(monkeypatch)
+    service = SessionPrefetchService()
+
+    async def run():
+        service.schedule(USER, "token")
+        service.schedule(USER, "token")  # 进程内去重
+        await _drain(service)
+        service.schedule(USER, "token")  # 去重窗口内（Redis NX）
+        await _drain(service)
+
+    asyncio.run(run())
+    assert calls == {"feedback": 1, "categories": 1, "history": 0}
+    client = redis.redis_client
+    assert json.loads(client.data["user_profile:42"])["company"] == "平台A"
+    assert "feedback_summary:42" in client.data
+    assert ticket_service.CATEGORIES_CACHE_KEY in client.data
+
+
+def test_chat_hits_prefetched_caches(monkeypatch):
+    calls = _setup(monkeypatch)
+    service = SessionPrefetchService()
+    session = {"user_id": "42", "company": "平台A", "age": "30", "gender": "男"}
+    history = [{"role": "user", "content": "骑手差评"}, {"role": "assistant", "content": "可以申诉"}]
+
+    async def run():
+        service.schedule(session, "token", conversation_id="conv_1", history=history)
+        await _drain(service)
+        before = metrics.snapshot()["counters"]
+        categories = await ticket_service.get_volunteer_service_categories("token")
+        messages = await WorkingMemory.get_messages("conv_1", "token")
+        return before, categories, messages
+
+    before, categories, messages = asyncio.run(run())
+    after = metrics.snapshot()["counters"]
+    assert categories["data"] == [{"name": "权益咨询"}]
+    assert messages == history
+    assert calls == {"feedback": 1, "categories": 1, "history": 0}  # 打开对话时直接使用已取得的历史
+    assert after["service_categories_cache.hit"] == before.get("service_categories_cache.hit", 0) + 1
+    assert after["working_memory.redis_hit"] == before.get("working_memory.redis_hit", 0) + 1
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
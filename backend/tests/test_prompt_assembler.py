@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prompt 组装引擎测试
+验证静态前缀逐字节稳定、易变上下文位于其后
+"""
+
+import sys
+from pathlib import Path
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.utils.prompt import ANRAN_SYSTEM_PROMPT, build_prompt_assembler, build_full_prompt
+
+
+def test_static_prefix_is_stable_across_users():
+    """不同用户、不同轮次的 system 消息必须完全一致"""
+    messages_a = build_prompt_assembler(
+        user_input="我被扣款了",
+        company="公司A",
+        age="25",
+        gender="男",
+        feedback_summary="用户满意度：80.0%"
+    ).build_messages()
+    messages_b = build_prompt_assembler(
+        user_input="你好",
+        company="公司B",
+        age="40",
+        gender="女",
+        working_memory_text="用户：在吗\n安然：我在"
+    ).build_messages()
+
+    assert messages_a[0] == {"role": "system", "content": ANRAN_SYSTEM_PROMPT}
+    assert messages_a[0] == messages_b[0]
+    assert messages_a[1]["role"] == "user"
+
+
+def test_volatile_sections_follow_frequency_order():
+    """易变上下文按变化频率从低到高排列，用户输入在最后"""
+    context = build_prompt_assembler(
+        user_input="我想投诉",
+        company="公司A",
+        working_memory_text="用户：你好",
+        similar_messages="用户：投诉 (相似度: 0.90)",
+        intents=[{"intent": "法律咨询", "confidence": 0.9}]
+    ).render_context()
+
+    positions = [
+        context.index("公司：公司A"),
+        context.index("用户暂无反馈记录"),
+        context.index("用户：你好"),
+        context.index("相似度: 0.90"),
+        context.index("法律咨询"),
+        context.index("用户：我想投诉"),
+    ]
+    assert positions == sorted(positions)
+    assert context.endswith("用户：我想投诉")
+
+
+def test_full_prompt_starts_with_static_prefix():
+    """兼容的字符串 Prompt 同样以静态前缀开头"""
+    prompt = build_full_prompt(user_input="你好", company="公司A")
+    assert prompt.startswith(ANRAN_SYSTEM_PROMPT)
+    assert "（这是新对话的开始）" in prompt
+
+
+if __name__ == "__main__":
+    test_static_prefix_is_stable_across_users()
+    test_volatile_sections_follow_frequency_order()
+    test_full_prompt_starts_with_static_prefix()
+    print("✅ Prompt 组装引擎测试通过")
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Redis 熔断测试
+验证熔断器状态转换、半开探测名额只由探测请求释放，以及 Redis 不可用时客户端快速失败并在恢复探测后重新放行
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.core.circuit_breaker import CircuitBreaker, PASS, PROBE
+from app.core.config import settings
+from app.initialize import redis
+
+
+def test_breaker_transitions():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+    assert breaker.allow() == PASS
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert not breaker.available
+
+    time.sleep(0.06)
+    assert breaker.available
+    assert breaker.allow() == PROBE  # 半开：放行一个探测
+    assert not breaker.allow()      # 探测进行中，其余请求拒绝
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def _half_open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow() == PROBE  # 占用半开探测名额
+    return breaker
+
+
+def test_cancelled_probe_releases_half_open_slot():
+    """探测请求被取消（客户端断开 / 截止时间）后，下一个请求仍可探测，不会永久熔断"""
+    breaker = _half_open_breaker()
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def scenario():
+        task = asyncio.create_task(redis._guarded(breaker, PROBE, slow))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(scenario())
+    assert breaker.state == "half_open"
+    assert breaker.available
+    assert breaker.allow()
+
+
+def test_slow_call_from_closed_state_keeps_active_probe():
+    """熔断前发起的慢请求在半开探测进行中被取消：不能释放探测名额，否则会同时放行多个探测"""
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    ticket = breaker.allow()
+    assert ticket == PASS
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def scenario():
+        task = asyncio.create_task(redis._guarded(breaker, ticket, slow))
+        await asyncio.sleep(0.01)
+        breaker.record_failure()  # 其他请求失败，熔断
+        await asyncio.sleep(0.02)
+        assert breaker.allow() == PROBE
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(scenario())
+    assert breaker.state == "half_open"
+    assert not breaker.available
+    assert breaker.allow() is None
+
+
+def test_response_error_counts_as_success():
+    """服务端返回错误（ResponseError）说明连接正常，探测视为成功"""
+    from redis.exceptions import ResponseError
+
+    breaker = _half_open_breaker()
+
+    async def wrong_type():
+        raise ResponseError("WRONGTYPE Operation against a key holding the wrong kind of value")
+
+    try:
+        asyncio.run(redis._guarded(breaker, PROBE, wrong_type))
+        raise AssertionError("应抛出 ResponseError")
+    except ResponseError:
+        pass
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_unreachable_redis_fails_fast():
+    async def scenario():
+        original = (settings.REDIS_HOST, settings.REDIS_PORT)
+        settings.REDIS_HOST, settings.REDIS_PORT = "127.0.0.1", 1
+        try:
+            await redis.init_redis()
+            client = redis.redis_client
+            assert client is not None
+            assert not client  # 熔断期间为假值，调用方走降级分支
+
+            started = time.perf_counter()
+            try:
+                await client.get("any")
+                raise AssertionError("熔断期间应快速失败")
+            except redis.RedisUnavailableError:
+                pass
+            try:
+                async with client.pipeline() as pipe:
+                    pipe.get("any")
+                    await pipe.execute()
+                raise AssertionError("熔断期间应快速失败")
+            except redis.RedisUnavailableError:
+                pass
+            assert time.perf_counter() - started < 0.05
+        finally:
+            settings.REDIS_HOST, settings.REDIS_PORT = original
+            await redis.close_redis()
+        assert redis.redis_client is None
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    test_breaker_transitions()
+    test_cancelled_probe_releases_half_open_slot()
+    test_slow_call_from_closed_state_keeps_active_probe()
+    test_response_error_counts_as_success()
+    test_unreachable_redis_fails_fast()
+    print("✅ Redis 熔断测试通过")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RedisService 对话历史测试
+验证追加为单次往返、长度封顶、元数据独立存储，以及旧格式数据的兼容读取与迁移
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.core.config import settings
+from app.initialize import redis
+from app.services.redis_service import RedisService
+from tests.fake_redis import FakeRedis
+
+
+def _with_fake(scenario):
+    original = redis.redis_client
+    redis.redis_client = FakeRedis()
+    try:
+        return asyncio.run(scenario(redis.redis_client, RedisService()))
+    finally:
+        redis.redis_client = original
+
+
+def test_append_single_round_trip_and_capped():
+    async def scenario(client, service):
+        await service.append_messages("u1", "s", [
+            {"role": "user", "content": "你好"},
+            {"role": "assistant", "content": "你好呀"}
+        ])
+        assert client.round_trips == 1
+
+        original_max = settings.CHAT_HISTORY_MAX_MESSAGES
+        settings.CHAT_HISTORY_MAX_MESSAGES = 3
+        try:
+            for i in range(5):
+                await service.append_message("u1", "s", "user", f"m{i}")
+        finally:
+            settings.CHAT_HISTORY_MAX_MESSAGES = original_max
+
+        history = await service.get_chat_history("u1")
+        assert [m["content"] for m in history] == ["m2", "m3", "m4"]
+        assert [m["content"] for m in await service.get_chat_history("u1", limit=2)] == ["m3", "m4"]
+
+        metadata = await service.get_conversation_metadata("u1")
+        assert metadata["conversation_count"] == 1
+        conversation_id = metadata["conversation_id"]
+
+        await service.start_new_conversation("u1", "s")
+        metadata = await service.get_conversation_metadata("u1")
+        assert metadata["conversation_count"] == 2
+        assert metadata["conversation_id"] != conversation_id
+        assert len(await service.get_chat_history("u1")) == 3
+
+        await service.clear_chat_history("u1")
+        assert await service.get_chat_history("u1") == []
+        assert await service.get_conversation_metadata("u1") is None
+
+    _with_fake(scenario)
+
+
+def test_legacy_blob_read_and_migrated_on_append():
+    async def scenario(client, service):
+        legacy = {
+            "metadata": {"conversation_id": "conv_old", "conversation_count": 4, "user_id": "u2"},
+            "messages": [{"role": "user", "content": "旧消息"}]
+        }
+        client.data["chat:history:u2"] = json.dumps(legacy, ensure_ascii=False)
+
+        assert await service.get_chat_history("u2") == legacy["messages"]
+        assert (await service.get_conversation_metadata("u2"))["conversation_id"] == "conv_old"
+
+        await service.append_message("u2", "s", "assistant", "新消息")
+        history = await service.get_chat_history("u2")
+        assert [m["content"] for m in history] == ["旧消息", "新消息"]
+        metadata = await service.get_conversation_metadata("u2")
+        assert metadata["conversation_id"] == "conv_old"
+        assert metadata["conversation_count"] == 4
+
+    _with_fake(scenario)
+
+
+if __name__ == "__main__":
+    test_append_single_round_trip_and_capped()
+    test_legacy_blob_read_and_migrated_on_append()
+    print("✅ RedisService 对话历史测试通过")
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSE 流式输出测试
+验证首 token 立即发送、按字节/时间窗口合并、控制消息单独成帧、含换行的帧编码，客户端断开时取消上游，
+以及断开时按回答是否已完整生成选择持久化策略
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+# 导入工作流模块时会创建 LLM 客户端（测试中不会发起请求）
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.core.config import settings
+from app.modules.workflow.workflows import workflow as chat_workflow
+from app.utils.sse import SSEFrameCoalescer, format_sse, watch_disconnect
+
+
+async def _source(items, delay=0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+async def _collect(coalescer, source):
+    return [frame async for frame in coalescer.coalesce(source)]
+
+
+def test_first_token_alone_then_merged():
+    tokens = ["你", "好", "，", "我", "是", "安", "然"]
+    frames = asyncio.run(_collect(SSEFrameCoalescer(window_ms=1000, max_bytes=4096), _source(tokens)))
+    assert frames == ["你", "好，我是安然"]
+
+
+def test_byte_threshold_flushes():
+    tokens = ["a", "bb", "cc", "dd", "e"]
+    frames = asyncio.run(_collect(SSEFrameCoalescer(window_ms=1000, max_bytes=4), _source(tokens)))
+    assert frames == ["a", "bbcc", "dde"]
+
+
+def test_time_window_flushes_during_pause():
+    async def slow():
+        yield "a"
+        yield "b"
+        await asyncio.sleep(0.1)
+        yield "c"
+
+    frames = asyncio.run(_collect(SSEFrameCoalescer(window_ms=20, max_bytes=4096), slow()))
+    assert frames == ["a", "b", "c"]
+
+
+def test_control_message_not_merged():
+    tokens = ["a", "b", "c", '[STATE] {"need_create_ticket": true}']
+    frames = asyncio.run(_collect(SSEFrameCoalescer(window_ms=1000, max_bytes=4096), _source(tokens)))
+    assert frames == ["a", "bc", '[STATE] {"need_create_ticket": true}']
+
+
+def test_disabled_passthrough():
+    tokens = ["a", "b", "c"]
+    frames = asyncio.run(_collect(SSEFrameCoalescer(window_ms=0, max_bytes=4096), _source(tokens)))
+    assert frames == tokens
+
+
+def _client_parse(wire):
+    """按前端（front/src/api/agent.ts）的方式解析：按空行切分消息，只保留 data: 开头的行"""
+    contents = []
+    for message in wire.split("\n\n"):
+        for line in message.split("\n"):
+            if line.startswith("data: ") and line[6:]:
+                contents.append(line[6:])
+    return contents
+
+
+def _spec_parse(wire):
+    """按 SSE 规范解析：同一消息的多个 data: 字段以换行拼接"""
+    events = []
+    for message in wire.split("\n\n")[:-1]:
+        events.append("\n".join(line[6:] for line in message.split("\n") if line.startswith("data: ")))
+    return events
+
+
+def test_frames_with_newlines_survive_wire_format():
+    """合并帧中的换行不能让其后的文本丢失"""
+    tokens = ["你好", "。\n\n", "第二段", "内容", "\n- 好的"]
+    frames = asyncio.run(_collect(SSEFrameCoalescer(window_ms=1000, max_bytes=4096), _source(tokens)))
+    wire = "".join(format_sse(frame) for frame in frames)
+    assert "".join(_client_parse(wire)) == "你好。第二段内容- 好的"
+    assert "".join(_spec_parse(wire)) == "".join(tokens)
+    assert _client_parse(format_sse("[DONE]")) == ["[DONE]"]
+
+
+def test_disconnect_cancels_upstream():
+    cancelled = []
+
+    async def workflow():
+        try:
+            for i in range(100):
+                await asyncio.sleep(0.01)
+                yield str(i)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        async def is_disconnected():
+            return loop.time() - started > 0.1
+
+        frames = [frame async for frame in watch_disconnect(workflow(), is_disconnected, poll_interval=0.02)]
+        await asyncio.sleep(0.01)
+        return frames
+
+    frames = asyncio.run(scenario())
+    assert 0 < len(frames) < 100
+    assert cancelled == [True]
+
+
+class _FakeWorkflow:
+    """工作流替身：推送回答片段与步骤状态后挂起（模拟工单分析、保存等后续节点仍在执行）"""
+
+    def __init__(self, events):
+        self.events = events
+
+    async def astream(self, initial_state, config=None, **kwargs):
+        for mode, payload in self.events:
+            if mode == "messages":
+                yield mode, (SimpleNamespace(content=payload), {"tags": ["answer_generator"]})
+            else:
+                yield mode, {**initial_state, **payload}
+        await asyncio.sleep(10)
+
+
+def _disconnect_after_first_frame(monkeypatch, events):
+    """客户端收到第一帧后断开，返回后台持久化使用的策略与回答"""
+    persisted = []
+
+    async def persist(state, partial_answer, policy):
+        persisted.append((policy, state.get("llm_response") or partial_answer))
+
+    monkeypatch.setattr(chat_workflow, "get_chat_workflow", lambda: _FakeWorkflow(events))
+    monkeypatch.setattr(chat_workflow, "persist_abandoned_turn", persist)
+
+    async def scenario():
+        received = []
+
+        async def is_disconnected():
+            return bool(received)
+
+        stream = chat_workflow.run_chat_workflow_streaming("你好", "c1", "s1", user_id="u1")
+        async for frame in watch_disconnect(stream, is_disconnected, poll_interval=0.01):
+            received.append(frame)
+        await asyncio.sleep(0.01)
+        return received
+
+    return asyncio.run(scenario()), persisted
+
+
+def test_disconnect_after_full_answer_persists_everything(monkeypatch):
+    received, persisted = _disconnect_after_first_frame(
+        monkeypatch, [("messages", "完整回答"), ("values", {"llm_response": "完整回答"})]
+    )
+    assert received == ["完整回答"]
+    assert persisted == [("all", "完整回答")]
+
+
+def test_disconnect_mid_answer_uses_cheap_policy(monkeypatch):
+    received, persisted = _disconnect_after_first_frame(monkeypatch, [("messages", "回答到一半")])
+    assert received == ["回答到一半"]
+    assert persisted == [(settings.CHAT_ABANDON_PERSIST, "回答到一半")]
+
+
+if __name__ == "__main__":
+    test_first_token_alone_then_merged()
+    test_byte_threshold_flushes()
+    test_time_window_flushes_during_pause()
+    test_control_message_not_merged()
+    test_disabled_passthrough()
+    test_frames_with_newlines_survive_wire_format()
+    test_disconnect_cancels_upstream()
+    print("✅ SSE 流式输出测试通过")
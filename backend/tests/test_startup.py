@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动子系统测试
+验证依赖并发初始化、超时/失败降级，以及就绪状态
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.initialize.startup import StartupTracker
+
+
+def test_concurrent_init_with_timeout_and_error():
+    tracker = StartupTracker()
+
+    async def slow_async():
+        await asyncio.sleep(0.2)
+
+    def slow_sync():
+        time.sleep(0.2)
+
+    def broken():
+        raise RuntimeError("boom")
+
+    async def hanging():
+        await asyncio.sleep(10)
+
+    async def scenario():
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            tracker.run("a", slow_async, timeout=1),
+            tracker.run("b", slow_sync, timeout=1),
+            tracker.run("c", broken, timeout=1),
+            tracker.run("d", hanging, timeout=0.1),
+        )
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(scenario())
+    assert results == [True, True, False, False]
+    assert elapsed < 0.35  # 并发执行，而非累加
+    assert tracker.init_results["c"]["status"] == "error"
+    assert tracker.init_results["d"]["status"] == "timeout"
+
+
+def test_readiness():
+    tracker = StartupTracker()
+    tracker.add_check("redis", lambda: True)
+    assert tracker.readiness()["ready"] is False
+
+    tracker.mark_ready()
+    assert tracker.readiness()["ready"] is True
+    assert tracker.readiness()["dependencies"] == {"redis": True}
+
+    tracker.mark_not_ready()
+    assert tracker.readiness()["ready"] is False
+
+
+if __name__ == "__main__":
+    test_concurrent_init_with_timeout_and_error()
+    test_readiness()
+    print("✅ 启动子系统测试通过")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滚动摘要记忆测试
+使用内存 Redis 与替身摘要 LLM 验证：滑出近期窗口的轮次合并进摘要、未合并的轮次保留原文、长对话 Prompt 体积基本恒定
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.initialize import redis
+from app.core.config import settings
+from app.modules.workflow.nodes.summary_memory import SummaryMemory, format_messages, message_keys
+from app.modules.workflow.nodes.working_memory import WorkingMemory
+from tests.fake_redis import FakeRedis
+
+
+def _setup(monkeypatch):
+    redis.redis_client = FakeRedis()
+    monkeypatch.setattr(settings, "WORKING_MEMORY_RECENT_ROUNDS", 2)
+    monkeypatch.setattr(settings, "WORKING_MEMORY_SUMMARY_BATCH", 2)
+    calls = []
+
+    async def fake_summarize(self, summary, pending):
+        calls.append([m["content"] for m in pending])
+        return f"摘要{len(calls)}"
+
+    monkeypatch.setattr(SummaryMemory, "_summarize_text", fake_summarize)
+    return calls
+
+
+async def _turn(memory, conversation_id, i):
+    await WorkingMemory.save_message(conversation_id, "user", f"问题{i}")
+    await WorkingMemory.save_message(conversation_id, "assistant", f"回答{i}")
+    await memory.summarize(conversation_id)
+
+
+def test_split_by_anchor(monkeypatch):
+    _setup(monkeypatch)
+    messages = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"消息{i}"} for i in range(8)]
+    pending, raw = SummaryMemory.split(messages, {})
+    assert [m["content"] for m in pending] == ["消息0", "消息1", "消息2", "消息3"]
+    assert raw == messages
+
+    record = {"summary": "已有摘要", "anchor": message_keys(messages[1:3])}
+    pending, raw = SummaryMemory.split(messages, record)
+    assert [m["content"] for m in pending] == ["消息3"]
+    assert [m["content"] for m in raw] == ["消息3", "消息4", "消息5", "消息6", "消息7"]
+
+
+def test_long_conversation_keeps_prompt_bounded(monkeypatch):
+    calls = _setup(monkeypatch)
+    memory = SummaryMemory()
+
+    async def run():
+        sizes = []
+        for i in range(15):
+            await _turn(memory, "conv_long", i)
+            messages = await WorkingMemory.get_messages("conv_long")
+            summary, raw = await memory.render("conv_long", messages)
+            sizes.append(len(raw))
+        return summary, raw, sizes
+
+    summary, raw, sizes = asyncio.run(run())
+    # 每轮新增 1 轮（2 条）滑出窗口，达到一批即合并，原文始终只有最近 2 轮
+    assert calls[0] == ["问题0", "回答0"]
+    assert calls[1] == ["问题1", "回答1"]
+    assert summary == f"摘要{len(calls)}"
+    assert [m["content"] for m in raw] == ["问题13", "回答13", "问题14", "回答14"]
+    assert max(sizes) == 4
+
+
+def test_unfolded_turns_stay_raw(monkeypatch):
+    calls = _setup(monkeypatch)
+    monkeypatch.setattr(settings, "WORKING_MEMORY_SUMMARY_BATCH", 4)
+    memory = SummaryMemory()
+
+    async def run():
+        for i in range(5):
+            await _turn(memory, "conv_batch", i)
+        messages = await WorkingMemory.get_messages("conv_batch")
+        return await memory.render("conv_batch", messages)
+
+    summary, raw = asyncio.run(run())
+    assert calls == [["问题0", "回答0", "问题1", "回答1"]]
+    # 第 3 轮已滑出窗口但不足一批，仍以原文保留
+    assert format_messages(raw).splitlines()[0] == "用户：问题2"
+    assert len(raw) == 4 + 2
+
+
+def test_schedule_coalesces_per_conversation(monkeypatch):
+    calls = _setup(monkeypatch)
+    memory = SummaryMemory()
+
+    async def run():
+        for i in range(3):
+            await WorkingMemory.save_message("conv_bg", "user", f"问题{i}")
+            await WorkingMemory.save_message("conv_bg", "assistant", f"回答{i}")
+        memory.schedule("conv_bg")
+        memory.schedule("conv_bg")
+        assert len(memory._tasks) == 1
+        await asyncio.gather(*list(memory._tasks.values()))
+
+    asyncio.run(run())
+    assert calls == [["问题0", "回答0"]]  # 重跑时已无待合并消息
+    assert "short_memory_summary_lock:conv_bg" not in redis.redis_client.data
+
+
+def test_schedule_runs_in_fresh_context(monkeypatch):
+    """摘要任务不继承调用方的上下文变量（请求截止时间、LangChain 回调）"""
+    import contextvars
+
+    marker = contextvars.ContextVar("marker", default=None)
+    seen = []
+    memory = SummaryMemory()
+
+    async def fake_summarize(conversation_id):
+        seen.append(marker.get())
+        return False
+
+    monkeypatch.setattr(settings, "WORKING_MEMORY_SUMMARY_ENABLED", True)
+    monkeypatch.setattr(memory, "summarize", fake_summarize)
+
+    async def run():
+        marker.set("request")
+        memory.schedule("conv_ctx")
+        await asyncio.gather(*list(memory._tasks.values()))
+
+    asyncio.run(run())
+    assert seen == [None]
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
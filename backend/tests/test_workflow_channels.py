@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工作流状态瘦身测试
+验证：大体积中间产物经旁路存储按句柄传递，节点只读取声明的通道，未声明的状态写入被丢弃
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, TypedDict
+
+import pytest
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from langgraph.graph import END
+from app.modules.workflow.core import artifacts
+from app.modules.workflow.core.graph import WorkflowGraphBuilder
+from app.modules.workflow.core.state import NODE_CHANNELS, WorkflowState
+
+
+class _State(TypedDict, total=False):
+    user_input: str
+    memories_ref: str
+    answer: str
+    secret: str
+
+
+def _build(seen: List[Dict[str, Any]]):
+    async def produce(state):
+        return {"memories_ref": artifacts.put("memories", ["记忆A", "记忆B"]), "secret": "不应写入"}
+
+    async def consume(state):
+        seen.append(dict(state))
+        return {"answer": "|".join(artifacts.get(state.get("memories_ref"), []))}
+
+    builder = WorkflowGraphBuilder(state_schema=_State, channels={
+        "produce": {"reads": ("user_input",), "writes": ("memories_ref",)},
+        "consume": {"reads": ("memories_ref",), "writes": ("answer",)},
+    })
+    builder.add_node("produce", produce)
+    builder.add_node("consume", consume)
+    builder.set_entry_point("produce")
+    builder.add_edge("produce", "consume")
+    builder.add_edge("consume", END)
+    return builder.compile()
+
+
+def test_artifacts_by_handle_and_channels():
+    seen = []
+
+    async def run():
+        artifacts.open_scope()
+        try:
+            return await _build(seen).ainvoke({"user_input": "你好"})
+        finally:
+            artifacts.close_scope()
+
+    result = asyncio.run(run())
+    assert result["answer"] == "记忆A|记忆B"
+    assert "secret" not in result  # 未声明的写入被丢弃
+    assert set(seen[0]) == {"memories_ref"}  # 只读取声明的通道
+
+
+def test_stale_handle_resolves_to_default():
+    """上一轮请求签发的句柄（如从检查点恢复）不会解析到本轮的数据"""
+    old = artifacts.ArtifactStore()
+    handle = old.put("similar_messages", "旧数据")
+    artifacts.open_scope()
+    assert artifacts.get(handle, "") == ""
+    artifacts.close_scope()
+    assert artifacts.put("x", 1) == ""
+
+
+def test_node_channels_match_state():
+    fields = set(WorkflowState.__annotations__)
+    for name, spec in NODE_CHANNELS.items():
+        assert set(spec["reads"]) <= fields, name
+        assert set(spec["writes"]) <= fields, name
+
+
+def test_unknown_read_channel_rejected():
+    builder = WorkflowGraphBuilder(state_schema=_State, channels={"n": {"reads": ("missing",)}})
+    with pytest.raises(ValueError):
+        builder.add_node("n", lambda state: {})
+
+
+if __name__ == "__main__":
+    test_artifacts_by_handle_and_channels()
+    test_stale_handle_resolves_to_default()
+    test_node_channels_match_state()
+    test_unknown_read_channel_rejected()
+    print("✅ 工作流状态瘦身测试通过")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Working Memory 历史回退测试
+使用内存 Redis 与替身历史接口验证：空历史负缓存、同一对话并发回退只请求一次、新建对话标记与首次保存清除标记
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# 确保从正确的路径导入模块
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.initialize import redis
+from app.core.metrics import metrics
+from app.modules.workflow.nodes.working_memory import WorkingMemory
+from tests.fake_redis import FakeRedis
+
+
+def _setup(monkeypatch, result):
+    redis.redis_client = FakeRedis()
+    calls = {"history": 0}
+
+    async def fake_history(session_token, access_token):
+        calls["history"] += 1
+        await asyncio.sleep(0.01)
+        return result
+
+    monkeypatch.setattr(WorkingMemory, "_fetch_history_from_api", staticmethod(fake_history))
+    return calls
+
+
+def test_empty_history_is_negatively_cached(monkeypatch):
+    calls = _setup(monkeypatch, [])
+
+    async def run():
+        first = await WorkingMemory.get_messages("conv_empty", "token")
+        second = await WorkingMemory.get_messages("conv_empty", "token")
+        return first, second
+
+    before = metrics.snapshot()["counters"].get("working_memory.negative_hit", 0)
+    assert asyncio.run(run()) == ([], [])
+    assert calls["history"] == 1
+    assert metrics.snapshot()["counters"]["working_memory.negative_hit"] == before + 1
+
+
+def test_failed_fetch_is_not_cached(monkeypatch):
+    calls = _setup(monkeypatch, None)
+
+    async def run():
+        await WorkingMemory.get_messages("conv_down", "token")
+        await WorkingMemory.get_messages("conv_down", "token")
+
+    asyncio.run(run())
+    assert calls["history"] == 2
+    assert f"{WorkingMemory.EMPTY_PREFIX}conv_down" not in redis.redis_client.data
+
+
+def test_concurrent_fallbacks_share_one_fetch(monkeypatch):
+    history = [{"role": "user", "content": "你好"}]
+    calls = _setup(monkeypatch, history)
+
+    async def run():
+        return await asyncio.gather(*[WorkingMemory.get_messages("conv_busy", "token") for _ in range(5)])
+
+    results = asyncio.run(run())
+    assert calls["history"] == 1
+    assert all(messages == history for messages in results)
+    assert not WorkingMemory._inflight
+
+
+def test_new_conversation_marker_cleared_on_first_save(monkeypatch):
+    calls = _setup(monkeypatch, [{"role": "user", "content": "不应被请求"}])
+
+    async def run():
+        await WorkingMemory.mark_empty("conv_new", ttl=3600)
+        empty = await WorkingMemory.get_messages("conv_new", "token")
+        await WorkingMemory.save_message("conv_new", "user", "第一条消息")
+        marked = f"{WorkingMemory.EMPTY_PREFIX}conv_new" in redis.redis_client.data
+        return empty, marked, await WorkingMemory.get_messages("conv_new", "token")
+
+    empty, marked, messages = asyncio.run(run())
+    assert empty == []
+    assert not marked
+    assert [m["content"] for m in messages] == ["第一条消息"]
+    assert calls["history"] == 0
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -41,3 +41,15 @@ DEFAULT_N_RESULTS = 3
 # ==================== 日志配置 ====================
 LOG_LEVEL = "INFO"
 LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+# ==================== 基准测试配置（vector_database_benchmark.py） ====================
+BENCH_DIMENSION = 384  # 与后端默认嵌入模型 all-MiniLM-L6-v2 的维度一致
+BENCH_SIZES = [10_000, 100_000]  # 语料规模（向量条数），最大支持到千万级
+BENCH_AVG_SESSION_SIZE = 40  # 每个会话的平均消息条数（几何分布）
+BENCH_MAX_SESSIONS_PER_USER = 200  # 单个用户的会话数上限（Zipf 分布，大部分用户只有几个会话）
+BENCH_QUERIES = 200  # 每种过滤条件的查询次数
+BENCH_TOP_K = 10
+BENCH_INSERT_BATCH = 5000
+BENCH_WORKDIR = "./bench_data"  # 语料缓存（float16 内存映射文件）与本地数据库目录
+BENCH_CHROMA_HNSW = {"space": "cosine", "ef_construction": 100, "ef_search": 100, "max_neighbors": 16}
+BENCH_MILVUS_URI = "./bench_data/milvus_lite.db"  # 本地文件路径为 Milvus Lite，http://host:port 为 Milvus 服务
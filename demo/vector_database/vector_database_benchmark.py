@@ -0,0 +1,657 @@
+"""
+向量数据库基准测试
+在 ChromaDB（内嵌 / 本地持久化 / HTTP 服务）与 Milvus（Milvus Lite / Milvus 服务）上测量：
+- 写入吞吐（条/秒，含落盘与索引构建等待）
+- 带过滤条件的查询延迟 p50 / p95 / p99
+- recall@k（与精确暴力检索的结果对比）
+
+语料为合成的对话记忆：每个会话的消息围绕会话主题、每个用户的会话围绕用户主题，
+会话长度服从几何分布，用户会话数服从 Zipf 分布，user_id / session_id 的基数与线上相近。
+向量不经过 Ollama 嵌入（千万级语料嵌入耗时远超检索本身），直接按分布生成并缓存到 float16 内存映射文件，
+相同规模与随机种子的语料可重复使用。
+
+用法:
+    python vector_database_benchmark.py --backend chroma --sizes 10000 100000
+    python vector_database_benchmark.py --backend milvus --milvus-uri ./bench_data/milvus_lite.db --sizes 10000
+    python vector_database_benchmark.py --backend chroma milvus --sizes 1000000 --chroma-ef-search 50 100 200 \\
+        --milvus-search-params '{"nprobe": 10}' '{"nprobe": 32}' --output results.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+# 从配置文件导入配置
+from config import (
+    CHROMA_HOST,
+    CHROMA_PORT,
+    MILVUS_INDEX_TYPE,
+    MILVUS_INDEX_PARAMS,
+    MILVUS_SEARCH_PARAMS,
+    BENCH_DIMENSION,
+    BENCH_SIZES,
+    BENCH_AVG_SESSION_SIZE,
+    BENCH_MAX_SESSIONS_PER_USER,
+    BENCH_QUERIES,
+    BENCH_TOP_K,
+    BENCH_INSERT_BATCH,
+    BENCH_WORKDIR,
+    BENCH_CHROMA_HNSW,
+    BENCH_MILVUS_URI,
+    LOG_LEVEL,
+    LOG_FORMAT
+)
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+BENCH_COLLECTION = "bench_collection"
+
+# 向量 = 用户主题 + 会话主题 + 消息噪声（归一化后使用，余弦与内积等价）
+USER_WEIGHT = 0.6
+SESSION_WEIGHT = 0.6
+NOISE_WEIGHT = 0.5
+# 查询向量在会话内某条消息附近扰动
+QUERY_NOISE = 0.3
+
+FILTERS = ("session", "user", "none")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 3) if values else 0.0
+
+
+# ==================== 合成语料 ====================
+
+class SyntheticCorpus:
+    """合成对话记忆语料（会话内消息在行上连续存放，过滤条件的精确结果可以按行区间直接计算）"""
+
+    def __init__(self, size: int, dim: int = BENCH_DIMENSION, seed: int = 42,
+                 avg_session_size: int = BENCH_AVG_SESSION_SIZE,
+                 max_sessions_per_user: int = BENCH_MAX_SESSIONS_PER_USER,
+                 workdir: str = BENCH_WORKDIR):
+        self.size = size
+        self.dim = dim
+        self.seed = seed
+        self.avg_session_size = avg_session_size
+        self.max_sessions_per_user = max_sessions_per_user
+        self.workdir = workdir
+
+        self._build_layout()
+        self.vectors = self._load_or_generate()
+
+    def _build_layout(self):
+        """生成会话长度与用户归属"""
+        rng = np.random.default_rng(self.seed)
+
+        sizes = []
+        total = 0
+        while total < self.size:
+            chunk = rng.geometric(1.0 / self.avg_session_size, size=max(1024, self.size // self.avg_session_size))
+            sizes.append(chunk)
+            total += int(chunk.sum())
+        sizes = np.concatenate(sizes)
+        ends = np.cumsum(sizes)
+        count = int(np.searchsorted(ends, self.size)) + 1
+        sizes = sizes[:count]
+        sizes[-1] -= int(ends[count - 1]) - self.size
+
+        # 每个用户的会话数（Zipf，大部分用户只有少量会话）
+        session_user = []
+        user = 0
+        while len(session_user) < count:
+            sessions = min(int(rng.zipf(2.2)), self.max_sessions_per_user)
+            session_user.extend([user] * sessions)
+            user += 1
+
+        self.session_sizes = sizes.astype(np.int64)
+        self.session_starts = np.concatenate([[0], np.cumsum(self.session_sizes)]).astype(np.int64)
+        self.session_user = np.asarray(session_user[:count], dtype=np.int64)
+        self.user_count = int(self.session_user[-1]) + 1
+        self.session_count = count
+
+        # 用户 → 会话列表（session_user 单调递增）
+        self.user_session_starts = np.searchsorted(self.session_user, np.arange(self.user_count + 1))
+
+    def _path(self) -> str:
+        return os.path.join(
+            self.workdir,
+            f"corpus_n{self.size}_d{self.dim}_s{self.seed}_a{self.avg_session_size}_u{self.max_sessions_per_user}.f16"
+        )
+
+    def _load_or_generate(self) -> np.memmap:
+        os.makedirs(self.workdir, exist_ok=True)
+        path = self._path()
+        expected_bytes = self.size * self.dim * 2
+        if os.path.exists(path) and os.path.getsize(path) == expected_bytes:
+            logger.info(f"📂 复用已生成的语料: {path}")
+            return np.memmap(path, dtype=np.float16, mode="r", shape=(self.size, self.dim))
+
+        logger.info(f"🔧 生成语料 {self.size} 条（{self.user_count} 个用户，{self.session_count} 个会话）→ {path}")
+        started = time.perf_counter()
+        tmp_path = path + ".tmp"
+        vectors = np.memmap(tmp_path, dtype=np.float16, mode="w+", shape=(self.size, self.dim))
+        rng = np.random.default_rng(self.seed + 1)
+        user_topics = _normalize(rng.standard_normal((self.user_count, self.dim)).astype(np.float32))
+
+        sessions_per_chunk = max(1, 200_000 // self.avg_session_size)
+        for first in range(0, self.session_count, sessions_per_chunk):
+            last = min(first + sessions_per_chunk, self.session_count)
+            sizes = self.session_sizes[first:last]
+            start, end = int(self.session_starts[first]), int(self.session_starts[last])
+
+            session_topics = _normalize(rng.standard_normal((last - first, self.dim)).astype(np.float32))
+            session_of_row = np.repeat(np.arange(last - first), sizes)
+            user_of_row = np.repeat(self.session_user[first:last], sizes)
+            noise = _normalize(rng.standard_normal((end - start, self.dim)).astype(np.float32))
+
+            vectors[start:end] = _normalize(
+                USER_WEIGHT * user_topics[user_of_row]
+                + SESSION_WEIGHT * session_topics[session_of_row]
+                + NOISE_WEIGHT * noise
+            ).astype(np.float16)
+
+        vectors.flush()
+        del vectors
+        os.replace(tmp_path, path)
+        logger.info(f"✅ 语料生成完成，耗时 {time.perf_counter() - started:.1f} 秒")
+        return np.memmap(path, dtype=np.float16, mode="r", shape=(self.size, self.dim))
+
+    @staticmethod
+    def user_id(user: int) -> str:
+        return str(100000 + user)
+
+    @staticmethod
+    def session_id(session: int) -> str:
+        return f"conv_{session:010d}"
+
+    def iter_batches(self, batch_size: int) -> Iterator[Dict]:
+        """按批遍历语料，每批包含行号、float32 向量与 user_id / session_id"""
+        row_session = np.repeat(np.arange(self.session_count), self.session_sizes)
+        for start in range(0, self.size, batch_size):
+            end = min(start + batch_size, self.size)
+            sessions = row_session[start:end]
+            yield {
+                "rows": np.arange(start, end),
+                "vectors": np.asarray(self.vectors[start:end], dtype=np.float32),
+                "user_ids": [self.user_id(u) for u in self.session_user[sessions]],
+                "session_ids": [self.session_id(s) for s in sessions],
+            }
+
+    def rows_matching(self, query: Dict, filter_mode: str) -> Optional[np.ndarray]:
+        """过滤条件命中的行号（none 返回 None，表示全库）"""
+        if filter_mode == "session":
+            session = query["session"]
+            return np.arange(self.session_starts[session], self.session_starts[session + 1])
+        if filter_mode == "user":
+            first, last = self.user_session_starts[query["user"]], self.user_session_starts[query["user"] + 1]
+            return np.arange(self.session_starts[first], self.session_starts[last])
+        return None
+
+    def make_queries(self, count: int, seed: int = 7) -> List[Dict]:
+        """生成查询：按会话长度加权抽取会话，以会话内某条消息为中心扰动"""
+        rng = np.random.default_rng(seed)
+        sessions = rng.choice(self.session_count, size=count, p=self.session_sizes / self.size)
+        queries = []
+        for session in sessions:
+            row = int(rng.integers(self.session_starts[session], self.session_starts[session + 1]))
+            base = np.asarray(self.vectors[row], dtype=np.float32)
+            vector = _normalize(base + QUERY_NOISE * _normalize(rng.standard_normal(self.dim).astype(np.float32)))
+            queries.append({
+                "vector": vector.astype(np.float32),
+                "user": int(self.session_user[session]),
+                "session": int(session),
+            })
+        return queries
+
+    def ground_truth(self, query: Dict, k: int, filter_mode: str) -> np.ndarray:
+        """精确检索（余弦距离）的 top-k 行号"""
+        rows = self.rows_matching(query, filter_mode)
+        if rows is not None:
+            scores = np.asarray(self.vectors[rows], dtype=np.float32) @ query["vector"]
+            top = np.argsort(-scores)[:k]
+            return rows[top]
+
+        # 全库：分块扫描，只保留每块的 top-k
+        best_rows, best_scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        for start in range(0, self.size, 1_000_000):
+            block = np.asarray(self.vectors[start:start + 1_000_000], dtype=np.float32) @ query["vector"]
+            top = np.argpartition(-block, min(k, len(block)) - 1)[:k]
+            best_rows = np.concatenate([best_rows, top + start])
+            best_scores = np.concatenate([best_scores, block[top]])
+        return best_rows[np.argsort(-best_scores)[:k]]
+
+    def describe(self) -> Dict:
+        candidates_per_user = np.diff(self.session_starts[self.user_session_starts])
+        return {
+            "size": self.size,
+            "dim": self.dim,
+            "seed": self.seed,
+            "users": self.user_count,
+            "sessions": self.session_count,
+            "session_size_mean": round(float(self.session_sizes.mean()), 2),
+            "session_size_p99": int(np.percentile(self.session_sizes, 99)),
+            "user_rows_mean": round(float(candidates_per_user.mean()), 2),
+            "user_rows_p99": int(np.percentile(candidates_per_user, 99)),
+        }
+
+
+# ==================== 后端封装 ====================
+
+class ChromaDBBench:
+    """ChromaDB 基准测试客户端（ephemeral: 进程内存 / persistent: 本地目录 / http: ChromaDB 服务）"""
+
+    name = "chroma"
+
+    def __init__(self, mode: str = "persistent", workdir: str = BENCH_WORKDIR, hnsw: Optional[Dict] = None):
+        self.mode = mode
+        self.workdir = workdir
+        self.hnsw = dict(hnsw or BENCH_CHROMA_HNSW)
+        self.client = None
+        self.collection = None
+
+    def connect(self):
+        import chromadb
+
+        if self.mode == "http":
+            self.client = chromadb.HttpClient(host=CHROMA_HOST, port=int(CHROMA_PORT))
+        elif self.mode == "ephemeral":
+            self.client = chromadb.EphemeralClient()
+        else:
+            self.client = chromadb.PersistentClient(path=os.path.join(self.workdir, "chroma"))
+        logger.info(f"✅ ChromaDB 客户端已创建 (mode={self.mode})")
+
+    def create_collection(self, dim: int):
+        """删除并重建基准集合"""
+        try:
+            self.client.delete_collection(BENCH_COLLECTION)
+        except Exception:
+            pass
+        self.collection = self.client.create_collection(
+            BENCH_COLLECTION,
+            configuration={"hnsw": self.hnsw},
+            embedding_function=None
+        )
+
+    def insert_batch_size(self, requested: int) -> int:
+        return min(requested, self.client.get_max_batch_size())
+
+    def insert(self, batch: Dict):
+        self.collection.add(
+            ids=[str(row) for row in batch["rows"]],
+            embeddings=batch["vectors"],
+            metadatas=[
+                {"user_id": user_id, "session_id": session_id}
+                for user_id, session_id in zip(batch["user_ids"], batch["session_ids"])
+            ]
+        )
+
+    def finalize(self):
+        """ChromaDB 写入时同步建索引，无需等待"""
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def search_settings(self, ef_search_values: List[int]) -> List[Dict]:
+        return [{"ef_search": value} for value in ef_search_values] or [{"ef_search": self.hnsw.get("ef_search", 100)}]
+
+    def apply_search_settings(self, search_settings: Dict):
+        self.collection.modify(configuration={"hnsw": {"ef_search": search_settings["ef_search"]}})
+
+    def search(self, vector: np.ndarray, k: int, user_id: Optional[str], session_id: Optional[str]) -> List[int]:
+        where = None
+        if user_id and session_id:
+            where = {"$and": [{"user_id": user_id}, {"session_id": session_id}]}
+        elif user_id:
+            where = {"user_id": user_id}
+        results = self.collection.query(query_embeddings=[vector], n_results=k, where=where, include=[])
+        return [int(row) for row in results["ids"][0]]
+
+    def close(self):
+        self.collection = None
+        self.client = None
+
+
+class MilvusBench:
+    """Milvus 基准测试客户端（uri 为本地文件路径时使用 Milvus Lite）"""
+
+    name = "milvus"
+
+    def __init__(self, uri: str = BENCH_MILVUS_URI, index_type: str = MILVUS_INDEX_TYPE,
+                 index_params: Optional[Dict] = None, partition_key: bool = True, num_partitions: int = 64):
+        self.uri = uri
+        self.index_type = index_type
+        self.index_params = dict(MILVUS_INDEX_PARAMS if index_params is None else index_params)
+        self.partition_key = partition_key
+        self.num_partitions = num_partitions
+        self.search_params = dict(MILVUS_SEARCH_PARAMS)
+        self.client = None
+
+    def connect(self):
+        from pymilvus import MilvusClient
+
+        if "://" not in self.uri:
+            os.makedirs(os.path.dirname(os.path.abspath(self.uri)), exist_ok=True)
+        self.client = MilvusClient(uri=self.uri)
+        logger.info(f"✅ 成功连接到 Milvus: {self.uri}")
+
+    def create_collection(self, dim: int):
+        """删除并重建基准集合（schema 与后端 MilvusMemoryStore 一致：user_id 为分区键，session_id 倒排索引）"""
+        from pymilvus import DataType, MilvusClient
+
+        if self.client.has_collection(BENCH_COLLECTION):
+            self.client.drop_collection(BENCH_COLLECTION)
+
+        schema = MilvusClient.create_schema(auto_id=False, enable_dynamic_field=False)
+        schema.add_field(field_name="id", datatype=DataType.INT64, is_primary=True)
+        schema.add_field(field_name="embedding", datatype=DataType.FLOAT_VECTOR, dim=dim)
+        schema.add_field(field_name="user_id", datatype=DataType.VARCHAR, max_length=100,
+                         is_partition_key=self.partition_key)
+        schema.add_field(field_name="session_id", datatype=DataType.VARCHAR, max_length=200)
+
+        index_params = self.client.prepare_index_params()
+        index_params.add_index(field_name="embedding", index_type=self.index_type,
+                               metric_type="COSINE", params=self.index_params)
+        index_params.add_index(field_name="session_id", index_type="INVERTED")
+
+        options = {"num_partitions": self.num_partitions} if self.partition_key else {}
+        self.client.create_collection(
+            collection_name=BENCH_COLLECTION,
+            schema=schema,
+            index_params=index_params,
+            **options
+        )
+
+    def insert_batch_size(self, requested: int) -> int:
+        return requested
+
+    def insert(self, batch: Dict):
+        self.client.insert(
+            collection_name=BENCH_COLLECTION,
+            data=[
+                {"id": int(row), "embedding": vector, "user_id": user_id, "session_id": session_id}
+                for row, vector, user_id, session_id in zip(
+                    batch["rows"], batch["vectors"], batch["user_ids"], batch["session_ids"]
+                )
+            ]
+        )
+
+    def finalize(self, timeout: float = 3600):
+        """落盘并等待索引构建完成后加载集合"""
+        if hasattr(self.client, "flush"):
+            self.client.flush(BENCH_COLLECTION)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            info = self.client.describe_index(BENCH_COLLECTION, index_name="embedding") or {}
+            if info.get("pending_index_rows", 0) == 0 and info.get("state", "Finished") == "Finished":
+                break
+            time.sleep(1)
+        self.client.load_collection(BENCH_COLLECTION)
+
+    def count(self) -> int:
+        rows = self.client.query(collection_name=BENCH_COLLECTION, filter="", output_fields=["count(*)"])
+        return int(rows[0]["count(*)"]) if rows else 0
+
+    def search_settings(self, search_params_values: List[Dict]) -> List[Dict]:
+        return list(search_params_values) or [self.search_params]
+
+    def apply_search_settings(self, search_settings: Dict):
+        self.search_params = search_settings
+
+    def search(self, vector: np.ndarray, k: int, user_id: Optional[str], session_id: Optional[str]) -> List[int]:
+        expr = ""
+        if user_id and session_id:
+            expr = f'user_id == "{user_id}" and session_id == "{session_id}"'
+        elif user_id:
+            expr = f'user_id == "{user_id}"'
+        results = self.client.search(
+            collection_name=BENCH_COLLECTION,
+            data=[vector.tolist()],
+            filter=expr,
+            limit=k,
+            search_params={"metric_type": "COSINE", "params": self.search_params}
+        )
+        return [int(hit["id"]) for hit in results[0]]
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+        self.client = None
+
+
+# ==================== 测量 ====================
+
+def measure_ingest(backend, corpus: SyntheticCorpus, batch_size: int) -> Dict:
+    """写入全部语料，返回写入吞吐"""
+    backend.create_collection(corpus.dim)
+    batch_size = backend.insert_batch_size(batch_size)
+
+    started = time.perf_counter()
+    inserted = 0
+    last_log = started
+    for batch in corpus.iter_batches(batch_size):
+        backend.insert(batch)
+        inserted += len(batch["rows"])
+        if time.perf_counter() - last_log > 10:
+            last_log = time.perf_counter()
+            logger.info(f"   已写入 {inserted}/{corpus.size} 条（{inserted / (last_log - started):.0f} 条/秒）")
+    insert_seconds = time.perf_counter() - started
+
+    backend.finalize()
+    total_seconds = time.perf_counter() - started
+    count = backend.count()
+    if count != corpus.size:
+        logger.warning(f"⚠️ 集合条数 {count} 与语料条数 {corpus.size} 不一致")
+
+    return {
+        "batch_size": batch_size,
+        "count": count,
+        "insert_seconds": round(insert_seconds, 3),
+        "ready_seconds": round(total_seconds, 3),
+        "vectors_per_second": round(corpus.size / max(total_seconds, 1e-9), 1),
+    }
+
+
+def measure_queries(backend, corpus: SyntheticCorpus, queries: List[Dict], truths: List[np.ndarray],
+                    filter_mode: str, k: int, warmup: int = 10) -> Dict:
+    """顺序执行查询，统计延迟分位数与 recall@k"""
+    def run(query):
+        user_id = corpus.user_id(query["user"]) if filter_mode in ("user", "session") else None
+        session_id = corpus.session_id(query["session"]) if filter_mode == "session" else None
+        return backend.search(query["vector"], k, user_id, session_id)
+
+    for query in queries[:warmup]:
+        run(query)
+
+    latencies, recalls = [], []
+    started = time.perf_counter()
+    for query, truth in zip(queries, truths):
+        t0 = time.perf_counter()
+        rows = run(query)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if len(truth):
+            recalls.append(len(set(rows) & set(truth.tolist())) / min(k, len(truth)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "filter": filter_mode,
+        "k": k,
+        "queries": len(queries),
+        "latency_ms": {
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "p99": _percentile(latencies, 99),
+            "mean": round(float(np.mean(latencies)), 3),
+        },
+        "qps": round(len(queries) / max(elapsed, 1e-9), 1),
+        f"recall_at_{k}": round(float(np.mean(recalls)), 4) if recalls else None,
+        "mean_candidates": round(float(np.mean([
+            corpus.size if rows is None else len(rows)
+            for rows in (corpus.rows_matching(query, filter_mode) for query in queries)
+        ])), 1),
+    }
+
+
+def run_backend(backend, corpus: SyntheticCorpus, args, sweep: List) -> Dict:
+    """单个后端、单个语料规模的完整测试"""
+    result = {"backend": backend.name, "corpus": corpus.describe()}
+    try:
+        backend.connect()
+        logger.info(f"📝 [{backend.name}] 写入 {corpus.size} 条向量")
+        result["ingest"] = measure_ingest(backend, corpus, args.batch_size)
+        logger.info(f"   写入完成: {result['ingest']}")
+
+        queries = corpus.make_queries(args.queries)
+        result["queries"] = []
+        for filter_mode in args.filters:
+            truths = [corpus.ground_truth(query, args.k, filter_mode) for query in queries]
+            for search_settings in backend.search_settings(sweep):
+                backend.apply_search_settings(search_settings)
+                stats = measure_queries(backend, corpus, queries, truths, filter_mode, args.k)
+                stats["search_params"] = search_settings
+                result["queries"].append(stats)
+                logger.info(
+                    f"🔍 [{backend.name}] filter={filter_mode} params={search_settings} "
+                    f"p50={stats['latency_ms']['p50']}ms p99={stats['latency_ms']['p99']}ms "
+                    f"recall@{args.k}={stats[f'recall_at_{args.k}']}"
+                )
+    except Exception as e:
+        logger.error(f"❌ [{backend.name}] 基准测试失败: {str(e)}")
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        try:
+            backend.close()
+        except Exception:
+            pass
+    return result
+
+
+# ==================== 辅助函数 ====================
+
+def collect_environment() -> Dict:
+    """记录运行环境（结果之间可比的前提）"""
+    environment = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+    for package in ("chromadb", "pymilvus"):
+        try:
+            environment[package] = __import__(package).__version__
+        except Exception:
+            environment[package] = None
+    return environment
+
+
+def create_backend(name: str, args):
+    if name == "chroma":
+        hnsw = {**BENCH_CHROMA_HNSW, **json.loads(args.chroma_hnsw)} if args.chroma_hnsw else None
+        return ChromaDBBench(mode=args.chroma_mode, workdir=args.workdir, hnsw=hnsw)
+    return MilvusBench(
+        uri=args.milvus_uri,
+        index_type=args.milvus_index_type,
+        index_params=json.loads(args.milvus_index_params) if args.milvus_index_params else None,
+        partition_key=not args.no_partition_key,
+        num_partitions=args.milvus_num_partitions
+    )
+
+
+def print_summary(report: Dict):
+    """打印结果摘要"""
+    print("\n" + "="*60)
+    print("📊 基准测试结果")
+    print("="*60)
+    for run in report["runs"]:
+        corpus = run["corpus"]
+        print(f"\n[{run['backend']}] {corpus['size']} 条 / {corpus['users']} 用户 / {corpus['sessions']} 会话")
+        if "error" in run:
+            print(f"   ❌ {run['error']}")
+            continue
+        if "ingest" in run:
+            print(f"   写入: {run['ingest']['vectors_per_second']} 条/秒（就绪耗时 {run['ingest']['ready_seconds']} 秒）")
+        for stats in run.get("queries", []):
+            recall = stats[f"recall_at_{stats['k']}"]
+            print(
+                f"   {stats['filter']:<8} {json.dumps(stats['search_params']):<20} "
+                f"p50={stats['latency_ms']['p50']:>8}ms  p99={stats['latency_ms']['p99']:>8}ms  "
+                f"recall@{stats['k']}={recall}"
+            )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="向量数据库基准测试（ChromaDB / Milvus）")
+    parser.add_argument("--backend", nargs="+", choices=("chroma", "milvus"), default=["chroma"], help="测试的后端")
+    parser.add_argument("--sizes", nargs="+", type=int, default=BENCH_SIZES, help="语料规模（向量条数）")
+    parser.add_argument("--dim", type=int, default=BENCH_DIMENSION, help="向量维度")
+    parser.add_argument("--seed", type=int, default=42, help="语料随机种子")
+    parser.add_argument("--avg-session-size", type=int, default=BENCH_AVG_SESSION_SIZE, help="会话平均消息条数")
+    parser.add_argument("--max-sessions-per-user", type=int, default=BENCH_MAX_SESSIONS_PER_USER, help="单用户会话数上限")
+    parser.add_argument("--queries", type=int, default=BENCH_QUERIES, help="每种过滤条件的查询次数")
+    parser.add_argument("--k", type=int, default=BENCH_TOP_K, help="top-k")
+    parser.add_argument("--filters", nargs="+", choices=FILTERS, default=["session", "user"],
+                        help="过滤条件：session（user_id + session_id，与线上一致）/ user / none（全库，精确结果计算较慢）")
+    parser.add_argument("--batch-size", type=int, default=BENCH_INSERT_BATCH, help="每批写入条数")
+    parser.add_argument("--workdir", default=BENCH_WORKDIR, help="语料缓存与本地数据库目录")
+    parser.add_argument("--chroma-mode", choices=("persistent", "ephemeral", "http"), default="persistent",
+                        help="ChromaDB 运行方式（http 使用 config.py 中的 CHROMA_HOST/CHROMA_PORT）")
+    parser.add_argument("--chroma-hnsw", default=None, help='ChromaDB HNSW 参数 JSON，如 \'{"max_neighbors": 32}\'')
+    parser.add_argument("--chroma-ef-search", nargs="*", type=int, default=[], help="依次测试的 ef_search 取值")
+    parser.add_argument("--milvus-uri", default=BENCH_MILVUS_URI, help="Milvus 地址（本地文件路径为 Milvus Lite）")
+    parser.add_argument("--milvus-index-type", default=MILVUS_INDEX_TYPE, help="Milvus 向量索引类型")
+    parser.add_argument("--milvus-index-params", default=None, help='Milvus 索引参数 JSON，如 \'{"nlist": 1024}\'')
+    parser.add_argument("--milvus-search-params", nargs="*", default=[], help="依次测试的 Milvus 检索参数 JSON")
+    parser.add_argument("--milvus-num-partitions", type=int, default=64, help="分区键的分区数")
+    parser.add_argument("--no-partition-key", action="store_true", help="不使用 user_id 作为分区键")
+    parser.add_argument("--output", default=None, help="结果 JSON 输出路径（默认输出到标准输出）")
+    return parser.parse_args(argv)
+
+
+# ==================== 主程序 ====================
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "environment": collect_environment(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "runs": [],
+    }
+
+    for size in args.sizes:
+        corpus = SyntheticCorpus(
+            size, dim=args.dim, seed=args.seed,
+            avg_session_size=args.avg_session_size,
+            max_sessions_per_user=args.max_sessions_per_user,
+            workdir=args.workdir
+        )
+        for name in args.backend:
+            sweep = args.chroma_ef_search if name == "chroma" else [json.loads(p) for p in args.milvus_search_params]
+            report["runs"].append(run_backend(create_backend(name, args), corpus, args, sweep))
+
+    print_summary(report)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        logger.info(f"✅ 结果已写入 {args.output}")
+    else:
+        print(output)
+    return 1 if any("error" in run for run in report["runs"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())